@@ -73,6 +73,92 @@ class ConfigManager:
         """获取API配置"""
         return self.main_config.get("api", {})
     
+    def get_http_pool_config(self) -> Dict[str, Any]:
+        """获取HTTP连接池配置"""
+        return self.get_api_config().get("http_pool", {})
+    
+    def get_response_cache_config(self) -> Dict[str, Any]:
+        """获取响应缓存配置"""
+        return self.get_api_config().get("response_cache", {})
+    
+    def get_rate_limit_config(self) -> Dict[str, Any]:
+        """获取客户端限流配置"""
+        return self.get_api_config().get("rate_limits", {})
+    
+    def get_retry_config(self) -> Dict[str, Any]:
+        """获取重试与超时配置"""
+        return self.get_api_config().get("retry", {})
+    
+    def get_routing_config(self) -> Dict[str, Any]:
+        """
+        获取多端点路由配置
+        
+        端点来自 alternative_base_urls，密钥按服务商配置解析；
+        默认服务地址在未单独配置密钥时使用全局密钥（环境变量优先）。
+        
+        Returns:
+            Dict[str, Any]: 路由配置，包含 endpoints 列表
+        """
+        api_config = self.get_api_config()
+        routing_config = dict(api_config.get("routing", {}))
+        
+        default_base_url = api_config.get("default_base_url", "")
+        endpoints = []
+        for url_config in self.get_base_urls():
+            url = url_config.get("url", "")
+            api_key = url_config.get("api_key", "")
+            if not api_key and url == default_base_url:
+                api_key = self.get_api_key()
+            endpoints.append({
+                "name": url_config.get("name", url),
+                "url": url,
+                "api_key": api_key,
+                "models": url_config.get("models"),
+                "weight": url_config.get("weight", 1.0)
+            })
+        routing_config["endpoints"] = endpoints
+        return routing_config
+    
+    def get_single_flight_config(self) -> Dict[str, Any]:
+        """获取相同请求合并配置"""
+        return self.get_api_config().get("single_flight", {})
+    
+    def get_metrics_config(self) -> Dict[str, Any]:
+        """获取调用指标配置"""
+        return self.get_api_config().get("metrics", {})
+    
+    def get_itinerary_cache_config(self) -> Dict[str, Any]:
+        """获取旅行行程缓存配置"""
+        return self.get_page_config("travel_agent").get("itinerary_cache", {})
+    
+    def get_itinerary_fanout_config(self) -> Dict[str, Any]:
+        """获取长行程按天并行生成配置"""
+        return self.get_page_config("travel_agent").get("fanout", {})
+    
+    def get_structured_itinerary_config(self) -> Dict[str, Any]:
+        """获取结构化精简行程模式配置"""
+        return self.get_page_config("travel_agent").get("structured", {})
+    
+    def get_plan_cache_config(self) -> Dict[str, Any]:
+        """获取MCP计划缓存配置"""
+        return self.get_page_config("mcp_agent").get("plan_cache", {})
+    
+    def get_tool_pool_config(self) -> Dict[str, Any]:
+        """获取MCP工具实例池配置"""
+        return self.get_page_config("mcp_agent").get("tool_pool", {})
+    
+    def get_intent_router_config(self) -> Dict[str, Any]:
+        """获取MCP本地意图路由配置"""
+        return self.get_page_config("mcp_agent").get("intent_router", {})
+    
+    def get_speculation_config(self) -> Dict[str, Any]:
+        """获取MCP推测执行配置"""
+        return self.get_page_config("mcp_agent").get("speculation", {})
+    
+    def get_batch_config(self) -> Dict[str, Any]:
+        """获取MCP批处理配置"""
+        return self.get_page_config("mcp_agent").get("batch", {})
+    
     def get_security_config(self) -> Dict[str, Any]:
         """获取安全配置"""
         return self.main_config.get("security", {})
@@ -129,7 +215,7 @@ class ConfigManager:
         # 1. 优先使用环境变量
         api_config = self.get_api_config()
         if api_config.get("use_environment_variables", True):
-            env_base_url = os.getenv("DEFAULT_API_KEY") or os.getenv("OPENAI_API_BASE") or os.getenv("API_BASE_URL")
+            env_base_url = os.getenv("OPENAI_API_BASE") or os.getenv("API_BASE_URL")
             if env_base_url:
                 return env_base_url
         
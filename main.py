@@ -3,6 +3,7 @@ import streamlit as st
 from pages import travel_agent_show_page,image_contetn_recognition_show_page,readme_show_page,semiconductor_yield_show_page  
 from config import config_manager
 from pages import mcp_agent
+from utils.llm_runtime import configure_llm_runtime
 
 def setup_page_config():
     """设置页面配置"""
@@ -15,6 +16,11 @@ def setup_page_config():
         initial_sidebar_state="expanded"
     )
 
+@st.cache_resource
+def init_llm_runtime():
+    """初始化LLM运行时（进程级，只执行一次）"""
+    return configure_llm_runtime(config_manager)
+
 def load_custom_css():
     """加载自定义CSS样式"""
     ui_config = config_manager.get_ui_config()
@@ -71,6 +77,9 @@ def main():
     # 设置页面配置
     setup_page_config()
     
+    # 初始化LLM运行时（连接池等）
+    init_llm_runtime()
+    
     # 加载自定义样式
     load_custom_css()
     
@@ -7,7 +7,8 @@ from utils.common import (
     format_model_description, 
     process_uploaded_image, 
     create_analysis_report,
-    validate_image_file
+    validate_image_file,
+    format_call_metrics
 )
 from config import config_manager
 
@@ -453,18 +454,24 @@ def perform_image_analysis(api_key, base_url, model, analysis_type, enable_strea
             st.subheader("📊 分析结果")
             content_placeholder = st.empty()
         
-        # 执行分析
+        # 执行分析（本次调用的指标通过回调收集）
+        call_records = []
         if enable_streaming:
             perform_streaming_analysis(
                 llm_client, analysis_type, chunk_delay,
-                progress_bar, status_text, content_placeholder
+                progress_bar, status_text, content_placeholder, call_records.append
             )
         else:
             perform_batch_analysis(
                 llm_client, analysis_type,
-                progress_bar, status_text, content_placeholder
+                progress_bar, status_text, content_placeholder, call_records.append
             )
         
+        # 显示本次调用的实际耗时与令牌用量
+        call_metrics = format_call_metrics(call_records[-1] if call_records else None)
+        if call_metrics:
+            status_text.text(f"✅ 分析完成！ {call_metrics}")
+        
         st.session_state.image_analyzing = False
         
         # 添加下载按钮
@@ -478,14 +485,14 @@ def perform_image_analysis(api_key, base_url, model, analysis_type, enable_strea
         handle_analysis_error(str(e))
 
 
-def perform_streaming_analysis(llm_client, analysis_type, chunk_delay, progress_bar, status_text, content_placeholder):
+def perform_streaming_analysis(llm_client, analysis_type, chunk_delay, progress_bar, status_text, content_placeholder, on_metrics=None):
     """执行流式分析"""
     accumulated_text = ""
     chunk_count = 0
     streaming_config = config_manager.get_streaming_config()
     cursor_symbol = streaming_config.get("cursor_symbol", "▊")
     
-    for chunk in llm_client.analyze_image_stream(st.session_state.image_uploaded_image, analysis_type):
+    for chunk in llm_client.analyze_image_stream(st.session_state.image_uploaded_image, analysis_type, on_metrics):
         accumulated_text += chunk
         chunk_count += 1
         
@@ -514,10 +521,10 @@ def perform_streaming_analysis(llm_client, analysis_type, chunk_delay, progress_
         st.markdown(accumulated_text)
 
 
-def perform_batch_analysis(llm_client, analysis_type, progress_bar, status_text, content_placeholder):
+def perform_batch_analysis(llm_client, analysis_type, progress_bar, status_text, content_placeholder, on_metrics=None):
     """执行批量分析"""
     status_text.text("分析中，请稍候...")
-    result = llm_client.analyze_image(st.session_state.image_uploaded_image, analysis_type)
+    result = llm_client.analyze_image(st.session_state.image_uploaded_image, analysis_type, on_metrics)
     st.session_state.image_analysis_result = result
     progress_bar.progress(1.0)
     status_text.text("✅ 分析完成！")
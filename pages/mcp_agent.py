@@ -2,6 +2,37 @@
 import streamlit as st
 from config import config_manager
 from utils.mcp_client import MCPAgentLLM
+from utils.mcp_events import TASK_PLANNED, PLAN_READY, TASK_STARTED, TOKEN, TASK_FINISHED, TASK_FAILED, COMPLETED
+
+def render_event(event: dict, plan_view: dict, task_area, task_views: dict, status):
+    """渲染一个执行事件（计划随规划逐步显示，状态栏显示进度，任务输出显示在 task_area），completed 事件返回执行结果JSON"""
+    event_type = event["type"]
+    if event_type == TASK_PLANNED:
+        plan_view["tasks"].append(event["task"])
+        plan_view["output"].json(plan_view["tasks"])
+    elif event_type == PLAN_READY:
+        plan_view["tasks"] = list(event["plan"])
+        plan_view["output"].json(plan_view["tasks"])
+    elif event_type == TASK_STARTED:
+        status.update(label=f"🚀 正在执行 {event['task_id']}: {event['description']}")
+        expander = task_area.expander(f"🔧 {event['task_id']} · {event['tool']} · {event['description']}", expanded=True)
+        task_views[event["task_id"]] = {"output": expander.empty(), "text": ""}
+    elif event_type == TOKEN:
+        view = task_views.get(event["task_id"])
+        if view:
+            view["text"] += event["delta"]
+            view["output"].markdown(view["text"])
+    elif event_type == TASK_FINISHED:
+        view = task_views.get(event["task_id"])
+        if view:
+            view["output"].markdown(str(event["result"]))
+        st.write(f"✅ {event['task_id']} 执行成功")
+    elif event_type == TASK_FAILED:
+        # 超时或取消的任务已输出的部分结果保留在任务输出中
+        st.write(f"{'⏰' if event.get('partial') else '❌'} {event['error']}")
+    elif event_type == COMPLETED:
+        return event["result"]
+    return None
 
 def show_page():
     page_config = config_manager.get_page_config("mcp_agent")
@@ -33,19 +64,32 @@ def show_page():
                 api_key=api_key, 
                 base_url=base_url, 
                 model=page_config.get("default_model"),
-                tool_config=tool_config
+                tool_config=tool_config,
+                max_parallel_tasks=page_config.get("max_parallel_tasks", 4),
+                context_config=page_config.get("dependency_context"),
+                task_timeout=page_config.get("task_timeout")
             )
             
-            with st.status("🤖 MCP 正在分析目标并制定计划...", expanded=True) as status:
-                plan = mcp_client.plan(goal)
-                status.update(label="✅ 计划制定完成!", state="complete")
-                st.subheader("行动计划")
-                st.json(plan)
-            
-            with st.spinner("⏳ MCP 正在调度专家执行计划..."):
-                final_result = mcp_client.execute_plan(plan, config_manager)
-                st.subheader("执行结果汇总")
-                st.code(final_result, language='json')
+            # 规划以流式进行，每个任务生成完毕且依赖满足后立即开始执行，工具输出实时显示
+            plan_area = st.container()
+            plan_area.subheader("行动计划")
+            plan_view = {"output": plan_area.empty(), "tasks": []}
+            status_area = st.container()
+            st.subheader("任务输出")
+            task_area = st.container()
+            task_views = {}
+            final_result = None
+            with status_area.status("🤖 MCP 正在制定计划并调度专家执行...", expanded=True) as status:
+                for event in mcp_client.plan_and_execute_events(
+                    goal, config_manager,
+                    planning_deadline=page_config.get("planning_budget"),
+                    deadline=page_config.get("execution_budget")
+                ):
+                    final_result = render_event(event, plan_view, task_area, task_views, status) or final_result
+                status.update(label="✅ 计划执行完成!", state="complete")
+
+            st.subheader("执行结果汇总")
+            st.code(final_result, language='json')
 
         except Exception as e:
             st.error(f"执行过程中发生错误: {e}")
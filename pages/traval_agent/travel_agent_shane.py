@@ -1,7 +1,9 @@
 import streamlit as st
 import time
-from utils.travel_planner_llm import TravelPlannerLLM
-from utils.common import generate_ics_content, format_model_description
+from utils.travel_planner_llm import TravelPlannerLLM, ItineraryRun
+from utils.common import generate_ics_content, format_model_description, format_call_metrics
+from utils.ics_builder import StreamingICSBuilder, cache_calendar
+from utils.structured_itinerary import itinerary_to_ics, structured_itinerary
 from config import config_manager
 
 def travel_agent_show_page():
@@ -19,7 +21,7 @@ def travel_agent_show_page():
     base_url = config_manager.get_base_url("travel_agent")
     
     # 侧边栏配置
-    model, enable_streaming, chunk_delay = render_sidebar(api_key)
+    model, enable_streaming, chunk_delay, structured_mode = render_sidebar(api_key)
     
     # 检查API密钥
     if not api_key:
@@ -36,7 +38,7 @@ def travel_agent_show_page():
     if generate_button and destination:
         perform_travel_planning(
             api_key, base_url, model, destination, num_days,
-            enable_streaming, chunk_delay
+            enable_streaming, chunk_delay, structured_mode
         )
     
     # 显示已生成的行程
@@ -74,14 +76,14 @@ def render_sidebar(api_key):
         st.divider()
         
         # 生成设置
-        enable_streaming, chunk_delay = render_generation_settings()
+        enable_streaming, chunk_delay, structured_mode = render_generation_settings()
         
         st.divider()
         
         # 使用说明
         render_help_section()
     
-    return model, enable_streaming, chunk_delay
+    return model, enable_streaming, chunk_delay, structured_mode
 
 
 def render_api_status(api_key):
@@ -173,7 +175,14 @@ def render_generation_settings():
             key="travel_delay"
         )
     
-    return enable_streaming, chunk_delay
+    structured_mode = st.checkbox(
+        "结构化精简模式",
+        value=config_manager.get_structured_itinerary_config().get("enabled", False),
+        help="模型只输出紧凑的JSON行程，由本地渲染为Markdown；生成更快，日历与预算更精确",
+        key="travel_structured"
+    )
+    
+    return enable_streaming, chunk_delay, structured_mode
 
 
 def render_help_section():
@@ -286,7 +295,7 @@ def render_control_buttons():
     return generate_button, clear_button
 
 
-def perform_travel_planning(api_key, base_url, model, destination, num_days, enable_streaming, chunk_delay):
+def perform_travel_planning(api_key, base_url, model, destination, num_days, enable_streaming, chunk_delay, structured_mode=False):
     """执行旅行规划"""
     st.session_state.travel_generating = True
     st.session_state.travel_itinerary = ""
@@ -302,6 +311,8 @@ def perform_travel_planning(api_key, base_url, model, destination, num_days, ena
             base_url=base_url.strip() if base_url.strip() else None,
             model=model
         )
+        # 本次生成的选项与结果（缓存命中、结构化行程数据、调用指标）
+        run = ItineraryRun(structured=structured_mode)
         
         # 创建容器用于流式显示
         st.divider()
@@ -321,14 +332,25 @@ def perform_travel_planning(api_key, base_url, model, destination, num_days, ena
         if enable_streaming:
             perform_streaming_generation(
                 llm_client, destination, num_days, chunk_delay,
-                progress_bar, status_text, content_placeholder
+                progress_bar, status_text, content_placeholder, run
             )
         else:
             perform_batch_generation(
                 llm_client, destination, num_days,
-                progress_bar, status_text, content_placeholder
+                progress_bar, status_text, content_placeholder, run
             )
         
+        # 结构化行程直接由数据生成日历，替换按文本切分的结果
+        if run.structured_itinerary:
+            cache_calendar(st.session_state.travel_itinerary, itinerary_to_ics(
+                run.structured_itinerary, currency=structured_itinerary.currency
+            ))
+        
+        # 显示本次调用的实际耗时与令牌用量
+        call_metrics = format_call_metrics(run.last_metrics)
+        if call_metrics:
+            status_text.text(f"✅ 生成完成！ {call_metrics}")
+        
         st.session_state.travel_generating = False
         st.success("🎉 行程规划完成！您可以下载日历文件或继续编辑。")
         
@@ -337,16 +359,20 @@ def perform_travel_planning(api_key, base_url, model, destination, num_days, ena
         handle_api_error(str(e))
 
 
-def perform_streaming_generation(llm_client, destination, num_days, chunk_delay, progress_bar, status_text, content_placeholder):
+def perform_streaming_generation(llm_client, destination, num_days, chunk_delay, progress_bar, status_text, content_placeholder, run=None):
     """执行流式生成"""
     accumulated_text = ""
     chunk_count = 0
     streaming_config = config_manager.get_streaming_config()
     cursor_symbol = streaming_config.get("cursor_symbol", "▊")
+    # 边接收边按天切分日历事件，生成结束时日历文件即已就绪
+    ics_builder = StreamingICSBuilder()
     
-    for chunk in llm_client.generate_itinerary_stream(destination, num_days):
+    run = run if run is not None else ItineraryRun()
+    for chunk in llm_client.generate_itinerary_stream(destination, num_days, run):
         accumulated_text += chunk
         chunk_count += 1
+        ics_builder.feed(chunk)
         
         # 更新显示内容
         with content_placeholder.container():
@@ -360,10 +386,12 @@ def perform_streaming_generation(llm_client, destination, num_days, chunk_delay,
         progress_bar.progress(estimated_progress)
         status_text.text(f"已生成 {len(accumulated_text)} 字符...")
         
-        # 添加延迟以控制显示速度
-        time.sleep(chunk_delay / 1000.0)
+        # 添加延迟以控制显示速度（缓存回放的速度由行程缓存配置控制）
+        if not run.from_cache:
+            time.sleep(chunk_delay / 1000.0)
     
-    # 完成生成
+    # 完成生成（日历按行程哈希缓存，下载按钮渲染时直接复用）
+    ics_builder.finish()
     st.session_state.travel_itinerary = accumulated_text
     progress_bar.progress(1.0)
     status_text.text("✅ 生成完成！")
@@ -373,10 +401,10 @@ def perform_streaming_generation(llm_client, destination, num_days, chunk_delay,
         st.markdown(accumulated_text)
 
 
-def perform_batch_generation(llm_client, destination, num_days, progress_bar, status_text, content_placeholder):
+def perform_batch_generation(llm_client, destination, num_days, progress_bar, status_text, content_placeholder, run=None):
     """执行批量生成"""
     status_text.text("生成中，请稍候...")
-    itinerary = llm_client.generate_itinerary(destination, num_days)
+    itinerary = llm_client.generate_itinerary(destination, num_days, run)
     st.session_state.travel_itinerary = itinerary
     progress_bar.progress(1.0)
     status_text.text("✅ 生成完成！")
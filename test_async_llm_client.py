@@ -0,0 +1,118 @@
+import sys
+import os
+import asyncio
+import json
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.async_llm_client import AsyncLLMClient
+from utils.mcp_client import AsyncMCPAgentLLM, MCPAgentLLM
+from utils.plan_cache import plan_cache
+from utils.response_cache import response_cache
+from utils.intent_router import intent_router
+from utils.travel_planner_llm import AsyncTravelPlannerLLM, TravelPlannerLLM
+
+BASE_URL = "https://api.example.com/v1"
+
+
+def sse_response(request: httpx.Request) -> httpx.Response:
+    """模拟 OpenAI 兼容接口：流式请求返回 SSE，非流式返回完整消息"""
+    body = json.loads(request.content)
+    if not body.get("stream"):
+        return httpx.Response(200, json={
+            "id": "1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "完整回答"}}],
+        })
+    events = []
+    for text in ("你好", "，", "世界"):
+        chunk = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                 "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return httpx.Response(200, headers={"content-type": "text/event-stream"}, content="".join(events).encode("utf-8"))
+
+
+class MockedAsyncClient(AsyncLLMClient):
+    """请求发往本地模拟传输层的异步客户端"""
+
+    def _route(self, failed_urls):
+        client = AsyncOpenAI(api_key="test", base_url=BASE_URL, max_retries=0,
+                             http_client=httpx.AsyncClient(transport=httpx.MockTransport(sse_response)))
+        return client, BASE_URL
+
+
+class StubConfigManager:
+    def get_api_key(self, page):
+        return "test"
+
+    def get_base_url(self, page):
+        return BASE_URL
+
+    def get_page_config(self, page):
+        return {"default_model": "qwen-turbo"}
+
+
+class SlowTool:
+    """只有同步实现的工具，每次执行约 0.3 秒"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def execute_task(self, task_description, context, on_token=None):
+        time.sleep(0.3)
+        return f"完成：{task_description}"
+
+
+def setup_module(module=None):
+    plan_cache.configure({"enabled": False})
+    response_cache.configure({"enabled": False})
+    intent_router.configure({"enabled": False})
+
+
+def test_async_stream_and_complete():
+    client = MockedAsyncClient("test", BASE_URL)
+
+    async def main():
+        chunks = [chunk async for chunk in client.stream_chat([{"role": "user", "content": "hi"}], use_cache=False)]
+        content = await client.complete_chat([{"role": "user", "content": "hi"}], use_cache=False)
+        return chunks, content
+
+    chunks, content = asyncio.run(main())
+    assert chunks == ["你好", "，", "世界"]
+    assert content == "完整回答"
+
+
+def test_sync_and_async_agents_share_prompts():
+    sync_planner = TravelPlannerLLM("test", BASE_URL)
+    async_planner = AsyncTravelPlannerLLM("test", BASE_URL)
+    assert sync_planner.build_itinerary_messages("北京", 3) == async_planner.build_itinerary_messages("北京", 3)
+
+    content = json.dumps({"plan": [{"task_id": "task_1", "description": "规划", "tool": "travel_planner", "dependencies": []}]})
+    sync_agent, async_agent = MCPAgentLLM("test", BASE_URL), AsyncMCPAgentLLM("test", BASE_URL)
+    assert sync_agent.build_planning_messages("帮我规划北京三天旅游") == async_agent.build_planning_messages("帮我规划北京三天旅游")
+    assert sync_agent._parse_plan_content(content) == async_agent._parse_plan_content(content)
+
+
+def test_async_agent_runs_sync_tools_in_threads():
+    tool_config = {"slow": {"description": "同步工具", "class": f"{__name__}.SlowTool", "page": "travel_agent"}}
+    agent = AsyncMCPAgentLLM("test", BASE_URL, tool_config=tool_config)
+    plan = [{"task_id": f"task_{i}", "description": f"步骤{i}", "tool": "slow", "dependencies": []} for i in (1, 2, 3)]
+
+    started = time.monotonic()
+    results = json.loads(asyncio.run(agent.execute_plan(plan, StubConfigManager())))
+    # 同步工具在线程中执行，不阻塞事件循环，三个任务并发完成
+    assert time.monotonic() - started < 0.8
+    assert results["tasks"]["task_2"] == {"result": "完成：步骤2"}
+
+
+if __name__ == "__main__":
+    setup_module()
+    test_async_stream_and_complete()
+    test_sync_and_async_agents_share_prompts()
+    test_async_agent_runs_sync_tools_in_threads()
+    print("✅ 异步客户端测试通过")
@@ -0,0 +1,108 @@
+import sys
+import os
+import time
+from collections import Counter
+
+import httpx
+from openai import OpenAI
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.endpoint_router import EndpointRouter, endpoint_router
+from utils.llm_client import LLMClient
+
+PRIMARY, BACKUP, VISION = "https://primary.example.com/v1", "https://backup.example.com/v1", "https://vl.example.com/v1"
+ENDPOINTS = [
+    {"name": "primary", "url": PRIMARY, "api_key": "a", "models": ["qwen-*"]},
+    {"name": "backup", "url": BACKUP, "api_key": "b", "models": ["qwen-turbo", "qwen-max"]},
+    {"name": "vision", "url": VISION, "api_key": "c", "models": ["glm-4v*"]},
+    {"name": "no-key", "url": "https://nokey.example.com/v1", "api_key": ""},
+]
+
+
+def make_router(**config) -> EndpointRouter:
+    return EndpointRouter({"endpoints": ENDPOINTS, **config})
+
+
+def test_only_registered_urls_with_alternatives_are_routed():
+    router = make_router()
+    assert router.is_routable(PRIMARY, "qwen-turbo")
+    # 只有一个端点提供该模型、地址未登记或未启用时不参与路由
+    assert not router.is_routable(VISION, "glm-4v-plus")
+    assert not router.is_routable("https://custom.example.com/v1", "qwen-turbo")
+    assert not make_router(enabled=False).is_routable(PRIMARY, "qwen-turbo")
+    assert router.choose("https://custom.example.com/v1", "qwen-turbo") is None
+    for _ in range(20):
+        assert router.choose(PRIMARY, "qwen-turbo")["url"] in (PRIMARY, BACKUP)
+
+
+def test_faster_endpoint_is_preferred():
+    router = make_router()
+    for _ in range(5):
+        router.record(PRIMARY, "qwen-turbo", 0.1, True)
+        router.record(BACKUP, "qwen-turbo", 2.0, True)
+    picks = Counter(router.choose(PRIMARY, "qwen-turbo")["url"] for _ in range(500))
+    assert picks[PRIMARY] > picks[BACKUP] * 5
+
+
+def test_repeated_failures_eject_endpoint():
+    router = make_router(failure_threshold=2, cooldown=0.2)
+    for _ in range(2):
+        router.record(BACKUP, "qwen-turbo", None, False)
+    assert {router.choose(PRIMARY, "qwen-turbo")["url"] for _ in range(50)} == {PRIMARY}
+    assert not router.has_alternative(PRIMARY, "qwen-turbo", [PRIMARY])
+    # 全部不可用时仍返回一个端点，优先本次调用中未失败的
+    assert router.choose(PRIMARY, "qwen-turbo", exclude=[PRIMARY])["url"] == BACKUP
+    assert router.get_stats()["backup|qwen-turbo"]["ejected"]
+
+    time.sleep(0.25)
+    assert router.has_alternative(PRIMARY, "qwen-turbo", [PRIMARY])
+
+
+class FailoverClient(LLMClient):
+    """请求发往模拟传输层：主端点返回 503，备用端点正常响应"""
+
+    def __init__(self):
+        super().__init__("a", PRIMARY)
+        self.requested = []
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        url = f"{request.url.scheme}://{request.url.host}/v1"
+        self.requested.append(url)
+        if url == PRIMARY:
+            return httpx.Response(503, json={"error": {"message": "overloaded"}})
+        return httpx.Response(200, json={
+            "id": "1", "object": "chat.completion", "created": 0, "model": self.model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "备用端点"}}],
+        })
+
+    def _route(self, failed_urls):
+        url = PRIMARY if PRIMARY not in failed_urls else BACKUP
+        client = OpenAI(api_key="test", base_url=url, max_retries=0,
+                        http_client=httpx.Client(transport=httpx.MockTransport(self._respond)))
+        return client, url
+
+
+def test_client_fails_over_without_backoff():
+    endpoint_router.configure({"endpoints": ENDPOINTS})
+    try:
+        client = FailoverClient()
+        started = time.monotonic()
+        assert client.complete_chat([{"role": "user", "content": "hi"}], use_cache=False) == "备用端点"
+        # 有其他健康端点时立即切换，不做退避等待
+        assert time.monotonic() - started < 0.5
+        assert client.requested == [PRIMARY, BACKUP]
+        stats = endpoint_router.get_stats()
+        assert stats["primary|qwen-turbo"]["failures"] == 1
+        assert stats["backup|qwen-turbo"]["requests"] == 1
+    finally:
+        endpoint_router.configure({})
+
+
+if __name__ == "__main__":
+    test_only_registered_urls_with_alternatives_are_routed()
+    test_faster_endpoint_is_preferred()
+    test_repeated_failures_eject_endpoint()
+    test_client_fails_over_without_backoff()
+    print("✅ 端点路由测试通过")
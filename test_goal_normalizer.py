@@ -0,0 +1,56 @@
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.goal_normalizer import bind_plan, normalize_destination, normalize_goal, templatize_plan
+
+
+# (目标, 期望的模板, 期望的槽位)
+GOAL_CASES = [
+    ("帮我规划北京三天旅游", "帮我规划{destination}{days}天旅游", {"destination": "北京", "days": 3}),
+    ("帮我规划上海 5 天旅游！", "帮我规划{destination}{days}天旅游", {"destination": "上海", "days": 5}),
+    ("帮我规划 Tokyo 两天旅游", "帮我规划{destination}{days}天旅游", {"destination": "东京", "days": 2}),
+    ("帮我规划北京三天旅游，两个人", "帮我规划{destination}{days}天旅游2个人", {"destination": "北京", "days": 3}),
+    ("帮我规划北京旅游", "帮我规划{destination}旅游", {"destination": "北京"}),
+]
+
+
+def test_normalize_goal():
+    for goal, template, slots in GOAL_CASES:
+        assert normalize_goal(goal) == (template, slots), goal
+
+
+def test_same_wording_shares_template():
+    assert normalize_goal("帮我规划北京三天旅游")[0] == normalize_goal("帮我规划 Tokyo 两天旅游")[0]
+
+
+def test_normalize_destination():
+    assert normalize_destination("北京市") == normalize_destination(" 北京") == "北京"
+
+
+def test_templatize_and_bind_plan():
+    plan = [{"task_id": "task_1", "description": "规划北京3天的行程", "tool": "travel_planner",
+             "dependencies": [], "args": {"destination": "北京", "days": 3}}]
+    template = templatize_plan(plan, {"destination": "北京", "days": 3})
+    assert template[0]["description"] == "规划{destination}{days}天的行程"
+    assert template[0]["args"] == {"destination": "{destination}", "days": "{days}"}
+
+    bound = bind_plan(template, {"destination": "东京", "days": 5})
+    assert bound[0]["description"] == "规划东京5天的行程"
+    assert bound[0]["args"] == {"destination": "东京", "days": 5}
+
+
+def test_templatize_plan_missing_slot():
+    plan = [{"task_id": "task_1", "description": "规划行程", "tool": "travel_planner", "dependencies": []}]
+    assert templatize_plan(plan, {"destination": "北京"}) is None
+
+
+if __name__ == "__main__":
+    test_normalize_goal()
+    test_same_wording_shares_template()
+    test_normalize_destination()
+    test_templatize_and_bind_plan()
+    test_templatize_plan_missing_slot()
+    print("✅ 目标规范化测试通过")
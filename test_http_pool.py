@@ -0,0 +1,64 @@
+import sys
+import os
+import asyncio
+
+import httpx
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.http_pool import ClientRegistry
+
+
+def make_registry() -> ClientRegistry:
+    return ClientRegistry({"timeout_profiles": {
+        "fast": {"total": 30, "connect": 5},
+        "connect_only": {"connect": 5},
+        "plain": 12,
+    }})
+
+
+def test_timeout_profile_resolution():
+    registry = make_registry()
+    # 未配置的分项沿用 total，而不是变成不限时
+    assert registry._get_timeout("fast") == httpx.Timeout(30, connect=5)
+    assert registry._get_timeout("fast").read == 30
+    assert registry._get_timeout("connect_only") == httpx.Timeout(None, connect=5)
+    assert registry._get_timeout("plain") == 12
+    # 未知配置名回退到 default
+    assert registry._get_timeout("missing") is None
+
+
+def test_clients_share_pool_per_upstream():
+    registry = make_registry()
+    client = registry.get_client("key", "https://api.example.com/v1")
+    assert registry.get_client("key", "https://api.example.com/v1") is client
+    other = registry.get_client("key", "https://api.example.com/v2", timeout_profile="fast")
+    assert other is not client
+    assert other._client is client._client
+    registry.get_client("key", "https://other.example.com/v1")
+
+    stats = registry.get_stats()
+    assert stats["clients"] == 3 and stats["pools"] == 2
+    assert stats["client_hits"] == 1 and stats["pool_hits"] == 1
+    registry.close()
+    assert registry.get_stats()["pools"] == 0
+
+
+def test_async_clients_are_per_loop():
+    registry = make_registry()
+
+    async def fetch():
+        first = registry.get_async_client("key", "https://api.example.com/v1")
+        assert registry.get_async_client("key", "https://api.example.com/v1") is first
+        return first
+
+    # 不同事件循环各自创建客户端
+    assert asyncio.run(fetch()) is not asyncio.run(fetch())
+
+
+if __name__ == "__main__":
+    test_timeout_profile_resolution()
+    test_clients_share_pool_per_upstream()
+    test_async_clients_are_per_loop()
+    print("✅ 连接池测试通过")
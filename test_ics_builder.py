@@ -0,0 +1,79 @@
+import sys
+import os
+import re
+from datetime import datetime, timedelta
+
+from icalendar import Calendar
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.common import generate_ics_content
+from utils.ics_builder import ICSCache, StreamingICSBuilder, ics_cache, itinerary_hash
+
+START = datetime(2026, 10, 1)
+PLAN = ("# 北京3天行程\n行前说明\n\nDay 1: 故宫\n上午参观故宫，下午景山公园\n\n"
+        "Day 2:长城\n八达岭长城，Day 2x 不是标题\n\nDay 3 颐和园\n傍晚返程\n")
+
+
+def reference_events(plan_text: str):
+    """按原先对全文做正则切分的方式得到的事件 (标题, 描述, 日期)"""
+    days = re.compile(r'Day (\d+)[:\s]+(.*?)(?=Day \d+|$)', re.DOTALL).findall(plan_text)
+    if not days:
+        return [("旅行行程", plan_text, START.date())]
+    return [(f"第{int(num)}天行程", content.strip(), (START + timedelta(days=int(num) - 1)).date()) for num, content in days]
+
+
+def calendar_events(content: bytes):
+    """从ICS内容中取出事件 (标题, 描述, 日期)，忽略时间戳"""
+    return [(str(event["summary"]), str(event["description"]), event.decoded("dtstart"))
+            for event in Calendar.from_ical(content).walk("VEVENT")]
+
+
+def build(plan_text: str, size: int) -> StreamingICSBuilder:
+    builder = StreamingICSBuilder(START)
+    for i in range(0, len(plan_text), size):
+        builder.feed(plan_text[i:i + size])
+    return builder
+
+
+def test_streaming_matches_full_text_split():
+    for text in (PLAN, "没有按天划分的行程", "Day 1: 故宫\nDay 2", "前言 Day 1:故宫 Day 12: 返程"):
+        expected = reference_events(text)
+        # 任意分块方式（包括标题被拆到两个分块中）结果都与全文切分一致
+        for size in (1, 3, 7, len(text)):
+            assert calendar_events(build(text, size).finish()) == expected, (text, size)
+
+
+def test_days_closed_while_streaming():
+    builder = StreamingICSBuilder(START)
+    builder.feed("Day 1: 故宫\n")
+    assert builder.day_count == 0
+    builder.feed("Day 2: 长")
+    # 第二天的标题出现后第一天即创建完成
+    assert builder.day_count == 1
+    builder.feed("城\n")
+    content = builder.finish()
+    assert builder.day_count == 2 and builder.text == "Day 1: 故宫\nDay 2: 长城\n"
+    assert builder.finish() is content
+
+
+def test_calendars_are_cached():
+    ics_cache.clear()
+    content = build(PLAN, 5).finish()
+    assert ics_cache.get(itinerary_hash(PLAN, START)) is content
+    assert generate_ics_content(PLAN, START) is content
+    # 开始日期不同时重新生成
+    assert generate_ics_content(PLAN, START + timedelta(days=1)) is not content
+
+    cache = ICSCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.encode())
+    assert cache.get("a") is None and cache.get("c") == b"c"
+
+
+if __name__ == "__main__":
+    test_streaming_matches_full_text_split()
+    test_days_closed_while_streaming()
+    test_calendars_are_cached()
+    print("✅ 流式日历测试通过")
@@ -0,0 +1,132 @@
+import sys
+import os
+import json
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.intent_router import MULTI_STEP_LABEL, IntentRouter, NgramClassifier
+
+
+TOOL_CONFIG = {
+    "travel_planner": {
+        "description": "旅行规划",
+        "args": {
+            "destination": {"type": "string"},
+            "days": {"type": "integer", "minimum": 1, "maximum": 30},
+        },
+    },
+    "image_analyzer": {"description": "图片分析"},
+}
+
+PLAYBOOKS = [
+    {"tool": "travel_planner", "patterns": ["旅游|旅行|行程|trip"], "description": "为用户规划行程：{goal}"},
+    {"tool": "image_analyzer", "patterns": ["图片|照片"]},
+]
+
+
+def make_router(**config) -> IntentRouter:
+    return IntentRouter({"playbooks": PLAYBOOKS, **config})
+
+
+def test_build_task_args_from_slots():
+    router = make_router()
+    # (目标, 期望的参数；None 表示不给出参数)
+    cases = [
+        ("帮我规划北京三天旅游", {"destination": "北京", "days": 3}),
+        ("Plan a 5 day trip to Tokyo", {"destination": "东京", "days": 5}),
+        ("去成都旅游", {"destination": "成都"}),
+        ("去大理旅游45天", {"destination": "大理"}),
+        # 名录中没有的目的地：不给出参数，由工具自行解析任务描述
+        ("去火星旅游三天", None),
+    ]
+    for goal, args in cases:
+        task = router.build_task("task_1", "travel_planner", goal, TOOL_CONFIG)
+        assert task.get("args") == args, f"{goal}: {task}"
+        assert task["description"] == f"为用户规划行程：{goal}"
+
+    # 工具没有声明参数时不给出参数
+    assert "args" not in router.build_task("task_1", "image_analyzer", "分析北京的照片", TOOL_CONFIG)
+
+
+def test_route_with_playbooks():
+    router = make_router()
+    plan = router.route("帮我规划北京三天旅游", TOOL_CONFIG)
+    assert plan == [{
+        "task_id": "task_1", "description": "为用户规划行程：帮我规划北京三天旅游", "tool": "travel_planner",
+        "dependencies": [], "args": {"destination": "北京", "days": 3}
+    }]
+    # 多个工具的规则同时命中或出现多步骤的说法时交给LLM规划
+    assert router.route("分析这张照片里的景点并规划旅游", TOOL_CONFIG) is None
+    assert router.route("规划北京旅游，然后预订酒店", TOOL_CONFIG) is None
+    assert make_router(enabled=False).route("帮我规划北京三天旅游", TOOL_CONFIG) is None
+
+
+def test_classifier_learns_from_recorded_plans():
+    router = IntentRouter({"min_examples": 4, "min_confidence": 0.6})
+    travel = [{"task_id": "task_1", "tool": "travel_planner", "description": "x", "dependencies": []}]
+    multi = travel + [{"task_id": "task_2", "tool": "image_analyzer", "description": "y", "dependencies": []}]
+    for goal in ("帮我规划北京三天旅游", "帮我规划上海两天旅游", "帮我规划东京五天旅游"):
+        router.record(goal, travel)
+    router.record("识别图片中的景点并给出攻略", multi)
+
+    plan = router.route("帮我规划成都四天旅游", TOOL_CONFIG)
+    assert plan is not None and plan[0]["tool"] == "travel_planner"
+    assert plan[0]["args"] == {"destination": "成都", "days": 4}
+    assert router.route("识别图片中的建筑并给出攻略", TOOL_CONFIG) is None
+    assert MULTI_STEP_LABEL in router._classifier.label_counts
+
+
+RECORDED_GOALS = [
+    ("帮我规划北京三天旅游", "travel_planner"),
+    ("分析这张照片", "image_analyzer"),
+    ("帮我规划上海两天旅游", "travel_planner"),
+    ("识别图片中的建筑", "image_analyzer"),
+    ("去成都玩三天", "travel_planner"),
+    ("规划行程然后分析照片", MULTI_STEP_LABEL),
+]
+
+
+def classifier_state(classifier: NgramClassifier) -> tuple:
+    return (dict(classifier.label_counts), {label: dict(counts) for label, counts in classifier.gram_counts.items()},
+            dict(classifier.gram_totals), set(classifier.vocabulary), classifier.examples)
+
+
+def test_sliding_window_matches_retraining():
+    router = IntentRouter({"max_examples": 3})
+    for goal, label in RECORDED_GOALS:
+        router.record(goal, [{"task_id": "task_1", "tool": label}] if label != MULTI_STEP_LABEL else [{}, {}])
+
+    # 窗口滑动时只减去被挤出样本的计数，结果与用窗口内样本重新训练一致
+    retrained = NgramClassifier()
+    for goal, label in RECORDED_GOALS[-3:]:
+        retrained.learn(goal, label)
+    assert classifier_state(router._classifier) == classifier_state(retrained)
+    assert router.get_stats()["examples"] == 3
+
+
+def test_log_is_compacted_to_window():
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, "goals.jsonl")
+        router = IntentRouter({"max_examples": 2, "log_path": log_path})
+        for goal, label in RECORDED_GOALS[:5]:
+            router.record(goal, [{"task_id": "task_1", "tool": label}])
+            with open(log_path, encoding="utf-8") as f:
+                assert len(f.readlines()) <= 4
+
+        # 压缩后的日志保留窗口内最新的样本，重新加载得到同样的分类器
+        with open(log_path, encoding="utf-8") as f:
+            logged = [(record["goal"], record["label"]) for record in map(json.loads, f)]
+        assert logged[-2:] == RECORDED_GOALS[3:5]
+        reloaded = IntentRouter({"max_examples": 2, "log_path": log_path})
+        assert classifier_state(reloaded._classifier) == classifier_state(router._classifier)
+
+
+if __name__ == "__main__":
+    test_build_task_args_from_slots()
+    test_route_with_playbooks()
+    test_classifier_learns_from_recorded_plans()
+    test_sliding_window_matches_retraining()
+    test_log_is_compacted_to_window()
+    print("✅ 意图路由测试通过")
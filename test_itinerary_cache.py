@@ -0,0 +1,155 @@
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.itinerary_cache import ItineraryCache, itinerary_cache
+from utils.travel_planner_llm import AsyncTravelPlannerLLM, ItineraryRun, TravelPlannerLLM
+
+CHUNKS = ["Day 1: ", "故宫", "\nDay 2: ", "长城"]
+
+
+class CountingPlanner(TravelPlannerLLM):
+    """按预设分块输出行程，记录上游调用次数"""
+
+    def __init__(self):
+        super().__init__(api_key="test", base_url="https://api.example.com/v1", model="qwen-turbo")
+        self.calls = 0
+
+    def stream_chat(self, messages, use_cache=True, deadline=None, on_metrics=None, **params):
+        self.calls += 1
+        yield from CHUNKS
+
+
+class AsyncCountingPlanner(AsyncTravelPlannerLLM):
+    def __init__(self):
+        super().__init__(api_key="test", base_url="https://api.example.com/v1", model="qwen-turbo")
+        self.calls = 0
+
+    async def stream_chat(self, messages, use_cache=True, deadline=None, on_metrics=None, **params):
+        self.calls += 1
+        for chunk in CHUNKS:
+            yield chunk
+
+
+class WarmupClient:
+    """只记录预生成调用的模拟客户端，目的地为 "失败" 时抛出异常"""
+
+    model = "qwen-turbo"
+
+    def __init__(self, cache: ItineraryCache):
+        self.cache = cache
+        self.generated = []
+
+    def itinerary_prompt_version(self, num_days):
+        return "v1"
+
+    def generate_itinerary(self, destination, num_days):
+        if destination == "失败":
+            raise ConnectionError("上游断开")
+        self.generated.append((destination, num_days))
+        self.cache.set(destination, num_days, self.model, "v1", [f"{destination}{num_days}天"])
+
+
+def setup_module(module=None):
+    itinerary_cache.configure({"enabled": True})
+    itinerary_cache.clear()
+
+
+def teardown_module(module=None):
+    itinerary_cache.configure({"enabled": False})
+    itinerary_cache.clear()
+
+
+def test_key_normalizes_destination():
+    key = ItineraryCache.make_key("北京市", 3, "qwen-turbo", "v1")
+    assert key == ItineraryCache.make_key(" 北京", 3, "qwen-turbo", "v1")
+    assert key != ItineraryCache.make_key("北京", 3, "qwen-turbo", "v2")
+    assert key != ItineraryCache.make_key("北京", 4, "qwen-turbo", "v1")
+    assert ItineraryCache.make_key(" ", 3, "qwen-turbo", "v1") is None
+
+
+def test_set_get_and_disk_tier():
+    with tempfile.TemporaryDirectory() as directory:
+        config = {"disk_path": os.path.join(directory, "itineraries.sqlite3")}
+        cache = ItineraryCache(config)
+        assert cache.set("北京", 3, "qwen-turbo", "v1", CHUNKS)
+        # 空行程不保存
+        assert not cache.set("上海", 3, "qwen-turbo", "v1", ["", " "])
+        assert cache.get("北京市", 3, "qwen-turbo", "v1") == CHUNKS
+        assert cache.get("上海", 3, "qwen-turbo", "v1") is None
+        # 新实例从磁盘读取
+        assert ItineraryCache(config).get("北京", 3, "qwen-turbo", "v1") == CHUNKS
+
+        cache.configure({**config, "enabled": False})
+        assert cache.get("北京", 3, "qwen-turbo", "v1") is None
+        assert not cache.set("北京", 3, "qwen-turbo", "v1", CHUNKS)
+
+
+def test_off_peak_hours():
+    cache = ItineraryCache({"warmup": {"off_peak_hours": [22, 6]}})
+    assert cache.in_off_peak(datetime(2026, 10, 1, 23)) and cache.in_off_peak(datetime(2026, 10, 1, 5))
+    assert not cache.in_off_peak(datetime(2026, 10, 1, 12))
+    cache.configure({"warmup": {"off_peak_hours": [2, 6]}})
+    assert cache.in_off_peak(datetime(2026, 10, 1, 2)) and not cache.in_off_peak(datetime(2026, 10, 1, 6))
+    cache.configure({"warmup": {"off_peak_hours": []}})
+    assert cache.in_off_peak(datetime(2026, 10, 1, 12))
+
+
+def test_warm_skips_cached_and_counts_failures():
+    cache = ItineraryCache({"warmup": {"destinations": ["北京", "上海", "失败"], "days": [3, 5]}})
+    cache.set("北京", 3, "qwen-turbo", "v1", ["已缓存"])
+    client = WarmupClient(cache)
+    assert cache.warm(client) == {"generated": 3, "skipped": 1, "failed": 2}
+    assert client.generated == [("北京", 5), ("上海", 3), ("上海", 5)]
+    assert cache.warm(client, ["上海"], [3]) == {"generated": 0, "skipped": 1, "failed": 0}
+
+
+def test_stream_replays_cached_itinerary():
+    planner = CountingPlanner()
+    run = ItineraryRun(structured=False)
+    assert list(planner.generate_itinerary_stream("杭州", 2, run)) == CHUNKS and not run.from_cache
+
+    run = ItineraryRun(structured=False)
+    # 目的地写法不同也命中同一份行程，按原分块回放
+    assert list(planner.generate_itinerary_stream("杭州市", 2, run)) == CHUNKS
+    assert run.from_cache and planner.calls == 1
+    assert run.last_metrics["cached"]
+
+
+def test_partial_stream_is_not_cached():
+    planner = CountingPlanner()
+    stream = planner.generate_itinerary_stream("苏州", 2, ItineraryRun(structured=False))
+    next(stream)
+    stream.close()
+    list(planner.generate_itinerary_stream("苏州", 2, ItineraryRun(structured=False)))
+    assert planner.calls == 2
+
+
+def test_async_stream_shares_cache():
+    async def collect(planner, destination):
+        return [chunk async for chunk in planner.generate_itinerary_stream(destination, 2, ItineraryRun(structured=False))]
+
+    planner = AsyncCountingPlanner()
+    assert asyncio.run(collect(planner, "成都")) == CHUNKS
+    assert asyncio.run(collect(planner, "成都市")) == CHUNKS
+    assert planner.calls == 1
+    # 同步客户端生成的行程异步客户端同样命中
+    assert list(CountingPlanner().generate_itinerary_stream("成都", 2, ItineraryRun(structured=False))) == CHUNKS
+
+
+if __name__ == "__main__":
+    setup_module()
+    test_key_normalizes_destination()
+    test_set_get_and_disk_tier()
+    test_off_peak_hours()
+    test_warm_skips_cached_and_counts_failures()
+    test_stream_replays_cached_itinerary()
+    test_partial_stream_is_not_cached()
+    test_async_stream_shares_cache()
+    teardown_module()
+    print("✅ 行程缓存测试通过")
@@ -0,0 +1,151 @@
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.itinerary_fanout import DAY_SEPARATOR, ItineraryFanout, parse_skeleton
+
+
+def day_stream(day: int, delay: float, log: list = None):
+    """模拟某一天的流式生成，记录开始与结束时间"""
+    def produce():
+        if log is not None:
+            log.append(("start", day, time.monotonic()))
+        for part in (f"Day {day}: ", "上午", "下午"):
+            time.sleep(delay)
+            yield part
+        if log is not None:
+            log.append(("end", day, time.monotonic()))
+    return produce
+
+
+def test_parse_skeleton():
+    content = json.dumps({"days": [
+        {"day": 2, "theme": "长城", "area": "延庆"},
+        {"day": 1, "theme": " 故宫 ", "area": "东城"},
+        {"day": 1, "theme": "重复", "area": ""},
+    ]}, ensure_ascii=False)
+    assert parse_skeleton(content, 2) == [
+        {"day": 1, "theme": "故宫", "area": "东城"},
+        {"day": 2, "theme": "长城", "area": "延庆"},
+    ]
+    # 顶层直接是数组、缺少 day 字段时按顺序编号
+    assert [day["day"] for day in parse_skeleton('[{"theme": "a"}, {"theme": "b"}]', 2)] == [1, 2]
+    for content in ('{"days": [{"day": 1}]}', '{"plan": []}'):
+        try:
+            parse_skeleton(content, 2)
+            raise AssertionError(f"骨架不完整时应抛出 ValueError: {content}")
+        except ValueError:
+            pass
+
+
+def test_applies():
+    fanout = ItineraryFanout({"min_days": 6})
+    assert not fanout.applies(5) and fanout.applies(6)
+    assert not ItineraryFanout({"enabled": False}).applies(10)
+    assert fanout.day_params({"temperature": 0.7, "max_tokens": 8192}) == {"temperature": 0.7, "max_tokens": 1536}
+
+
+def test_merge_ordered_runs_days_concurrently_and_keeps_order():
+    fanout = ItineraryFanout({"max_concurrency": 4})
+    log = []
+    started = time.monotonic()
+    # 后面的天生成得更快，输出仍按天的顺序
+    output = list(fanout.merge_ordered([day_stream(day, 0.1 / day, log) for day in (1, 2, 3, 4)]))
+    elapsed = time.monotonic() - started
+    assert "".join(output) == DAY_SEPARATOR.join(f"Day {day}: 上午下午" for day in (1, 2, 3, 4))
+    # 并行生成：总耗时接近最慢的一天（约0.3秒），而不是各天之和
+    assert elapsed < 0.5
+    starts = [at for kind, _, at in log if kind == "start"]
+    assert max(starts) - min(starts) < 0.1
+
+
+def test_merge_ordered_respects_concurrency_limit():
+    fanout = ItineraryFanout({"max_concurrency": 2})
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def producer():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        yield "x"
+        with lock:
+            running[0] -= 1
+
+    assert len(list(fanout.merge_ordered([producer] * 5))) == 5 + 4
+    assert peak[0] == 2
+
+
+def test_failed_day_raises_after_earlier_days():
+    fanout = ItineraryFanout()
+
+    def failing():
+        yield "Day 2: "
+        raise ConnectionError("上游断开")
+
+    received = []
+    try:
+        for chunk in fanout.merge_ordered([day_stream(1, 0.01), failing, day_stream(3, 0.01)]):
+            received.append(chunk)
+        raise AssertionError("某一天失败时应抛出错误")
+    except ConnectionError:
+        pass
+    assert "".join(received) == "Day 1: 上午下午" + DAY_SEPARATOR + "Day 2: "
+
+
+def test_stop_reading_closes_day_streams():
+    fanout = ItineraryFanout({"max_concurrency": 2})
+    closed = []
+
+    def producer(day: int):
+        def produce():
+            try:
+                for i in range(50):
+                    time.sleep(0.01)
+                    yield f"{day}-{i} "
+            finally:
+                closed.append(day)
+        return produce
+
+    merged = fanout.merge_ordered([producer(day) for day in (1, 2, 3)])
+    assert next(merged) == "1-0 "
+    merged.close()
+    time.sleep(0.2)
+    # 正在生成的两天停止读取，尚未开始的第3天不再启动
+    assert sorted(closed) == [1, 2]
+
+
+def test_amerge_ordered():
+    fanout = ItineraryFanout({"max_concurrency": 3})
+
+    def producer(day: int, delay: float):
+        async def produce():
+            for part in (f"Day {day}: ", "行程"):
+                await asyncio.sleep(delay)
+                yield part
+        return produce
+
+    async def main():
+        return [chunk async for chunk in fanout.amerge_ordered([producer(1, 0.05), producer(2, 0.01), producer(3, 0.02)])]
+
+    started = time.monotonic()
+    output = asyncio.run(main())
+    assert "".join(output) == DAY_SEPARATOR.join(f"Day {day}: 行程" for day in (1, 2, 3))
+    assert time.monotonic() - started < 0.3
+
+
+if __name__ == "__main__":
+    test_parse_skeleton()
+    test_applies()
+    test_merge_ordered_runs_days_concurrently_and_keeps_order()
+    test_merge_ordered_respects_concurrency_limit()
+    test_failed_day_raises_after_earlier_days()
+    test_stop_reading_closes_day_streams()
+    test_amerge_ordered()
+    print("✅ 按天并行生成测试通过")
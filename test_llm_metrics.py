@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.llm_metrics import LLMMetrics, _percentile
+
+
+def test_percentile_nearest_rank():
+    one_to_ten = list(range(1, 11))
+    assert _percentile(one_to_ten, 50) == 5
+    assert _percentile(one_to_ten, 90) == 9
+    assert _percentile(one_to_ten, 100) == 10
+    assert _percentile(list(range(1, 21)), 95) == 19
+    assert _percentile(list(range(1, 101)), 7) == 7
+    # 乱序输入、单个值与边界
+    assert _percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert _percentile([4.2], 95) == 4.2
+    assert _percentile(one_to_ten, 0) == 1
+    assert _percentile([], 50) is None
+
+
+def record_call(metrics: LLMMetrics, model: str, completion_tokens: int, cached: bool = False, error: Exception = None):
+    tracker = metrics.track(model, "https://api.example.com/v1", "complete")
+    tracker.start_attempt()
+    if cached:
+        tracker.mark_cached()
+    else:
+        tracker.set_usage(100, completion_tokens)
+    tracker.finish(error)
+    return tracker.record
+
+
+def test_summarize_groups_upstream_calls():
+    metrics = LLMMetrics()
+    for tokens in (10, 20, 30):
+        record_call(metrics, "qwen-turbo", tokens)
+    record_call(metrics, "qwen-turbo", 0, cached=True)
+    record_call(metrics, "qwen-turbo", 5, error=TimeoutError("超时"))
+    record_call(metrics, "qwen-max", 40)
+
+    summary = metrics.summarize()
+    turbo = summary["qwen-turbo"]
+    assert turbo["calls"] == 5 and turbo["errors"] == 1 and turbo["cache_hits"] == 1
+    # 缓存命中与失败的调用不计入延迟与用量
+    assert turbo["prompt_tokens"] == 300 and turbo["completion_tokens"] == 60
+    assert turbo["latency_p50"] is not None and turbo["latency_p50"] <= turbo["latency_p95"]
+    assert summary["qwen-max"]["calls"] == 1
+    assert set(metrics.summarize(group_by="kind")) == {"complete"}
+
+
+def test_sinks_and_on_finish():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "metrics.jsonl")
+        metrics = LLMMetrics({"jsonl_path": path, "memory_max_records": 2})
+        received, finished = [], []
+        metrics.add_sink(received.append)
+        tracker = metrics.track("qwen-turbo", None, "stream", finished.append)
+        tracker.finish()
+        for _ in range(2):
+            record_call(metrics, "qwen-turbo", 10)
+
+        assert len(received) == 3 and len(finished) == 1
+        assert len(metrics.recent()) == 2
+        with open(path, encoding="utf-8") as f:
+            assert [json.loads(line)["kind"] for line in f] == ["stream", "complete", "complete"]
+
+        # 关闭后不再分发记录
+        metrics.configure({"enabled": False})
+        record_call(metrics, "qwen-turbo", 10)
+        assert len(received) == 3
+
+
+if __name__ == "__main__":
+    test_percentile_nearest_rank()
+    test_summarize_groups_upstream_calls()
+    test_sinks_and_on_finish()
+    print("✅ 调用指标测试通过")
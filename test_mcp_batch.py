@@ -0,0 +1,130 @@
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.mcp_batch import load_goals, run_batch, run_batch_async
+
+
+class FakeAgent:
+    """记录执行过的目标与最大并发数的模拟 Agent"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.goals = []
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def _start(self, goal: str):
+        with self.lock:
+            self.goals.append(goal)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        if "失败" in goal:
+            raise RuntimeError("规划失败")
+
+    def _finish(self, goal: str):
+        with self.lock:
+            self.running -= 1
+        plan = [{"task_id": "task_1", "description": goal, "tool": "travel_planner", "dependencies": []}]
+        return plan, json.dumps({"execution_summary": [], "tasks": {"task_1": {"result": goal}}}, ensure_ascii=False)
+
+    def plan_and_execute(self, goal, config_manager, context, planning_deadline=None, deadline=None):
+        try:
+            self._start(goal)
+            time.sleep(self.delay)
+        except RuntimeError:
+            with self.lock:
+                self.running -= 1
+            raise
+        return self._finish(goal)
+
+
+class AsyncFakeAgent(FakeAgent):
+    async def plan_and_execute(self, goal, config_manager, context, planning_deadline=None, deadline=None):
+        try:
+            self._start(goal)
+            await asyncio.sleep(self.delay)
+        except RuntimeError:
+            with self.lock:
+                self.running -= 1
+            raise
+        return self._finish(goal)
+
+
+def test_load_goals_skips_invalid_lines():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "goals.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('"规划北京三天旅游"\n\n{"id": "b", "goal": "规划上海两天旅游", "context": {"budget": 1000}}\n'
+                    '{"goal": ""}\n不是JSON\n{"goal": "x", "context": "北京"}\n')
+        assert list(load_goals(path)) == [
+            {"id": "1", "goal": "规划北京三天旅游", "context": {}},
+            {"id": "b", "goal": "规划上海两天旅游", "context": {"budget": 1000}},
+        ]
+
+
+def test_duplicates_run_once_and_concurrency_is_bounded():
+    agent = FakeAgent()
+    goals = ["目标A", "目标B", {"goal": "目标A"}, "目标C", "目标D", "目标失败", {"goal": "目标A", "context": {"x": 1}}]
+    outputs = {output["id"]: output for output in run_batch(agent, goals, None, concurrency=2)}
+
+    assert sorted(agent.goals) == sorted(["目标A", "目标B", "目标C", "目标D", "目标失败", "目标A"])
+    assert outputs["3"]["duplicate_of"] == "1"
+    assert outputs["1"]["result"]["tasks"]["task_1"]["result"] == "目标A"
+    assert outputs["6"]["error"] == "规划失败"
+    # 上下文不同的相同目标不算重复
+    assert "duplicate_of" not in outputs["7"]
+    assert agent.peak <= 2
+
+
+def test_resume_skips_finished_goals_and_truncates_torn_line():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.jsonl")
+        goals = ["目标A", "目标B", "目标A"]
+        assert len(list(run_batch(FakeAgent(), goals[:2], None, output_path=path))) == 2
+        # 模拟写到一半时进程崩溃
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"id": "3", "goal": "目标')
+
+        agent = FakeAgent()
+        outputs = list(run_batch(agent, goals + ["目标C"], None, output_path=path))
+        assert agent.goals == ["目标C"]
+        # 续跑时重复目标仍指向检查点中首次执行的记录
+        assert [(output["id"], output.get("duplicate_of")) for output in outputs] == [("3", "1"), ("4", None)]
+        with open(path, encoding="utf-8") as f:
+            assert sorted(json.loads(line)["id"] for line in f) == ["1", "2", "3", "4"]
+
+        # 不续跑时清空已有结果
+        agent = FakeAgent()
+        list(run_batch(agent, goals, None, output_path=path, resume=False))
+        assert agent.goals.count("目标A") == 1 and len(agent.goals) == 2
+
+
+def test_async_batch():
+    agent = AsyncFakeAgent()
+
+    async def collect():
+        return [output async for output in run_batch_async(agent, ["A", "B", "C", "A", "D"], None, concurrency=2)]
+
+    started = time.monotonic()
+    outputs = asyncio.run(collect())
+    assert sorted(output["id"] for output in outputs) == ["1", "2", "3", "4", "5"]
+    assert len(agent.goals) == 4 and agent.peak == 2
+    # 4 个目标、每次 2 个并发，约 0.1 秒
+    assert time.monotonic() - started < 0.3
+
+
+if __name__ == "__main__":
+    test_load_goals_skips_invalid_lines()
+    test_duplicates_run_once_and_concurrency_is_bounded()
+    test_resume_skips_finished_goals_and_truncates_torn_line()
+    test_async_batch()
+    print("✅ 批处理测试通过")
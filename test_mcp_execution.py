@@ -0,0 +1,245 @@
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.intent_router import intent_router
+from utils.mcp_client import AsyncMCPAgentLLM, MCPAgentLLM
+from utils.plan_cache import plan_cache
+from utils.response_cache import response_cache
+from utils.task_run import PlanRun
+
+
+class StubConfigManager:
+    """只提供工具实例化所需的API配置"""
+
+    def get_api_key(self, page):
+        return "test"
+
+    def get_base_url(self, page):
+        return "https://api.example.com/v1"
+
+    def get_page_config(self, page):
+        return {"default_model": "qwen-turbo"}
+
+
+class StreamingTool:
+    """逐段输出的模拟工具，约 0.5 秒输出完毕"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def execute_task(self, task_description, context, on_token=None):
+        parts = []
+        for i in range(10):
+            time.sleep(0.05)
+            parts.append(f"<{i}>")
+            if on_token:
+                on_token(parts[-1])
+        return "".join(parts)
+
+
+class AsyncStreamingTool(StreamingTool):
+    async def execute_task(self, task_description, context, on_token=None):
+        parts = []
+        for i in range(10):
+            await asyncio.sleep(0.05)
+            parts.append(f"<{i}>")
+            if on_token:
+                on_token(parts[-1])
+        return "".join(parts)
+
+
+class PausingTool:
+    """每次执行约 0.2 秒、不输出中间内容的模拟工具"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def execute_task(self, task_description, context, on_token=None):
+        time.sleep(0.2)
+        return f"完成：{task_description}"
+
+
+TOOL_CONFIG = {
+    "travel_planner": {
+        "description": "旅行规划",
+        "class": f"{__name__}.StreamingTool",
+        "async_class": f"{__name__}.AsyncStreamingTool",
+        "page": "travel_agent",
+    }
+}
+PLAN = [{"task_id": "task_1", "description": "规划行程", "tool": "travel_planner", "dependencies": []}]
+FULL_RESULT = "".join(f"<{i}>" for i in range(10))
+
+
+STREAMED_PLAN = json.dumps({"plan": [
+    {"task_id": "task_1", "description": "规划行程", "tool": "travel_planner", "dependencies": []},
+    {"task_id": "task_2", "description": "规划备选行程", "tool": "travel_planner", "dependencies": []},
+]}, ensure_ascii=False)
+
+
+class StreamingPlanner(MCPAgentLLM):
+    """分块输出预设计划的规划模型"""
+
+    def stream_chat(self, messages, use_cache=True, deadline=None, on_metrics=None, **params):
+        for i in range(0, len(STREAMED_PLAN), 16):
+            time.sleep(0.02)
+            yield STREAMED_PLAN[i:i + 16]
+
+
+class AsyncStreamingPlanner(AsyncMCPAgentLLM):
+    async def stream_chat(self, messages, use_cache=True, deadline=None, on_metrics=None, **params):
+        for i in range(0, len(STREAMED_PLAN), 16):
+            await asyncio.sleep(0.02)
+            yield STREAMED_PLAN[i:i + 16]
+
+
+def setup_module(module=None):
+    # 不使用缓存与本地路由，保证每次都真正执行计划
+    plan_cache.configure({"enabled": False})
+    response_cache.configure({"enabled": False})
+    intent_router.configure({"enabled": False})
+
+
+def make_agent(agent_class=MCPAgentLLM, **kwargs):
+    return agent_class("test", "https://api.example.com/v1", "qwen-turbo", tool_config=TOOL_CONFIG, **kwargs)
+
+
+def task_outcome(result_json: str) -> dict:
+    return json.loads(result_json)["tasks"]["task_1"]
+
+
+def run_in_thread(agent, outcomes: dict, name: str, plan_run: PlanRun = None) -> threading.Thread:
+    def run():
+        outcomes[name] = task_outcome(agent.execute_plan(PLAN, StubConfigManager(), plan_run=plan_run))
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def parallel_task(task_id: str, tool: str = "pausing", dependencies=None) -> dict:
+    return {"task_id": task_id, "description": task_id, "tool": tool, "dependencies": dependencies or []}
+
+
+def test_plan_runs_along_dependency_graph():
+    tool_config = {
+        "pausing": {"description": "并行工具", "class": f"{__name__}.PausingTool", "page": "travel_agent"},
+        "serial": {"description": "串行工具", "class": f"{__name__}.PausingTool", "page": "travel_agent",
+                   "max_concurrency": 1},
+    }
+    agent = MCPAgentLLM("test", "https://api.example.com/v1", tool_config=tool_config)
+    plan = [
+        parallel_task("task_3", dependencies=["task_1", "task_2"]),
+        parallel_task("task_1"),
+        parallel_task("task_2"),
+        parallel_task("task_4", dependencies=["task_5"]),
+        parallel_task("task_5", dependencies=["task_4"]),
+    ]
+    started = time.monotonic()
+    results = json.loads(agent.execute_plan(plan, StubConfigManager()))
+    # 总耗时取决于关键路径（两层，约0.4秒），而不是全部任务耗时之和
+    assert time.monotonic() - started < 0.6
+    assert list(results["tasks"]) == ["task_3", "task_1", "task_2", "task_4", "task_5"]
+    assert results["tasks"]["task_3"] == {"result": "完成：task_3"}
+    assert all("循环依赖" in results["tasks"][task_id]["error"] for task_id in ("task_4", "task_5"))
+
+    # 工具声明 max_concurrency 时同一工具的任务依次执行
+    started = time.monotonic()
+    agent.execute_plan([parallel_task("task_1", "serial"), parallel_task("task_2", "serial")], StubConfigManager())
+    assert time.monotonic() - started >= 0.4
+
+
+def test_cancel_one_plan_leaves_concurrent_plans_running():
+    agent, outcomes = make_agent(), {}
+    cancelled = PlanRun()
+    threads = [run_in_thread(agent, outcomes, "cancelled", cancelled), run_in_thread(agent, outcomes, "other")]
+    time.sleep(0.2)
+    cancelled.cancel()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes["cancelled"]["truncated"] and "已取消" in outcomes["cancelled"]["error"]
+    assert outcomes["other"] == {"result": FULL_RESULT}
+    # 之后开始的计划不受已取消计划的影响
+    assert task_outcome(agent.execute_plan(PLAN, StubConfigManager())) == {"result": FULL_RESULT}
+
+
+def test_agent_cancel_stops_every_running_plan():
+    agent, outcomes = make_agent(), {}
+    threads = [run_in_thread(agent, outcomes, name) for name in ("a", "b")]
+    time.sleep(0.2)
+    agent.cancel()
+    for thread in threads:
+        thread.join()
+    assert all("已取消" in outcome["error"] for outcome in outcomes.values())
+    assert not agent._plan_runs
+
+
+def test_abandoned_event_stream_cancels_only_its_plan():
+    agent, outcomes = make_agent(), {}
+    other = run_in_thread(agent, outcomes, "other")
+    events = agent.execute_plan_events(PLAN, StubConfigManager())
+    for event in events:
+        if event["type"] == "token":
+            break
+    events.close()
+    other.join()
+    assert outcomes["other"] == {"result": FULL_RESULT}
+
+
+def test_async_cancel_one_plan():
+    agent = make_agent(AsyncMCPAgentLLM)
+
+    async def main():
+        cancelled = PlanRun()
+        jobs = [asyncio.create_task(agent.execute_plan(PLAN, StubConfigManager(), plan_run=cancelled)),
+                asyncio.create_task(agent.execute_plan(PLAN, StubConfigManager()))]
+        await asyncio.sleep(0.2)
+        cancelled.cancel()
+        return [task_outcome(result) for result in await asyncio.gather(*jobs)]
+
+    cancelled, other = asyncio.run(main())
+    assert "已取消" in cancelled["error"]
+    assert other == {"result": FULL_RESULT}
+
+
+def check_event_order(events: list):
+    """每个任务先 task_planned 再 task_started；plan_ready 带完整计划，completed 最后"""
+    kinds = [(event["type"], event.get("task_id") or event.get("task", {}).get("task_id")) for event in events]
+    for task_id in ("task_1", "task_2"):
+        assert kinds.index(("task_planned", task_id)) < kinds.index(("task_started", task_id))
+        assert ("token", task_id) not in kinds[:kinds.index(("task_planned", task_id))]
+    # 第一个任务在规划结束之前就已开始执行
+    assert kinds.index(("task_started", "task_1")) < kinds.index(("plan_ready", None))
+    plan_ready = next(event for event in events if event["type"] == "plan_ready")
+    assert [task["task_id"] for task in plan_ready["plan"]] == ["task_1", "task_2"]
+    assert kinds[-1] == ("completed", None)
+
+
+def test_streamed_plan_announces_tasks_before_they_start():
+    agent = make_agent(StreamingPlanner)
+    check_event_order(list(agent.plan_and_execute_events("帮我规划北京三天旅游", StubConfigManager())))
+
+    agent = make_agent(AsyncStreamingPlanner)
+
+    async def collect():
+        return [event async for event in agent.plan_and_execute_events("帮我规划北京三天旅游", StubConfigManager())]
+
+    check_event_order(asyncio.run(collect()))
+
+
+if __name__ == "__main__":
+    setup_module()
+    test_plan_runs_along_dependency_graph()
+    test_cancel_one_plan_leaves_concurrent_plans_running()
+    test_agent_cancel_stops_every_running_plan()
+    test_abandoned_event_stream_cancels_only_its_plan()
+    test_async_cancel_one_plan()
+    test_streamed_plan_announces_tasks_before_they_start()
+    print("✅ MCP 计划执行测试通过")
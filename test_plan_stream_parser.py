@@ -0,0 +1,65 @@
+import sys
+import os
+import json
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.plan_stream_parser import PlanStreamParser
+
+
+PLAN = {"plan": [
+    {"task_id": "task_1", "description": "规划{北京}行程 \"三天\"", "tool": "travel_planner", "dependencies": []},
+    {"task_id": "task_2", "description": "分析图片]", "tool": "image_analyzer", "dependencies": ["task_1"]},
+]}
+
+
+def feed_in_chunks(parser: PlanStreamParser, text: str, size: int) -> list:
+    """按固定大小分块输入，返回每个任务闭合时已输入的字符数与任务"""
+    emitted = []
+    for i in range(0, len(text), size):
+        for task in parser.feed(text[i:i + size]):
+            emitted.append((i + size, task))
+    return emitted
+
+
+def test_tasks_emitted_as_soon_as_closed():
+    text = json.dumps(PLAN, ensure_ascii=False)
+    for size in (1, 3, 7, len(text)):
+        parser = PlanStreamParser()
+        emitted = feed_in_chunks(parser, text, size)
+        assert [task for _, task in emitted] == PLAN["plan"], size
+        assert parser.finished and parser.text == text
+    # 逐字符输入时，第一个任务在第二个任务开始之前就已返回
+    parser = PlanStreamParser()
+    first_end = feed_in_chunks(parser, text, 1)[0][0]
+    assert first_end < text.index('"task_2"')
+
+
+def test_prefix_and_trailing_text_ignored():
+    parser = PlanStreamParser()
+    tasks = parser.feed('好的，计划如下：{"plan": [{"task_id": "task_1"}]} 其他内容 {"task_id": "x"}')
+    assert tasks == [{"task_id": "task_1"}]
+    assert parser.finished
+    assert parser.feed('{"task_id": "task_2"}') == []
+
+
+def test_invalid_object_recorded_and_skipped():
+    parser = PlanStreamParser()
+    tasks = parser.feed('{"plan": [{"task_id": "task_1",}, {"task_id": "task_2"}]}')
+    assert tasks == [{"task_id": "task_2"}]
+    assert len(parser.errors) == 1
+
+
+def test_unfinished_plan():
+    parser = PlanStreamParser()
+    assert parser.feed('{"plan": [{"task_id": "task_1"}, {"task_id": ') == [{"task_id": "task_1"}]
+    assert not parser.finished
+
+
+if __name__ == "__main__":
+    test_tasks_emitted_as_soon_as_closed()
+    test_prefix_and_trailing_text_ignored()
+    test_invalid_object_recorded_and_skipped()
+    test_unfinished_plan()
+    print("✅ 流式计划解析测试通过")
@@ -0,0 +1,178 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.rate_limiter import RateGovernor, estimate_tokens, DEFAULT_COMPLETION_RESERVE
+from utils.retry_policy import Deadline, DeadlineExceeded
+
+
+BASE_URL, MODEL = "https://api.example.com/v1", "qwen-turbo"
+
+
+def test_estimate_tokens():
+    messages = [{"role": "user", "content": "一" * 100}]
+    assert estimate_tokens(messages) == 50 + DEFAULT_COMPLETION_RESERVE
+    assert estimate_tokens(messages, {"max_tokens": 10}) == 60
+
+
+def test_overrides_prefer_most_specific():
+    governor = RateGovernor({
+        "default": {"max_in_flight": 8},
+        "overrides": [
+            {"model": MODEL, "max_in_flight": 4, "requests_per_minute": 100},
+            {"base_url": BASE_URL, "model": MODEL, "max_in_flight": 2},
+        ]
+    })
+    assert governor._resolve_limits(BASE_URL, MODEL) == {
+        "requests_per_minute": 100, "tokens_per_minute": None, "max_in_flight": 2
+    }
+    assert governor._resolve_limits("https://other", MODEL)["max_in_flight"] == 4
+    assert governor._resolve_limits(BASE_URL, "other")["max_in_flight"] == 8
+
+
+def test_max_in_flight_queues_in_arrival_order():
+    governor = RateGovernor({"default": {"max_in_flight": 1}})
+    order = []
+
+    def call(name: str):
+        with governor.acquire(BASE_URL, MODEL):
+            order.append(name)
+            time.sleep(0.05)
+
+    with governor.acquire(BASE_URL, MODEL):
+        threads = []
+        for name in ("a", "b", "c"):
+            thread = threading.Thread(target=call, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # 等待线程进入队列，保证到达顺序
+            while governor.get_queue_state(BASE_URL, MODEL)["queue_depth"] < len(threads):
+                time.sleep(0.005)
+        assert order == []
+    for thread in threads:
+        thread.join()
+    assert order == ["a", "b", "c"]
+    stats = governor.get_queue_state(BASE_URL, MODEL)
+    assert stats["granted"] == 4 and stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+
+def test_token_bucket_waits_for_refill():
+    # 每秒补充 100 个令牌
+    governor = RateGovernor({"default": {"tokens_per_minute": 6000}})
+    with governor.acquire(BASE_URL, MODEL, 6000):
+        pass
+    started = time.monotonic()
+    with governor.acquire(BASE_URL, MODEL, 20) as permit:
+        permit.record_usage(20)
+    assert time.monotonic() - started >= 0.15
+
+
+def test_unused_tokens_refunded_on_release():
+    governor = RateGovernor({"default": {"tokens_per_minute": 6000}})
+    # 预留的令牌多于实际用量时，释放后退还差额
+    with governor.acquire(BASE_URL, MODEL, 5900) as permit:
+        permit.record_usage(100)
+    # 未退还时需要等待约 49 秒，超出截止时间会立即失败
+    with governor.acquire(BASE_URL, MODEL, 5000, Deadline(0.5)) as permit:
+        assert permit.wait_time < 0.1
+
+
+def test_queue_wait_bounded_by_deadline():
+    governor = RateGovernor({"default": {"max_in_flight": 1}})
+    with governor.acquire(BASE_URL, MODEL):
+        started = time.monotonic()
+        try:
+            with governor.acquire(BASE_URL, MODEL, 0, Deadline(0.2)):
+                raise AssertionError("排队超过截止时间时应抛出 DeadlineExceeded")
+        except DeadlineExceeded:
+            pass
+        assert 0.15 <= time.monotonic() - started < 1
+        # 超时的请求离开队列，不阻塞后续请求
+        assert governor.get_queue_state(BASE_URL, MODEL)["queue_depth"] == 0
+    with governor.acquire(BASE_URL, MODEL, 0, Deadline(0.2)):
+        pass
+    assert governor.get_queue_state(BASE_URL, MODEL)["deadline_exceeded"] == 1
+
+
+def test_bucket_wait_beyond_deadline_fails_fast():
+    governor = RateGovernor({"default": {"requests_per_minute": 1}})
+    with governor.acquire(BASE_URL, MODEL):
+        pass
+    started = time.monotonic()
+    try:
+        with governor.acquire(BASE_URL, MODEL, 0, Deadline(1)):
+            raise AssertionError("令牌桶需要的等待超过截止时间时应立即失败")
+    except DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 0.1
+
+
+def test_async_acquire():
+    governor = RateGovernor({"default": {"max_in_flight": 1}})
+    order = []
+
+    async def call(name: str, deadline: Deadline = None):
+        async with governor.acquire_async(BASE_URL, MODEL, 0, deadline):
+            order.append(name)
+            await asyncio.sleep(0.05)
+
+    async def main():
+        await asyncio.gather(call("a"), call("b"), call("c"))
+        async with governor.acquire_async(BASE_URL, MODEL):
+            try:
+                await call("late", Deadline(0.1))
+            except DeadlineExceeded:
+                order.append("deadline")
+
+    asyncio.run(main())
+    assert order == ["a", "b", "c", "deadline"]
+    assert governor.get_queue_state(BASE_URL, MODEL)["queue_depth"] == 0
+
+
+def test_async_waiter_woken_by_release_without_polling():
+    governor = RateGovernor({"default": {"max_in_flight": 1}})
+    limiter = governor._get_limiter(BASE_URL, MODEL)
+    attempts = []
+    try_grant = limiter._try_grant
+    limiter._try_grant = lambda ticket, tokens: attempts.append(ticket) or try_grant(ticket, tokens)
+    held = threading.Event()
+
+    def hold():
+        # 另一个线程持有许可 0.3 秒
+        with governor.acquire(BASE_URL, MODEL):
+            held.set()
+            time.sleep(0.3)
+
+    async def main():
+        thread = threading.Thread(target=hold)
+        thread.start()
+        await asyncio.to_thread(held.wait)
+        del attempts[:]
+        started = time.monotonic()
+        async with governor.acquire_async(BASE_URL, MODEL) as permit:
+            waited = time.monotonic() - started
+        thread.join()
+        return waited, permit
+
+    waited, permit = asyncio.run(main())
+    # 释放后立即被唤醒，等待期间不轮询（只在入队和被唤醒时检查）
+    assert 0.2 <= waited < 0.4 and permit.wait_time < 0.4
+    assert len(attempts) <= 3
+
+
+if __name__ == "__main__":
+    test_estimate_tokens()
+    test_overrides_prefer_most_specific()
+    test_max_in_flight_queues_in_arrival_order()
+    test_token_bucket_waits_for_refill()
+    test_unused_tokens_refunded_on_release()
+    test_queue_wait_bounded_by_deadline()
+    test_bucket_wait_beyond_deadline_fails_fast()
+    test_async_acquire()
+    test_async_waiter_woken_by_release_without_polling()
+    print("✅ 限流测试通过")
@@ -0,0 +1,105 @@
+import sys
+import os
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.llm_client import LLMClient
+from utils.response_cache import ResponseCache, response_cache
+from utils.single_flight import single_flight
+
+MESSAGES = [{"role": "user", "content": "北京有哪些景点？"}]
+
+
+class CountingClient(LLMClient):
+    """记录上游调用次数、不发起网络请求的客户端"""
+
+    def __init__(self):
+        super().__init__("test", "https://api.example.com/v1")
+        self.upstream_calls = 0
+
+    def _stream_upstream(self, messages, params, deadline, tracker):
+        self.upstream_calls += 1
+        yield from ("故宫", "、", "长城")
+
+    def _complete_with_failover(self, messages, params, deadline, tracker):
+        self.upstream_calls += 1
+        return "故宫、长城"
+
+
+def test_make_key_is_canonical_and_temperature_gated():
+    cache = ResponseCache()
+    key = cache.make_key("qwen-turbo", MESSAGES, {"temperature": 0.2, "max_tokens": 100})
+    assert key == cache.make_key("qwen-turbo", MESSAGES, {"max_tokens": 100, "temperature": 0.2})
+    assert key != cache.make_key("qwen-plus", MESSAGES, {"temperature": 0.2, "max_tokens": 100})
+    # 不参与采样的参数不影响缓存键
+    assert key == cache.make_key("qwen-turbo", MESSAGES, {"temperature": 0.2, "max_tokens": 100, "user": "a"})
+    # 高温度或未指定温度（默认1.0）的调用不缓存
+    assert cache.make_key("qwen-turbo", MESSAGES, {"temperature": 0.7}) is None
+    assert cache.make_key("qwen-turbo", MESSAGES, {}) is None
+    assert ResponseCache({"enabled": False}).make_key("qwen-turbo", MESSAGES, {"temperature": 0}) is None
+
+
+def test_memory_lru_eviction():
+    cache = ResponseCache({"memory_max_entries": 2})
+    cache.set("a", ["1"])
+    cache.set("b", ["2"])
+    assert cache.get("a") == ["1"]
+    cache.set("c", ["3"])
+    # 最近最少使用的 b 被淘汰
+    assert cache.get("b") is None
+    assert cache.get("a") == ["1"] and cache.get("c") == ["3"]
+
+
+def test_disk_tier_survives_restart_and_expires():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "responses.sqlite3")
+        ResponseCache({"disk_path": path}).set("key", ["第一段", "第二段"])
+
+        restarted = ResponseCache({"disk_path": path})
+        assert restarted.get("key") == ["第一段", "第二段"]
+        assert restarted.get_stats()["disk_hits"] == 1
+
+        expired = ResponseCache({"disk_path": path, "disk_ttl": 0})
+        time.sleep(0.01)
+        assert expired.get("key") is None
+
+        restarted.delete("key")
+        assert ResponseCache({"disk_path": path}).get("key") is None
+
+
+def test_client_replays_cached_stream():
+    response_cache.configure({"enabled": True})
+    response_cache.clear()
+    single_flight.configure({"enabled": False})
+    try:
+        client = CountingClient()
+        first = list(client.stream_chat(MESSAGES, temperature=0.1))
+        second = list(client.stream_chat(MESSAGES, temperature=0.1))
+        # 命中时按原分块回放，不再请求上游
+        assert first == second == ["故宫", "、", "长城"]
+        assert client.upstream_calls == 1
+
+        list(client.stream_chat(MESSAGES, use_cache=False, temperature=0.1))
+        list(client.stream_chat(MESSAGES, temperature=0.9))
+        assert client.upstream_calls == 3
+
+        assert client.complete_chat(MESSAGES, temperature=0) == client.complete_chat(MESSAGES, temperature=0)
+        assert client.upstream_calls == 4
+
+        client.invalidate_cached_response(MESSAGES, temperature=0.1)
+        list(client.stream_chat(MESSAGES, temperature=0.1))
+        assert client.upstream_calls == 5
+    finally:
+        response_cache.clear()
+        single_flight.configure({"enabled": True})
+
+
+if __name__ == "__main__":
+    test_make_key_is_canonical_and_temperature_gated()
+    test_memory_lru_eviction()
+    test_disk_tier_survives_restart_and_expires()
+    test_client_replays_cached_stream()
+    print("✅ 响应缓存测试通过")
@@ -0,0 +1,73 @@
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.result_store import ResultStore, TaskContext, truncate_text
+
+LONG_RESULT = "开头" + "中" * 2000 + "结尾"
+
+
+def make_store(**config) -> ResultStore:
+    results = {"tasks": {"task_1": {"result": LONG_RESULT}, "task_2": {"error": "失败"}, "task_3": {"result": "短结果"}}}
+    return ResultStore(results, threading.Lock(), config.pop("context_config", None), **config)
+
+
+def test_truncate_keeps_head_and_tail():
+    truncated = truncate_text(LONG_RESULT, 100)
+    assert truncated.startswith("开头") and truncated.endswith("结尾")
+    assert "已省略" in truncated and len(truncated) < 250
+    assert truncate_text("短文本", 100) == "短文本"
+    assert truncate_text(LONG_RESULT, 0) == LONG_RESULT
+
+
+def test_refs_read_lazily_within_budget():
+    store = make_store(context_config={"token_budget": 100})
+    assert store.ref("task_2") is None and store.ref("missing") is None
+    ref = store.ref("task_1")
+    assert ref.read_full() == LONG_RESULT
+    assert str(ref) == truncate_text(LONG_RESULT, 100)
+    assert store.ref("task_3").read() == "短结果"
+
+
+def test_summary_computed_once_and_falls_back_to_truncation():
+    calls = []
+
+    def summarize(text, budget):
+        calls.append(budget)
+        return "摘要"
+
+    store = make_store(context_config={"token_budget": 100, "strategy": "summarize"}, summarizer=summarize)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        summaries = list(executor.map(lambda _: store.materialize("task_1"), range(8)))
+    # 并发读取同一依赖只摘要一次
+    assert summaries == ["摘要"] * 8 and calls == [100]
+
+    def failing(text, budget):
+        raise ConnectionError("上游断开")
+
+    store = make_store(context_config={"token_budget": 100, "strategy": "summarize"}, summarizer=failing)
+    assert store.materialize("task_1") == truncate_text(LONG_RESULT, 100)
+
+
+def test_task_context_shares_base_and_resolves_refs():
+    store = make_store(context_config={"token_budget": 100})
+    base = {"user_goal": "规划北京旅游"}
+    context = TaskContext(base, {"task_1_result": store.ref("task_1")})
+    assert context["user_goal"] == "规划北京旅游"
+    assert context["task_1_result"] == truncate_text(LONG_RESULT, 100)
+    assert context.get("task_9_result") is None
+    assert sorted(context) == ["task_1_result", "user_goal"] and len(context) == 2
+    assert context.ref("task_1_result").task_id == "task_1"
+    assert dict(context.copy()) == dict(context)
+
+
+if __name__ == "__main__":
+    test_truncate_keeps_head_and_tail()
+    test_refs_read_lazily_within_budget()
+    test_summary_computed_once_and_falls_back_to_truncation()
+    test_task_context_shares_base_and_resolves_refs()
+    print("✅ 依赖结果存储测试通过")
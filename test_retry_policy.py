@@ -0,0 +1,193 @@
+import sys
+import os
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.retry_policy import Deadline, DeadlineExceeded, RetryPolicy, StreamTimeoutError, deadline_scope
+
+
+FAST_RETRY = {"base_delay": 0.01, "max_delay": 0.02, "first_token_timeout": 5, "inter_token_timeout": 5}
+
+
+def status_error(status_code: int) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    return openai.APIStatusError("error", response=httpx.Response(status_code, request=request), body=None)
+
+
+class FakeStream:
+    """按给定间隔产出数据块的流式响应"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.closed = False
+
+    def __iter__(self):
+        for delay in self.delays:
+            time.sleep(delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="字"))])
+
+    def close(self):
+        self.closed = True
+
+
+def test_is_retryable():
+    assert RetryPolicy.is_retryable(httpx.ConnectError("连接失败"))
+    assert RetryPolicy.is_retryable(StreamTimeoutError("超时"))
+    assert RetryPolicy.is_retryable(status_error(429))
+    assert RetryPolicy.is_retryable(status_error(503))
+    assert not RetryPolicy.is_retryable(status_error(400))
+    assert not RetryPolicy.is_retryable(ValueError("参数错误"))
+
+
+def test_retries_until_success():
+    policy = RetryPolicy(dict(FAST_RETRY, max_attempts=3))
+    attempts = []
+
+    def flaky(deadline: Deadline):
+        attempts.append(deadline)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("连接失败")
+        return "ok"
+
+    assert policy.call(flaky) == "ok"
+    assert len(attempts) == 3
+
+
+def test_gives_up_after_max_attempts_and_on_fatal_errors():
+    policy = RetryPolicy(dict(FAST_RETRY, max_attempts=2))
+    attempts = []
+
+    def failing(deadline: Deadline):
+        attempts.append(1)
+        raise httpx.ConnectError("连接失败")
+
+    try:
+        policy.call(failing)
+        raise AssertionError("重试次数用完后应抛出原始错误")
+    except httpx.ConnectError:
+        pass
+    assert len(attempts) == 2
+
+    attempts.clear()
+
+    def fatal(deadline: Deadline):
+        attempts.append(1)
+        raise status_error(401)
+
+    try:
+        policy.call(fatal)
+        raise AssertionError("不可重试的错误应直接抛出")
+    except openai.APIStatusError:
+        pass
+    assert len(attempts) == 1
+
+
+def test_no_retry_past_total_budget():
+    policy = RetryPolicy(dict(FAST_RETRY, max_attempts=10, base_delay=1, max_delay=1, total_budget=0.2))
+    started = time.monotonic()
+    attempts = []
+
+    def failing(deadline: Deadline):
+        attempts.append(1)
+        raise httpx.ConnectError("连接失败")
+
+    try:
+        policy.call(failing)
+    except (httpx.ConnectError, DeadlineExceeded):
+        pass
+    assert time.monotonic() - started < 1.5
+    assert len(attempts) < 10
+
+
+def test_deadline_scope_nests_to_earliest():
+    with deadline_scope(5) as outer:
+        with deadline_scope(0.1) as inner:
+            assert inner.remaining() <= 0.1
+            with deadline_scope(10) as nested:
+                assert nested.expires_at == inner.expires_at
+        assert outer.remaining() > 4
+
+
+def test_total_budget_does_not_cut_streaming_output():
+    # 总时间预算 0.2 秒，流式输出持续约 0.4 秒
+    policy = RetryPolicy(dict(FAST_RETRY, total_budget=0.2))
+    chunks = list(policy.watch_stream(FakeStream([0.04] * 10), policy.start()))
+    assert len(chunks) == 10
+
+
+def test_total_budget_bounds_first_token():
+    policy = RetryPolicy(dict(FAST_RETRY, total_budget=0.2))
+    stream = FakeStream([0.3, 0.01])
+    try:
+        list(policy.watch_stream(stream, policy.start()))
+        raise AssertionError("首个token超出总时间预算时应抛出 DeadlineExceeded")
+    except DeadlineExceeded:
+        pass
+    assert stream.closed
+
+
+def test_caller_deadline_bounds_whole_stream():
+    policy = RetryPolicy(dict(FAST_RETRY, total_budget=None))
+    stream = FakeStream([0.04] * 10)
+    with deadline_scope(0.2):
+        try:
+            list(policy.watch_stream(stream, policy.start()))
+            raise AssertionError("超出调用方截止时间时应中断流式输出")
+        except DeadlineExceeded:
+            pass
+    assert stream.closed
+
+
+def test_inter_token_timeout():
+    policy = RetryPolicy(dict(FAST_RETRY, inter_token_timeout=0.1))
+    try:
+        list(policy.watch_stream(FakeStream([0, 0.2]), policy.start()))
+        raise AssertionError("token间隔超时应抛出 StreamTimeoutError")
+    except StreamTimeoutError:
+        pass
+
+
+def test_request_timeout_follows_budget():
+    policy = RetryPolicy(dict(FAST_RETRY, total_budget=2, connect_timeout=10, read_timeout=60))
+    timeout = policy.request_timeout(policy.start())
+    assert timeout.connect <= 2 and timeout.read <= 2
+    # 流式读取不受总时间预算约束，只受调用截止时间约束
+    assert policy.request_timeout(policy.start(), stream=True).read == 5
+    with deadline_scope(1):
+        assert policy.request_timeout(policy.start(), stream=True).read <= 1
+
+
+def test_call_async_retries():
+    policy = RetryPolicy(dict(FAST_RETRY, max_attempts=3))
+    attempts = []
+
+    async def flaky(deadline: Deadline):
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise status_error(502)
+        return "ok"
+
+    assert asyncio.run(policy.call_async(flaky)) == "ok"
+    assert len(attempts) == 2
+
+
+if __name__ == "__main__":
+    test_is_retryable()
+    test_retries_until_success()
+    test_gives_up_after_max_attempts_and_on_fatal_errors()
+    test_no_retry_past_total_budget()
+    test_deadline_scope_nests_to_earliest()
+    test_total_budget_does_not_cut_streaming_output()
+    test_total_budget_bounds_first_token()
+    test_caller_deadline_bounds_whole_stream()
+    test_inter_token_timeout()
+    test_request_timeout_follows_budget()
+    test_call_async_retries()
+    print("✅ 重试策略测试通过")
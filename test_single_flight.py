@@ -0,0 +1,201 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.single_flight import SingleFlight, make_flight_key
+
+
+CHUNKS = ["北京", "三天", "行程"]
+
+
+class Upstream:
+    """模拟上游流，记录被调用与被关闭的次数"""
+
+    def __init__(self, delay: float = 0.05, fail_after: int = None):
+        self.delay = delay
+        self.fail_after = fail_after
+        self.calls = 0
+        self.closed = 0
+
+    def stream(self):
+        self.calls += 1
+        try:
+            for i, chunk in enumerate(CHUNKS):
+                if self.fail_after is not None and i == self.fail_after:
+                    raise ConnectionError("上游断开")
+                time.sleep(self.delay)
+                yield chunk
+        except GeneratorExit:
+            self.closed += 1
+            raise
+
+    async def stream_async(self):
+        self.calls += 1
+        for chunk in CHUNKS:
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+
+def test_flight_key():
+    messages = [{"role": "user", "content": "你好"}]
+    key = make_flight_key("stream", "http://x", "m", messages, {"temperature": 0.1, "top_p": 1})
+    assert key == make_flight_key("stream", "http://x", "m", messages, {"top_p": 1, "temperature": 0.1})
+    assert key != make_flight_key("complete", "http://x", "m", messages, {"temperature": 0.1, "top_p": 1})
+    assert key != make_flight_key("stream", "http://x", "m", messages, {"temperature": 0.2, "top_p": 1})
+
+
+def test_concurrent_streams_share_one_upstream():
+    flight, upstream = SingleFlight(), Upstream()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: list(flight.stream("k", upstream.stream)), range(4)))
+    assert upstream.calls == 1
+    assert results == [CHUNKS] * 4
+    stats = flight.get_stats()
+    assert stats["leaders"] == 1 and stats["followers"] == 3 and stats["in_flight_streams"] == 0
+
+
+def test_late_joiner_replays_received_chunks():
+    flight, upstream = SingleFlight(), Upstream()
+    leader = iter(flight.stream("k", upstream.stream))
+    assert next(leader) == CHUNKS[0]
+    follower = flight.stream("k", upstream.stream)
+    assert not follower.leader
+    assert list(follower) == CHUNKS
+    assert list(leader) == CHUNKS[1:]
+    assert upstream.calls == 1
+
+
+def test_leader_leaving_does_not_stop_followers():
+    flight, upstream = SingleFlight(), Upstream()
+    leader = iter(flight.stream("k", upstream.stream))
+    follower = iter(flight.stream("k", upstream.stream))
+    assert next(leader) == CHUNKS[0]
+    leader.close()
+    assert list(follower) == CHUNKS
+    assert upstream.closed == 0
+
+
+def test_last_subscriber_closes_upstream():
+    flight, upstream = SingleFlight(), Upstream()
+    subscription = iter(flight.stream("k", upstream.stream))
+    next(subscription)
+    subscription.close()
+    assert upstream.closed == 1
+    # 被放弃的流不会被后来的请求复用
+    assert flight.stream("k", upstream.stream).leader
+
+
+def test_upstream_error_reaches_all_subscribers():
+    flight, upstream = SingleFlight(), Upstream(fail_after=1)
+    errors = []
+
+    def consume():
+        received = []
+        try:
+            for chunk in flight.stream("k", upstream.stream):
+                received.append(chunk)
+        except ConnectionError as e:
+            errors.append((received, str(e)))
+
+    threads = [threading.Thread(target=consume) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert upstream.calls == 1
+    assert errors == [([CHUNKS[0]], "上游断开")] * 3
+
+
+def test_call_coalesces_and_shares_errors():
+    flight = SingleFlight()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.1)
+        return "结果"
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(lambda _: flight.call("k", upstream), range(3)))
+    assert len(calls) == 1
+    assert sorted(leader for _, leader in results) == [False, False, True]
+    assert {result for result, _ in results} == {"结果"}
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("失败")
+
+    def call_failing():
+        try:
+            flight.call("bad", failing)
+        except ValueError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(lambda _: call_failing(), range(2))) == ["失败", "失败"]
+
+
+def test_async_stream_and_call():
+    flight, upstream = SingleFlight(), Upstream()
+    calls = []
+
+    async def collect():
+        return [chunk async for chunk in flight.stream_async("k", upstream.stream_async)]
+
+    async def complete():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "结果"
+
+    async def main():
+        streams = await asyncio.gather(*(collect() for _ in range(3)))
+        results = await asyncio.gather(*(flight.call_async("c", complete) for _ in range(3)))
+        return streams, results
+
+    streams, results = asyncio.run(main())
+    assert streams == [CHUNKS] * 3 and upstream.calls == 1
+    assert [result for result, _ in results] == ["结果"] * 3 and len(calls) == 1
+
+
+def test_cancelled_async_leader_hands_call_to_followers():
+    flight = SingleFlight()
+    calls = []
+
+    async def complete():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "结果"
+
+    async def main():
+        leader = asyncio.create_task(flight.call_async("c", complete))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flight.call_async("c", complete)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader, results
+
+    leader, results = asyncio.run(main())
+    assert leader.cancelled()
+    # 第一个等待者重新发起调用，另一个合并到它的调用上
+    assert sorted(results, key=lambda r: r[1]) == [("结果", False), ("结果", True)]
+    assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    test_flight_key()
+    test_concurrent_streams_share_one_upstream()
+    test_late_joiner_replays_received_chunks()
+    test_leader_leaving_does_not_stop_followers()
+    test_last_subscriber_closes_upstream()
+    test_upstream_error_reaches_all_subscribers()
+    test_call_coalesces_and_shares_errors()
+    test_async_stream_and_call()
+    test_cancelled_async_leader_hands_call_to_followers()
+    print("✅ 请求合并测试通过")
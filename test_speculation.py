@@ -0,0 +1,171 @@
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.intent_router import intent_router
+from utils.mcp_client import AsyncMCPAgentLLM, MCPAgentLLM
+from utils.plan_cache import plan_cache
+from utils.response_cache import response_cache
+from utils.speculation import Speculation, speculator
+from utils.task_run import PlanRun
+
+# 多步骤的说法使本地路由交给LLM规划，推测执行在规划期间提前运行第一个任务
+GOAL = "帮我规划北京三天旅游，然后推荐美食"
+PLAN = json.dumps({"plan": [
+    {"task_id": "task_1", "description": "规划北京3天的行程", "tool": "travel_planner", "dependencies": []},
+]}, ensure_ascii=False)
+FULL_RESULT = "".join(f"<{i}>" for i in range(10))
+
+
+class StubConfigManager:
+    def get_api_key(self, page):
+        return "test"
+
+    def get_base_url(self, page):
+        return "https://api.example.com/v1"
+
+    def get_page_config(self, page):
+        return {"default_model": "qwen-turbo"}
+
+
+class CountingTool:
+    """逐段输出的模拟工具，约 0.5 秒输出完毕，记录执行次数"""
+
+    executions = 0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def execute_task(self, task_description, context, on_token=None):
+        CountingTool.executions += 1
+        parts = []
+        for i in range(10):
+            time.sleep(0.05)
+            parts.append(f"<{i}>")
+            if on_token:
+                on_token(parts[-1])
+        return "".join(parts)
+
+
+class AsyncCountingTool(CountingTool):
+    async def execute_task(self, task_description, context, on_token=None):
+        CountingTool.executions += 1
+        parts = []
+        for i in range(10):
+            await asyncio.sleep(0.05)
+            parts.append(f"<{i}>")
+            if on_token:
+                on_token(parts[-1])
+        return "".join(parts)
+
+
+class SlowPlanner(MCPAgentLLM):
+    """约 0.2 秒后才输出计划的规划模型"""
+
+    def stream_chat(self, messages, use_cache=True, deadline=None, on_metrics=None, **params):
+        time.sleep(0.2)
+        yield PLAN
+
+
+class AsyncSlowPlanner(AsyncMCPAgentLLM):
+    async def stream_chat(self, messages, use_cache=True, deadline=None, on_metrics=None, **params):
+        await asyncio.sleep(0.2)
+        yield PLAN
+
+
+def tool_config(**extra) -> dict:
+    return {"travel_planner": {
+        "description": "旅行规划", "class": f"{__name__}.CountingTool", "async_class": f"{__name__}.AsyncCountingTool",
+        "page": "travel_agent", **extra
+    }}
+
+
+def setup_module(module=None):
+    plan_cache.configure({"enabled": False})
+    response_cache.configure({"enabled": False})
+    intent_router.configure({"playbooks": [{"tool": "travel_planner", "patterns": ["旅游"]}]})
+    speculator.configure({"enabled": True})
+
+
+def teardown_module(module=None):
+    intent_router.configure({"enabled": False})
+    speculator.configure({"enabled": False})
+
+
+def task_outcome(result_json: str) -> dict:
+    return json.loads(result_json)["tasks"]["task_1"]
+
+
+def test_matches_and_claims():
+    speculation = Speculation({"task_id": "speculative_task", "tool": "travel_planner"}, "帮我规划北京三天旅游", 1.0)
+    task = {"task_id": "task_1", "tool": "travel_planner", "description": "规划北京3天的行程", "dependencies": []}
+    # 推测任务尚未启动时不能认领
+    assert not speculation.claim(task)
+    speculation.job = object()
+    assert not speculation.matches({**task, "description": "规划上海3天的行程"})
+    assert not speculation.matches({**task, "dependencies": ["task_0"]})
+    assert speculation.claim(task) and speculation.owns(task)
+    assert not speculation.claim({**task, "task_id": "task_2"})
+
+
+def test_claimed_speculation_is_used():
+    CountingTool.executions = 0
+    agent = SlowPlanner("test", "https://api.example.com/v1", tool_config=tool_config())
+    plan, result = agent.plan_and_execute(GOAL, StubConfigManager())
+    assert [task["task_id"] for task in plan] == ["task_1"]
+    assert task_outcome(result) == {"result": FULL_RESULT}
+    # 工具只执行了一次：计划任务直接使用推测执行的结果
+    assert CountingTool.executions == 1
+
+
+def test_adopted_speculation_obeys_task_timeout():
+    agent = SlowPlanner("test", "https://api.example.com/v1", tool_config=tool_config(timeout=0.1))
+    started = time.monotonic()
+    outcome = task_outcome(agent.plan_and_execute(GOAL, StubConfigManager())[1])
+    assert time.monotonic() - started < 0.45
+    assert outcome["truncated"] and "超时" in outcome["error"]
+    assert FULL_RESULT.startswith(outcome["result"])
+
+
+def test_adopted_speculation_is_cancelled_with_its_plan():
+    agent = SlowPlanner("test", "https://api.example.com/v1", tool_config=tool_config())
+    plan_run, outcomes = PlanRun(), {}
+
+    def run():
+        outcomes["task_1"] = task_outcome(agent.plan_and_execute(GOAL, StubConfigManager(), plan_run=plan_run)[1])
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(0.3)
+    plan_run.cancel()
+    thread.join()
+    assert outcomes["task_1"]["truncated"] and "已取消" in outcomes["task_1"]["error"]
+    assert not agent._plan_runs
+
+
+def test_async_adopted_speculation_obeys_task_timeout():
+    CountingTool.executions = 0
+    agent = AsyncSlowPlanner("test", "https://api.example.com/v1", tool_config=tool_config())
+    assert task_outcome(asyncio.run(agent.plan_and_execute(GOAL, StubConfigManager()))[1]) == {"result": FULL_RESULT}
+    assert CountingTool.executions == 1
+
+    agent = AsyncSlowPlanner("test", "https://api.example.com/v1", tool_config=tool_config(timeout=0.1))
+    outcome = task_outcome(asyncio.run(agent.plan_and_execute(GOAL, StubConfigManager()))[1])
+    assert outcome["truncated"] and "超时" in outcome["error"]
+
+
+if __name__ == "__main__":
+    setup_module()
+    test_matches_and_claims()
+    test_claimed_speculation_is_used()
+    test_adopted_speculation_obeys_task_timeout()
+    test_adopted_speculation_is_cancelled_with_its_plan()
+    test_async_adopted_speculation_obeys_task_timeout()
+    teardown_module()
+    print("✅ 推测执行测试通过")
@@ -0,0 +1,222 @@
+import sys
+import os
+import asyncio
+import json
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.itinerary_cache import itinerary_cache
+from utils.response_cache import response_cache
+from utils.single_flight import single_flight
+from utils.travel_planner_llm import AsyncTravelPlannerLLM, ItineraryRun, TravelPlannerLLM
+from utils.structured_itinerary import (
+    StructuredItineraryError, StructuredItineraryMode, StructuredItineraryStream,
+    budget_summary, itinerary_to_ics, parse_cost, render_itinerary
+)
+
+
+ITINERARY = {
+    "title": "北京 2天经典行程",
+    "overview": "故宫与长城",
+    "days": [
+        {"day": 1, "theme": "皇城文化", "area": "东城区", "slots": [
+            {"time": "09:00", "type": "景点", "poi": "故宫", "note": "提前预约", "cost": 60},
+            {"time": "12:00", "type": "餐饮", "poi": "四季民福", "cost": "约150元"},
+        ], "hotel": {"name": "王府井酒店", "area": "王府井", "cost": 500}, "transport": "地铁1号线"},
+        {"day": 2, "theme": "长城", "area": "延庆区", "slots": [
+            {"time": "08:00", "type": "交通", "poi": "北京北站", "note": "S2线{往返}"},
+            {"time": "10:00", "type": "景点", "poi": "八达岭长城", "cost": 40},
+        ]},
+    ],
+    "tips": ["带好身份证"],
+}
+
+
+
+class ScriptedTravelPlanner(TravelPlannerLLM):
+    """结构化调用与Markdown调用分别返回预设的输出"""
+
+    def __init__(self, structured_output: str):
+        super().__init__(api_key="test", base_url="https://api.example.com/v1", model="qwen-turbo")
+        self.structured_output = structured_output
+
+    def stream_chat(self, messages, use_cache=True, deadline=None, on_metrics=None, **params):
+        if params.get("response_format"):
+            yield self.structured_output
+        else:
+            yield "Day 1: Markdown行程"
+
+
+class UpstreamCountingPlanner(TravelPlannerLLM):
+    """经过响应缓存调用的模拟上游：结构化调用返回无法解析的JSON，记录结构化调用次数"""
+
+    def __init__(self):
+        super().__init__(api_key="test", base_url="https://api.example.com/v1", model="qwen-turbo")
+        self.structured_calls = 0
+
+    def _stream_upstream(self, messages, params, deadline, tracker):
+        if params.get("response_format"):
+            self.structured_calls += 1
+            yield "不是JSON"
+        else:
+            yield "Day 1: Markdown行程"
+
+
+class AsyncUpstreamCountingPlanner(AsyncTravelPlannerLLM):
+    def __init__(self):
+        super().__init__(api_key="test", base_url="https://api.example.com/v1", model="qwen-turbo")
+        self.structured_calls = 0
+
+    async def _stream_upstream(self, messages, params, deadline, tracker):
+        if params.get("response_format"):
+            self.structured_calls += 1
+            yield "不是JSON"
+        else:
+            yield "Day 1: Markdown行程"
+
+
+def stream_text(text: str, size: int):
+    """按固定大小分块输入，返回每块输入后新渲染的片段"""
+    stream = StructuredItineraryStream("北京", 2)
+    steps = [stream.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return stream, steps
+
+
+def test_parse_cost_and_budget():
+    assert parse_cost(60) == 60 and parse_cost("约150元") == 150 and parse_cost(None) == 0 and parse_cost(True) == 0
+    summary = budget_summary(ITINERARY)
+    assert [day["cost"] for day in summary["days"]] == [710, 40]
+    assert summary["total"] == 750
+
+
+def test_days_rendered_as_soon_as_closed():
+    text = json.dumps(ITINERARY, ensure_ascii=False)
+    stream, steps = stream_text(text, 5)
+    rendered = [part for step in steps for part in step]
+    assert rendered[0].startswith("# 北京 2天经典行程") and "故宫与长城" in rendered[0]
+    assert rendered[1].startswith("## Day 1: 皇城文化")
+    assert rendered[2].startswith("## Day 2: 长城")
+    assert [day["day"] for day in stream.days] == [1, 2]
+
+    footer = stream.finish()
+    assert len(footer) == 1 and "带好身份证" in footer[0] and "约750元" in footer[0]
+    assert stream.itinerary["tips"] == ["带好身份证"]
+
+
+def test_first_day_rendered_before_rest_arrives():
+    text = json.dumps(ITINERARY, ensure_ascii=False)
+    second_day = text.index('{"day": 2')
+    stream = StructuredItineraryStream("北京", 2)
+    rendered = stream.feed(text[:second_day])
+    assert [part.split("\n")[0] for part in rendered] == ["# 北京 2天经典行程", "## Day 1: 皇城文化"]
+    assert [part.split("\n")[0] for part in stream.feed(text[second_day:])] == ["## Day 2: 长城"]
+
+
+def test_render_day_details():
+    parts = render_itinerary(json.dumps(ITINERARY, ensure_ascii=False), "北京", 2)
+    day_one = parts[1]
+    assert "- **09:00** 🏛️ 故宫：提前预约（约60元）" in day_one
+    assert "🏨 住宿：王府井酒店（王府井），约500元/晚" in day_one
+    assert "💰 当日预算：约710元" in day_one
+
+
+def test_code_fence_and_missing_header():
+    text = "```json\n" + json.dumps({"days": ITINERARY["days"]}, ensure_ascii=False) + "\n```"
+    parts = render_itinerary(text, "北京", 2)
+    assert parts[0].startswith("# 北京 2天行程")
+    assert len(parts) == 4
+
+
+def test_truncated_output_keeps_complete_days():
+    text = json.dumps(ITINERARY, ensure_ascii=False)
+    truncated = text[:text.index('"day": 2') + 10]
+    stream, _ = stream_text(truncated, 7)
+    footer = stream.finish()
+    assert [day["day"] for day in stream.itinerary["days"]] == [1]
+    assert "约710元" in footer[0]
+
+
+def test_no_days_raises():
+    for text in ('{"title": "x", "days": [', "不是JSON", '{"days": []}'):
+        stream = StructuredItineraryStream("北京", 2)
+        stream.feed(text)
+        try:
+            stream.finish()
+            raise AssertionError(f"没有任何一天时应抛出 StructuredItineraryError: {text}")
+        except StructuredItineraryError:
+            pass
+
+
+def test_itinerary_to_ics():
+    calendar = itinerary_to_ics(ITINERARY, start_date=datetime(2026, 10, 1)).decode("utf-8")
+    # 每天一个全天事件，加上每个带时间的时间段
+    assert calendar.count("BEGIN:VEVENT") == 6
+    assert "DTSTART:20261001T090000" in calendar
+    assert "DTEND:20261001T120000" in calendar  # 结束于下一个时间段开始
+    assert "DTSTART;VALUE=DATE:20261002" in calendar
+
+
+def test_mode_params_scale_with_days():
+    mode = StructuredItineraryMode({"base_max_tokens": 100, "max_tokens_per_day": 200, "max_tokens": 1000})
+    assert mode.params(3)["max_tokens"] == 700
+    assert mode.params(10)["max_tokens"] == 1000
+    assert not mode.enabled and mode.currency == "元"
+
+
+def test_markdown_fallback_only_before_output():
+    itinerary_cache.configure({"enabled": False})
+    # 模型没有返回任何一天：回退为Markdown生成
+    planner = ScriptedTravelPlanner("不是JSON")
+    assert "".join(planner.generate_itinerary_stream("北京", 2, ItineraryRun(structured=True))) == "Day 1: Markdown行程"
+
+    # 标题已经输出后才失败：不能再拼接Markdown行程，直接抛出
+    planner = ScriptedTravelPlanner('{"title": "北京", "days": [{"day": 1, "theme": "皇城"')
+    received, error = [], None
+    try:
+        for chunk in planner.generate_itinerary_stream("北京", 2, ItineraryRun(structured=True)):
+            received.append(chunk)
+    except Exception as e:
+        error = e
+    assert error is not None and "结构化行程" in str(error)
+    assert received and "Markdown" not in "".join(received)
+
+
+def test_failed_structured_response_is_not_replayed():
+    itinerary_cache.configure({"enabled": False})
+    response_cache.configure({"enabled": True})
+    response_cache.clear()
+    single_flight.configure({"enabled": False})
+    try:
+        planner = UpstreamCountingPlanner()
+        for _ in range(2):
+            assert "".join(planner.generate_itinerary_stream("北京", 2, ItineraryRun(structured=True))) == "Day 1: Markdown行程"
+        # 解析失败的结构化响应已从响应缓存中删除，再次生成时重新请求上游
+        assert planner.structured_calls == 2
+
+        async def generate(planner):
+            return "".join([chunk async for chunk in planner.generate_itinerary_stream("北京", 2, ItineraryRun(structured=True))])
+
+        planner = AsyncUpstreamCountingPlanner()
+        for _ in range(2):
+            assert asyncio.run(generate(planner)) == "Day 1: Markdown行程"
+        assert planner.structured_calls == 2
+    finally:
+        single_flight.configure({"enabled": True})
+        response_cache.clear()
+
+
+if __name__ == "__main__":
+    test_parse_cost_and_budget()
+    test_days_rendered_as_soon_as_closed()
+    test_first_day_rendered_before_rest_arrives()
+    test_render_day_details()
+    test_code_fence_and_missing_header()
+    test_truncated_output_keeps_complete_days()
+    test_no_days_raises()
+    test_itinerary_to_ics()
+    test_mode_params_scale_with_days()
+    test_markdown_fallback_only_before_output()
+    test_failed_structured_response_is_not_replayed()
+    print("✅ 结构化行程测试通过")
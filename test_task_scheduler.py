@@ -0,0 +1,162 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.task_scheduler import (
+    AsyncTaskScheduler, TaskScheduler, find_dependency_cycle, find_missing_dependencies, task_dependencies
+)
+
+
+def make_task(task_id: str, dependencies=None, tool: str = "travel_planner") -> dict:
+    return {"task_id": task_id, "tool": tool, "dependencies": dependencies or []}
+
+
+class Recorder:
+    """记录任务的开始、结束顺序与最大并发数"""
+
+    def __init__(self, duration: float = 0.05):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.events = []
+        self.running = 0
+        self.peak = 0
+        self.tool_peak = {}
+        self.tool_running = {}
+
+    def start(self, task: dict):
+        with self.lock:
+            self.events.append(("start", task["task_id"]))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            tool = task["tool"]
+            self.tool_running[tool] = self.tool_running.get(tool, 0) + 1
+            self.tool_peak[tool] = max(self.tool_peak.get(tool, 0), self.tool_running[tool])
+
+    def finish(self, task: dict):
+        with self.lock:
+            self.events.append(("finish", task["task_id"]))
+            self.running -= 1
+            self.tool_running[task["tool"]] -= 1
+
+    def run(self, task: dict):
+        self.start(task)
+        time.sleep(self.duration)
+        self.finish(task)
+
+    async def run_async(self, task: dict):
+        self.start(task)
+        await asyncio.sleep(self.duration)
+        self.finish(task)
+
+    def index(self, kind: str, task_id: str) -> int:
+        return self.events.index((kind, task_id))
+
+
+def run_sync(tasks, max_concurrency=4, tool_limits=None, recorder=None):
+    recorder = recorder or Recorder()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        scheduler = TaskScheduler(recorder.run, executor, max_concurrency=max_concurrency, tool_limits=tool_limits)
+        for task in tasks:
+            scheduler.add(task)
+        scheduler.close()
+        unresolved = scheduler.wait()
+    return recorder, unresolved
+
+
+def run_async(tasks, max_concurrency=4, tool_limits=None):
+    recorder = Recorder()
+
+    async def main():
+        scheduler = AsyncTaskScheduler(recorder.run_async, max_concurrency=max_concurrency, tool_limits=tool_limits)
+        for task in tasks:
+            scheduler.add(task)
+        scheduler.close()
+        return await scheduler.wait()
+
+    return recorder, asyncio.run(main())
+
+
+def test_task_dependencies():
+    assert task_dependencies({"dependencies": ["task_1", 2]}) == ["task_1", "2"]
+    assert task_dependencies({"dependencies": "task_1"}) == ["task_1"]
+    assert task_dependencies({"dependencies": 0}) == []
+    assert task_dependencies({}) == []
+
+
+def test_dependency_checks():
+    tasks = [make_task("a", ["b"]), make_task("b", ["a"]), make_task("c", ["x"])]
+    assert find_missing_dependencies(tasks) == {"c": ["x"]}
+    assert find_dependency_cycle(tasks) == ["a", "b"]
+    assert find_dependency_cycle([make_task("a"), make_task("b", ["a"])]) == []
+
+
+def test_dependencies_run_in_order():
+    # a、b 并行；c 依赖两者；d 依赖 c
+    tasks = [make_task("a"), make_task("b"), make_task("c", ["a", "b"]), make_task("d", ["c"])]
+    for recorder, unresolved in (run_sync(tasks), run_async(tasks)):
+        assert unresolved == []
+        assert recorder.index("start", "b") < recorder.index("finish", "a")
+        assert recorder.index("start", "c") > max(recorder.index("finish", "a"), recorder.index("finish", "b"))
+        assert recorder.index("start", "d") > recorder.index("finish", "c")
+
+
+def test_concurrency_limits():
+    tasks = [make_task(f"t{i}") for i in range(6)] + [make_task(f"img{i}", tool="image_analyzer") for i in range(4)]
+    for recorder, _ in (run_sync(tasks, 3, {"image_analyzer": 1}), run_async(tasks, 3, {"image_analyzer": 1})):
+        assert recorder.peak == 3
+        assert recorder.tool_peak["image_analyzer"] == 1
+        assert len(recorder.events) == 20
+
+
+def test_cycle_and_missing_dependencies():
+    # 依赖环中的任务不会执行；计划结束后，不存在的依赖不再等待
+    tasks = [make_task("a", ["b"]), make_task("b", ["a"]), make_task("c", ["missing"])]
+    for recorder, unresolved in (run_sync(tasks), run_async(tasks)):
+        assert sorted(task["task_id"] for task in unresolved) == ["a", "b"]
+        assert recorder.events == [("start", "c"), ("finish", "c")]
+
+
+def test_tasks_start_before_plan_closed():
+    recorder = Recorder(duration=0)
+    started = threading.Event()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        scheduler = TaskScheduler(lambda task: (recorder.run(task), started.set()), executor, max_concurrency=2)
+        scheduler.add(make_task("a"))
+        assert started.wait(1), "任务应在计划结束前开始执行"
+        scheduler.add(make_task("b", ["a"]))
+        scheduler.close()
+        assert scheduler.wait() == []
+    assert recorder.events == [("start", "a"), ("finish", "a"), ("start", "b"), ("finish", "b")]
+
+
+def test_failed_task_releases_dependents():
+    def run_task(task):
+        if task["task_id"] == "a":
+            raise RuntimeError("失败")
+
+    finished = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        scheduler = TaskScheduler(lambda task: (run_task(task), finished.append(task["task_id"])), executor, 2)
+        scheduler.add(make_task("a"))
+        scheduler.add(make_task("b", ["a"]))
+        scheduler.close()
+        assert scheduler.wait() == []
+    # 依赖失败的处理由调用方的 run_task 负责，调度器只保证不会卡住
+    assert finished == ["b"]
+
+
+if __name__ == "__main__":
+    test_task_dependencies()
+    test_dependency_checks()
+    test_dependencies_run_in_order()
+    test_concurrency_limits()
+    test_cycle_and_missing_dependencies()
+    test_tasks_start_before_plan_closed()
+    test_failed_task_releases_dependents()
+    print("✅ 任务调度测试通过")
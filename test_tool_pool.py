@@ -0,0 +1,88 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.tool_pool import ToolPool
+
+
+class SlowTool:
+    """构造较慢的模拟工具，记录构造次数"""
+
+    built = 0
+    lock = threading.Lock()
+
+    def __init__(self, api_key, base_url, model):
+        time.sleep(0.05)
+        with SlowTool.lock:
+            SlowTool.built += 1
+        self.model = model
+
+
+class ReloadableConfigManager:
+    """配置可在运行中修改的配置管理器"""
+
+    def __init__(self):
+        self.pages = {"travel_agent": {"default_model": "qwen-turbo"}}
+
+    def get_api_key(self, page):
+        return "key"
+
+    def get_base_url(self, page):
+        return "https://api.example.com/v1"
+
+    def get_page_config(self, page):
+        return self.pages.get(page, {})
+
+
+def test_concurrent_acquire_builds_once():
+    pool, manager = ToolPool(), ReloadableConfigManager()
+    SlowTool.built = 0
+    settings = pool.resolve_settings("travel_agent", manager)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        instances = list(executor.map(lambda _: pool.acquire(SlowTool, "travel_agent", settings), range(8)))
+    assert SlowTool.built == 1
+    assert all(instance is instances[0] for instance in instances)
+    assert pool.get_stats()["misses"] == 1 and pool.get_stats()["hits"] == 7
+
+
+def test_settings_follow_config_reload():
+    pool, manager = ToolPool(), ReloadableConfigManager()
+    first = pool.acquire(SlowTool, "travel_agent", pool.resolve_settings("travel_agent", manager))
+    manager.pages["travel_agent"]["default_model"] = "qwen-max"
+    second = pool.acquire(SlowTool, "travel_agent", pool.resolve_settings("travel_agent", manager))
+    assert (first.model, second.model) == ("qwen-turbo", "qwen-max")
+    # 没有配置默认模型时使用 qwen-turbo
+    assert pool.resolve_settings("unknown", manager)["model"] == "qwen-turbo"
+
+
+def test_lru_bound_and_disabled_pool():
+    pool = ToolPool({"max_instances": 2})
+    for model in ("a", "b", "c"):
+        pool.acquire(SlowTool, "travel_agent", {"api_key": "key", "base_url": None, "model": model})
+    assert pool.get_stats()["instances"] == 2 and pool.get_stats()["evictions"] == 1
+
+    disabled = ToolPool({"enabled": False})
+    settings = {"api_key": "key", "base_url": None, "model": "a"}
+    assert disabled.acquire(SlowTool, "travel_agent", settings) is not disabled.acquire(SlowTool, "travel_agent", settings)
+
+
+def test_warmup_reports_failures():
+    class BrokenTool:
+        def __init__(self, **kwargs):
+            raise RuntimeError("缺少依赖")
+
+    results = ToolPool().warmup([(SlowTool, "travel_agent"), (BrokenTool, "readme")], ReloadableConfigManager())
+    assert results == {"SlowTool@travel_agent": True, "BrokenTool@readme": False}
+
+
+if __name__ == "__main__":
+    test_concurrent_acquire_builds_once()
+    test_settings_follow_config_reload()
+    test_lru_bound_and_disabled_pool()
+    test_warmup_reports_failures()
+    print("✅ 工具实例池测试通过")
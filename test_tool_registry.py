@@ -0,0 +1,65 @@
+import sys
+import os
+import subprocess
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.tool_registry import ToolRegistry
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class EchoTool:
+    """测试用工具类"""
+
+
+def test_resolves_import_paths_once():
+    registry = ToolRegistry()
+    assert registry.resolve(f"{__name__}.EchoTool") is EchoTool
+    assert registry.resolve(f"{__name__}:EchoTool") is EchoTool
+    assert registry.loaded() == {f"{__name__}.EchoTool": f"{__name__}.EchoTool", f"{__name__}:EchoTool": f"{__name__}.EchoTool"}
+    registry.clear()
+    assert registry.loaded() == {}
+
+
+def test_invalid_paths_raise_import_error():
+    registry = ToolRegistry()
+    for path in ("EchoTool", f"{__name__}.MissingTool", "utils.no_such_module.Tool"):
+        try:
+            registry.resolve(path)
+        except ImportError:
+            continue
+        raise AssertionError(f"{path} 应当无法加载")
+    assert registry.loaded() == {}
+
+
+def test_tool_info_and_legacy_names():
+    registry = ToolRegistry()
+    tool_info = {"class": f"{__name__}.EchoTool"}
+    assert not registry.is_loaded(tool_info)
+    assert registry.tool_class(tool_info) is EchoTool
+    # 没有异步版本时由调用方放到线程中执行同步工具
+    assert registry.async_tool_class(tool_info) is None
+    assert registry.is_loaded(tool_info)
+
+    # 旧配置只写类名时使用内置的同步/异步类
+    legacy = {"class": "ReadmeViewerLLM"}
+    assert registry.tool_class(legacy).__module__ == "utils.readme_client"
+    assert registry.async_tool_class({"class": "TravelPlannerLLM"}).__name__ == "AsyncTravelPlannerLLM"
+
+
+def test_importing_mcp_client_skips_tool_modules():
+    # 在独立进程中检查，避免受本进程已导入模块的影响
+    code = ("import sys, utils.mcp_client; "
+            "print(sorted(m for m in ('PIL', 'icalendar', 'utils.travel_planner_llm', 'utils.vision_llm_client') if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+if __name__ == "__main__":
+    test_resolves_import_paths_once()
+    test_invalid_paths_raise_import_error()
+    test_tool_info_and_legacy_names()
+    test_importing_mcp_client_skips_tool_modules()
+    print("✅ 工具类注册表测试通过")
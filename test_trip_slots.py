@@ -0,0 +1,70 @@
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.trip_slots import MAX_TRIP_DAYS, parse_chinese_number, trip_slot_extractor
+from utils.task_args import coerce_task_args
+
+
+# (用户输入, 期望的目的地, 期望的天数)
+SLOT_CASES = [
+    ("帮我安排一下北京国庆七天旅游计划", "北京", 7),
+    ("去成都玩三天两晚", "成都", 3),
+    ("从上海出发去杭州玩两天", "杭州", 2),
+    ("北京到上海的高铁", "上海", None),
+    ("周末去苏州", "苏州", 2),
+    ("半个月的云南之旅", "云南", 15),
+    ("去东京玩一周", "东京", 7),
+    ("去三亚玩十一天", "三亚", 11),
+    ("新疆自驾20天", "新疆", 20),
+    ("Plan a 5 day trip to Tokyo", "东京", 5),
+    ("I want to visit New York for 3 days", "纽约", 3),
+    ("ＴＯＫＹＯ　３天", "东京", 3),
+    ("第二天去长城", None, None),
+    ("10月1日去北京", "北京", None),
+    ("comparison of cities", None, None),
+    (f"去大理玩{MAX_TRIP_DAYS + 15}天", "大理", None),
+    (f"去大理玩{MAX_TRIP_DAYS}天", "大理", MAX_TRIP_DAYS),
+]
+
+TRAVEL_ARGS_SCHEMA = {
+    "destination": {"type": "string"},
+    "days": {"type": "integer", "minimum": 1, "maximum": MAX_TRIP_DAYS},
+}
+
+
+def test_extract_slots():
+    for text, destination, days in SLOT_CASES:
+        slots = trip_slot_extractor.extract(text)
+        assert slots == {"destination": destination, "days": days}, f"{text}: {slots}"
+
+
+def test_parse_chinese_number():
+    cases = {"十": 10, "十一": 11, "二十": 20, "二十五": 25, "两": 2, "3": 3, "一百": 100,
+             "一百零八": 108, "廿一": 21, "一万二千": 12000, "五五": None, "二十五五": None, "十一二": None}
+    for text, expected in cases.items():
+        assert parse_chinese_number(text) == expected, text
+
+
+def test_locate_spans_index_normalized_text():
+    text = "Plan a 5 day trip to Tokyo"
+    start, end, name = trip_slot_extractor.locate_destination(text)
+    assert text.lower()[start:end] == "tokyo" and name == "东京"
+    start, end, days = trip_slot_extractor.locate_days(text)
+    assert text.lower()[start:end] == "5 day" and days == 5
+
+
+def test_coerce_days_within_bounds():
+    assert coerce_task_args({"destination": "北京", "days": "七"}, TRAVEL_ARGS_SCHEMA) == {"destination": "北京", "days": 7}
+    assert coerce_task_args({"destination": "北京", "days": MAX_TRIP_DAYS + 1}, TRAVEL_ARGS_SCHEMA) == {"destination": "北京"}
+    assert coerce_task_args({"days": 0}, TRAVEL_ARGS_SCHEMA) == {}
+
+
+if __name__ == "__main__":
+    test_extract_slots()
+    test_parse_chinese_number()
+    test_locate_spans_index_normalized_text()
+    test_coerce_days_within_bounds()
+    print("✅ 槽位提取测试通过")
@@ -1,24 +1,106 @@
+import importlib
+
 from .llm_client import LLMClient
-from .travel_planner_llm import TravelPlannerLLM
-from .vision_llm_client import VisionLLMClient
-from .readme_client import ReadmeViewerLLM
+from .async_llm_client import AsyncLLMClient
+from .http_pool import ClientRegistry, client_registry
+from .response_cache import ResponseCache, response_cache
+from .rate_limiter import RateGovernor, rate_governor
+from .retry_policy import RetryPolicy, retry_policy, Deadline, deadline_scope
+from .llm_metrics import LLMMetrics, llm_metrics, MemorySink, JsonlSink
+from .single_flight import SingleFlight, single_flight
+from .endpoint_router import EndpointRouter, endpoint_router
+from .plan_cache import PlanCache, plan_cache
+from .itinerary_cache import ItineraryCache, itinerary_cache
+from .itinerary_fanout import ItineraryFanout, itinerary_fanout
+from .structured_itinerary import StructuredItineraryMode, StructuredItineraryStream, structured_itinerary
+from .trip_slots import TripSlotExtractor, trip_slot_extractor
+from .tool_pool import ToolPool, tool_pool
+from .intent_router import IntentRouter, intent_router
+from .speculation import Speculator, speculator
+from .tool_registry import ToolRegistry, tool_registry
+from .task_args import TaskArgExtractor, task_arg_extractor
+
+# 工具类与页面辅助函数依赖 PIL、icalendar 等较重的库，首次访问时才导入
+_LAZY_EXPORTS = {
+    'TravelPlannerLLM': '.travel_planner_llm',
+    'AsyncTravelPlannerLLM': '.travel_planner_llm',
+    'ItineraryRun': '.travel_planner_llm',
+    'VisionLLMClient': '.vision_llm_client',
+    'AsyncVisionLLMClient': '.vision_llm_client',
+    'ReadmeViewerLLM': '.readme_client',
+    'generate_ics_content': '.common',
+    'format_model_description': '.common',
+    'process_uploaded_image': '.common',
+    'create_analysis_report': '.common',
+    'validate_image_file': '.common',
+    'format_call_metrics': '.common',
+    'StreamingICSBuilder': '.ics_builder',
+    'ics_cache': '.ics_builder'
+}
+
 
-from .common import (
-    generate_ics_content, 
-    format_model_description,
-    process_uploaded_image,
-    create_analysis_report,
-    validate_image_file
-)
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     'LLMClient', 
+    'AsyncLLMClient',
+    'ClientRegistry',
+    'client_registry',
+    'ResponseCache',
+    'response_cache',
+    'RateGovernor',
+    'rate_governor',
+    'RetryPolicy',
+    'retry_policy',
+    'Deadline',
+    'deadline_scope',
+    'LLMMetrics',
+    'llm_metrics',
+    'MemorySink',
+    'JsonlSink',
+    'SingleFlight',
+    'single_flight',
+    'EndpointRouter',
+    'endpoint_router',
+    'PlanCache',
+    'plan_cache',
+    'ItineraryCache',
+    'itinerary_cache',
+    'ItineraryFanout',
+    'itinerary_fanout',
+    'StructuredItineraryMode',
+    'StructuredItineraryStream',
+    'structured_itinerary',
+    'TripSlotExtractor',
+    'trip_slot_extractor',
+    'ToolPool',
+    'tool_pool',
+    'IntentRouter',
+    'intent_router',
+    'Speculator',
+    'speculator',
+    'ToolRegistry',
+    'tool_registry',
+    'TaskArgExtractor',
+    'task_arg_extractor',
     'TravelPlannerLLM', 
+    'AsyncTravelPlannerLLM',
+    'ItineraryRun',
     'VisionLLMClient',
+    'AsyncVisionLLMClient',
     'generate_ics_content',
     'format_model_description',
     'process_uploaded_image',
     'create_analysis_report',
     'validate_image_file',
+    'format_call_metrics',
+    'StreamingICSBuilder',
+    'ics_cache',
     'ReadmeViewerLLM'
 ]
@@ -1,14 +1,15 @@
-import re
 import time
-from datetime import datetime, timedelta
-from icalendar import Calendar, Event
+from datetime import datetime
 from PIL import Image
-from typing import Tuple
+from typing import Tuple, Dict, Any
+from utils.ics_builder import StreamingICSBuilder, ics_cache, itinerary_hash
 
 def generate_ics_content(plan_text: str, start_date: datetime = None) -> bytes:
     """
     从旅行行程文本生成ICS日历文件
     
+    相同行程与开始日期的结果会被缓存，页面重新运行时不再重复切分与序列化。
+    
     Args:
         plan_text: 旅行行程文本
         start_date: 可选的开始日期（默认为今天）
@@ -16,43 +17,16 @@ def generate_ics_content(plan_text: str, start_date: datetime = None) -> bytes:
     Returns:
         bytes: ICS文件内容
     """
-    cal = Calendar()
-    cal.add('prodid', '-//AI Travel Planner//github.com//')
-    cal.add('version', '2.0')
-    
     if start_date is None:
         start_date = datetime.today()
     
-    # 将行程按天分割
-    day_pattern = re.compile(r'Day (\d+)[:\s]+(.*?)(?=Day \d+|$)', re.DOTALL)
-    days = day_pattern.findall(plan_text)
-    
-    if not days:  # 如果没有找到日期模式，创建单个全天事件
-        event = Event()
-        event.add('summary', "旅行行程")
-        event.add('description', plan_text)
-        event.add('dtstart', start_date.date())
-        event.add('dtend', start_date.date())
-        event.add("dtstamp", datetime.now())
-        cal.add_component(event)
-    else:
-        # 处理每一天
-        for day_num, day_content in days:
-            day_num = int(day_num)
-            current_date = start_date + timedelta(days=day_num - 1)
-            
-            # 为整天创建一个事件
-            event = Event()
-            event.add('summary', f"第{day_num}天行程")
-            event.add('description', day_content.strip())
-            
-            # 设置为全天事件
-            event.add('dtstart', current_date.date())
-            event.add('dtend', current_date.date())
-            event.add("dtstamp", datetime.now())
-            cal.add_component(event)
-    
-    return cal.to_ical()
+    cached = ics_cache.get(itinerary_hash(plan_text, start_date))
+    if cached is not None:
+        return cached
+    
+    builder = StreamingICSBuilder(start_date)
+    builder.feed(plan_text)
+    return builder.finish()
 
 
 def format_model_description(model_name: str) -> str:
@@ -180,3 +154,35 @@ def validate_image_file(uploaded_file, max_size_mb: int = 10) -> Tuple[bool, str
         return False, f"不支持的文件格式，请选择: {', '.join(allowed_types)}"
     
     return True, ""
+
+
+def format_call_metrics(metrics: Dict[str, Any]) -> str:
+    """
+    将单次LLM调用的指标记录格式化为一行摘要
+    
+    Args:
+        metrics: 单次调用的指标记录（stream_chat/complete_chat 的 on_metrics 回调收到的记录）
+        
+    Returns:
+        str: 摘要文本，记录为空时返回空字符串
+    """
+    if not metrics:
+        return ""
+    if metrics.get("cached"):
+        return f"⚡ 缓存命中 · 耗时 {metrics.get('latency') or 0:.2f}s"
+    if metrics.get("coalesced"):
+        return f"🔗 与相同请求合并 · 首字 {metrics.get('ttft') or 0:.2f}s · 总耗时 {metrics.get('latency') or 0:.2f}s"
+    
+    parts = []
+    if metrics.get("queue_wait"):
+        parts.append(f"排队 {metrics['queue_wait']:.2f}s")
+    if metrics.get("ttft") is not None:
+        parts.append(f"首字 {metrics['ttft']:.2f}s")
+    if metrics.get("latency") is not None:
+        parts.append(f"总耗时 {metrics['latency']:.2f}s")
+    if metrics.get("tokens_per_second"):
+        parts.append(f"{metrics['tokens_per_second']:.1f} tokens/s")
+    if metrics.get("total_tokens"):
+        estimated = "≈" if metrics.get("usage_source") == "estimate" else ""
+        parts.append(f"令牌 {estimated}{metrics.get('prompt_tokens') or 0} + {estimated}{metrics.get('completion_tokens') or 0}")
+    return "⏱️ " + " · ".join(parts)
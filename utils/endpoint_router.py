@@ -0,0 +1,187 @@
+import fnmatch
+import random
+import threading
+import time
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+
+DEFAULT_ROUTER_CONFIG = {
+    "enabled": True,
+    "ewma_alpha": 0.3,  # 延迟与错误率滑动平均的权重，越大越看重最近的调用
+    "default_latency": 1.0,  # 秒，尚无统计数据的端点按此延迟估算，保证新端点也能被探测
+    "error_penalty": 4.0,  # 错误率对得分的惩罚系数
+    "failure_threshold": 3,  # 连续失败次数达到阈值后暂时摘除端点
+    "cooldown": 30,  # 秒，首次摘除时长，之后每次翻倍
+    "max_cooldown": 300,
+    "endpoints": []  # [{name, url, api_key, models, weight}]
+}
+
+
+class _EndpointStats:
+    """单个 (端点, 模型) 的滚动延迟与错误统计"""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出统计"""
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ejected": self.ejected_until > time.monotonic()
+        }
+
+
+class EndpointRouter:
+    """
+    延迟感知的多端点路由器。
+
+    为每个 (端点, 模型) 维护滚动平均延迟与错误率，按 权重/(延迟×错误惩罚)
+    加权随机选择兼容该模型的健康端点；连续失败的端点会被暂时摘除，冷却后重新参与探测。
+    """
+
+    def __init__(self, router_config: Dict[str, Any] = None):
+        """初始化路由器"""
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], _EndpointStats] = {}
+        self._config = dict(DEFAULT_ROUTER_CONFIG)
+        self._endpoints: List[Dict[str, Any]] = []
+        if router_config:
+            self.configure(router_config)
+
+    def configure(self, router_config: Dict[str, Any]):
+        """更新路由配置（对应 config.yaml 中的 api.routing，端点列表由 ConfigManager 生成）"""
+        with self._lock:
+            merged = dict(DEFAULT_ROUTER_CONFIG)
+            merged.update(router_config or {})
+            self._config = merged
+            # 没有密钥的端点无法调用，不参与路由
+            self._endpoints = [dict(endpoint) for endpoint in merged.get("endpoints") or []
+                               if endpoint.get("url") and endpoint.get("api_key")]
+
+    @property
+    def enabled(self) -> bool:
+        """路由是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    @staticmethod
+    def _supports(endpoint: Dict[str, Any], model: str) -> bool:
+        """端点是否提供该模型（models 为通配符列表，未配置时视为全部支持）"""
+        patterns = endpoint.get("models")
+        if patterns is None:
+            return True
+        return any(fnmatch.fnmatchcase(model, pattern) for pattern in patterns)
+
+    def _get_stats(self, url: str, model: str) -> _EndpointStats:
+        """获取统计对象（调用方需持有锁）"""
+        key = (url, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = _EndpointStats()
+            self._stats[key] = stats
+        return stats
+
+    def _score(self, endpoint: Dict[str, Any], stats: _EndpointStats) -> float:
+        """端点得分，越高越优先（调用方需持有锁）"""
+        latency = stats.latency if stats.latency is not None else self._config.get("default_latency", 1.0)
+        penalty = 1.0 + self._config.get("error_penalty", 4.0) * stats.error_rate
+        return float(endpoint.get("weight", 1.0)) / (max(latency, 0.01) * penalty)
+
+    def is_routable(self, base_url: Optional[str], model: str) -> bool:
+        """客户端配置的地址是否为已登记端点，且存在其他兼容端点可供分流"""
+        if not self.enabled or not base_url:
+            return False
+        with self._lock:
+            urls = [endpoint["url"] for endpoint in self._endpoints if self._supports(endpoint, model)]
+        return base_url in urls and len(urls) > 1
+
+    def choose(self, base_url: Optional[str], model: str, exclude: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        为一次请求选择端点
+
+        Args:
+            base_url: 客户端配置的地址；只有它是已登记端点时才会参与路由
+            model: 模型名称
+            exclude: 本次调用中已失败的端点地址
+
+        Returns:
+            Optional[Dict]: 选中的端点 {name, url, api_key, ...}；不参与路由时返回None
+        """
+        if not self.is_routable(base_url, model):
+            return None
+
+        excluded = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            compatible = [endpoint for endpoint in self._endpoints if self._supports(endpoint, model)]
+            healthy = [endpoint for endpoint in compatible
+                       if endpoint["url"] not in excluded and self._get_stats(endpoint["url"], model).ejected_until <= now]
+            if not healthy:
+                # 全部不可用时退回到最快恢复的端点，优先未在本次调用中失败的
+                candidates = [endpoint for endpoint in compatible if endpoint["url"] not in excluded] or compatible
+                return dict(min(candidates, key=lambda e: self._get_stats(e["url"], model).ejected_until))
+
+            scores = [self._score(endpoint, self._get_stats(endpoint["url"], model)) for endpoint in healthy]
+        return dict(random.choices(healthy, weights=scores, k=1)[0])
+
+    def has_alternative(self, base_url: Optional[str], model: str, exclude: Iterable[str]) -> bool:
+        """除已失败端点外是否还有健康的兼容端点（用于决定故障转移时是否需要退避等待）"""
+        if not self.is_routable(base_url, model):
+            return False
+        excluded = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            return any(endpoint["url"] not in excluded and self._get_stats(endpoint["url"], model).ejected_until <= now
+                       for endpoint in self._endpoints if self._supports(endpoint, model))
+
+    def record(self, url: Optional[str], model: str, latency: Optional[float], success: bool):
+        """
+        记录一次请求结果
+
+        Args:
+            latency: 首个响应到达的耗时（流式为首token，非流式为整体耗时）；失败时可为None
+            success: 是否成功；只应对上游故障（超时、连接失败、429、5xx）记录失败
+        """
+        if not url:
+            return
+        alpha = self._config.get("ewma_alpha", 0.3)
+        with self._lock:
+            stats = self._get_stats(url, model)
+            stats.requests += 1
+            stats.error_rate = (1 - alpha) * stats.error_rate + alpha * (0.0 if success else 1.0)
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else (1 - alpha) * stats.latency + alpha * latency
+
+            if success:
+                stats.consecutive_failures = 0
+                stats.ejections = 0
+                return
+
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= self._config.get("failure_threshold", 3):
+                cooldown = min(self._config.get("max_cooldown", 300),
+                               self._config.get("cooldown", 30) * (2 ** stats.ejections))
+                stats.ejected_until = time.monotonic() + cooldown
+                stats.ejections += 1
+                stats.consecutive_failures = 0
+                print(f"⚠️ 端点 {url} ({model}) 连续失败，暂停路由 {cooldown:.0f} 秒")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有端点/模型的路由统计"""
+        with self._lock:
+            names = {endpoint["url"]: endpoint.get("name", endpoint["url"]) for endpoint in self._endpoints}
+            return {f"{names.get(url, url)}|{model}": stats.to_dict() for (url, model), stats in self._stats.items()}
+
+
+# 全局路由器实例
+endpoint_router = EndpointRouter()
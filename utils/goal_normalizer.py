@@ -0,0 +1,143 @@
+import re
+import unicodedata
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.trip_slots import NUMERAL_CHARS, parse_chinese_number, trip_slot_extractor
+
+
+# 数量词前的中文数字，统一为阿拉伯数字（不改动地名中的数字）
+COUNTED_NUMERAL_PATTERN = re.compile(rf"([{NUMERAL_CHARS}]+)(?=个|人|位|晚|次|张|座|岁)")
+# 空白与标点（NFKC 之后全角标点已转为半角）
+PUNCTUATION_PATTERN = re.compile(r"[\s!-/:-@\[-`{-~　-〿‘-‟＀-／]+")
+
+# 计划模板中的槽位占位符
+SLOT_PLACEHOLDERS = {"destination": "{destination}", "days": "{days}"}
+
+
+def _extract_slots(text: str) -> Tuple[str, Dict[str, Any]]:
+    """由 trip_slot_extractor 提取目的地与天数槽位，并在文本中替换为占位符"""
+    slots: Dict[str, Any] = {}
+    replacements = []
+    destination = trip_slot_extractor.locate_destination(text)
+    if destination:
+        slots["destination"] = destination[2]
+        replacements.append((destination[0], destination[1], "{destination}"))
+    days = trip_slot_extractor.locate_days(text)
+    if days and not (destination and days[0] < destination[1] and destination[0] < days[1]):
+        slots["days"] = days[2]
+        replacements.append((days[0], days[1], "{days}天"))
+    # 从后往前替换，前面的位置不受影响
+    for start, end, placeholder in sorted(replacements, reverse=True):
+        text = text[:start] + placeholder + text[end:]
+    return text, slots
+
+
+def normalize_destination(destination: str) -> str:
+    """规范化目的地名称：统一全半角与大小写，去除空白、标点与末尾的“市”（"北京市" 与 " 北京" 相同）"""
+    text = PUNCTUATION_PATTERN.sub("", unicodedata.normalize("NFKC", destination or "").lower())
+    if len(text) > 2 and text.endswith("市"):
+        text = text[:-1]
+    return text
+
+
+def normalize_goal(goal: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    规范化用户目标
+
+    统一全半角与大小写，提取目的地（标准名）与天数槽位，统一数量词前的中文数字，
+    去除空白与标点。措辞相同、只有目的地或天数不同的目标得到相同的模板。
+
+    Returns:
+        Tuple[str, Dict]: (规范化模板, 槽位 {destination, days})
+    """
+    # 先在保留空白的文本中提取槽位（英文地名如 "new york" 需要整词匹配）
+    text, slots = _extract_slots(unicodedata.normalize("NFKC", goal or "").lower())
+    text = re.sub(r"\s+", "", text)
+
+    text = COUNTED_NUMERAL_PATTERN.sub(lambda m: str(parse_chinese_number(m.group(1)) or m.group(1)), text)
+    text = PUNCTUATION_PATTERN.sub("", text.replace("{days}", "\0days\0").replace("{destination}", "\0destination\0"))
+    text = text.replace("\0days\0", "{days}").replace("\0destination\0", "{destination}")
+    return text, slots
+
+
+def _templatize_text(text: str, slots: Dict[str, Any]) -> Tuple[str, set]:
+    """将文本中的槽位值替换为占位符，返回 (模板文本, 出现过的槽位)"""
+    found = set()
+    destination = slots.get("destination")
+    if destination and destination in text:
+        text = text.replace(destination, SLOT_PLACEHOLDERS["destination"])
+        found.add("destination")
+
+    days = slots.get("days")
+    if days:
+        def replace_days(match):
+            if parse_chinese_number(match.group(1)) == days:
+                found.add("days")
+                return SLOT_PLACEHOLDERS["days"] + match.group(0)[len(match.group(1)):]
+            return match.group(0)
+        text = re.sub(rf"([\d{NUMERAL_CHARS}]+)(?=\s*[天日])", replace_days, text)
+    return text, found
+
+
+def _templatize_args(args: Dict[str, Any], slots: Dict[str, Any]) -> Tuple[Dict[str, Any], set]:
+    """将任务参数中的槽位值替换为占位符：同名参数整体替换，其他字符串参数按文本替换"""
+    found = set()
+    templated = {}
+    for key, value in args.items():
+        if key in SLOT_PLACEHOLDERS and slots.get(key) == value:
+            found.add(key)
+            templated[key] = SLOT_PLACEHOLDERS[key]
+        elif isinstance(value, str):
+            templated[key], text_found = _templatize_text(value, slots)
+            found |= text_found
+        else:
+            templated[key] = value
+    return templated, found
+
+
+def _bind_text(text: str, slots: Dict[str, Any]) -> str:
+    """将文本中的占位符替换为槽位值"""
+    for name, placeholder in SLOT_PLACEHOLDERS.items():
+        if name in slots:
+            text = text.replace(placeholder, str(slots[name]))
+    return text
+
+
+def templatize_plan(plan: List[Dict[str, Any]], slots: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    将计划中的槽位值替换为占位符，以便其他目的地/天数复用
+
+    Returns:
+        Optional[List]: 计划模板；某个槽位在计划中没有出现时返回None（无法安全复用）
+    """
+    found = set()
+    template = []
+    for task in plan:
+        task = dict(task)
+        task["description"], task_found = _templatize_text(task.get("description", ""), slots)
+        found |= task_found
+        if task.get("args"):
+            task["args"], args_found = _templatize_args(task["args"], slots)
+            found |= args_found
+        template.append(task)
+    if set(slots) - found:
+        return None
+    return template
+
+
+def bind_plan(template: List[Dict[str, Any]], slots: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """将槽位值填回计划模板"""
+    plan = []
+    for task in template:
+        task = dict(task)
+        task["description"] = _bind_text(task.get("description", ""), slots)
+        task["dependencies"] = list(task.get("dependencies", []))
+        if task.get("args"):
+            # 同名参数填回原始类型的槽位值（天数为整数）
+            task["args"] = {
+                key: slots[key] if key in slots and value == SLOT_PLACEHOLDERS[key]
+                else _bind_text(value, slots) if isinstance(value, str) else value
+                for key, value in task["args"].items()
+            }
+        plan.append(task)
+    return plan
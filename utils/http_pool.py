@@ -0,0 +1,219 @@
+import asyncio
+import threading
+import weakref
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+try:
+    import h2  # noqa: F401  # 可选依赖，安装后启用HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+DEFAULT_POOL_CONFIG = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 60,
+    "http2": True,
+    "warmup": False,
+    "timeout_profiles": {
+        "default": None
+    }
+}
+
+
+class ClientRegistry:
+    """
+    进程级OpenAI客户端注册表。
+
+    按 (base_url, api_key, timeout_profile) 缓存 OpenAI 客户端，
+    同一上游（scheme + host）的所有客户端共享一个有界、长连接的 httpx 连接池，
+    避免每次实例化 LLMClient 都重新建立 TCP/TLS 连接。
+    """
+
+    def __init__(self, pool_config: Dict[str, Any] = None):
+        """初始化注册表"""
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[str, str, str], OpenAI] = {}
+        self._pools: Dict[str, httpx.Client] = {}
+        # 异步连接绑定在事件循环上，按事件循环分别缓存，循环销毁后自动释放
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._stats = {"client_hits": 0, "client_misses": 0, "pool_hits": 0, "pool_misses": 0}
+        self._config = dict(DEFAULT_POOL_CONFIG)
+        if pool_config:
+            self.configure(pool_config)
+
+    def configure(self, pool_config: Dict[str, Any]):
+        """
+        更新连接池配置（对应 config.yaml 中的 api.http_pool）
+
+        已创建的连接池保持不变，新配置仅作用于之后新建的连接池。
+        """
+        with self._lock:
+            merged = dict(DEFAULT_POOL_CONFIG)
+            merged.update(pool_config or {})
+            profiles = dict(DEFAULT_POOL_CONFIG["timeout_profiles"])
+            profiles.update((pool_config or {}).get("timeout_profiles") or {})
+            merged["timeout_profiles"] = profiles
+            self._config = merged
+
+    @staticmethod
+    def _upstream_key(base_url: Optional[str]) -> str:
+        """提取上游标识（scheme://host:port），同一上游共享连接池"""
+        if not base_url:
+            return "default"
+        parts = urlsplit(base_url)
+        return f"{parts.scheme}://{parts.netloc}" if parts.netloc else base_url
+
+    def _get_timeout(self, timeout_profile: str):
+        """根据超时配置名获取超时设置"""
+        profiles = self._config.get("timeout_profiles", {})
+        timeout = profiles.get(timeout_profile, profiles.get("default"))
+        if isinstance(timeout, dict):
+            # 只传入配置中出现的分项，未配置的分项沿用 total（显式传 None 会变成不限时）
+            phases = {k: v for k, v in timeout.items() if k in ("connect", "read", "write", "pool")}
+            return httpx.Timeout(timeout.get("total"), **phases)
+        return timeout
+
+    def _build_limits(self) -> httpx.Limits:
+        """根据配置构建连接池限制"""
+        return httpx.Limits(
+            max_connections=self._config.get("max_connections"),
+            max_keepalive_connections=self._config.get("max_keepalive_connections"),
+            keepalive_expiry=self._config.get("keepalive_expiry")
+        )
+
+    def _get_pool(self, upstream: str) -> httpx.Client:
+        """获取上游对应的共享连接池（调用方需持有锁）"""
+        pool = self._pools.get(upstream)
+        if pool is not None:
+            self._stats["pool_hits"] += 1
+            return pool
+
+        self._stats["pool_misses"] += 1
+        pool = httpx.Client(
+            limits=self._build_limits(),
+            http2=bool(self._config.get("http2")) and HTTP2_AVAILABLE,
+            timeout=None,
+            follow_redirects=True
+        )
+        self._pools[upstream] = pool
+        return pool
+
+    def get_client(self, api_key: str, base_url: str = None, timeout_profile: str = "default") -> OpenAI:
+        """获取共享的OpenAI客户端"""
+        key = (base_url or "", api_key or "", timeout_profile)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._stats["client_hits"] += 1
+                return client
+
+            self._stats["client_misses"] += 1
+            client_kwargs = {
+                "api_key": api_key,
+                "timeout": self._get_timeout(timeout_profile),
+                "max_retries": 0,  # 重试统一由 RetryPolicy 处理
+                "http_client": self._get_pool(self._upstream_key(base_url))
+            }
+            if base_url:
+                client_kwargs["base_url"] = base_url
+
+            client = OpenAI(**client_kwargs)
+            self._clients[key] = client
+            return client
+
+    def get_async_client(self, api_key: str, base_url: str = None, timeout_profile: str = "default") -> AsyncOpenAI:
+        """获取当前事件循环内共享的AsyncOpenAI客户端"""
+        loop = asyncio.get_running_loop()
+        key = (base_url or "", api_key or "", timeout_profile)
+        with self._lock:
+            loop_state = self._async_clients.get(loop)
+            if loop_state is None:
+                loop_state = {"clients": {}, "pools": {}}
+                self._async_clients[loop] = loop_state
+
+            client = loop_state["clients"].get(key)
+            if client is not None:
+                self._stats["client_hits"] += 1
+                return client
+
+            self._stats["client_misses"] += 1
+            upstream = self._upstream_key(base_url)
+            pool = loop_state["pools"].get(upstream)
+            if pool is None:
+                self._stats["pool_misses"] += 1
+                pool = httpx.AsyncClient(
+                    limits=self._build_limits(),
+                    http2=bool(self._config.get("http2")) and HTTP2_AVAILABLE,
+                    timeout=None,
+                    follow_redirects=True
+                )
+                loop_state["pools"][upstream] = pool
+            else:
+                self._stats["pool_hits"] += 1
+
+            client_kwargs = {
+                "api_key": api_key,
+                "timeout": self._get_timeout(timeout_profile),
+                "max_retries": 0,  # 重试统一由 RetryPolicy 处理
+                "http_client": pool
+            }
+            if base_url:
+                client_kwargs["base_url"] = base_url
+
+            client = AsyncOpenAI(**client_kwargs)
+            loop_state["clients"][key] = client
+            return client
+
+    def warmup(self, base_urls: List[str]) -> Dict[str, bool]:
+        """
+        预连接上游服务，提前完成TCP/TLS握手
+
+        Args:
+            base_urls: 需要预热的服务地址列表
+
+        Returns:
+            Dict[str, bool]: 每个地址是否预热成功
+        """
+        results = {}
+        for base_url in base_urls:
+            if not base_url:
+                continue
+            upstream = self._upstream_key(base_url)
+            with self._lock:
+                pool = self._get_pool(upstream)
+            try:
+                # 任意响应（包括404/401）都说明连接已建立并进入keep-alive池
+                pool.head(base_url, timeout=5)
+                results[base_url] = True
+            except httpx.HTTPError as e:
+                print(f"⚠️ 预连接 {base_url} 失败: {e}")
+                results[base_url] = False
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            async_states = list(self._async_clients.values())
+            stats["clients"] = len(self._clients) + sum(len(state["clients"]) for state in async_states)
+            stats["pools"] = len(self._pools) + sum(len(state["pools"]) for state in async_states)
+            stats["http2"] = bool(self._config.get("http2")) and HTTP2_AVAILABLE
+            return stats
+
+    def close(self):
+        """关闭所有连接池"""
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+            self._clients.clear()
+
+
+# 全局客户端注册表实例
+client_registry = ClientRegistry()
@@ -0,0 +1,153 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from icalendar import Calendar, Event
+
+
+# 每天行程的标题，例如 "Day 1:"；标题后需要有冒号或空白才算一天的开始
+DAY_BOUNDARY_PATTERN = re.compile(r"Day (\d+)(?=\D)")
+DAY_HEADER_SEPARATOR = re.compile(r"[:\s]+")
+# 未确认的标题最多跨越的字符数（"Day " 加上天数），流式扫描时保留这部分文本等待后续分块
+BOUNDARY_HOLDBACK = 12
+
+
+def itinerary_hash(plan_text: str, start_date: datetime) -> str:
+    """日历缓存键：行程文本与开始日期"""
+    payload = f"{start_date.date().isoformat()}|{plan_text}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ICSCache:
+    """按行程哈希缓存序列化后的日历，页面重新运行时直接复用"""
+
+    def __init__(self, max_entries: int = 32):
+        """初始化日历缓存"""
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存的日历，未命中返回None"""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+
+    def set(self, key: str, content: bytes):
+        """保存日历"""
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+def cache_calendar(plan_text: str, content: bytes, start_date: datetime = None):
+    """缓存已生成的日历（例如由结构化行程直接生成的日历），之后按同一行程生成日历时直接复用"""
+    ics_cache.set(itinerary_hash(plan_text, start_date or datetime.today()), content)
+
+
+class StreamingICSBuilder:
+    """
+    流式日历构建器。
+
+    边接收行程分块边按 "Day N:" 标题切分，每当下一天的标题出现，前一天的日历事件即创建完成；
+    行程结束时只需补上最后一天并序列化，不再对全文做正则扫描。
+    切分结果与按 Day N 标题对全文切分一致：第一个标题之前的文字不计入，没有任何标题时整段行程作为一个全天事件。
+    """
+
+    def __init__(self, start_date: datetime = None):
+        """
+        Args:
+            start_date: 可选的开始日期（默认为今天）
+        """
+        self.start_date = start_date or datetime.today()
+        self._text = ""
+        self._scan_from = 0
+        # 当前这一天：(天数, 标题结束位置)；标题后没有冒号或空白时为None，其内容被跳过
+        self._open_day: Optional[Tuple[int, int]] = None
+        self._events: List[Event] = []
+        self._content: Optional[bytes] = None
+
+    def feed(self, chunk: str):
+        """接收一块行程文本"""
+        if not chunk:
+            return
+        self._text += chunk
+        self._scan(self._text)
+        self._scan_from = max(self._scan_from, len(self._text) - BOUNDARY_HOLDBACK)
+
+    def _scan(self, haystack: str):
+        """从上次扫描的位置起查找已确认的标题，每个标题结束前一天并开始新的一天"""
+        for match in DAY_BOUNDARY_PATTERN.finditer(haystack, self._scan_from):
+            self._close_day(match.start())
+            if DAY_HEADER_SEPARATOR.match(self._text, match.end()):
+                self._open_day = (int(match.group(1)), match.end())
+            self._scan_from = match.end()
+
+    def _close_day(self, end: int):
+        """结束当前这一天，创建对应的全天事件"""
+        if self._open_day is None:
+            return
+        day_num, header_end = self._open_day
+        self._open_day = None
+        separator = DAY_HEADER_SEPARATOR.match(self._text, header_end, end)
+        content_start = separator.end() if separator else header_end
+        self._events.append(self._make_event(f"第{day_num}天行程", self._text[content_start:end].strip(),
+                                             self.start_date + timedelta(days=day_num - 1)))
+
+    @staticmethod
+    def _make_event(summary: str, description: str, date: datetime) -> Event:
+        """创建全天事件"""
+        event = Event()
+        event.add('summary', summary)
+        event.add('description', description)
+        event.add('dtstart', date.date())
+        event.add('dtend', date.date())
+        event.add("dtstamp", datetime.now())
+        return event
+
+    @property
+    def text(self) -> str:
+        """已接收的行程文本"""
+        return self._text
+
+    @property
+    def day_count(self) -> int:
+        """已完成切分的天数"""
+        return len(self._events)
+
+    def finish(self) -> bytes:
+        """结束接收并返回 ICS 文件内容（可重复调用）"""
+        if self._content is not None:
+            return self._content
+
+        # 末尾的标题此时才能确认（后面没有更多文本）
+        self._scan(self._text + "\n")
+        self._close_day(len(self._text))
+
+        cal = Calendar()
+        cal.add('prodid', '-//AI Travel Planner//github.com//')
+        cal.add('version', '2.0')
+        if not self._events:  # 如果没有找到日期模式，创建单个全天事件
+            cal.add_component(self._make_event("旅行行程", self._text, self.start_date))
+        for event in self._events:
+            cal.add_component(event)
+
+        self._content = cal.to_ical()
+        ics_cache.set(itinerary_hash(self._text, self.start_date), self._content)
+        return self._content
+
+
+# 全局日历缓存
+ics_cache = ICSCache()
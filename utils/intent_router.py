@@ -0,0 +1,339 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.goal_normalizer import normalize_goal
+from utils.task_args import coerce_task_args
+from utils.trip_slots import trip_slot_extractor
+
+
+DEFAULT_INTENT_ROUTER_CONFIG = {
+    "enabled": True,
+    "min_confidence": 0.9,  # 分类器的后验概率低于该值时交给LLM规划
+    "min_examples": 20,  # 训练样本少于该数量时只使用规则
+    "ngram_range": [1, 3],  # 字符n-gram的长度范围
+    "log_path": None,  # 记录LLM规划结果的JSONL文件，作为分类器的训练数据；为空时只在内存中学习
+    "max_examples": 5000,  # 参与训练的最近样本数上限
+    "multi_step_pattern": "然后|之后|接着|并且|同时|以及|另外",  # 命中时认为目标需要多个步骤
+    "playbooks": []  # [{"tool": 工具名, "patterns": [正则], "description": "任务描述模板，{goal} 为用户目标"}]
+}
+
+# 需要多个工具（或LLM无法归到单个工具）的目标的类别标签
+MULTI_STEP_LABEL = "__multi__"
+
+
+def goal_ngrams(goal: str, ngram_range: Tuple[int, int]) -> List[str]:
+    """规范化目标后提取字符n-gram，目的地与天数槽位各视为一个字符"""
+    template, _ = normalize_goal(goal)
+    text = "^" + template.replace("{destination}", "\x01").replace("{days}", "\x02") + "$"
+    low, high = ngram_range
+    return [text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1)]
+
+
+class NgramClassifier:
+    """基于字符n-gram的多项式朴素贝叶斯分类器，支持增量训练"""
+
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 3)):
+        self.ngram_range = tuple(ngram_range)
+        self.label_counts: Dict[str, int] = defaultdict(int)
+        self.gram_counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.gram_totals: Dict[str, int] = defaultdict(int)
+        # n-gram -> 在全部样本中出现的次数，降为0时移出词表，使遗忘样本后与重新训练的结果一致
+        self.vocabulary: Dict[str, int] = defaultdict(int)
+        self.examples = 0
+
+    def learn(self, goal: str, label: str):
+        """加入一条训练样本"""
+        self.label_counts[label] += 1
+        self.examples += 1
+        for gram in goal_ngrams(goal, self.ngram_range):
+            self.gram_counts[label][gram] += 1
+            self.gram_totals[label] += 1
+            self.vocabulary[gram] += 1
+
+    def forget(self, goal: str, label: str):
+        """移除一条此前加入的训练样本（样本窗口滑动时使用，无需重新训练）"""
+        counts = self.gram_counts[label]
+        for gram in goal_ngrams(goal, self.ngram_range):
+            counts[gram] -= 1
+            if not counts[gram]:
+                del counts[gram]
+            self.gram_totals[label] -= 1
+            self.vocabulary[gram] -= 1
+            if not self.vocabulary[gram]:
+                del self.vocabulary[gram]
+        self.examples -= 1
+        self.label_counts[label] -= 1
+        if not self.label_counts[label]:
+            del self.label_counts[label], self.gram_counts[label], self.gram_totals[label]
+
+    def predict(self, goal: str, labels: List[str] = None) -> Tuple[Optional[str], float]:
+        """
+        预测目标的类别
+
+        Args:
+            labels: 只在这些类别中选择（例如当前可用的工具），默认全部
+
+        Returns:
+            Tuple[Optional[str], float]: (类别, 后验概率)；没有训练样本时返回 (None, 0.0)
+        """
+        candidates = [label for label in (labels or self.label_counts) if self.label_counts.get(label)]
+        if not candidates:
+            return None, 0.0
+
+        grams = goal_ngrams(goal, self.ngram_range)
+        vocabulary_size = len(self.vocabulary) or 1
+        scores = {}
+        for label in candidates:
+            counts = self.gram_counts[label]
+            denominator = self.gram_totals[label] + vocabulary_size
+            score = math.log(self.label_counts[label] / self.examples)
+            for gram in grams:
+                score += math.log((counts.get(gram, 0) + 1) / denominator)
+            scores[label] = score
+
+        best = max(scores, key=scores.get)
+        # softmax 归一化为后验概率
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+
+class IntentRouter:
+    """
+    MCP 本地意图路由器。
+
+    大多数目标只需要一个工具，本地路由命中时直接生成单任务计划，省去一次LLM规划调用。
+    先匹配 config 中的正则规则（playbooks），唯一一个工具命中时直接路由；
+    否则使用在历史LLM规划结果上训练的字符n-gram分类器，置信度足够高时路由，其余情况交给LLM规划。
+    LLM生成的计划会被记录为训练样本（多任务计划记为需要多步骤），分类器随使用逐渐完善。
+    """
+
+    def __init__(self, router_config: Dict[str, Any] = None):
+        """初始化意图路由器"""
+        self._lock = threading.Lock()
+        self._config = dict(DEFAULT_INTENT_ROUTER_CONFIG)
+        self._playbooks: List[Dict[str, Any]] = []
+        self._multi_step: Optional[re.Pattern] = None
+        self._examples: deque = deque()
+        self._log_lines = 0  # 日志文件中的样本行数，超过样本上限的两倍时压缩
+        self._classifier = NgramClassifier()
+        self._stats = {"routed": 0, "deferred": 0, "route_us": 0.0}
+        self.configure(router_config or {})
+
+    def configure(self, router_config: Dict[str, Any]):
+        """更新路由配置（对应 config.yaml 中 pages.mcp_agent.intent_router），并从日志重新训练分类器"""
+        merged = dict(DEFAULT_INTENT_ROUTER_CONFIG)
+        merged.update(router_config or {})
+        playbooks = []
+        for playbook in merged.get("playbooks") or []:
+            try:
+                patterns = [re.compile(pattern, re.IGNORECASE) for pattern in playbook.get("patterns", [])]
+            except re.error as e:
+                print(f"⚠️ 意图规则 {playbook.get('tool')} 的正则无效: {e}")
+                continue
+            if playbook.get("tool") and patterns:
+                playbooks.append({**playbook, "patterns": patterns})
+        pattern = merged.get("multi_step_pattern")
+
+        with self._lock:
+            self._config = merged
+            self._playbooks = playbooks
+            self._multi_step = re.compile(pattern) if pattern else None
+            logged = self._load_log()
+            self._examples = deque(logged, maxlen=max(1, int(merged.get("max_examples", 5000))))
+            self._log_lines = len(logged)
+            self._retrain()
+            self._maybe_compact_log()
+
+    @property
+    def enabled(self) -> bool:
+        """路由是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    def _load_log(self) -> List[Tuple[str, str]]:
+        """读取已记录的训练样本"""
+        log_path = self._config.get("log_path")
+        if not log_path or not os.path.exists(log_path):
+            return []
+        examples = []
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    examples.append((record["goal"], record["label"]))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+        return examples
+
+    def _retrain(self):
+        """用当前样本重新训练分类器（调用方需持有锁）"""
+        self._classifier = NgramClassifier(self._config.get("ngram_range", [1, 3]))
+        for goal, label in self._examples:
+            self._classifier.learn(goal, label)
+
+    def route(self, goal: str, tool_config: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        尝试在本地为目标生成计划
+
+        Returns:
+            Optional[List]: 单任务计划；置信度不足或需要多个步骤时返回None，由LLM规划
+        """
+        if not self.enabled or not goal:
+            return None
+        started = time.perf_counter()
+        tool, confidence, source = self._classify(goal, tool_config)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+
+        with self._lock:
+            self._stats["route_us"] += elapsed_us
+            self._stats["routed" if tool else "deferred"] += 1
+        if not tool:
+            return None
+
+        print(f"⚡ 本地路由: {tool}（{source}，置信度 {confidence:.2f}，耗时 {elapsed_us:.0f}µs）")
+        return [self.build_task("task_1", tool, goal, tool_config)]
+
+    def build_task(self, task_id: str, tool: str, goal: str, tool_config: Dict[str, Any]) -> Dict[str, Any]:
+        """生成单个任务；目标中识别到的目的地、天数作为工具参数，工具无需再调用LLM解析"""
+        task = {
+            "task_id": task_id,
+            "description": self.describe(tool, goal),
+            "tool": tool,
+            "dependencies": []
+        }
+        # 目的地必须在名录中识别到，否则不给出参数，由工具自行解析任务描述
+        slots = trip_slot_extractor.extract(goal)
+        args = coerce_task_args(slots, tool_config.get(tool, {}).get("args")) if slots["destination"] else {}
+        if args:
+            task["args"] = args
+        return task
+
+    def _classify(self, goal: str, tool_config: Dict[str, Any]) -> Tuple[Optional[str], float, str]:
+        """返回 (工具, 置信度, 来源)；无法可靠路由时工具为None"""
+        if self._multi_step is not None and self._multi_step.search(goal):
+            return None, 0.0, ""
+
+        matched = {
+            playbook["tool"] for playbook in self._playbooks
+            if playbook["tool"] in tool_config and any(p.search(goal) for p in playbook["patterns"])
+        }
+        if len(matched) == 1:
+            return matched.pop(), 1.0, "规则"
+        if len(matched) > 1:
+            # 多个工具的规则同时命中，可能需要多个步骤
+            return None, 0.0, ""
+
+        with self._lock:
+            classifier = self._classifier
+            if classifier.examples < self._config.get("min_examples", 20):
+                return None, 0.0, ""
+            label, confidence = classifier.predict(goal, list(tool_config) + [MULTI_STEP_LABEL])
+        if label and label != MULTI_STEP_LABEL and confidence >= self._config.get("min_confidence", 0.9):
+            return label, confidence, "分类器"
+        return None, confidence, ""
+
+    def predict_first_tool(self, goal: str, tool_config: Dict[str, Any]) -> Tuple[Optional[str], float]:
+        """
+        预测计划第一个任务最可能使用的工具（用于推测执行，不要求目标只需要一个工具）
+
+        规则命中时取在目标中最先出现的工具；否则取分类器在各工具中的最优类别。
+
+        Returns:
+            Tuple[Optional[str], float]: (工具, 置信度)
+        """
+        if not self.enabled or not goal:
+            return None, 0.0
+        positions = {}
+        for playbook in self._playbooks:
+            if playbook["tool"] not in tool_config:
+                continue
+            for pattern in playbook["patterns"]:
+                match = pattern.search(goal)
+                if match and match.start() < positions.get(playbook["tool"], len(goal) + 1):
+                    positions[playbook["tool"]] = match.start()
+        if positions:
+            first = min(positions, key=positions.get)
+            return first, 1.0 if len(positions) == 1 else 0.8
+
+        with self._lock:
+            classifier = self._classifier
+            if classifier.examples < self._config.get("min_examples", 20):
+                return None, 0.0
+            return classifier.predict(goal, list(tool_config))
+
+    def describe(self, tool: str, goal: str) -> str:
+        """按规则中的描述模板生成任务描述"""
+        for playbook in self._playbooks:
+            if playbook["tool"] == tool and playbook.get("description"):
+                return playbook["description"].replace("{goal}", goal)
+        return goal
+
+    def record(self, goal: str, plan: List[Dict[str, Any]]):
+        """记录LLM规划的结果作为训练样本：单任务计划记为该工具，多任务计划记为需要多步骤"""
+        if not self.enabled or not goal or not plan:
+            return
+        label = plan[0].get("tool") if len(plan) == 1 else MULTI_STEP_LABEL
+        if not label:
+            return
+        with self._lock:
+            if len(self._examples) == self._examples.maxlen:
+                # 最早的样本被挤出窗口，从分类器中减去它的计数
+                self._classifier.forget(*self._examples[0])
+            self._examples.append((goal, label))
+            self._classifier.learn(goal, label)
+            self._append_log(goal, label)
+            self._maybe_compact_log()
+
+    def _append_log(self, goal: str, label: str):
+        """追加训练样本到日志文件（调用方需持有锁）"""
+        log_path = self._config.get("log_path")
+        if not log_path:
+            return
+        try:
+            directory = os.path.dirname(log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"goal": goal, "label": label}, ensure_ascii=False) + "\n")
+            self._log_lines += 1
+        except OSError as e:
+            print(f"⚠️ 写入意图路由日志失败: {e}")
+
+    def _maybe_compact_log(self):
+        """
+        日志行数超过样本上限的两倍时，改写为当前窗口内的样本（调用方需持有锁）
+
+        窗口之外的旧样本不再参与训练，压缩后日志大小有界；
+        每次压缩之间至少追加了与样本上限相当的行数，分摊到每次记录的开销为常数。
+        """
+        log_path = self._config.get("log_path")
+        if not log_path or self._log_lines <= 2 * self._examples.maxlen:
+            return
+        temp_path = f"{log_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for goal, label in self._examples:
+                    f.write(json.dumps({"goal": goal, "label": label}, ensure_ascii=False) + "\n")
+            os.replace(temp_path, log_path)
+            self._log_lines = len(self._examples)
+        except OSError as e:
+            print(f"⚠️ 压缩意图路由日志失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取路由统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            calls = stats["routed"] + stats["deferred"]
+            route_us = stats.pop("route_us")
+            stats["avg_route_us"] = route_us / calls if calls else 0.0
+            stats["examples"] = len(self._examples)
+            return stats
+
+
+# 全局意图路由器实例
+intent_router = IntentRouter()
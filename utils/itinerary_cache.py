@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import hashlib
+import time
+from datetime import datetime
+from typing import Dict, Any, AsyncGenerator, Generator, List, Optional
+
+from utils.goal_normalizer import normalize_destination
+from utils.response_cache import ResponseCache
+
+
+DEFAULT_ITINERARY_CACHE_CONFIG = {
+    "enabled": True,
+    "memory_max_entries": 128,
+    "disk_path": None,  # 为空时只使用内存缓存
+    "disk_ttl": 2592000,  # 秒
+    "disk_max_size_mb": 200,
+    "replay_delay_ms": 0,  # 命中时回放每个分块之间的间隔，0 表示立即输出
+    "warmup": {
+        "destinations": [],  # 预生成的热门目的地
+        "days": [3],  # 预生成的天数
+        "off_peak_hours": [2, 6]  # 允许预生成的时段 [开始小时, 结束小时)，为空表示不限制
+    }
+}
+
+
+class ItineraryCache:
+    """
+    旅行行程缓存。
+
+    缓存键为 (规范化目的地, 天数, 模型, 提示词版本)，"北京市" 与 " 北京" 命中同一份行程；
+    提示词或采样参数变化后版本随之变化，旧行程不会再被命中。
+    行程按生成时的原分块保存，命中时通过同样的生成器接口按配置的速度回放。
+    存储复用 ResponseCache 的内存LRU与带TTL、容量上限的SQLite两级缓存。
+    """
+
+    def __init__(self, cache_config: Dict[str, Any] = None):
+        """初始化行程缓存"""
+        self._config = dict(DEFAULT_ITINERARY_CACHE_CONFIG)
+        self._store = ResponseCache(self._config)
+        if cache_config:
+            self.configure(cache_config)
+
+    def configure(self, cache_config: Dict[str, Any]):
+        """更新缓存配置（对应 config.yaml 中 pages.travel_agent.itinerary_cache）"""
+        merged = dict(DEFAULT_ITINERARY_CACHE_CONFIG)
+        merged.update(cache_config or {})
+        merged["warmup"] = {**DEFAULT_ITINERARY_CACHE_CONFIG["warmup"], **(merged.get("warmup") or {})}
+        self._config = merged
+        self._store.configure(merged)
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    @property
+    def replay_delay(self) -> float:
+        """回放分块之间的间隔（秒）"""
+        return max(float(self._config.get("replay_delay_ms") or 0), 0.0) / 1000.0
+
+    @property
+    def warmup_config(self) -> Dict[str, Any]:
+        """预生成配置"""
+        return self._config["warmup"]
+
+    @staticmethod
+    def make_key(destination: str, num_days: int, model: str, prompt_version: str) -> Optional[str]:
+        """计算缓存键；目的地为空时返回None"""
+        normalized = normalize_destination(destination)
+        if not normalized:
+            return None
+        payload = f"{normalized}|{int(num_days)}|{model}|{prompt_version}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, destination: str, num_days: int, model: str, prompt_version: str) -> Optional[List[str]]:
+        """读取缓存的行程分块，未命中返回None"""
+        if not self.enabled:
+            return None
+        key = self.make_key(destination, num_days, model, prompt_version)
+        chunks = self._store.get(key) if key else None
+        return chunks or None
+
+    def set(self, destination: str, num_days: int, model: str, prompt_version: str, chunks: List[str]) -> bool:
+        """
+        保存完整生成的行程分块
+
+        Returns:
+            bool: 是否已保存；缓存未启用或内容为空时不保存
+        """
+        if not self.enabled or not "".join(chunks).strip():
+            return False
+        key = self.make_key(destination, num_days, model, prompt_version)
+        if not key:
+            return False
+        self._store.set(key, list(chunks))
+        return True
+
+    def replay(self, chunks: List[str]) -> Generator[str, None, None]:
+        """按配置的速度回放缓存的分块"""
+        delay = self.replay_delay
+        for index, chunk in enumerate(chunks):
+            if delay and index:
+                time.sleep(delay)
+            yield chunk
+
+    async def areplay(self, chunks: List[str]) -> AsyncGenerator[str, None]:
+        """replay 的异步版本"""
+        delay = self.replay_delay
+        for index, chunk in enumerate(chunks):
+            if delay and index:
+                await asyncio.sleep(delay)
+            yield chunk
+
+    def in_off_peak(self, now: Optional[datetime] = None) -> bool:
+        """当前是否处于允许预生成的时段（支持跨零点，例如 [22, 6]）"""
+        hours = self.warmup_config.get("off_peak_hours")
+        if not hours:
+            return True
+        start, end = int(hours[0]), int(hours[1])
+        hour = (now or datetime.now()).hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def warm(self, client, destinations: Optional[List[str]] = None, days: Optional[List[int]] = None) -> Dict[str, int]:
+        """
+        预生成热门目的地的行程
+
+        逐个组合生成，已缓存的组合跳过，单个组合失败不影响其余组合。
+
+        Args:
+            client: TravelPlannerLLM 实例，生成的行程由其 generate_itinerary_stream 写入缓存
+            destinations: 目的地列表，默认使用配置中的 warmup.destinations
+            days: 天数列表，默认使用配置中的 warmup.days
+
+        Returns:
+            Dict: {"generated", "skipped", "failed"}
+        """
+        destinations = destinations if destinations is not None else self.warmup_config.get("destinations") or []
+        days = days if days is not None else self.warmup_config.get("days") or []
+        stats = {"generated": 0, "skipped": 0, "failed": 0}
+        if not self.enabled:
+            return stats
+
+        for destination in destinations:
+            for num_days in days:
+                if self.get(destination, num_days, client.model, client.itinerary_prompt_version(num_days)) is not None:
+                    stats["skipped"] += 1
+                    continue
+                try:
+                    client.generate_itinerary(destination, num_days)
+                    stats["generated"] += 1
+                    print(f"🔥 已预生成行程: {destination} {num_days}天")
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"⚠️ 预生成行程失败 {destination} {num_days}天: {e}")
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return self._store.get_stats()
+
+    def clear(self):
+        """清空行程缓存"""
+        self._store.clear()
+
+
+# 全局行程缓存实例
+itinerary_cache = ItineraryCache()
+
+
+def main(argv=None):
+    """命令行入口：python -m utils.itinerary_cache [--force]，适合在低峰时段由定时任务调用"""
+    # 在函数内导入，避免 travel_planner_llm 导入本模块时循环导入
+    from config import config_manager
+    from utils.llm_runtime import configure_llm_runtime
+    from utils.travel_planner_llm import TravelPlannerLLM
+
+    parser = argparse.ArgumentParser(description="预生成热门目的地的旅行行程")
+    parser.add_argument("-d", "--destination", action="append", help="目的地，可重复指定；默认使用配置中的热门目的地")
+    parser.add_argument("--days", type=int, action="append", help="天数，可重复指定；默认使用配置中的天数")
+    parser.add_argument("--force", action="store_true", help="忽略低峰时段限制立即执行")
+    args = parser.parse_args(argv)
+
+    configure_llm_runtime(config_manager)
+    if not args.force and not itinerary_cache.in_off_peak():
+        print(f"⏸️ 当前不在低峰时段 {itinerary_cache.warmup_config.get('off_peak_hours')}，跳过预生成")
+        return
+
+    page_config = config_manager.get_page_config("travel_agent")
+    client = TravelPlannerLLM(
+        api_key=config_manager.get_api_key("travel_agent"),
+        base_url=config_manager.get_base_url("travel_agent"),
+        model=page_config.get("default_model")
+    )
+    stats = itinerary_cache.warm(client, args.destination, args.days)
+    print(f"✅ 预生成完成: 新生成 {stats['generated']}，已缓存 {stats['skipped']}，失败 {stats['failed']}")
+
+
+if __name__ == "__main__":
+    main()
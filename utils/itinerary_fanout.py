@@ -0,0 +1,192 @@
+import asyncio
+import contextvars
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Callable, Generator, AsyncGenerator, Iterator, List
+
+
+DEFAULT_FANOUT_CONFIG = {
+    "enabled": True,
+    "min_days": 6,  # 天数不少于该值时按天并行生成
+    "max_concurrency": 4,  # 同时生成的天数上限
+    "skeleton_max_tokens": 1024,  # 行程骨架（每天主题与区域）的令牌上限
+    "day_max_tokens": 1536  # 每天详细行程的令牌上限
+}
+
+# 相邻两天输出之间的分隔
+DAY_SEPARATOR = "\n\n"
+
+
+class _DayDone:
+    """某一天的输出已结束"""
+
+
+class _DayFailed:
+    """某一天的生成失败"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def parse_skeleton(content: str, num_days: int) -> List[Dict[str, Any]]:
+    """
+    解析LLM返回的行程骨架
+
+    Returns:
+        List[Dict]: 按天排序的 [{"day", "theme", "area"}]，恰好 num_days 项
+
+    Raises:
+        ValueError: 骨架不是预期的JSON结构或缺少某一天
+    """
+    result = json.loads(content)
+    days = result.get("days") if isinstance(result, dict) else result
+    if not isinstance(days, list):
+        raise ValueError(f"行程骨架缺少 days 列表: {content[:100]}")
+
+    by_day = {}
+    for index, item in enumerate(days, 1):
+        if not isinstance(item, dict):
+            continue
+        try:
+            day = int(item.get("day", index))
+        except (TypeError, ValueError):
+            day = index
+        by_day.setdefault(day, {
+            "day": day,
+            "theme": str(item.get("theme") or "").strip(),
+            "area": str(item.get("area") or "").strip()
+        })
+    missing = [day for day in range(1, num_days + 1) if day not in by_day]
+    if missing:
+        raise ValueError(f"行程骨架缺少第 {missing} 天")
+    return [by_day[day] for day in range(1, num_days + 1)]
+
+
+class ItineraryFanout:
+    """
+    长行程的按天并行生成。
+
+    先用一次较短的调用生成行程骨架（每天的主题与区域），再在并发上限内同时生成每天的详细行程，
+    按天的顺序流式输出：第1天边生成边输出，后面各天在此期间已在后台生成，输出到它们时多半已经完成，
+    总耗时接近骨架加上一天的生成时间，且不受单次调用 max_tokens 的截断影响。
+    """
+
+    def __init__(self, fanout_config: Dict[str, Any] = None):
+        """初始化并行生成配置"""
+        self._config = dict(DEFAULT_FANOUT_CONFIG)
+        if fanout_config:
+            self.configure(fanout_config)
+
+    def configure(self, fanout_config: Dict[str, Any]):
+        """更新配置（对应 config.yaml 中 pages.travel_agent.fanout）"""
+        merged = dict(DEFAULT_FANOUT_CONFIG)
+        merged.update(fanout_config or {})
+        self._config = merged
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用按天并行生成"""
+        return bool(self._config.get("enabled", True))
+
+    @property
+    def max_concurrency(self) -> int:
+        """同时生成的天数上限"""
+        return max(int(self._config.get("max_concurrency") or 1), 1)
+
+    def applies(self, num_days: int) -> bool:
+        """该天数的行程是否按天并行生成"""
+        return self.enabled and int(num_days) >= int(self._config.get("min_days") or 2)
+
+    def skeleton_params(self) -> Dict[str, Any]:
+        """骨架调用的采样参数"""
+        return {"temperature": 0.2, "max_tokens": self._config["skeleton_max_tokens"],
+                "response_format": {"type": "json_object"}}
+
+    def day_params(self, itinerary_params: Dict[str, Any]) -> Dict[str, Any]:
+        """每天详细行程的采样参数（其余参数与整体生成相同）"""
+        return {**itinerary_params, "max_tokens": self._config["day_max_tokens"]}
+
+    def merge_ordered(self, producers: List[Callable[[], Iterator[str]]]) -> Generator[str, None, None]:
+        """
+        在线程池中并发运行每天的流式生成，按天的顺序输出
+
+        调用方提前停止读取或某一天失败时，其余各天停止读取上游并不再启动。
+        """
+        queues = [queue.Queue() for _ in producers]
+        stopped = threading.Event()
+
+        def run(index: int):
+            day_queue = queues[index]
+            try:
+                if stopped.is_set():
+                    return
+                stream = producers[index]()
+                try:
+                    for chunk in stream:
+                        if stopped.is_set():
+                            break
+                        day_queue.put(chunk)
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close:
+                        close()
+            except BaseException as e:
+                day_queue.put(_DayFailed(e))
+            finally:
+                day_queue.put(_DayDone)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="itinerary-day")
+        try:
+            for index in range(len(producers)):
+                executor.submit(contextvars.copy_context().run, run, index)
+            for index, day_queue in enumerate(queues):
+                if index:
+                    yield DAY_SEPARATOR
+                while True:
+                    item = day_queue.get()
+                    if item is _DayDone:
+                        break
+                    if isinstance(item, _DayFailed):
+                        raise item.error
+                    yield item
+        finally:
+            stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def amerge_ordered(self, producers: List[Callable[[], AsyncIterator[str]]]) -> AsyncGenerator[str, None]:
+        """merge_ordered 的异步版本"""
+        queues = [asyncio.Queue() for _ in producers]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(index: int):
+            day_queue = queues[index]
+            try:
+                async with semaphore:
+                    async for chunk in producers[index]():
+                        day_queue.put_nowait(chunk)
+            except Exception as e:
+                day_queue.put_nowait(_DayFailed(e))
+            finally:
+                day_queue.put_nowait(_DayDone)
+
+        tasks = [asyncio.create_task(run(index)) for index in range(len(producers))]
+        try:
+            for index, day_queue in enumerate(queues):
+                if index:
+                    yield DAY_SEPARATOR
+                while True:
+                    item = await day_queue.get()
+                    if item is _DayDone:
+                        break
+                    if isinstance(item, _DayFailed):
+                        raise item.error
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# 全局按天并行生成配置
+itinerary_fanout = ItineraryFanout()
@@ -1,33 +1,224 @@
-from typing import Dict, Any, List, Optional, Tuple, Generator
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, Tuple, Generator, Set, Callable
+from openai import OpenAI, BadRequestError
 import re
-import base64
-from io import BytesIO
-from PIL import Image
-from datetime import datetime, timedelta
-from icalendar import Calendar, Event
 import json
+from utils.http_pool import client_registry
+from utils.response_cache import response_cache
+from utils.rate_limiter import rate_governor, estimate_tokens, estimate_prompt_tokens, estimate_text_tokens
+from utils.retry_policy import retry_policy, Deadline
+from utils.llm_metrics import llm_metrics, CallTracker
+from utils.single_flight import single_flight, make_flight_key
+from utils.endpoint_router import endpoint_router
+import time
 
 
 class LLMClient:
     """通用LLM客户端基类"""
     
-    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-turbo"):
+    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-turbo", timeout_profile: str = "default"):
         """初始化LLM客户端"""
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
+        self.timeout_profile = timeout_profile
         
-        # 初始化OpenAI客户端
-        client_kwargs = {
-            "api_key": self.api_key,
-            "timeout": None
-        }
-        
-        if self.base_url:
-            client_kwargs["base_url"] = self.base_url
-            
-        self.client = OpenAI(**client_kwargs)
+        # 从进程级注册表获取共享的OpenAI客户端，复用同一上游的长连接池
+        self.client: OpenAI = client_registry.get_client(self.api_key, self.base_url, self.timeout_profile)
+
+    def stream_chat(self, messages: List[Dict[str, Any]], use_cache: bool = True, deadline: Optional[Deadline] = None,
+                    on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None, **params) -> Generator[str, None, None]:
+        """
+        流式调用对话接口，逐块产出文本
+
+        低温度调用会先查询响应缓存，命中时按原分块回放；完整读完的流才会写入缓存。
+        未命中时与进行中的相同请求合并为一次上游调用。
+        use_cache=False 可跳过缓存与合并；deadline 为本次调用的截止时间（秒数或 Deadline）。
+        每次调用的耗时与用量发送到 llm_metrics；on_metrics 可选，调用结束时收到本次调用的指标记录
+        （调用状态不保存在实例上，工具池会在并发任务间复用同一实例）。
+        """
+        tracker = llm_metrics.track(self.model, self.base_url, "stream", on_metrics)
+        cache_key = response_cache.make_key(self.model, messages, params) if use_cache else None
+        if cache_key:
+            cached_chunks = response_cache.get(cache_key)
+            if cached_chunks is not None:
+                tracker.mark_cached()
+                tracker.mark_first_token()
+                yield from cached_chunks
+                tracker.finish()
+                return
+
+        call_deadline = retry_policy.start(deadline)
+        upstream = lambda: self._stream_upstream(messages, params, call_deadline, tracker)
+        leader = True
+        if use_cache and single_flight.enabled:
+            # 并发的相同请求共享一次上游调用，后加入者先回放已收到的内容
+            subscription = single_flight.stream(make_flight_key("stream", self.base_url, self.model, messages, params), upstream)
+            source, leader = iter(subscription), subscription.leader
+            if not leader:
+                tracker.mark_coalesced()
+        else:
+            source = upstream()
+
+        chunks = []
+        try:
+            for text in source:
+                if not chunks:
+                    tracker.mark_first_token()
+                chunks.append(text)
+                yield text
+        except BaseException as e:
+            # 包括调用方提前停止读取（GeneratorExit）的情况
+            tracker.finish(e)
+            raise
+        tracker.finish()
+
+        if cache_key and leader:
+            response_cache.set(cache_key, chunks)
+
+    def complete_chat(self, messages: List[Dict[str, Any]], use_cache: bool = True, deadline: Optional[Deadline] = None,
+                      on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None, **params) -> str:
+        """非流式调用对话接口，返回完整文本（use_cache=False 可跳过缓存与请求合并）"""
+        tracker = llm_metrics.track(self.model, self.base_url, "complete", on_metrics)
+        cache_key = response_cache.make_key(self.model, messages, params) if use_cache else None
+        if cache_key:
+            cached_chunks = response_cache.get(cache_key)
+            if cached_chunks is not None:
+                tracker.mark_cached()
+                tracker.finish()
+                return "".join(cached_chunks)
+
+        upstream = lambda: self._complete_with_failover(messages, params, deadline, tracker)
+        try:
+            if use_cache and single_flight.enabled:
+                content, leader = single_flight.call(make_flight_key("complete", self.base_url, self.model, messages, params), upstream)
+                if not leader:
+                    tracker.mark_coalesced()
+            else:
+                content, leader = upstream(), True
+        except Exception as e:
+            tracker.finish(e)
+            raise
+        tracker.finish()
+
+        if cache_key and leader:
+            response_cache.set(cache_key, [content])
+        return content
+
+    def _route(self, failed_urls: Set[str]) -> Tuple[OpenAI, Optional[str]]:
+        """选择本次请求的端点，返回 (客户端, 端点地址)；未启用路由时使用客户端自身配置"""
+        endpoint = endpoint_router.choose(self.base_url, self.model, failed_urls)
+        if endpoint is None:
+            return self.client, self.base_url
+        return client_registry.get_client(endpoint["api_key"], endpoint["url"], self.timeout_profile), endpoint["url"]
+
+    def _record_failure(self, base_url: Optional[str], error: BaseException, failed_urls: Set[str]):
+        """记录上游故障，供路由器降低该端点的权重"""
+        if retry_policy.is_retryable(error):
+            endpoint_router.record(base_url, self.model, None, False)
+            failed_urls.add(base_url)
+
+    def _can_failover(self, failed_urls: Set[str]) -> bool:
+        """是否还有其他健康端点可以立即重试"""
+        return endpoint_router.has_alternative(self.base_url, self.model, failed_urls)
+
+    def _stream_upstream(self, messages: List[Dict[str, Any]], params: Dict[str, Any], deadline: Deadline, tracker: CallTracker) -> Generator[str, None, None]:
+        """
+        向上游发起流式请求，按重试策略处理可重试错误
+
+        只有在尚未产出任何内容时才会重试，避免重复输出；启用路由时重试会切换到其他端点。
+        """
+        attempt = 0
+        failed_urls: Set[str] = set()
+        while True:
+            received = False
+            client, base_url = self._route(failed_urls)
+            stream_options = {"include_usage": True} if llm_metrics.wants_stream_usage(base_url) else None
+            try:
+                tracker.start_attempt()
+                tracker.set_endpoint(base_url)
+                # 流式调用在整个读取过程中占用一个并发名额
+                with rate_governor.acquire(base_url, self.model, estimate_tokens(messages, params), deadline) as permit:
+                    tracker.add_queue_wait(permit.wait_time)
+                    request_params = dict(params, stream_options=stream_options) if stream_options else params
+                    requested_at = time.monotonic()
+                    first_token_latency = None
+                    response = client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        stream=True,
+                        timeout=retry_policy.request_timeout(deadline, stream=True),
+                        **request_params
+                    )
+                    completion_parts = []
+                    usage = None
+                    for chunk in retry_policy.watch_stream(response, deadline):
+                        if getattr(chunk, "usage", None):
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content is not None:
+                            if not received:
+                                first_token_latency = time.monotonic() - requested_at
+                            received = True
+                            completion_parts.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                    if usage is not None:
+                        tracker.set_usage(usage.prompt_tokens, usage.completion_tokens)
+                    else:
+                        tracker.set_usage(estimate_prompt_tokens(messages), estimate_text_tokens("".join(completion_parts)), "estimate")
+                    permit.record_usage(tracker.record["total_tokens"])
+                endpoint_router.record(base_url, self.model, first_token_latency, True)
+                return
+            except Exception as e:
+                if stream_options and not received and isinstance(e, BadRequestError):
+                    # 部分兼容接口不支持 stream_options，去掉后立即重发
+                    llm_metrics.mark_stream_usage_unsupported(base_url)
+                    continue
+                self._record_failure(base_url, e, failed_urls)
+                delay = None if received else retry_policy.next_delay(e, attempt, deadline, failover=self._can_failover(failed_urls))
+                if delay is None:
+                    raise
+                print(f"🔁 流式调用失败，{delay:.2f}秒后重试 (第{attempt + 1}次): {e}")
+                time.sleep(delay)
+                attempt += 1
 
+    def _complete_with_failover(self, messages: List[Dict[str, Any]], params: Dict[str, Any], deadline: Optional[Deadline], tracker: CallTracker) -> str:
+        """按重试策略发起非流式请求，启用路由时重试会切换到其他端点"""
+        failed_urls: Set[str] = set()
+        return retry_policy.call(
+            lambda call_deadline: self._complete_upstream(messages, params, call_deadline, tracker, failed_urls),
+            deadline,
+            failover=lambda: self._can_failover(failed_urls)
+        )
 
+    def _complete_upstream(self, messages: List[Dict[str, Any]], params: Dict[str, Any], deadline: Deadline,
+                           tracker: CallTracker, failed_urls: Set[str]) -> str:
+        """向上游发起一次非流式请求"""
+        client, base_url = self._route(failed_urls)
+        tracker.start_attempt()
+        tracker.set_endpoint(base_url)
+        try:
+            with rate_governor.acquire(base_url, self.model, estimate_tokens(messages, params), deadline) as permit:
+                tracker.add_queue_wait(permit.wait_time)
+                requested_at = time.monotonic()
+                response = client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    timeout=retry_policy.request_timeout(deadline),
+                    **params
+                )
+                endpoint_router.record(base_url, self.model, time.monotonic() - requested_at, True)
+                content = response.choices[0].message.content or ""
+                if getattr(response, "usage", None):
+                    tracker.set_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+                else:
+                    tracker.set_usage(estimate_prompt_tokens(messages), estimate_text_tokens(content), "estimate")
+                permit.record_usage(tracker.record["total_tokens"])
+        except Exception as e:
+            self._record_failure(base_url, e, failed_urls)
+            raise
+        return content
 
+    def invalidate_cached_response(self, messages: List[Dict[str, Any]], **params):
+        """删除指定调用的缓存响应，用于响应内容未通过校验的情况"""
+        cache_key = response_cache.make_key(self.model, messages, params)
+        if cache_key:
+            response_cache.delete(cache_key)
@@ -0,0 +1,281 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable
+
+
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    "stream_usage": True,  # 流式调用时请求 stream_options.include_usage 以获取真实用量
+    "memory_max_records": 1000,  # 内存中保留的最近调用记录数
+    "jsonl_path": None  # 非空时将每条记录追加写入该JSONL文件
+}
+
+# 指标记录的字段
+RECORD_FIELDS = ("timestamp", "model", "base_url", "kind", "cached", "coalesced", "success", "error", "attempts",
+                 "queue_wait", "ttft", "latency", "prompt_tokens", "completion_tokens", "total_tokens",
+                 "usage_source", "tokens_per_second")
+
+
+class CallTracker:
+    """单次LLM调用的计时与用量记录器，调用结束时生成一条指标记录"""
+
+    def __init__(self, metrics: "LLMMetrics", model: str, base_url: Optional[str], kind: str,
+                 on_finish: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._metrics = metrics
+        self._on_finish = on_finish
+        self._started = time.monotonic()
+        self._first_token_at: Optional[float] = None
+        self._finished = False
+        self.record: Dict[str, Any] = {
+            "timestamp": time.time(),
+            "model": model,
+            "base_url": base_url,
+            "kind": kind,
+            "cached": False,
+            "coalesced": False,
+            "success": False,
+            "error": None,
+            "attempts": 0,
+            "queue_wait": 0.0,
+            "ttft": None,
+            "latency": None,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "total_tokens": None,
+            "usage_source": None,
+            "tokens_per_second": None
+        }
+
+    def start_attempt(self):
+        """开始一次上游请求（含重试）"""
+        self.record["attempts"] += 1
+
+    def set_endpoint(self, base_url: Optional[str]):
+        """记录实际请求的端点（启用路由时可能与客户端配置不同）"""
+        self.record["base_url"] = base_url
+
+    def add_queue_wait(self, wait_time: float):
+        """累加限流排队等待时间"""
+        self.record["queue_wait"] += wait_time
+
+    def mark_first_token(self):
+        """记录首个token到达时间"""
+        if self._first_token_at is None:
+            self._first_token_at = time.monotonic()
+            self.record["ttft"] = self._first_token_at - self._started
+
+    def set_usage(self, prompt_tokens: Optional[int], completion_tokens: Optional[int], source: str = "provider"):
+        """记录令牌用量；source 为 provider（上游返回）或 estimate（本地估算）"""
+        self.record["prompt_tokens"] = prompt_tokens
+        self.record["completion_tokens"] = completion_tokens
+        self.record["total_tokens"] = (prompt_tokens or 0) + (completion_tokens or 0)
+        self.record["usage_source"] = source
+
+    def mark_cached(self):
+        """标记为缓存命中"""
+        self.record["cached"] = True
+
+    def mark_coalesced(self):
+        """标记为与进行中的相同请求合并（未单独调用上游）"""
+        self.record["coalesced"] = True
+
+    def finish(self, error: Optional[BaseException] = None):
+        """结束计时并提交记录（重复调用只提交一次）"""
+        if self._finished:
+            return
+        self._finished = True
+        now = time.monotonic()
+        self.record["latency"] = now - self._started
+        self.record["success"] = error is None
+        if error is not None:
+            self.record["error"] = f"{type(error).__name__}: {error}"
+
+        # 输出速度按首token之后的生成时间计算，非流式调用按整体耗时计算
+        completion_tokens = self.record["completion_tokens"]
+        generation_started = self._first_token_at if self.record["kind"] == "stream" else self._started
+        if completion_tokens and generation_started is not None and now > generation_started:
+            self.record["tokens_per_second"] = completion_tokens / (now - generation_started)
+
+        self._metrics.emit(self.record)
+        if self._on_finish is not None:
+            # 调用方的单次回调（例如页面显示本次调用的指标），不受指标收集开关影响
+            try:
+                self._on_finish(dict(self.record))
+            except Exception as e:
+                print(f"⚠️ 调用指标回调出错: {e}")
+
+
+class MemorySink:
+    """保存最近调用记录的内存环形缓冲区"""
+
+    def __init__(self, max_records: int = 1000):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=max_records)
+
+    def __call__(self, record: Dict[str, Any]):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """按时间顺序返回记录副本"""
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        """清空记录"""
+        with self._lock:
+            self._records.clear()
+
+
+class JsonlSink:
+    """将调用记录逐行追加写入JSONL文件，便于离线做容量规划与模型对比"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100.0) - 1))
+    return ordered[index]
+
+
+class LLMMetrics:
+    """
+    LLM调用指标收集器。
+
+    每次调用产生一条记录（排队等待、首token延迟、总耗时、输出速度、输入/输出令牌数），
+    分发给已注册的所有sink。sink 为任意接收记录字典的可调用对象。
+    """
+
+    def __init__(self, metrics_config: Dict[str, Any] = None):
+        """初始化指标收集器"""
+        self._lock = threading.Lock()
+        self._config = dict(DEFAULT_METRICS_CONFIG)
+        self._memory_sink = MemorySink(self._config["memory_max_records"])
+        self._file_sink: Optional[JsonlSink] = None
+        self._sinks: List[Callable[[Dict[str, Any]], None]] = []
+        self._stream_usage_unsupported = set()
+        if metrics_config:
+            self.configure(metrics_config)
+
+    def configure(self, metrics_config: Dict[str, Any]):
+        """更新指标配置（对应 config.yaml 中的 api.metrics）"""
+        with self._lock:
+            merged = dict(DEFAULT_METRICS_CONFIG)
+            merged.update(metrics_config or {})
+            if merged["memory_max_records"] != self._config["memory_max_records"]:
+                self._memory_sink = MemorySink(merged["memory_max_records"])
+            jsonl_path = merged.get("jsonl_path")
+            if not jsonl_path:
+                self._file_sink = None
+            elif self._file_sink is None or self._file_sink.path != jsonl_path:
+                self._file_sink = JsonlSink(jsonl_path)
+            self._config = merged
+
+    @property
+    def enabled(self) -> bool:
+        """指标收集是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    def add_sink(self, sink: Callable[[Dict[str, Any]], None]):
+        """注册自定义sink"""
+        with self._lock:
+            if sink not in self._sinks:
+                self._sinks.append(sink)
+
+    def remove_sink(self, sink: Callable[[Dict[str, Any]], None]):
+        """移除自定义sink"""
+        with self._lock:
+            if sink in self._sinks:
+                self._sinks.remove(sink)
+
+    def track(self, model: str, base_url: Optional[str], kind: str,
+              on_finish: Optional[Callable[[Dict[str, Any]], None]] = None) -> CallTracker:
+        """为一次调用创建记录器，kind 为 stream 或 complete；on_finish 在调用结束时收到本次记录"""
+        return CallTracker(self, model, base_url, kind, on_finish)
+
+    def emit(self, record: Dict[str, Any]):
+        """分发一条调用记录，单个sink出错不影响调用本身"""
+        if not self.enabled:
+            return
+        with self._lock:
+            sinks = [self._memory_sink] + ([self._file_sink] if self._file_sink else []) + list(self._sinks)
+        for sink in sinks:
+            try:
+                sink(dict(record))
+            except Exception as e:
+                print(f"⚠️ 指标sink写入失败: {e}")
+
+    def wants_stream_usage(self, base_url: Optional[str]) -> bool:
+        """流式调用是否应请求 include_usage"""
+        return bool(self._config.get("stream_usage", True)) and (base_url or "") not in self._stream_usage_unsupported
+
+    def mark_stream_usage_unsupported(self, base_url: Optional[str]):
+        """记录上游不支持 stream_options，之后对该上游改用本地估算"""
+        with self._lock:
+            self._stream_usage_unsupported.add(base_url or "")
+        print(f"⚠️ 上游 {base_url or 'default'} 不支持 stream_options，改用本地估算令牌数")
+
+    def recent(self, limit: int = None) -> List[Dict[str, Any]]:
+        """获取最近的调用记录"""
+        records = self._memory_sink.records()
+        return records[-limit:] if limit else records
+
+    def summarize(self, group_by: str = "model") -> Dict[str, Dict[str, Any]]:
+        """
+        按字段分组汇总最近的调用记录
+
+        Returns:
+            Dict: 分组 -> {calls, errors, cache_hits, ttft/latency 的p50/p95, 平均输出速度, 令牌合计}
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self._memory_sink.records():
+            groups.setdefault(str(record.get(group_by)), []).append(record)
+
+        summary = {}
+        for name, records in groups.items():
+            upstream = [r for r in records if not r["cached"] and not r.get("coalesced") and r["success"]]
+            ttfts = [r["ttft"] for r in upstream if r["ttft"] is not None]
+            latencies = [r["latency"] for r in upstream]
+            speeds = [r["tokens_per_second"] for r in upstream if r["tokens_per_second"]]
+            summary[name] = {
+                "calls": len(records),
+                "errors": sum(1 for r in records if not r["success"]),
+                "cache_hits": sum(1 for r in records if r["cached"]),
+                "coalesced": sum(1 for r in records if r.get("coalesced")),
+                "avg_queue_wait": sum(r["queue_wait"] for r in upstream) / len(upstream) if upstream else 0.0,
+                "ttft_p50": _percentile(ttfts, 50),
+                "ttft_p95": _percentile(ttfts, 95),
+                "latency_p50": _percentile(latencies, 50),
+                "latency_p95": _percentile(latencies, 95),
+                "avg_tokens_per_second": sum(speeds) / len(speeds) if speeds else None,
+                "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in upstream),
+                "completion_tokens": sum(r["completion_tokens"] or 0 for r in upstream)
+            }
+        return summary
+
+    def clear(self):
+        """清空内存中的记录"""
+        self._memory_sink.clear()
+
+
+# 全局指标收集器实例
+llm_metrics = LLMMetrics()
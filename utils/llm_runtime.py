@@ -0,0 +1,56 @@
+from utils.http_pool import client_registry
+from utils.response_cache import response_cache
+from utils.rate_limiter import rate_governor
+from utils.retry_policy import retry_policy
+from utils.llm_metrics import llm_metrics
+from utils.single_flight import single_flight
+from utils.endpoint_router import endpoint_router
+from utils.plan_cache import plan_cache
+from utils.itinerary_cache import itinerary_cache
+from utils.itinerary_fanout import itinerary_fanout
+from utils.structured_itinerary import structured_itinerary
+from utils.tool_pool import tool_pool
+from utils.intent_router import intent_router
+from utils.speculation import speculator
+from utils.mcp_client import MCPAgentLLM
+
+
+def configure_llm_runtime(config_manager):
+    """
+    按配置初始化进程级的LLM运行时（连接池、缓存、限流、重试、指标、路由等全局实例）
+
+    Streamlit 应用与命令行批处理共用，同一进程内的所有调用共享这些实例。
+    """
+    pool_config = config_manager.get_http_pool_config()
+    client_registry.configure(pool_config)
+    response_cache.configure(config_manager.get_response_cache_config())
+    rate_governor.configure(config_manager.get_rate_limit_config())
+    retry_policy.configure(config_manager.get_retry_config())
+    llm_metrics.configure(config_manager.get_metrics_config())
+    single_flight.configure(config_manager.get_single_flight_config())
+    endpoint_router.configure(config_manager.get_routing_config())
+    plan_cache.configure(config_manager.get_plan_cache_config())
+    itinerary_cache.configure(config_manager.get_itinerary_cache_config())
+    itinerary_fanout.configure(config_manager.get_itinerary_fanout_config())
+    structured_itinerary.configure(config_manager.get_structured_itinerary_config())
+    tool_pool.configure(config_manager.get_tool_pool_config())
+    intent_router.configure(config_manager.get_intent_router_config())
+    speculator.configure(config_manager.get_speculation_config())
+
+    # 可选：启动时预连接所有配置的上游服务
+    if pool_config.get("warmup", False):
+        base_urls = [config_manager.get_base_url()]
+        base_urls += [url_config.get("url", "") for url_config in config_manager.get_base_urls()]
+        client_registry.warmup(list(dict.fromkeys(base_urls)))
+
+    # 可选：启动时预先创建MCP可调度的工具实例
+    if tool_pool.warmup_enabled:
+        mcp_config = config_manager.get_page_config("mcp_agent")
+        MCPAgentLLM(
+            api_key=config_manager.get_api_key("mcp_agent"),
+            base_url=config_manager.get_base_url("mcp_agent"),
+            model=mcp_config.get("default_model"),
+            tool_config=mcp_config.get("available_tools")
+        ).warmup_tools(config_manager)
+
+    return client_registry
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, AsyncGenerator, Generator, Iterable, Optional, Tuple, Union
+
+
+DEFAULT_BATCH_CONFIG = {
+    "concurrency": 4,  # 同时执行的目标数
+    "output_path": ".cache/mcp_batch_results.jsonl",  # 结果JSONL，同时作为断点续跑的检查点
+    "resume": True  # 跳过输出文件中已有结果的目标
+}
+
+# 等待执行的目标数上限为并发数的倍数，输入按需读取，不会一次性载入内存
+PENDING_FACTOR = 2
+
+GoalInput = Union[str, Dict[str, Any]]
+
+
+def load_goals(path: str) -> Generator[Dict[str, Any], None, None]:
+    """
+    逐行读取JSONL格式的目标
+
+    每行为目标字符串，或 {"goal": ..., "id": 可选, "context": 可选} 对象；无效的行会被跳过。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield normalize_goal_record(json.loads(line), line_number)
+            except (json.JSONDecodeError, ValueError) as e:
+                print(f"⚠️ 跳过第 {line_number} 行: {e}")
+
+
+def normalize_goal_record(item: GoalInput, index: int) -> Dict[str, Any]:
+    """把输入的目标整理为 {"id", "goal", "context"}，未指定id时使用序号（JSONL输入为行号）"""
+    if isinstance(item, str):
+        item = {"goal": item}
+    if not isinstance(item, dict) or not isinstance(item.get("goal"), str) or not item["goal"].strip():
+        raise ValueError("缺少目标 goal")
+    context = item.get("context") or {}
+    if not isinstance(context, dict):
+        raise ValueError("context 必须是对象")
+    return {"id": str(item.get("id", index)), "goal": item["goal"].strip(), "context": context}
+
+
+def batch_key(record: Dict[str, Any]) -> str:
+    """目标的去重键：目标与上下文完全相同的记录视为同一目标"""
+    payload = json.dumps({"goal": record["goal"], "context": record["context"]}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class BatchCheckpoint:
+    """
+    批处理结果文件：每完成一个目标追加一行并立即落盘，同时作为断点续跑的检查点。
+
+    续跑时读取已有结果，跳过已完成的目标；进程崩溃时写了一半的最后一行会被截掉。
+    """
+
+    def __init__(self, path: str, resume: bool = True):
+        self.path = path
+        self.done_ids = set()
+        self.done_keys: Dict[str, str] = {}  # 去重键 -> 首个已执行记录的id
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+        elif os.path.exists(path):
+            open(path, "w", encoding="utf-8").close()
+
+    def _load(self):
+        """读取已完成的结果，并截掉不完整的尾行"""
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid_size += len(line)
+                self.done_ids.add(record.get("id"))
+                if record.get("key") and "duplicate_of" not in record:
+                    self.done_keys.setdefault(record["key"], record.get("id"))
+        if valid_size < os.path.getsize(self.path):
+            print(f"⚠️ 检查点尾部不完整，已截断到 {valid_size} 字节")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+        print(f"📂 从检查点恢复: 已完成 {len(self.done_ids)} 个目标")
+
+    def write(self, record: Dict[str, Any]):
+        """追加一条结果并落盘"""
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BatchRun:
+    """
+    一次批处理的去重与记录状态。
+
+    完全相同的目标只执行一次，之后出现的重复目标输出 duplicate_of 指向首次执行的记录；
+    已写入检查点的目标（包括重复目标）在续跑时跳过。
+    """
+
+    def __init__(self, checkpoint: Optional[BatchCheckpoint] = None):
+        self.checkpoint = checkpoint
+        self._first_ids: Dict[str, str] = dict(checkpoint.done_keys) if checkpoint else {}
+        self._done_ids = set(checkpoint.done_ids) if checkpoint else set()
+        self.stats = {"total": 0, "executed": 0, "duplicates": 0, "skipped": 0, "failed": 0}
+
+    def admit(self, record: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        判断输入记录的处理方式
+
+        Returns:
+            Tuple[str, Optional[Dict]]: ("skip", None) 已有结果；("duplicate", 输出记录) 与之前的目标重复；
+            ("run", None) 需要执行
+        """
+        self.stats["total"] += 1
+        if record["id"] in self._done_ids:
+            self.stats["skipped"] += 1
+            return "skip", None
+        record["key"] = batch_key(record)
+        first_id = self._first_ids.get(record["key"])
+        if first_id is not None:
+            self.stats["duplicates"] += 1
+            return "duplicate", self.finish({"id": record["id"], "goal": record["goal"], "key": record["key"], "duplicate_of": first_id})
+        self._first_ids[record["key"]] = record["id"]
+        return "run", None
+
+    def finish(self, output: Dict[str, Any]) -> Dict[str, Any]:
+        """记录一条输出并写入检查点"""
+        self._done_ids.add(output["id"])
+        if "duplicate_of" not in output:
+            self.stats["executed"] += 1
+            if "error" in output:
+                self.stats["failed"] += 1
+        if self.checkpoint is not None:
+            self.checkpoint.write(output)
+        return output
+
+
+def build_output(record: Dict[str, Any], started: float, plan: list = None, result: str = None,
+                 error: Exception = None) -> Dict[str, Any]:
+    """组装一个目标的输出记录"""
+    output = {"id": record["id"], "goal": record["goal"], "key": record["key"]}
+    if error is not None:
+        output["error"] = str(error)
+    else:
+        output["plan"] = plan
+        output["result"] = json.loads(result)
+    output["elapsed"] = round(time.perf_counter() - started, 3)
+    return output
+
+
+def iter_goal_records(goals: Iterable[GoalInput]) -> Generator[Dict[str, Any], None, None]:
+    """整理输入的目标（已整理的记录保持不变），无效的目标会被跳过"""
+    for index, item in enumerate(goals, 1):
+        try:
+            yield normalize_goal_record(item, index)
+        except ValueError as e:
+            print(f"⚠️ 跳过第 {index} 个目标: {e}")
+
+
+def run_batch(agent, goals: Iterable[GoalInput], config_manager, concurrency: int = 4, output_path: str = None,
+              resume: bool = True, planning_deadline: float = None, deadline: float = None) -> Generator[Dict[str, Any], None, None]:
+    """
+    并发执行一批目标，按完成顺序产出每个目标的输出记录
+
+    进程内的缓存、连接池、工具实例池与限流器都是全局实例，批内所有目标共享。
+
+    Args:
+        agent: MCPAgentLLM 实例
+        goals: 目标字符串或 {"goal", "id", "context"} 对象，可以是按需读取的迭代器
+        concurrency: 同时执行的目标数
+        output_path: 结果JSONL文件，每完成一个目标立即追加；为空时不写文件
+        resume: 是否跳过 output_path 中已有结果的目标
+        planning_deadline / deadline: 每个目标的规划与执行时间预算（秒）
+    """
+    batch = BatchRun(BatchCheckpoint(output_path, resume) if output_path else None)
+    concurrency = max(1, int(concurrency))
+
+    def run_goal(record: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            plan, result = agent.plan_and_execute(record["goal"], config_manager, dict(record["context"]), planning_deadline, deadline)
+            return build_output(record, started, plan, result)
+        except Exception as e:
+            return build_output(record, started, error=e)
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="mcp-batch") as executor:
+        for record in iter_goal_records(goals):
+            action, output = batch.admit(record)
+            if action == "duplicate":
+                yield output
+            elif action == "run":
+                pending.add(executor.submit(run_goal, record))
+                while len(pending) >= concurrency * PENDING_FACTOR:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        yield batch.finish(future.result())
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield batch.finish(future.result())
+
+    print(f"📦 批处理完成: {batch.stats}")
+
+
+async def run_batch_async(agent, goals: Iterable[GoalInput], config_manager, concurrency: int = 4, output_path: str = None,
+                          resume: bool = True, planning_deadline: float = None,
+                          deadline: float = None) -> AsyncGenerator[Dict[str, Any], None]:
+    """run_batch 的异步版本：agent 为 AsyncMCPAgentLLM，所有目标在同一个事件循环中并发执行"""
+    batch = BatchRun(BatchCheckpoint(output_path, resume) if output_path else None)
+    concurrency = max(1, int(concurrency))
+
+    async def run_goal(record: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            plan, result = await agent.plan_and_execute(record["goal"], config_manager, dict(record["context"]), planning_deadline, deadline)
+            return build_output(record, started, plan, result)
+        except Exception as e:
+            return build_output(record, started, error=e)
+
+    pending = set()
+    try:
+        for record in iter_goal_records(goals):
+            action, output = batch.admit(record)
+            if action == "duplicate":
+                yield output
+            elif action == "run":
+                pending.add(asyncio.create_task(run_goal(record)))
+                while len(pending) >= concurrency:
+                    finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for job in finished:
+                        yield batch.finish(job.result())
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for job in finished:
+                yield batch.finish(job.result())
+    finally:
+        for job in pending:
+            job.cancel()
+
+    print(f"📦 批处理完成: {batch.stats}")
+
+
+def main(argv=None):
+    """命令行入口：python -m utils.mcp_batch goals.jsonl [-o results.jsonl]"""
+    # 在函数内导入，避免 mcp_client 导入本模块时循环导入
+    from config import config_manager
+    from utils.llm_runtime import configure_llm_runtime
+    from utils.mcp_client import MCPAgentLLM
+
+    page_config = config_manager.get_page_config("mcp_agent")
+    batch_config = dict(DEFAULT_BATCH_CONFIG)
+    batch_config.update(config_manager.get_batch_config())
+
+    parser = argparse.ArgumentParser(description="批量执行MCP目标（JSONL输入，JSONL输出，支持断点续跑）")
+    parser.add_argument("input", help="目标JSONL文件，每行为目标字符串或 {\"goal\", \"id\", \"context\"} 对象")
+    parser.add_argument("-o", "--output", default=batch_config["output_path"], help="结果JSONL文件")
+    parser.add_argument("-c", "--concurrency", type=int, default=batch_config["concurrency"], help="同时执行的目标数")
+    parser.add_argument("--no-resume", action="store_true", help="忽略并覆盖已有的结果文件")
+    args = parser.parse_args(argv)
+
+    configure_llm_runtime(config_manager)
+    agent = MCPAgentLLM(
+        api_key=config_manager.get_api_key("mcp_agent"),
+        base_url=config_manager.get_base_url("mcp_agent"),
+        model=page_config.get("default_model"),
+        tool_config=page_config.get("available_tools"),
+        max_parallel_tasks=page_config.get("max_parallel_tasks", 4),
+        context_config=page_config.get("dependency_context"),
+        task_timeout=page_config.get("task_timeout")
+    )
+
+    resume = batch_config["resume"] and not args.no_resume
+    for output in agent.run_batch(load_goals(args.input), config_manager, args.concurrency, args.output, resume,
+                                  page_config.get("planning_budget"), page_config.get("execution_budget")):
+        status = "🔁" if "duplicate_of" in output else ("❌" if "error" in output else "✅")
+        print(f"{status} {output['id']}: {output['goal'][:40]}")
+
+
+if __name__ == "__main__":
+    main()
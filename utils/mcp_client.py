@@ -1,98 +1,106 @@
-
 # ==============================================================================
 # +++ 新增: MCP Agent 的完整实现 +++
 # ==============================================================================
 
-from typing import Dict, Any, List, Optional, Tuple, Generator
-from openai import OpenAI
-import re
-import base64
-from io import BytesIO
-from PIL import Image
-from datetime import datetime, timedelta
-from icalendar import Calendar, Event
+from typing import Dict, Any, List, Optional, Tuple, Generator, AsyncGenerator, Callable, Awaitable, Iterable
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import inspect
 import json
 from utils.llm_client import LLMClient
-from utils.travel_planner_llm import TravelPlannerLLM
-from utils.vision_llm_client import VisionLLMClient
-from utils.readme_client import ReadmeViewerLLM
+from utils.async_llm_client import AsyncLLMClient
+from utils.retry_policy import Deadline, deadline_scope
+from utils.plan_stream_parser import PlanStreamParser
+from utils.plan_cache import plan_cache
+from utils.intent_router import intent_router
+from utils.result_store import ResultStore, TaskContext, DEFAULT_DEPENDENCY_CONTEXT_CONFIG
+from utils.speculation import Speculation, speculator
+from utils.task_run import PlanRun, TaskRun, TIMED_OUT
+from utils.mcp_batch import GoalInput, run_batch, run_batch_async
+from utils.tool_pool import tool_pool
+from utils.tool_registry import tool_registry
+from utils.trip_slots import trip_slot_extractor
+from utils.task_args import (
+    coerce_task_args, describe_task_args, build_travel_parse_messages, parse_json_args, task_arg_extractor
+)
+from utils.mcp_events import (
+    emit_event, token_forwarder, iter_events, aiter_events,
+    TASK_PLANNED, PLAN_READY, TASK_STARTED, TASK_FINISHED, TASK_FAILED, COMPLETED
+)
+from utils.task_scheduler import (
+    TaskScheduler, AsyncTaskScheduler, task_dependencies, find_missing_dependencies, find_dependency_cycle
+)
 
-class MCPAgentLLM(LLMClient):
-    """
-    Master Control Program, 负责规划和调度其他Agent。
-    """
-    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-max", tool_config: dict = None):
-        super().__init__(api_key, base_url, model)
+
+class MCPAgentMixin:
+    """MCP 规划提示词、计划校验与工具解析逻辑，由同步和异步客户端共享"""
+
+    def _init_tools(self, tool_config: dict = None, max_parallel_tasks: int = 4, context_config: dict = None,
+                    task_timeout: float = None):
+        """初始化工具配置、并行执行参数、依赖上下文的压缩参数与任务超时"""
         self.tool_config = tool_config or {
             "travel_planner": {
                 "description": "专业旅行规划师，能够制定详细的旅行计划、推荐景点和安排行程",
-                "class": "TravelPlannerLLM", 
-                "page": "travel_agent"
+                "class": "utils.travel_planner_llm.TravelPlannerLLM",
+                "async_class": "utils.travel_planner_llm.AsyncTravelPlannerLLM",
+                "page": "travel_agent",
+                "args": {
+                    "destination": {"type": "string", "description": "目的地城市"},
+                    "days": {"type": "integer", "minimum": 1, "maximum": 30, "description": "旅行天数"}
+                }
             },
             "vision_analyzer": {
                 "description": "图像识别专家，能够分析图片内容、识别物体和场景",
-                "class": "VisionLLMClient",
-                "page": "image_recognition"  
+                "class": "utils.vision_llm_client.VisionLLMClient",
+                "async_class": "utils.vision_llm_client.AsyncVisionLLMClient",
+                "page": "image_recognition",
+                "args": {
+                    "analysis_type": {"type": "string", "enum": ["simple", "detailed", "comprehensive"], "description": "分析详细程度"},
+                    "image": {"type": "string", "description": "上下文中图片路径的键名，默认 image_path"}
+                }
             },
             "readme_viewer":{
                 "description": "一个专业的文档介绍员，可以查看和解释项目说明文档内容。",
-                "class": "ReadmeViewerLLM", # 假设这是图像识别的类名
+                "class": "utils.readme_client.ReadmeViewerLLM",
                 "page": "readme"
             }
         }
-        # --- 修改: 动态加载工具类，确保类名与 config.yaml 中配置的一致 ---
-        self.tool_classes = {
-            "TravelPlannerLLM": TravelPlannerLLM,
-            "VisionLLMClient": VisionLLMClient,
-            "ReadmeViewerLLM": ReadmeViewerLLM
+        # 工具类按 tool_config 中的导入路径在首次使用时加载（见 utils.tool_registry）
+        # 并行执行：总并发数与单个工具的并发上限（available_tools 中的 max_concurrency）
+        self.max_parallel_tasks = max(1, int(max_parallel_tasks or 1))
+        self.tool_limits = {
+            name: info["max_concurrency"]
+            for name, info in self.tool_config.items() if info.get("max_concurrency")
+        }
+        self._results_lock = threading.Lock()
+        # 任务超时：available_tools 中单个工具的 timeout 优先，否则使用默认的 task_timeout（秒）
+        self.task_timeout = task_timeout
+        self.tool_timeouts = {
+            name: info["timeout"]
+            for name, info in self.tool_config.items() if info.get("timeout")
+        }
+        # 正在执行的计划（每次 execute_plan / plan_and_execute 调用各自一个），cancel() 时全部停止
+        self._plan_runs = set()
+        # 依赖结果注入下游任务时的令牌预算与压缩方式
+        self.context_config = dict(DEFAULT_DEPENDENCY_CONTEXT_CONFIG)
+        self.context_config.update(context_config or {})
+        # 规划调用的采样参数
+        self.planning_params = {
+            "temperature": 0.1,
+            "response_format": {"type": "json_object"}
         }
 
-    def execute_task(self, task_description: str, context: dict, config_manager=None) -> str:
-        """
-        作为工具被MCP调用时执行的具体任务。
-        task_description: MCP分配的具体指令, e.g., "为去巴黎的5日游制定一个行程"
-        context: 任务上下文，可能包含前置任务的结果
-        config_manager: 配置管理器实例
-        """
-        print(f"🧠 MCPAgentLLM 正在执行: {task_description}")
-        
-        # 生成计划
-        plan = self.plan(task_description, context)
-        print(f"📋 生成的计划: {plan}")
-        
-        # 如果计划为空或失败，尝试使用LLM解析任务描述
-        if not plan or (isinstance(plan, list) and len(plan) == 0):
-            print("⚠️ 计划为空，尝试使用LLM解析任务描述...")
-            parsed_info = self._parse_task_with_llm(task_description)
-            if parsed_info and 'destination' in parsed_info and 'days' in parsed_info:
-                destination = parsed_info['destination']
-                days = parsed_info['days']
-                if destination and days:
-                    # 创建一个备用计划
-                    plan = [{
-                        "task_id": "task_1",
-                        "description": f"为{destination}的{days}日游制定详细行程",
-                        "tool": "travel_planner",
-                        "dependencies": []
-                    }]
-                    print(f"✅ 使用LLM解析结果创建备用计划: {plan}")
-        
-        # 执行计划
-        result = self.execute_plan(plan, config_manager, context)
-        
-        # 转换为JSON字符串返回
-        return json.dumps(result, indent=2, ensure_ascii=False)
-
-    def plan(self, goal: str, context: dict = None) -> list:
-        """
-        使用 LLM 将用户目标分解为具体任务步骤。
-        """
+    def build_planning_messages(self, goal: str, context: dict = None) -> List[Dict[str, Any]]:
+        """构建规划请求的对话消息"""
         tool_descriptions = "".join([
-            f"- {name}: {info['description']}" 
+            f"- {name}: {info['description']}" + (f"（参数: {describe_task_args(info['args'])}）" if info.get("args") else "")
             for name, info in self.tool_config.items()
         ])
-        
-        context_str = f"初始上下文: {json.dumps(context, ensure_ascii=False)}\n" if context else ""
+
+        context_str = f"初始上下文: {json.dumps(dict(context), ensure_ascii=False, default=str)}\n" if context else ""
 
         planning_prompt = f"""
 你是超级智能助理 (MCP)，根据用户目标生成执行计划。
@@ -111,7 +119,8 @@ class MCPAgentLLM(LLMClient):
     "task_id": "task_1",
     "description": "具体任务描述",
     "tool": "travel_planner",
-    "dependencies": []
+    "dependencies": [],
+    "args": {{}}
     }}
 ]
 }}
@@ -120,127 +129,107 @@ class MCPAgentLLM(LLMClient):
 1. 必须返回有效的JSON对象
 2. 顶层必须有"plan"键
 3. plan的值必须是数组
-4. 每个任务必须包含所有4个字段
+4. 每个任务必须包含 task_id、description、tool、dependencies 4个字段
 5. dependencies必须是数组格式
 6. tool必须是: {', '.join(self.tool_config.keys())}
+7. 工具列出了参数时，在 args 中给出从目标中确定的参数值，无法确定的参数省略
 
 示例：对于旅行规划，返回：
 {{
 "plan": [
     {{
-    "task_id": "task_1", 
+    "task_id": "task_1",
     "description": "为合肥的2日游制定详细行程",
     "tool": "travel_planner",
-    "dependencies": []
+    "dependencies": [],
+    "args": {{"destination": "合肥", "days": 2}}
     }}
 ]
 }}
 """
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                print(f"🤖 尝试生成计划 (第{attempt + 1}次)...")
-                
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": planning_prompt}],
-                    temperature=0.1,
-                    response_format={"type": "json_object"}
-                )
-                
-                content = response.choices[0].message.content.strip()
-                print(f"🤖 LLM 原始返回: {content}")
-                
-                # 尝试解析JSON
-                try:
-                    plan_data = json.loads(content)
-                    print(f"✅ JSON解析成功: {type(plan_data)}")
-                except json.JSONDecodeError as e:
-                    print(f"❌ JSON 解析失败: {e}")
-                    if attempt == max_retries - 1:
-                        return self._create_fallback_plan(goal, context)
-                    continue
-                
-                # 验证结构
-                if not isinstance(plan_data, dict):
-                    print(f"❌ 返回不是字典: {type(plan_data)}")
-                    if attempt == max_retries - 1:
-                        return self._create_fallback_plan(goal, context)
-                    continue
-                    
-                if "plan" not in plan_data:
-                    print("❌ 缺少 'plan' 键")
-                    if attempt == max_retries - 1:
-                        return self._create_fallback_plan(goal, context)
-                    continue
-                    
-                plan_list = plan_data["plan"]
-                if not isinstance(plan_list, list):
-                    print(f"❌ 'plan' 不是数组: {type(plan_list)}")
-                    if attempt == max_retries - 1:
-                        return self._create_fallback_plan(goal, context)
-                    continue
-                
-                # 验证每个任务
-                validated_plan = []
-                for i, task in enumerate(plan_list):
-                    if not isinstance(task, dict):
-                        print(f"❌ 任务 {i} 不是字典: {type(task)}")
-                        continue
-                        
-                    required_fields = ['task_id', 'description', 'tool', 'dependencies']
-                    missing_fields = [f for f in required_fields if f not in task]
-                    if missing_fields:
-                        print(f"❌ 任务 {i} 缺少字段: {missing_fields}")
-                        continue
-                    
-                    # 验证并修正字段类型
-                    task['task_id'] = str(task['task_id'])
-                    task['description'] = str(task['description'])
-                    task['tool'] = str(task['tool'])
-                    
-                    # 修正 dependencies
-                    deps = task.get("dependencies", [])
-                    if isinstance(deps, (int, str)):
-                        task["dependencies"] = [] if deps in [0, "0", ""] else [str(deps)]
-                    elif not isinstance(deps, list):
-                        task["dependencies"] = []
-                    else:
-                        # 确保依赖项都是字符串
-                        task["dependencies"] = [str(d) for d in deps]
-                    
-                    # 验证工具名称
-                    if task["tool"] not in self.tool_config:
-                        print(f"❌ 未知工具: {task['tool']}")
-                        continue
-                        
-                    validated_plan.append(task)
-                
-                if validated_plan:
-                    print(f"✅ 验证通过，共 {len(validated_plan)} 个任务")
-                    return validated_plan
-                else:
-                    print("❌ 没有有效任务")
-                    if attempt == max_retries - 1:
-                        return self._create_fallback_plan(goal, context)
-                        
-            except Exception as e:
-                print(f"❌ 计划生成失败 (尝试{attempt + 1}): {e}")
-                if attempt == max_retries - 1:
-                    return self._create_fallback_plan(goal, context)
-        
-        return self._create_fallback_plan(goal, context)
+        return [{"role": "user", "content": planning_prompt}]
+
+    def _parse_plan_content(self, content: str) -> list:
+        """解析并校验LLM返回的计划JSON，失败时返回空列表"""
+        # 尝试解析JSON
+        try:
+            plan_data = json.loads(content)
+            print(f"✅ JSON解析成功: {type(plan_data)}")
+        except json.JSONDecodeError as e:
+            print(f"❌ JSON 解析失败: {e}")
+            return []
+
+        # 验证结构
+        if not isinstance(plan_data, dict):
+            print(f"❌ 返回不是字典: {type(plan_data)}")
+            return []
+
+        if "plan" not in plan_data:
+            print("❌ 缺少 'plan' 键")
+            return []
+
+        plan_list = plan_data["plan"]
+        if not isinstance(plan_list, list):
+            print(f"❌ 'plan' 不是数组: {type(plan_list)}")
+            return []
+
+        # 验证每个任务
+        validated_plan = []
+        for i, task in enumerate(plan_list):
+            validated_task = self._validate_task(task, i)
+            if validated_task is not None:
+                validated_plan.append(validated_task)
+
+        if not validated_plan:
+            print("❌ 没有有效任务")
+        return validated_plan
+
+    def _validate_task(self, task: Any, index: int) -> Optional[dict]:
+        """校验并修正单个任务，无效时返回None"""
+        if not isinstance(task, dict):
+            print(f"❌ 任务 {index} 不是字典: {type(task)}")
+            return None
+
+        required_fields = ['task_id', 'description', 'tool', 'dependencies']
+        missing_fields = [f for f in required_fields if f not in task]
+        if missing_fields:
+            print(f"❌ 任务 {index} 缺少字段: {missing_fields}")
+            return None
 
+        # 验证并修正字段类型
+        task['task_id'] = str(task['task_id'])
+        task['description'] = str(task['description'])
+        task['tool'] = str(task['tool'])
 
+        # 修正 dependencies
+        deps = task.get("dependencies", [])
+        if isinstance(deps, (int, str)):
+            task["dependencies"] = [] if deps in [0, "0", ""] else [str(deps)]
+        elif not isinstance(deps, list):
+            task["dependencies"] = []
+        else:
+            # 确保依赖项都是字符串
+            task["dependencies"] = [str(d) for d in deps]
+
+        # 验证工具名称
+        if task["tool"] not in self.tool_config:
+            print(f"❌ 未知工具: {task['tool']}")
+            return None
+
+        # 按工具的参数定义校验参数，无效的参数丢弃，由工具自行解析
+        args = coerce_task_args(task.pop("args", None), self.tool_config[task["tool"]].get("args"))
+        if args:
+            task["args"] = args
+
+        return task
 
     def _create_fallback_plan(self, goal: str, context: dict = None) -> list:
         """创建备用计划，当LLM生成失败时使用"""
         print("🔄 生成备用计划...")
-        
+
         # 根据目标关键词判断需要什么工具
         goal_lower = goal.lower()
-        
+
         if any(keyword in goal_lower for keyword in ["旅行", "旅游", "行程", "travel"]):
             return [{
                 "task_id": "task_1",
@@ -250,7 +239,7 @@ class MCPAgentLLM(LLMClient):
             }]
         elif any(keyword in goal_lower for keyword in ["图片", "图像", "分析", "识别", "image"]):
             return [{
-                "task_id": "task_1", 
+                "task_id": "task_1",
                 "description": f"分析用户上传的图像: {goal}",
                 "tool": "vision_analyzer",  # 修改：使用正确的工具名称
                 "dependencies": []
@@ -264,179 +253,744 @@ class MCPAgentLLM(LLMClient):
                 "dependencies": []
             }]
 
+    def _create_parsed_plan(self, parsed_info: dict) -> list:
+        """根据解析出的目的地和天数创建备用计划"""
+        if parsed_info and 'destination' in parsed_info and 'days' in parsed_info:
+            destination = parsed_info['destination']
+            days = parsed_info['days']
+            if destination and days:
+                # 创建一个备用计划
+                plan = [{
+                    "task_id": "task_1",
+                    "description": f"为{destination}的{days}日游制定详细行程",
+                    "tool": "travel_planner",
+                    "dependencies": [],
+                    "args": coerce_task_args(parsed_info, self.tool_config.get("travel_planner", {}).get("args"))
+                }]
+                print(f"✅ 使用解析结果创建备用计划: {plan}")
+                return plan
+        return []
+
+    def _get_cached_plan(self, goal: str, context: dict = None) -> Optional[list]:
+        """
+        不调用LLM直接获取计划：先由本地意图路由处理只需单个工具的目标，再按规范化目标查找缓存的计划。
+        带上下文的规划依赖上下文内容，不使用本地路由与缓存
+        """
+        if context:
+            return None
+        plan = intent_router.route(goal, self.tool_config)
+        if plan:
+            return plan
+        plan = plan_cache.get(goal, self.model, self.tool_config)
+        if plan:
+            print(f"⚡ 命中计划缓存，共 {len(plan)} 个任务")
+        return plan
+
+    def _cache_plan(self, goal: str, context: dict, plan: list):
+        """缓存LLM生成且通过校验的计划，并作为本地意图路由的训练样本（备用计划不缓存）"""
+        if context:
+            return
+        intent_router.record(goal, plan)
+        if plan_cache.set(goal, self.model, self.tool_config, plan):
+            print("💾 计划已缓存")
+
+    def _accept_streamed_task(self, raw_task: Any, plan: list) -> Optional[dict]:
+        """校验流式解析出的任务并追加到计划中，无效或重复的任务返回None"""
+        task = self._validate_task(raw_task, len(plan))
+        if task is None:
+            return None
+        if any(existing["task_id"] == task["task_id"] for existing in plan):
+            print(f"❌ 重复的任务ID: {task['task_id']}")
+            return None
+        plan.append(task)
+        print(f"📥 收到任务 {task['task_id']}: {task['description']}")
+        return task
+
+    def _record_unresolved_tasks(self, results: dict, tasks: list):
+        """记录因依赖环而无法执行的任务"""
+        cycle = find_dependency_cycle(tasks)
+        for task in tasks:
+            if task["task_id"] in cycle:
+                reason = f"存在循环依赖: {' -> '.join(cycle + cycle[:1])}"
+            else:
+                reason = f"依赖的任务无法执行: {task_dependencies(task)}"
+            self._record_task_error(results, task["task_id"], f"任务 {task['task_id']} 未执行，{reason}")
+
+    def _resolve_tool(self, task_id: str, tool_name: str, config_manager,
+                      prefer_async: bool = False) -> Tuple[Optional[type], Dict[str, Any], Optional[str]]:
+        """
+        解析任务对应的工具类与实例化参数，工具类在首次使用时按配置的导入路径加载
+
+        Args:
+            prefer_async: 工具配置了异步版本时返回异步工具类
+
+        Returns:
+            Tuple: (工具类, 实例化参数, 错误信息)
+        """
+        if not tool_name or tool_name not in self.tool_config:
+            error_msg = f"任务 {task_id} 的工具 '{tool_name}' 不存在，可用工具: {list(self.tool_config.keys())}"
+            return None, {}, error_msg
+
+        # 获取工具配置
+        tool_info = self.tool_config[tool_name]
+        tool_page_config_key = tool_info["page"]
+
+        print(f"🔍 工具类: {tool_info['class']}")
+        print(f"📄 配置页面: {tool_page_config_key}")
+
+        # 加载工具类（结果由注册表缓存）
+        try:
+            tool_class = (prefer_async and tool_registry.async_tool_class(tool_info)) or tool_registry.tool_class(tool_info)
+        except ImportError as e:
+            return None, {}, f"无法加载工具 {tool_name} 的类 {tool_info['class']}: {e}"
+
+        # 获取API配置（由工具实例池缓存，同一页面只解析一次）
+        tool_kwargs = tool_pool.resolve_settings(tool_page_config_key, config_manager)
+        print(f"⚙️ API配置: base_url={tool_kwargs['base_url']}, model={tool_kwargs['model']}")
+
+        return tool_class, tool_kwargs, None
+
+    def _acquire_tool(self, tool_name: str, tool_class: type, tool_kwargs: Dict[str, Any]) -> Any:
+        """从工具实例池获取可复用的工具实例"""
+        return tool_pool.acquire(tool_class, self.tool_config[tool_name]["page"], tool_kwargs)
+
+    def warmup_tools(self, config_manager) -> Dict[str, bool]:
+        """预先加载 tool_config 中全部工具的类并创建实例"""
+        tools = []
+        for name, info in self.tool_config.items():
+            try:
+                tools.append((tool_registry.tool_class(info), info["page"]))
+            except ImportError as e:
+                print(f"⚠️ 无法加载工具 {name} 的类 {info.get('class')}: {e}")
+        return tool_pool.warmup(tools, config_manager)
+
+    def build_summary_messages(self, text: str, token_budget: int) -> List[Dict[str, Any]]:
+        """构建依赖结果摘要的对话消息"""
+        summary_prompt = f"""
+请将以下任务结果压缩为不超过{token_budget * 2}字的摘要，保留后续任务需要的关键事实、数字、地点和结论：
+
+{text}
+"""
+        return [{"role": "user", "content": summary_prompt}]
+
+    def _summary_params(self, token_budget: int) -> Dict[str, Any]:
+        """依赖结果摘要的采样参数"""
+        return {"temperature": 0.1, "max_tokens": token_budget}
+
+    def _create_result_store(self, results: dict) -> ResultStore:
+        """创建计划执行期间共享的结果存储"""
+        return ResultStore(results, self._results_lock, self.context_config, self._summarize_result)
+
+    def _build_task_context(self, task: dict, context: dict, store: ResultStore) -> TaskContext:
+        """构建任务上下文：共享初始上下文，依赖任务的结果以句柄形式附加，读取时才按预算压缩"""
+        dependencies = task.get("dependencies", [])
+        if isinstance(dependencies, (int, str)):
+            dependencies = [] if dependencies in [0, "0"] else [f"task_{dependencies}"]
+        elif not isinstance(dependencies, list):
+            dependencies = []
+
+        refs = {}
+        for dep_id in dependencies:
+            ref = store.ref(dep_id)
+            if ref is not None:
+                refs[f"{dep_id}_result"] = ref
+        return TaskContext(context, refs)
+
+    def _check_task(self, task: Any, index: int, results: dict) -> Optional[str]:
+        """检查任务格式，返回task_id；格式错误时记录错误并返回None"""
+        if not isinstance(task, dict):
+            error_msg = f"任务 {index} 格式错误: {task}"
+            print(f"❌ {error_msg}")
+            results["execution_summary"].append(error_msg)
+            return None
+
+        if 'task_id' not in task:
+            error_msg = f"任务 {index} 缺少 task_id: {task}"
+            print(f"❌ {error_msg}")
+            results["execution_summary"].append(error_msg)
+            return None
+        return task['task_id']
+
+    def _record_task_error(self, results: dict, task_id: str, error_msg: str):
+        """记录任务执行错误"""
+        print(f"❌ {error_msg}")
+        with self._results_lock:
+            results["tasks"][task_id] = {"error": error_msg}
+            results["execution_summary"].append(error_msg)
+        emit_event(TASK_FAILED, task_id=task_id, error=error_msg)
+
+    def _record_task_result(self, results: dict, task_id: str, result: str):
+        """记录任务执行结果"""
+        with self._results_lock:
+            results["tasks"][task_id] = {"result": result}
+            results["execution_summary"].append(f"✅ {task_id} 执行成功")
+        print(f"✅ {task_id} 执行成功")
+        emit_event(TASK_FINISHED, task_id=task_id, result=result)
+
+    def _start_task(self, task_id: str, tool_name: str, description: str):
+        """通知事件订阅方任务开始执行"""
+        emit_event(TASK_STARTED, task_id=task_id, tool=tool_name, description=description)
+
+    @staticmethod
+    def _accepts_kwarg(tool_instance: Any, name: str) -> bool:
+        """工具的 execute_task 是否支持该关键字参数（例如 on_token 回调、task_args 任务参数）"""
+        try:
+            return name in inspect.signature(tool_instance.execute_task).parameters
+        except (TypeError, ValueError):
+            return False
+
+    def _task_args_kwargs(self, tool_instance: Any, task: dict) -> Dict[str, Any]:
+        """规划给出了任务参数且工具支持时直接传给工具，工具无需再从描述中解析"""
+        if task.get("args") and self._accepts_kwarg(tool_instance, "task_args"):
+            return {"task_args": dict(task["args"])}
+        return {}
+
+    def _tool_call_kwargs(self, tool_instance: Any, run: TaskRun, task: dict) -> Dict[str, Any]:
+        """工具支持 on_token 时由 TaskRun 收集输出（订阅了事件时同时转发为 TOKEN 事件），并在超时或取消时中止输出"""
+        kwargs = self._task_args_kwargs(tool_instance, task)
+        if self._accepts_kwarg(tool_instance, "on_token"):
+            kwargs["on_token"] = run.on_token
+        return kwargs
+
+    def _task_timeout(self, task: dict) -> Optional[float]:
+        """任务的时间预算（秒），未配置时返回None"""
+        return self.tool_timeouts.get(task.get("tool", "")) or self.task_timeout
+
+    @contextmanager
+    def _plan_run(self, plan_run: Optional[PlanRun] = None):
+        """登记一次计划执行；未传入时新建，调用方传入自己的 PlanRun 时可以只取消这一次执行"""
+        plan_run = plan_run or PlanRun()
+        with self._results_lock:
+            self._plan_runs.add(plan_run)
+        try:
+            yield plan_run
+        finally:
+            with self._results_lock:
+                self._plan_runs.discard(plan_run)
+
+    def cancel(self):
+        """取消所有正在执行的计划：运行中的工具在下一次输出时停止（保留部分结果），尚未开始的任务被跳过"""
+        with self._results_lock:
+            plan_runs = list(self._plan_runs)
+        for plan_run in plan_runs:
+            plan_run.cancel()
+
+    def _skip_task(self, task: dict, task_id: str, results: dict, plan_run: PlanRun) -> bool:
+        """计划被取消、超出时间预算或依赖的任务失败时跳过任务，返回是否已跳过"""
+        if plan_run.cancelled:
+            self._record_task_error(results, task_id, f"任务 {task_id} 已取消")
+            return True
+        failed = self._failed_dependencies(task, results)
+        if failed:
+            self._record_task_error(results, task_id, f"任务 {task_id} 依赖的任务 {failed} 失败或超时，已跳过")
+            return True
+        return False
+
+    def _skip_claimed_task(self, task: dict, task_id: str, speculation: Speculation, results: dict,
+                           plan_deadline: Deadline, plan_run: PlanRun) -> bool:
+        """认领了推测结果的任务在计划已取消或超出时间预算时跳过，并中止推测执行，返回是否已跳过"""
+        if plan_deadline.expired():
+            self._record_task_error(results, task_id, f"任务 {task_id} 超出计划时间预算，已跳过")
+        elif not self._skip_task(task, task_id, results, plan_run):
+            return False
+        speculation.cancel()
+        return True
+
+    def _failed_dependencies(self, task: dict, results: dict) -> List[str]:
+        """依赖中执行失败、超时或被跳过的任务（计划中不存在的依赖不计入）"""
+        with self._results_lock:
+            return [dep for dep in task_dependencies(task) if "error" in results["tasks"].get(dep, {})]
+
+    def _record_task_outcome(self, results: dict, task_id: str, run: TaskRun, result: Any):
+        """记录工具返回后的结果；任务已超时或被取消时只保留已输出的部分结果"""
+        run.check_deadline()
+        if run.stop_reason:
+            self._record_task_partial(results, task_id, run)
+        else:
+            self._record_task_result(results, task_id, result)
+
+    def _record_task_partial(self, results: dict, task_id: str, run: TaskRun):
+        """记录超时或被取消的任务：保留已输出的部分结果并标记为截断"""
+        partial = run.partial
+        if not partial:
+            self._record_task_error(results, task_id, f"任务 {task_id} {run.stop_reason}，没有输出")
+            return
+        error_msg = f"任务 {task_id} {run.stop_reason}，已保留部分结果（{len(partial)} 字）"
+        print(f"⏰ {error_msg}")
+        with self._results_lock:
+            results["tasks"][task_id] = {"result": partial, "truncated": True, "error": error_msg}
+            results["execution_summary"].append(error_msg)
+        emit_event(TASK_FAILED, task_id=task_id, error=error_msg, partial=partial)
+
+    def _speculation_call_kwargs(self, tool_instance: Any, speculation: Speculation) -> Dict[str, Any]:
+        """推测任务通过 on_token 回调转发输出，并在被取消时中止流式生成"""
+        kwargs = self._task_args_kwargs(tool_instance, speculation.task)
+        if self._accepts_kwarg(tool_instance, "on_token"):
+            kwargs["on_token"] = speculation.on_token
+        return kwargs
+
+    @staticmethod
+    def _announcing(on_task: Callable[[dict], None]) -> Callable[[dict], None]:
+        """包装 on_task：任务交给调度器前先发送 TASK_PLANNED 事件，保证事件订阅方先看到任务再看到它开始执行"""
+        def announce_and_add(task: dict):
+            emit_event(TASK_PLANNED, task=task)
+            on_task(task)
+        return announce_and_add
+
+    def _claiming(self, speculation: Optional[Speculation], on_task: Callable[[dict], None]) -> Callable[[dict], None]:
+        """包装 on_task：计划中第一个与推测任务匹配的任务认领推测结果"""
+        if speculation is None:
+            return on_task
+
+        def claim_and_add(task: dict):
+            speculation.claim(task)
+            on_task(task)
+        return claim_and_add
+
+    def _prepare_tasks(self, plan: list, results: dict) -> list:
+        """检查计划中每个任务的格式，并报告依赖了不存在任务的情况"""
+        tasks = [task for i, task in enumerate(plan) if self._check_task(task, i, results) is not None]
+        self._report_missing_dependencies(results, tasks)
+        return tasks
+
+    def _report_missing_dependencies(self, results: dict, tasks: list):
+        """依赖不存在的任务仍会执行，只在执行摘要中提示"""
+        for task_id, missing in find_missing_dependencies(tasks).items():
+            warning = f"⚠️ 任务 {task_id} 依赖的任务不存在: {missing}，已忽略这些依赖"
+            print(warning)
+            results["execution_summary"].append(warning)
+
+    def _order_results(self, results: dict, tasks: list):
+        """并行执行的结果按计划顺序排列"""
+        ordered = {task["task_id"]: results["tasks"][task["task_id"]] for task in tasks if task["task_id"] in results["tasks"]}
+        ordered.update(results["tasks"])
+        results["tasks"] = ordered
+
+    def build_parse_messages(self, task_description: str) -> List[Dict[str, Any]]:
+        """构建任务解析的对话消息（与旅行规划工具共用同一提示词）"""
+        return build_travel_parse_messages(task_description)
+
+    def _parse_task_locally(self, task_description: str) -> dict:
+        """使用本地提取器（目的地名录 + 中文数字与时长解析）解析任务描述，提取不全时才需要调用LLM"""
+        result = trip_slot_extractor.extract(task_description)
+        print(f"🧩 本地解析结果: {result}")
+        return result
+
+    @staticmethod
+    def _has_trip_slots(parsed_info: dict) -> bool:
+        """是否已解析出目的地与天数"""
+        return bool(parsed_info.get("destination") and parsed_info.get("days"))
 
-    def execute_plan(self, plan: list, config_manager, initial_context: dict = None) -> str:
+
+class MCPAgentLLM(MCPAgentMixin, LLMClient):
+    """
+    Master Control Program, 负责规划和调度其他Agent。
+    """
+    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-max", tool_config: dict = None,
+                 max_parallel_tasks: int = 4, context_config: dict = None, task_timeout: float = None):
+        super().__init__(api_key, base_url, model)
+        self._init_tools(tool_config, max_parallel_tasks, context_config, task_timeout)
+
+    def execute_task(self, task_description: str, context: dict, config_manager=None) -> str:
         """
-        按顺序执行计划，并调度相应的Agent工具。
+        作为工具被MCP调用时执行的具体任务。
+        task_description: MCP分配的具体指令, e.g., "为去巴黎的5日游制定一个行程"
+        context: 任务上下文，可能包含前置任务的结果
+        config_manager: 配置管理器实例
+        """
+        print(f"🧠 MCPAgentLLM 正在执行: {task_description}")
+
+        # 生成计划
+        plan = self.plan(task_description, context)
+        print(f"📋 生成的计划: {plan}")
+
+        # 如果计划为空或失败，尝试使用LLM解析任务描述
+        if not plan or (isinstance(plan, list) and len(plan) == 0):
+            print("⚠️ 计划为空，尝试解析任务描述...")
+            plan = self._create_parsed_plan(self._parse_task_with_llm(task_description))
+
+        # 执行计划
+        result = self.execute_plan(plan, config_manager, context)
+
+        # 转换为JSON字符串返回
+        return json.dumps(result, indent=2, ensure_ascii=False)
+
+    def plan(self, goal: str, context: dict = None, deadline: Optional[Deadline] = None) -> list:
+        """
+        使用 LLM 将用户目标分解为具体任务步骤。
+        deadline: 规划的时间预算（秒数或 Deadline），超出后直接使用备用计划
+        """
+        cached_plan = self._get_cached_plan(goal, context)
+        if cached_plan:
+            return cached_plan
+
+        messages = self.build_planning_messages(goal, context)
+
+        max_retries = 3
+        with deadline_scope(deadline) as plan_deadline:
+            for attempt in range(max_retries):
+                if plan_deadline.expired():
+                    print("⏰ 规划超出时间预算")
+                    break
+                try:
+                    print(f"🤖 尝试生成计划 (第{attempt + 1}次)...")
+
+                    content = self.complete_chat(messages, **self.planning_params).strip()
+                    print(f"🤖 LLM 原始返回: {content}")
+
+                    validated_plan = self._parse_plan_content(content)
+                    if validated_plan:
+                        print(f"✅ 验证通过，共 {len(validated_plan)} 个任务")
+                        self._cache_plan(goal, context, validated_plan)
+                        return validated_plan
+                    # 无效的计划不能留在缓存中，否则重试会再次命中
+                    self.invalidate_cached_response(messages, **self.planning_params)
+
+                except Exception as e:
+                    # 可重试的传输错误已由 RetryPolicy 处理，这里再重试只会浪费时间
+                    print(f"❌ 计划生成失败 (尝试{attempt + 1}): {e}")
+                    break
+
+        return self._create_fallback_plan(goal, context)
+
+    def execute_plan(self, plan: list, config_manager, initial_context: dict = None, deadline: Optional[Deadline] = None,
+                     plan_run: Optional[PlanRun] = None) -> str:
+        """
+        按依赖关系并行执行计划，并调度相应的Agent工具。
+        deadline: 整个计划的时间预算，所有工具的LLM调用共享该预算，超出后剩余任务直接跳过
+        plan_run: 可选，本次执行的取消状态；调用 plan_run.cancel() 只取消这一次执行
         """
         if not isinstance(plan, list) or not plan:
             return json.dumps({"error": "计划为空或格式不正确"}, indent=2, ensure_ascii=False)
-            
+
         context = initial_context or {}
         results = {"execution_summary": [], "tasks": {}}
-        
-        for i, task in enumerate(plan):
-            if not isinstance(task, dict):
-                error_msg = f"任务 {i} 格式错误: {task}"
-                print(f"❌ {error_msg}")
-                results["execution_summary"].append(error_msg)
-                continue
-                
-            if 'task_id' not in task:
-                error_msg = f"任务 {i} 缺少 task_id: {task}"
-                print(f"❌ {error_msg}")
-                results["execution_summary"].append(error_msg)
-                continue
-                
-            task_id = task['task_id']
-            description = task.get('description', '无描述')
-            tool_name = task.get('tool', '')
-            
-            print(f"🤖 MCP: 开始执行 {task_id} - {description}")
-            print(f"🔧 使用工具: {tool_name}")
-            
-            if not tool_name or tool_name not in self.tool_config:
-                error_msg = f"任务 {task_id} 的工具 '{tool_name}' 不存在，可用工具: {list(self.tool_config.keys())}"
-                print(f"❌ {error_msg}")
-                results["tasks"][task_id] = {"error": error_msg}
-                results["execution_summary"].append(error_msg)
-                continue
+        emit_event(PLAN_READY, plan=plan)
+
+        with self._plan_run(plan_run) as plan_run, deadline_scope(deadline) as plan_deadline:
+            self._run_tasks(plan, config_manager, context, results, plan_deadline, plan_run)
+
+        return json.dumps(results, indent=2, ensure_ascii=False)
+
+    def _run_tasks(self, plan: list, config_manager, context: dict, results: dict, plan_deadline: Deadline, plan_run: PlanRun):
+        """按依赖关系并行执行计划中的任务"""
+        tasks = self._prepare_tasks(plan, results)
+        with ThreadPoolExecutor(max_workers=self.max_parallel_tasks, thread_name_prefix="mcp-task") as executor:
+            scheduler = self._create_scheduler(executor, config_manager, context, results, plan_deadline, plan_run)
+            for task in tasks:
+                scheduler.add(task)
+            scheduler.close()
+            self._record_unresolved_tasks(results, scheduler.wait())
+        self._order_results(results, tasks)
+
+    def _create_scheduler(self, executor: ThreadPoolExecutor, config_manager, context: dict, results: dict, plan_deadline: Deadline,
+                          plan_run: PlanRun, speculation: Optional[Speculation] = None) -> TaskScheduler:
+        """创建任务调度器；认领了推测结果的任务直接使用推测结果"""
+        store = self._create_result_store(results)
 
+        def run_task(task: dict):
+            if speculation is not None and speculation.owns(task):
+                self._finish_speculative_task(task, speculation, results, plan_deadline, plan_run)
+            else:
+                self._execute_task(task, task["task_id"], config_manager, context, results, store, plan_deadline, plan_run)
+
+        return TaskScheduler(
+            run_task,
+            executor,
+            max_concurrency=self.max_parallel_tasks,
+            tool_limits=self.tool_limits
+        )
+
+    def _execute_task(self, task: dict, task_id: str, config_manager, context: dict, results: dict,
+                      store: ResultStore, plan_deadline: Deadline, plan_run: PlanRun):
+        """执行单个任务并记录结果或错误；任务超时后不再等待工具，保留其已输出的部分结果"""
+        if plan_deadline.expired():
+            self._record_task_error(results, task_id, f"任务 {task_id} 超出计划时间预算，已跳过")
+            return
+        if self._skip_task(task, task_id, results, plan_run):
+            return
+
+        description = task.get('description', '无描述')
+        tool_name = task.get('tool', '')
+
+        print(f"🤖 MCP: 开始执行 {task_id} - {description}")
+        print(f"🔧 使用工具: {tool_name}")
+        self._start_task(task_id, tool_name, description)
+
+        with deadline_scope(self._task_timeout(task)) as task_deadline:
+            run = plan_run.begin(task_id, task_deadline, token_forwarder(task_id))
+            try:
+                self._run_tool(task, task_id, config_manager, context, results, store, run)
+            finally:
+                plan_run.end(run)
+
+    def _run_tool(self, task: dict, task_id: str, config_manager, context: dict, results: dict,
+                  store: ResultStore, run: TaskRun):
+        """解析并调用任务的工具"""
+        description = task.get('description', '无描述')
+        tool_name = task.get('tool', '')
+        try:
+            tool_class, tool_kwargs, error_msg = self._resolve_tool(task_id, tool_name, config_manager)
+            if error_msg:
+                self._record_task_error(results, task_id, error_msg)
+                return
+
+            print(f"✅ 找到工具类: {tool_class}")
+
+            # 处理依赖
+            task_context = self._build_task_context(task, context, store)
+
+            # 获取工具实例（跨任务、跨计划复用）
+            tool_instance = self._acquire_tool(tool_name, tool_class, tool_kwargs)
+            print(f"✅ 工具实例就绪: {type(tool_instance)}")
+
+            # 验证工具实例是否有execute_task方法
+            if not hasattr(tool_instance, 'execute_task'):
+                self._record_task_error(results, task_id, f"工具实例 {tool_class.__name__} 没有 execute_task 方法")
+                return
+
+            # 执行任务
+            print(f"🚀 开始执行任务...")
+            call_kwargs = self._tool_call_kwargs(tool_instance, run, task)
+            result = self._call_with_timeout(lambda: tool_instance.execute_task(description, task_context, **call_kwargs), run)
+            self._record_task_outcome(results, task_id, run, result)
+
+        except Exception as e:
+            if run.stop_reason:
+                self._record_task_partial(results, task_id, run)
+                return
+            error_msg = f"执行 {task_id} 时发生错误: {str(e)}"
+            print(f"🔍 错误详情: {type(e).__name__}: {e}")
+            import traceback
+            traceback.print_exc()  # 打印完整的错误堆栈
+            self._record_task_error(results, task_id, error_msg)
+
+    @staticmethod
+    def _call_with_timeout(call: Callable[[], Any], run: TaskRun) -> Any:
+        """
+        在任务截止时间内调用工具
+
+        有截止时间时工具在单独的线程中运行，超时后立即返回None并停止任务，
+        工具在下一次输出时中止；不能以流式输出的工具会在后台自行结束。
+        """
+        remaining = run.deadline.remaining()
+        if remaining is None:
+            return call()
+
+        future = Future()
+
+        def target():
             try:
-                # 获取工具配置
-                tool_info = self.tool_config[tool_name]
-                tool_class_name = tool_info["class"]
-                tool_page_config_key = tool_info["page"]
-                
-                print(f"🔍 工具类名: {tool_class_name}")
-                print(f"📄 配置页面: {tool_page_config_key}")
-                
-                # 获取API配置
-                api_key = config_manager.get_api_key(tool_page_config_key)
-                base_url = config_manager.get_base_url(tool_page_config_key)
-                
+                future.set_result(call())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=contextvars.copy_context().run, args=(target,), name=f"mcp-tool-{run.task_id}", daemon=True).start()
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            run.stop(TIMED_OUT)
+            return None
+
+    def plan_and_execute(self, goal: str, config_manager, initial_context: dict = None,
+                         planning_deadline: Optional[Deadline] = None, deadline: Optional[Deadline] = None,
+                         plan_run: Optional[PlanRun] = None) -> Tuple[list, str]:
+        """
+        流式规划并执行：规划模型每输出一个完整的任务就立即校验，依赖满足后马上派发执行，
+        规划与执行重叠进行。
+        planning_deadline: 规划的时间预算；deadline: 整个规划与执行的时间预算
+        plan_run: 可选，本次执行的取消状态；调用 plan_run.cancel() 只取消这一次执行
+
+        Returns:
+            Tuple[list, str]: (最终计划, 执行结果JSON)
+        """
+        context = initial_context or {}
+        results = {"execution_summary": [], "tasks": {}}
+        # 可选的推测执行：LLM规划期间提前运行最可能的第一个任务
+        speculation = speculator.predict(goal, self.tool_config)
+
+        with self._plan_run(plan_run) as plan_run, deadline_scope(deadline) as plan_deadline:
+            # 推测任务额外占用一个线程，不挤占计划任务的并发数
+            with ThreadPoolExecutor(max_workers=self.max_parallel_tasks + 1, thread_name_prefix="mcp-task") as executor:
+                scheduler = self._create_scheduler(executor, config_manager, context, results, plan_deadline, plan_run, speculation)
                 try:
-                    page_config = config_manager.get_page_config(tool_page_config_key)
-                    model = page_config.get("default_model", "qwen-turbo")
-                except:
-                    model = "qwen-turbo"
-                    
-                print(f"⚙️ API配置: base_url={base_url}, model={model}")
-
-                # 获取工具类并验证
-                if tool_class_name not in self.tool_classes:
-                    available_classes = list(self.tool_classes.keys())
-                    error_msg = f"未找到工具类 {tool_class_name}，可用类: {available_classes}"
-                    print(f"❌ {error_msg}")
-                    results["tasks"][task_id] = {"error": error_msg}
-                    results["execution_summary"].append(error_msg)
-                    continue
-                
-                tool_class = self.tool_classes[tool_class_name]
-                print(f"✅ 找到工具类: {tool_class}")
-                    
-                # 处理依赖
-                task_context = context.copy()
-                dependencies = task.get("dependencies", [])
-                if isinstance(dependencies, (int, str)):
-                    dependencies = [] if dependencies in [0, "0"] else [f"task_{dependencies}"]
-                elif not isinstance(dependencies, list):
-                    dependencies = []
-                    
-                # 合并依赖结果
-                for dep_id in dependencies:
-                    if dep_id in results["tasks"] and "result" in results["tasks"][dep_id]:
-                        task_context[f"{dep_id}_result"] = results["tasks"][dep_id]["result"]
-
-                # 实例化工具
-                print(f"🏗️ 正在实例化工具...")
-                tool_instance = tool_class(api_key=api_key, base_url=base_url, model=model)
-                print(f"✅ 工具实例化成功: {type(tool_instance)}")
-                
-                # 验证工具实例是否有execute_task方法
-                if not hasattr(tool_instance, 'execute_task'):
-                    error_msg = f"工具实例 {tool_class_name} 没有 execute_task 方法"
-                    print(f"❌ {error_msg}")
-                    results["tasks"][task_id] = {"error": error_msg}
-                    results["execution_summary"].append(error_msg)
-                    continue
-                
-                # 执行任务
-                print(f"🚀 开始执行任务...")
-                result = tool_instance.execute_task(description, task_context)
-                
-                results["tasks"][task_id] = {"result": result}
-                results["execution_summary"].append(f"✅ {task_id} 执行成功")
-                print(f"✅ {task_id} 执行成功")
-                
+                    plan = self._stream_plan(
+                        goal, context, self._announcing(self._claiming(speculation, scheduler.add)), planning_deadline,
+                        on_llm_planning=lambda: self._launch_speculation(speculation, executor, config_manager, context)
+                    )
+                finally:
+                    speculator.settle(speculation)
+                scheduler.close()
+                emit_event(PLAN_READY, plan=plan)
+                self._report_missing_dependencies(results, plan)
+                self._record_unresolved_tasks(results, scheduler.wait())
+        self._order_results(results, plan)
+
+        return plan, json.dumps(results, indent=2, ensure_ascii=False)
+
+    def plan_and_execute_events(self, goal: str, config_manager, initial_context: dict = None,
+                                planning_deadline: Optional[Deadline] = None, deadline: Optional[Deadline] = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        以事件流的形式规划并执行，参数与 plan_and_execute 相同
+
+        每个任务通过校验后产出 task_planned 事件，随后是该任务的 task_started、token、task_finished / task_failed 事件；
+        规划结束后产出带有完整计划的 plan_ready 事件（见 utils.mcp_events），
+        最后产出带有最终计划与执行结果JSON的 completed 事件。规划与执行在后台线程中进行。
+        """
+        plan_run = PlanRun()
+
+        def run():
+            plan, result = self.plan_and_execute(goal, config_manager, initial_context, planning_deadline, deadline, plan_run)
+            emit_event(COMPLETED, plan=plan, result=result)
+
+        yield from iter_events(run, on_abandon=plan_run.cancel)
+
+    def execute_plan_events(self, plan: list, config_manager, initial_context: dict = None,
+                            deadline: Optional[Deadline] = None) -> Generator[Dict[str, Any], None, None]:
+        """以事件流的形式执行已有计划，事件与 plan_and_execute_events 相同"""
+        plan_run = PlanRun()
+
+        def run():
+            result = self.execute_plan(plan, config_manager, initial_context, deadline, plan_run)
+            emit_event(COMPLETED, plan=plan, result=result)
+
+        yield from iter_events(run, on_abandon=plan_run.cancel)
+
+    def run_batch(self, goals: Iterable[GoalInput], config_manager, concurrency: int = 4, output_path: str = None,
+                  resume: bool = True, planning_deadline: float = None, deadline: float = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        并发规划并执行一批目标，按完成顺序产出每个目标的输出记录（见 utils.mcp_batch.run_batch）
+
+        完全相同的目标只执行一次；指定 output_path 时每完成一个目标立即追加到JSONL文件，
+        resume 时跳过文件中已完成的目标。
+        """
+        return run_batch(self, goals, config_manager, concurrency, output_path, resume, planning_deadline, deadline)
+
+    def _launch_speculation(self, speculation: Optional[Speculation], executor: ThreadPoolExecutor, config_manager, context: dict):
+        """在线程池中启动推测任务"""
+        if speculation is not None:
+            speculation.job = executor.submit(
+                contextvars.copy_context().run, self._run_speculative_task, speculation, config_manager, context
+            )
+
+    def _run_speculative_task(self, speculation: Speculation, config_manager, context: dict) -> str:
+        """执行推测任务，返回工具结果"""
+        task = speculation.task
+        tool_class, tool_kwargs, error_msg = self._resolve_tool(task["task_id"], task["tool"], config_manager)
+        if error_msg:
+            raise RuntimeError(error_msg)
+        tool_instance = self._acquire_tool(task["tool"], tool_class, tool_kwargs)
+        return tool_instance.execute_task(
+            task["description"], TaskContext(context, {}), **self._speculation_call_kwargs(tool_instance, speculation)
+        )
+
+    def _finish_speculative_task(self, task: dict, speculation: Speculation, results: dict, plan_deadline: Deadline,
+                                 plan_run: PlanRun):
+        """
+        认领推测结果的任务：由任务自己的 TaskRun 接管提前开始的执行，等待其完成并记录结果
+
+        与正常执行的任务一样受任务超时与计划时间预算约束、可被计划取消，超时或取消时保留已输出的部分结果。
+        """
+        task_id = task["task_id"]
+        if self._skip_claimed_task(task, task_id, speculation, results, plan_deadline, plan_run):
+            return
+        print(f"🤖 MCP: {task_id} 使用推测执行的结果 - {task.get('description', '')}")
+        self._start_task(task_id, task.get("tool", ""), task.get("description", ""))
+
+        with deadline_scope(self._task_timeout(task)) as task_deadline:
+            run = plan_run.begin(task_id, task_deadline, token_forwarder(task_id))
+            try:
+                speculation.attach(run)
+                try:
+                    result = speculation.job.result(timeout=run.deadline.remaining())
+                except FutureTimeoutError:
+                    # 推测任务在下一次输出时中止
+                    run.stop(TIMED_OUT)
+                    result = None
+                self._record_task_outcome(results, task_id, run, result)
             except Exception as e:
-                error_msg = f"执行 {task_id} 时发生错误: {str(e)}"
-                print(f"❌ {error_msg}")
-                print(f"🔍 错误详情: {type(e).__name__}: {e}")
-                import traceback
-                traceback.print_exc()  # 打印完整的错误堆栈
-                results["tasks"][task_id] = {"error": error_msg}
-                results["execution_summary"].append(error_msg)
-        
-        return json.dumps(results, indent=2, ensure_ascii=False)
+                if run.stop_reason:
+                    self._record_task_partial(results, task_id, run)
+                else:
+                    self._record_task_error(results, task_id, f"执行 {task_id} 时发生错误: {str(e)}")
+            finally:
+                plan_run.end(run)
 
+    def _stream_plan(self, goal: str, context: dict, on_task: Callable[[dict], None], deadline: Optional[Deadline] = None,
+                     on_llm_planning: Callable[[], None] = None) -> list:
+        """
+        流式生成计划，每个通过校验的任务都会立即交给 on_task；流中没有有效任务时使用备用计划
+        on_llm_planning: 需要调用LLM规划（本地路由与计划缓存均未命中）时，在开始规划前调用
+        """
+        cached_plan = self._get_cached_plan(goal, context)
+        if cached_plan:
+            for task in cached_plan:
+                on_task(task)
+            return cached_plan
+        if on_llm_planning:
+            on_llm_planning()
 
-    def _parse_task_with_llm(self, task_description: str) -> dict:
-        """使用LLM来智能解析任务描述中的目的地和天数信息"""
-        try:
-            parse_prompt = f"""
-请从以下任务描述中提取旅行规划信息：
+        messages = self.build_planning_messages(goal, context)
+        parser = PlanStreamParser()
+        plan = []
 
-任务描述: "{task_description}"
+        with deadline_scope(deadline):
+            try:
+                print("🤖 流式生成计划...")
+                for chunk in self.stream_chat(messages, **self.planning_params):
+                    for raw_task in parser.feed(chunk):
+                        task = self._accept_streamed_task(raw_task, plan)
+                        if task is not None:
+                            on_task(task)
+                print(f"🤖 LLM 原始返回: {parser.text}")
+                # 只缓存完整生成的计划，中途失败的部分计划不能复用
+                if plan and parser.finished:
+                    self._cache_plan(goal, context, plan)
+            except Exception as e:
+                print(f"❌ 流式规划失败: {e}")
 
-请返回JSON格式的结果：
-{{
-    "destination": "目的地城市名称",
-    "days": 天数（数字）
-}}
+        if not plan:
+            # 流中没有完整的任务对象：无效内容不能留在缓存中
+            self.invalidate_cached_response(messages, **self.planning_params)
+            for task in self._parse_plan_content(parser.text) or self._create_fallback_plan(goal, context):
+                plan.append(task)
+                on_task(task)
+        return plan
 
-如果无法确定某个信息，请返回null。
-"""
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": parse_prompt}],
+    def _summarize_result(self, text: str, token_budget: int) -> str:
+        """使用LLM把依赖结果压缩到令牌预算内"""
+        return self.complete_chat(self.build_summary_messages(text, token_budget), **self._summary_params(token_budget))
+
+    def _parse_task_with_llm(self, task_description: str) -> dict:
+        """解析任务描述中的目的地和天数信息：先本地提取，提取不全时才调用LLM（同一描述的解析结果与工具共享）"""
+        local_result = self._parse_task_locally(task_description)
+        if self._has_trip_slots(local_result):
+            return local_result
+        try:
+            result = task_arg_extractor.extract(task_description, lambda text: parse_json_args(self.complete_chat(
+                self.build_parse_messages(text),
                 temperature=0.1,
                 response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            )))
             print(f"🧠 LLM解析结果: {result}")
-            return result
-            
+            # 本地已提取到的槽位优先
+            return {**result, **{name: value for name, value in local_result.items() if value}}
+
         except Exception as e:
             print(f"⚠️ LLM解析失败: {e}")
-            # 当LLM解析失败时，使用正则表达式作为备选方案
-            import re
-            print("🔄 使用正则表达式作为备选方案...")
-            
-            # 尝试提取目的地
-            destination_match = re.search(r'[去往|前往|到|去]?([\u4e00-\u9fa5]{2,10})[旅游|旅行|游玩]?', task_description)
-            destination = destination_match.group(1) if destination_match else None
-            
-            # 尝试提取天数
-            days_match = re.search(r'(\d+)[天日]', task_description)
-            days = days_match.group(1) if days_match else None
-            
-            result = {
-                "destination": destination,
-                "days": days
-            }
-            print(f"🧠 正则表达式解析结果: {result}")
-            return result
+            return local_result
     def debug_tool_classes(self):
         """调试工具类配置"""
         print("🔍 调试工具类配置:")
-        print(f"tool_classes 类型: {type(self.tool_classes)}")
-        print(f"tool_classes 内容: {self.tool_classes}")
+        print(f"已加载的工具类: {tool_registry.loaded()}")
         
-        for class_name, class_obj in self.tool_classes.items():
-            print(f"  {class_name}: {class_obj}")
+        for tool_name, tool_info in self.tool_config.items():
+            try:
+                class_obj = tool_registry.tool_class(tool_info)
+            except ImportError as e:
+                print(f"  {tool_name}: ❌ 无法加载 {tool_info.get('class')}: {e}")
+                continue
+            print(f"  {tool_name}: {class_obj}")
             print(f"    类型: {type(class_obj)}")
             if hasattr(class_obj, '__name__'):
                 print(f"    名称: {class_obj.__name__}")
@@ -449,3 +1003,356 @@ class MCPAgentLLM(LLMClient):
                 print(f"    有execute_task方法: {hasattr(test_instance, 'execute_task')}")
             except Exception as e:
                 print(f"    ❌ 实例化失败: {e}")
+
+
+class AsyncMCPAgentLLM(MCPAgentMixin, AsyncLLMClient):
+    """
+    异步版本的 Master Control Program，在单个事件循环中规划并调度其他Agent。
+    """
+    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-max", tool_config: dict = None,
+                 max_parallel_tasks: int = 4, context_config: dict = None, task_timeout: float = None):
+        super().__init__(api_key, base_url, model)
+        self._init_tools(tool_config, max_parallel_tasks, context_config, task_timeout)
+
+    async def execute_task(self, task_description: str, context: dict, config_manager=None) -> str:
+        """作为工具被MCP调用时执行的具体任务（异步版本，契约与同步版本一致）"""
+        print(f"🧠 AsyncMCPAgentLLM 正在执行: {task_description}")
+
+        plan = await self.plan(task_description, context)
+        print(f"📋 生成的计划: {plan}")
+
+        if not plan:
+            print("⚠️ 计划为空，尝试解析任务描述...")
+            plan = self._create_parsed_plan(await self._parse_task_with_llm(task_description))
+
+        result = await self.execute_plan(plan, config_manager, context)
+        return json.dumps(result, indent=2, ensure_ascii=False)
+
+    async def plan(self, goal: str, context: dict = None, deadline: Optional[Deadline] = None) -> list:
+        """使用 LLM 将用户目标分解为具体任务步骤（异步版本）"""
+        cached_plan = self._get_cached_plan(goal, context)
+        if cached_plan:
+            return cached_plan
+
+        messages = self.build_planning_messages(goal, context)
+
+        max_retries = 3
+        with deadline_scope(deadline) as plan_deadline:
+            for attempt in range(max_retries):
+                if plan_deadline.expired():
+                    print("⏰ 规划超出时间预算")
+                    break
+                try:
+                    print(f"🤖 尝试生成计划 (第{attempt + 1}次)...")
+
+                    content = (await self.complete_chat(messages, **self.planning_params)).strip()
+                    print(f"🤖 LLM 原始返回: {content}")
+
+                    validated_plan = self._parse_plan_content(content)
+                    if validated_plan:
+                        print(f"✅ 验证通过，共 {len(validated_plan)} 个任务")
+                        self._cache_plan(goal, context, validated_plan)
+                        return validated_plan
+                    # 无效的计划不能留在缓存中，否则重试会再次命中
+                    self.invalidate_cached_response(messages, **self.planning_params)
+
+                except Exception as e:
+                    print(f"❌ 计划生成失败 (尝试{attempt + 1}): {e}")
+                    break
+
+        return self._create_fallback_plan(goal, context)
+
+    async def execute_plan(self, plan: list, config_manager, initial_context: dict = None, deadline: Optional[Deadline] = None,
+                           plan_run: Optional[PlanRun] = None) -> str:
+        """按依赖关系并发执行计划（异步版本），没有异步实现的工具放到线程中执行"""
+        if not isinstance(plan, list) or not plan:
+            return json.dumps({"error": "计划为空或格式不正确"}, indent=2, ensure_ascii=False)
+
+        context = initial_context or {}
+        results = {"execution_summary": [], "tasks": {}}
+        emit_event(PLAN_READY, plan=plan)
+
+        with self._plan_run(plan_run) as plan_run, deadline_scope(deadline) as plan_deadline:
+            await self._run_tasks(plan, config_manager, context, results, plan_deadline, plan_run)
+
+        return json.dumps(results, indent=2, ensure_ascii=False)
+
+    async def _run_tasks(self, plan: list, config_manager, context: dict, results: dict, plan_deadline: Deadline, plan_run: PlanRun):
+        """按依赖关系并发执行计划中的任务（异步版本）"""
+        tasks = self._prepare_tasks(plan, results)
+        scheduler = self._create_scheduler(config_manager, context, results, plan_deadline, plan_run)
+        for task in tasks:
+            scheduler.add(task)
+        scheduler.close()
+        self._record_unresolved_tasks(results, await scheduler.wait())
+        self._order_results(results, tasks)
+
+    def _create_scheduler(self, config_manager, context: dict, results: dict, plan_deadline: Deadline,
+                          plan_run: PlanRun, speculation: Optional[Speculation] = None) -> AsyncTaskScheduler:
+        """创建异步任务调度器；认领了推测结果的任务直接使用推测结果"""
+        store = self._create_result_store(results)
+
+        def run_task(task: dict):
+            if speculation is not None and speculation.owns(task):
+                return self._finish_speculative_task(task, speculation, results, plan_deadline, plan_run)
+            return self._execute_task(task, task["task_id"], config_manager, context, results, store, plan_deadline, plan_run)
+
+        return AsyncTaskScheduler(
+            run_task,
+            max_concurrency=self.max_parallel_tasks,
+            tool_limits=self.tool_limits
+        )
+
+    async def _execute_task(self, task: dict, task_id: str, config_manager, context: dict, results: dict,
+                            store: ResultStore, plan_deadline: Deadline, plan_run: PlanRun):
+        """执行单个任务并记录结果或错误（异步版本）；任务超时后不再等待工具，保留其已输出的部分结果"""
+        if plan_deadline.expired():
+            self._record_task_error(results, task_id, f"任务 {task_id} 超出计划时间预算，已跳过")
+            return
+        if self._skip_task(task, task_id, results, plan_run):
+            return
+
+        description = task.get('description', '无描述')
+        tool_name = task.get('tool', '')
+        print(f"🤖 MCP: 开始执行 {task_id} - {description}")
+        self._start_task(task_id, tool_name, description)
+
+        with deadline_scope(self._task_timeout(task)) as task_deadline:
+            run = plan_run.begin(task_id, task_deadline, token_forwarder(task_id))
+            try:
+                await self._run_tool(task, task_id, config_manager, context, results, store, run)
+            finally:
+                plan_run.end(run)
+
+    async def _run_tool(self, task: dict, task_id: str, config_manager, context: dict, results: dict,
+                        store: ResultStore, run: TaskRun):
+        """解析并调用任务的工具（异步版本）"""
+        description = task.get('description', '无描述')
+        tool_name = task.get('tool', '')
+        try:
+            tool_class, tool_kwargs, error_msg = await self._resolve_tool_async(task_id, tool_name, config_manager)
+            if error_msg:
+                self._record_task_error(results, task_id, error_msg)
+                return
+
+            task_context = self._build_task_context(task, context, store)
+            if store.needs_summarizer:
+                # 摘要需要调用LLM，在线程中提前完成，避免工具在事件循环中读取依赖结果时阻塞
+                await asyncio.to_thread(lambda: [ref.read() for ref in task_context.refs()])
+
+            if inspect.iscoroutinefunction(tool_class.execute_task):
+                tool_instance = self._acquire_tool(tool_name, tool_class, tool_kwargs)
+                call = tool_instance.execute_task(description, task_context, **self._tool_call_kwargs(tool_instance, run, task))
+            else:
+                # 首次构造可能导入页面模块，放到线程中避免阻塞事件循环
+                tool_instance = await asyncio.to_thread(self._acquire_tool, tool_name, tool_class, tool_kwargs)
+                call = asyncio.to_thread(
+                    tool_instance.execute_task, description, task_context, **self._tool_call_kwargs(tool_instance, run, task)
+                )
+
+            result = await self._call_with_timeout(call, run)
+            self._record_task_outcome(results, task_id, run, result)
+
+        except Exception as e:
+            if run.stop_reason:
+                self._record_task_partial(results, task_id, run)
+                return
+            self._record_task_error(results, task_id, f"执行 {task_id} 时发生错误: {str(e)}")
+
+    @staticmethod
+    async def _call_with_timeout(call: Awaitable[Any], run: TaskRun) -> Any:
+        """
+        在任务截止时间内等待工具（异步版本）
+
+        超时后取消协程并停止任务；在线程中执行的同步工具在下一次输出时中止。
+        """
+        remaining = run.deadline.remaining()
+        if remaining is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, timeout=remaining)
+        except asyncio.TimeoutError:
+            run.stop(TIMED_OUT)
+            return None
+
+    async def plan_and_execute(self, goal: str, config_manager, initial_context: dict = None,
+                               planning_deadline: Optional[Deadline] = None, deadline: Optional[Deadline] = None,
+                               plan_run: Optional[PlanRun] = None) -> Tuple[list, str]:
+        """流式规划并执行（异步版本），返回 (最终计划, 执行结果JSON)"""
+        context = initial_context or {}
+        results = {"execution_summary": [], "tasks": {}}
+        speculation = speculator.predict(goal, self.tool_config)
+
+        with self._plan_run(plan_run) as plan_run, deadline_scope(deadline) as plan_deadline:
+            scheduler = self._create_scheduler(config_manager, context, results, plan_deadline, plan_run, speculation)
+            try:
+                plan = await self._stream_plan(
+                    goal, context, self._announcing(self._claiming(speculation, scheduler.add)), planning_deadline,
+                    on_llm_planning=lambda: self._launch_speculation(speculation, config_manager, context)
+                )
+            finally:
+                speculator.settle(speculation)
+            scheduler.close()
+            emit_event(PLAN_READY, plan=plan)
+            self._report_missing_dependencies(results, plan)
+            self._record_unresolved_tasks(results, await scheduler.wait())
+        self._order_results(results, plan)
+
+        return plan, json.dumps(results, indent=2, ensure_ascii=False)
+
+    async def plan_and_execute_events(self, goal: str, config_manager, initial_context: dict = None,
+                                      planning_deadline: Optional[Deadline] = None,
+                                      deadline: Optional[Deadline] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """以事件流的形式规划并执行（异步版本），事件与同步版本相同"""
+        plan_run = PlanRun()
+
+        async def run():
+            plan, result = await self.plan_and_execute(goal, config_manager, initial_context, planning_deadline, deadline, plan_run)
+            emit_event(COMPLETED, plan=plan, result=result)
+
+        async for event in aiter_events(run, on_abandon=plan_run.cancel):
+            yield event
+
+    async def execute_plan_events(self, plan: list, config_manager, initial_context: dict = None,
+                                  deadline: Optional[Deadline] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """以事件流的形式执行已有计划（异步版本）"""
+        plan_run = PlanRun()
+
+        async def run():
+            result = await self.execute_plan(plan, config_manager, initial_context, deadline, plan_run)
+            emit_event(COMPLETED, plan=plan, result=result)
+
+        async for event in aiter_events(run, on_abandon=plan_run.cancel):
+            yield event
+
+    def run_batch(self, goals: Iterable[GoalInput], config_manager, concurrency: int = 4, output_path: str = None,
+                  resume: bool = True, planning_deadline: float = None,
+                  deadline: float = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """并发规划并执行一批目标（异步版本），返回按完成顺序产出输出记录的异步生成器"""
+        return run_batch_async(self, goals, config_manager, concurrency, output_path, resume, planning_deadline, deadline)
+
+    def _launch_speculation(self, speculation: Optional[Speculation], config_manager, context: dict):
+        """在事件循环中启动推测任务"""
+        if speculation is not None:
+            speculation.job = asyncio.create_task(self._run_speculative_task(speculation, config_manager, context))
+
+    async def _resolve_tool_async(self, task_id: str, tool_name: str,
+                                  config_manager) -> Tuple[Optional[type], Dict[str, Any], Optional[str]]:
+        """解析工具类（优先异步版本）；首次加载需要导入模块，放到线程中避免阻塞事件循环"""
+        tool_info = self.tool_config.get(tool_name)
+        if tool_info and not tool_registry.is_loaded(tool_info):
+            return await asyncio.to_thread(self._resolve_tool, task_id, tool_name, config_manager, True)
+        return self._resolve_tool(task_id, tool_name, config_manager, True)
+
+    async def _run_speculative_task(self, speculation: Speculation, config_manager, context: dict) -> str:
+        """执行推测任务（异步版本），返回工具结果"""
+        task = speculation.task
+        tool_class, tool_kwargs, error_msg = await self._resolve_tool_async(task["task_id"], task["tool"], config_manager)
+        if error_msg:
+            raise RuntimeError(error_msg)
+        task_context = TaskContext(context, {})
+        if inspect.iscoroutinefunction(tool_class.execute_task):
+            tool_instance = self._acquire_tool(task["tool"], tool_class, tool_kwargs)
+            return await tool_instance.execute_task(
+                task["description"], task_context, **self._speculation_call_kwargs(tool_instance, speculation)
+            )
+        tool_instance = await asyncio.to_thread(self._acquire_tool, task["tool"], tool_class, tool_kwargs)
+        return await asyncio.to_thread(
+            tool_instance.execute_task, task["description"], task_context, **self._speculation_call_kwargs(tool_instance, speculation)
+        )
+
+    async def _finish_speculative_task(self, task: dict, speculation: Speculation, results: dict, plan_deadline: Deadline,
+                                       plan_run: PlanRun):
+        """认领推测结果的任务（异步版本）：由任务自己的 TaskRun 接管提前开始的执行，超时时取消推测任务并保留部分结果"""
+        task_id = task["task_id"]
+        if self._skip_claimed_task(task, task_id, speculation, results, plan_deadline, plan_run):
+            return
+        print(f"🤖 MCP: {task_id} 使用推测执行的结果 - {task.get('description', '')}")
+        self._start_task(task_id, task.get("tool", ""), task.get("description", ""))
+
+        with deadline_scope(self._task_timeout(task)) as task_deadline:
+            run = plan_run.begin(task_id, task_deadline, token_forwarder(task_id))
+            try:
+                speculation.attach(run)
+                result = await self._call_with_timeout(speculation.job, run)
+                self._record_task_outcome(results, task_id, run, result)
+            except Exception as e:
+                if run.stop_reason:
+                    self._record_task_partial(results, task_id, run)
+                else:
+                    self._record_task_error(results, task_id, f"执行 {task_id} 时发生错误: {str(e)}")
+            finally:
+                plan_run.end(run)
+
+    async def _stream_plan(self, goal: str, context: dict, on_task: Callable[[dict], None], deadline: Optional[Deadline] = None,
+                           on_llm_planning: Callable[[], None] = None) -> list:
+        """流式生成计划（异步版本），每个通过校验的任务都会立即交给 on_task"""
+        cached_plan = self._get_cached_plan(goal, context)
+        if cached_plan:
+            for task in cached_plan:
+                on_task(task)
+            return cached_plan
+        if on_llm_planning:
+            on_llm_planning()
+
+        messages = self.build_planning_messages(goal, context)
+        parser = PlanStreamParser()
+        plan = []
+
+        with deadline_scope(deadline):
+            try:
+                print("🤖 流式生成计划...")
+                async for chunk in self.stream_chat(messages, **self.planning_params):
+                    for raw_task in parser.feed(chunk):
+                        task = self._accept_streamed_task(raw_task, plan)
+                        if task is not None:
+                            on_task(task)
+                print(f"🤖 LLM 原始返回: {parser.text}")
+                # 只缓存完整生成的计划，中途失败的部分计划不能复用
+                if plan and parser.finished:
+                    self._cache_plan(goal, context, plan)
+            except Exception as e:
+                print(f"❌ 流式规划失败: {e}")
+
+        if not plan:
+            self.invalidate_cached_response(messages, **self.planning_params)
+            for task in self._parse_plan_content(parser.text) or self._create_fallback_plan(goal, context):
+                plan.append(task)
+                on_task(task)
+        return plan
+
+    def _create_result_store(self, results: dict) -> ResultStore:
+        """创建结果存储；摘要在工作线程中进行，通过事件循环调用异步LLM"""
+        loop = asyncio.get_running_loop()
+
+        def summarize(text: str, token_budget: int) -> str:
+            return asyncio.run_coroutine_threadsafe(self._summarize_result(text, token_budget), loop).result()
+
+        return ResultStore(results, self._results_lock, self.context_config, summarize)
+
+    async def _summarize_result(self, text: str, token_budget: int) -> str:
+        """使用LLM把依赖结果压缩到令牌预算内（异步版本）"""
+        return await self.complete_chat(self.build_summary_messages(text, token_budget), **self._summary_params(token_budget))
+
+    async def _parse_task_with_llm(self, task_description: str) -> dict:
+        """解析任务描述中的目的地和天数信息（异步版本）：先本地提取，提取不全时才调用LLM"""
+        local_result = self._parse_task_locally(task_description)
+        if self._has_trip_slots(local_result):
+            return local_result
+
+        async def parse(text: str) -> dict:
+            return parse_json_args(await self.complete_chat(
+                self.build_parse_messages(text),
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            ))
+
+        try:
+            result = await task_arg_extractor.extract_async(task_description, parse)
+            print(f"🧠 LLM解析结果: {result}")
+            # 本地已提取到的槽位优先
+            return {**result, **{name: value for name, value in local_result.items() if value}}
+
+        except Exception as e:
+            print(f"⚠️ LLM解析失败: {e}")
+            return local_result
@@ -0,0 +1,127 @@
+import asyncio
+import contextvars
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Generator, AsyncGenerator, Awaitable
+
+
+# 事件类型
+TASK_PLANNED = "task_planned"  # 流式规划中一个任务通过校验：{"task": {...}}，先于该任务的 task_started
+PLAN_READY = "plan_ready"  # 计划已完整生成：{"plan": [...]}（流式规划时在规划结束后发送，此前任务可能已开始执行）
+TASK_STARTED = "task_started"  # 任务开始执行：{"task_id", "tool", "description"}
+TOKEN = "token"  # 工具底层流式输出的文本增量：{"task_id", "delta"}
+TASK_FINISHED = "task_finished"  # 任务执行成功：{"task_id", "result"}
+TASK_FAILED = "task_failed"  # 任务执行失败、超时或被跳过：{"task_id", "error"}，超时或取消时附带已输出的 "partial"
+COMPLETED = "completed"  # 整个计划执行结束：{"plan", "result"}（result 为执行结果JSON）
+
+
+EventSink = Callable[[Dict[str, Any]], None]
+
+_current_sink: contextvars.ContextVar = contextvars.ContextVar("mcp_event_sink", default=None)
+
+
+def emit_event(event_type: str, **fields):
+    """向当前上下文的事件接收方发送事件，未订阅事件时不做任何事"""
+    sink = _current_sink.get()
+    if sink is not None:
+        sink({"type": event_type, **fields})
+
+
+def token_forwarder(task_id: str) -> Optional[Callable[[str], None]]:
+    """返回把工具输出的文本增量作为 TOKEN 事件转发的回调，未订阅事件时返回None"""
+    if _current_sink.get() is None:
+        return None
+    return lambda delta: emit_event(TOKEN, task_id=task_id, delta=delta)
+
+
+@contextmanager
+def event_scope(sink: EventSink):
+    """
+    在作用域内把执行事件交给 sink
+
+    线程池任务与协程会继承提交时的上下文，因此并行执行的任务产生的事件同样会送达。
+    """
+    token = _current_sink.set(sink)
+    try:
+        yield
+    finally:
+        _current_sink.reset(token)
+
+
+_DONE = object()
+
+
+def iter_events(run: Callable[[], Any], on_abandon: Callable[[], None] = None) -> Generator[Dict[str, Any], None, None]:
+    """
+    在后台线程中运行 run，边运行边产出其发送的事件
+
+    run 抛出的异常会在所有已发送的事件产出后重新抛出。
+    提前停止迭代时调用 on_abandon（例如取消正在执行的任务），不会强行中断后台线程。
+    """
+    events: "queue.Queue" = queue.Queue()
+    outcome = {}
+
+    def worker():
+        try:
+            with event_scope(events.put):
+                run()
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            events.put(_DONE)
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(worker,), name="mcp-events", daemon=True).start()
+
+    finished = False
+    try:
+        while True:
+            event = events.get()
+            if event is _DONE:
+                finished = True
+                break
+            yield event
+    finally:
+        if not finished and on_abandon is not None:
+            on_abandon()
+
+    if "error" in outcome:
+        raise outcome["error"]
+
+
+async def aiter_events(run: Callable[[], Awaitable[Any]],
+                       on_abandon: Callable[[], None] = None) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    iter_events 的异步版本：在事件循环中并发运行协程 run，边运行边产出事件
+
+    在线程中执行的同步工具发送的事件经 call_soon_threadsafe 送回事件循环。
+    提前停止迭代会调用 on_abandon 并取消正在运行的协程。
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def sink(event: Dict[str, Any]):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    async def worker():
+        try:
+            with event_scope(sink):
+                await run()
+        finally:
+            sink(_DONE)
+
+    job = asyncio.create_task(worker())
+    try:
+        while True:
+            event = await events.get()
+            if event is _DONE:
+                break
+            yield event
+        # 取出协程的异常（如果有）
+        await job
+    finally:
+        if not job.done():
+            if on_abandon is not None:
+                on_abandon()
+            job.cancel()
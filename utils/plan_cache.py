@@ -0,0 +1,112 @@
+import hashlib
+import json
+from typing import Dict, Any, List, Optional
+
+from utils.goal_normalizer import normalize_goal, templatize_plan, bind_plan
+from utils.response_cache import ResponseCache
+
+
+DEFAULT_PLAN_CACHE_CONFIG = {
+    "enabled": True,
+    "memory_max_entries": 256,
+    "disk_path": None,  # 为空时只使用内存缓存
+    "disk_ttl": 604800,  # 秒
+    "disk_max_size_mb": 20
+}
+
+
+def tool_fingerprint(tool_config: Dict[str, Any]) -> str:
+    """工具配置的指纹：工具名称、描述、类名等任何变化都会使旧计划失效"""
+    canonical = json.dumps(tool_config or {}, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class PlanCache:
+    """
+    MCP 计划缓存。
+
+    缓存键为 (模型, 工具配置指纹, 规范化目标模板)，目标中的目的地与天数作为槽位提取，
+    计划中对应的文字替换为占位符保存，命中时再填入本次目标的槽位值，
+    因此“去合肥玩3天”与“去 北京 玩三天！”可以复用同一份计划。
+    工具配置变化后指纹随之变化，旧计划不会再被命中。存储复用 ResponseCache 的内存LRU与SQLite两级缓存。
+    """
+
+    def __init__(self, cache_config: Dict[str, Any] = None):
+        """初始化计划缓存"""
+        self._config = dict(DEFAULT_PLAN_CACHE_CONFIG)
+        self._store = ResponseCache(self._config)
+        if cache_config:
+            self.configure(cache_config)
+
+    def configure(self, cache_config: Dict[str, Any]):
+        """更新缓存配置（对应 config.yaml 中 pages.mcp_agent.plan_cache）"""
+        merged = dict(DEFAULT_PLAN_CACHE_CONFIG)
+        merged.update(cache_config or {})
+        self._config = merged
+        self._store.configure(merged)
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    @staticmethod
+    def make_key(template: str, model: str, tool_config: Dict[str, Any]) -> str:
+        """计算缓存键"""
+        payload = f"{model}|{tool_fingerprint(tool_config)}|{template}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, goal: str, model: str, tool_config: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+        查找目标对应的计划
+
+        Returns:
+            Optional[List]: 已填入本次槽位值的计划；未命中返回None
+        """
+        if not self.enabled:
+            return None
+        template, slots = normalize_goal(goal)
+        if not template:
+            return None
+        chunks = self._store.get(self.make_key(template, model, tool_config))
+        if not chunks:
+            return None
+        try:
+            entry = json.loads(chunks[0])
+        except json.JSONDecodeError:
+            return None
+        # 槽位集合不同（例如缓存的计划没有天数）时无法正确填充
+        if set(entry.get("slots", [])) != set(slots):
+            return None
+        return bind_plan(entry["plan"], slots)
+
+    def set(self, goal: str, model: str, tool_config: Dict[str, Any], plan: List[Dict[str, Any]]) -> bool:
+        """
+        保存目标对应的计划
+
+        Returns:
+            bool: 是否已保存；计划中找不到目标的槽位值时无法安全复用，不保存
+        """
+        if not self.enabled or not plan:
+            return False
+        template, slots = normalize_goal(goal)
+        if not template:
+            return False
+        plan_template = templatize_plan(plan, slots)
+        if plan_template is None:
+            return False
+        entry = {"slots": sorted(slots), "plan": plan_template}
+        self._store.set(self.make_key(template, model, tool_config), [json.dumps(entry, ensure_ascii=False)])
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return self._store.get_stats()
+
+    def clear(self):
+        """清空计划缓存"""
+        self._store.clear()
+
+
+# 全局计划缓存实例
+plan_cache = PlanCache()
@@ -0,0 +1,91 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+# 计划数组的起始位置： "plan": [
+PLAN_ARRAY_PATTERN = re.compile(r'"plan"\s*:\s*\[')
+
+
+class PlanStreamParser:
+    """
+    流式计划解析器。
+
+    逐块接收规划模型输出的 {"plan": [...]} 文本，数组中的每个任务对象一闭合
+    就立即解析并返回，无需等待整个JSON生成完毕。
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0  # 下一个待扫描字符的位置
+        self._in_array = False
+        self._finished = False  # 计划数组已闭合
+        self._depth = 0  # 数组内的嵌套深度
+        self._in_string = False
+        self._escaped = False
+        self._object_start: Optional[int] = None
+        self.errors: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """目前收到的完整文本"""
+        return self._buffer
+
+    @property
+    def finished(self) -> bool:
+        """计划数组是否已闭合"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        输入一块文本
+
+        Returns:
+            List[Any]: 本块中闭合的任务对象（JSON解析结果，尚未校验）
+        """
+        self._buffer += chunk
+        if self._finished:
+            return []
+
+        if not self._in_array:
+            match = PLAN_ARRAY_PATTERN.search(self._buffer)
+            if match is None:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        tasks = []
+        buffer = self._buffer
+        for index in range(self._pos, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # 计划数组闭合
+                    self._finished = True
+                    self._pos = index + 1
+                    return tasks
+                self._depth -= 1
+                if self._depth == 0 and char == "}" and self._object_start is not None:
+                    raw = buffer[self._object_start:index + 1]
+                    self._object_start = None
+                    try:
+                        tasks.append(json.loads(raw))
+                    except json.JSONDecodeError as e:
+                        self.errors.append(f"任务对象解析失败: {e}")
+        self._pos = len(buffer)
+        return tasks
@@ -0,0 +1,313 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.retry_policy import Deadline, DeadlineExceeded
+
+
+DEFAULT_RATE_LIMITS = {
+    "requests_per_minute": None,  # None 或 0 表示不限制
+    "tokens_per_minute": None,
+    "max_in_flight": None
+}
+
+# 未指定 max_tokens 时为输出预留的令牌数
+DEFAULT_COMPLETION_RESERVE = 1024
+# 每张图片按固定令牌数估算
+IMAGE_TOKEN_ESTIMATE = 1000
+
+
+def estimate_text_tokens(text: str) -> int:
+    """按约2字符/令牌粗略估算文本令牌数（介于中文与英文之间）"""
+    return len(text) // 2
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    """粗略估算输入消息的令牌数"""
+    prompt_tokens = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            prompt_tokens += estimate_text_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    prompt_tokens += estimate_text_tokens(part.get("text", ""))
+                else:
+                    prompt_tokens += IMAGE_TOKEN_ESTIMATE
+    return prompt_tokens
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], params: Dict[str, Any] = None) -> int:
+    """估算一次调用需要预留的令牌数（输入估算 + 按max_tokens预留输出）"""
+    completion_reserve = (params or {}).get("max_tokens") or DEFAULT_COMPLETION_RESERVE
+    return estimate_prompt_tokens(messages) + completion_reserve
+
+
+class _Permit:
+    """一次调用持有的限流许可，调用结束后按实际用量结算"""
+
+    def __init__(self, limiter: "_UpstreamLimiter", reserved_tokens: int, wait_time: float):
+        self.limiter = limiter
+        self.reserved_tokens = reserved_tokens
+        self.actual_tokens: Optional[int] = None
+        self.wait_time = wait_time
+
+    def record_usage(self, total_tokens: int):
+        """记录实际消耗的令牌数，释放时多退少补"""
+        self.actual_tokens = total_tokens
+
+
+class _UpstreamLimiter:
+    """单个 (base_url, model) 的令牌桶限流器与并发控制，按到达顺序公平排队"""
+
+    def __init__(self, limits: Dict[str, Any]):
+        self.requests_per_minute = limits.get("requests_per_minute") or 0
+        self.tokens_per_minute = limits.get("tokens_per_minute") or 0
+        self.max_in_flight = limits.get("max_in_flight") or 0
+
+        self._cond = threading.Condition()
+        self._request_bucket = float(self.requests_per_minute)
+        self._token_bucket = float(self.tokens_per_minute)
+        self._updated_at = time.monotonic()
+        self._queue = deque()
+        # 异步等待者：(事件循环, asyncio.Event)，状态变化时在各自的事件循环中唤醒
+        self._async_waiters = set()
+        self._in_flight = 0
+        self._stats = {"granted": 0, "total_wait": 0.0, "max_wait": 0.0, "last_wait": 0.0, "deadline_exceeded": 0}
+
+    def _refill(self, now: float):
+        """按流逝时间补充令牌（调用方需持有锁）"""
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self.requests_per_minute:
+            self._request_bucket = min(self.requests_per_minute, self._request_bucket + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._token_bucket = min(self.tokens_per_minute, self._token_bucket + elapsed * self.tokens_per_minute / 60.0)
+
+    def _try_grant(self, ticket: int, tokens: int) -> Tuple[bool, Optional[float]]:
+        """
+        尝试为队首请求发放许可（调用方需持有锁）
+
+        Returns:
+            Tuple: (是否获得许可, 建议等待秒数；None 表示需等待其他请求释放)
+        """
+        if self._queue[0] != ticket:
+            return False, None
+        if self.max_in_flight and self._in_flight >= self.max_in_flight:
+            return False, None
+
+        self._refill(time.monotonic())
+        wait = 0.0
+        if self.requests_per_minute and self._request_bucket < 1:
+            wait = max(wait, (1 - self._request_bucket) * 60.0 / self.requests_per_minute)
+        # 单次请求超过桶容量时按桶容量计，避免永久阻塞
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        if self.tokens_per_minute and self._token_bucket < tokens:
+            wait = max(wait, (tokens - self._token_bucket) * 60.0 / self.tokens_per_minute)
+        if wait > 0:
+            return False, wait
+
+        self._queue.popleft()
+        if self.requests_per_minute:
+            self._request_bucket -= 1
+        if self.tokens_per_minute:
+            self._token_bucket -= tokens
+        self._in_flight += 1
+        # 队首变化，唤醒下一个等待者
+        self._notify()
+        return True, 0.0
+
+    def _notify(self):
+        """唤醒所有同步与异步等待者（调用方需持有锁）"""
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭，等待者随之结束
+                pass
+
+    def _record_wait(self, wait_time: float):
+        """记录排队等待时间（调用方需持有锁）"""
+        self._stats["granted"] += 1
+        self._stats["total_wait"] += wait_time
+        self._stats["last_wait"] = wait_time
+        self._stats["max_wait"] = max(self._stats["max_wait"], wait_time)
+
+    def _abandon(self, ticket: int):
+        """放弃排队（调用方需持有锁）"""
+        try:
+            self._queue.remove(ticket)
+        except ValueError:
+            pass
+        self._notify()
+
+    def _bounded_wait(self, wait: Optional[float], deadline: Optional[Deadline]) -> Optional[float]:
+        """
+        按调用的截止时间限制本次等待（调用方需持有锁）
+
+        Raises:
+            DeadlineExceeded: 截止时间已到，或按令牌桶需要的等待会超过截止时间
+        """
+        remaining = deadline.setup_remaining() if deadline is not None else None
+        if remaining is None:
+            return wait
+        if remaining <= 0 or (wait is not None and wait > remaining):
+            self._stats["deadline_exceeded"] += 1
+            raise DeadlineExceeded("排队等待调用许可超出截止时间")
+        return remaining if wait is None else wait
+
+    def acquire(self, ticket: int, tokens: int, deadline: Optional[Deadline] = None) -> _Permit:
+        """阻塞等待许可，等待不超过调用的截止时间"""
+        started = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    granted, wait = self._try_grant(ticket, tokens)
+                    if granted:
+                        break
+                    self._cond.wait(timeout=self._bounded_wait(wait, deadline))
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            wait_time = time.monotonic() - started
+            self._record_wait(wait_time)
+        return _Permit(self, tokens, wait_time)
+
+    async def acquire_async(self, ticket: int, tokens: int, deadline: Optional[Deadline] = None) -> _Permit:
+        """
+        在事件循环中等待许可，不占用线程，等待不超过调用的截止时间
+
+        等待期间不轮询：其他调用释放许可或队首变化时通过 call_soon_threadsafe 唤醒，
+        令牌桶需要补充时按计算出的等待时间定时唤醒。
+        """
+        started = time.monotonic()
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            self._queue.append(ticket)
+            self._async_waiters.add(waiter)
+        try:
+            while True:
+                # 先清除再检查，检查之后发生的状态变化一定会重新唤醒
+                waiter[1].clear()
+                with self._cond:
+                    granted, wait = self._try_grant(ticket, tokens)
+                    if granted:
+                        wait_time = time.monotonic() - started
+                        self._record_wait(wait_time)
+                        return _Permit(self, tokens, wait_time)
+                    wait = self._bounded_wait(wait, deadline)
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._cond:
+                self._abandon(ticket)
+            raise
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+    def release(self, permit: _Permit):
+        """释放许可，并按实际用量修正令牌桶"""
+        with self._cond:
+            self._in_flight -= 1
+            if self.tokens_per_minute and permit.actual_tokens is not None:
+                reserved = min(permit.reserved_tokens, self.tokens_per_minute)
+                self._token_bucket = min(self.tokens_per_minute, self._token_bucket + reserved - permit.actual_tokens)
+            self._notify()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取当前排队与等待统计"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._queue)
+            stats["in_flight"] = self._in_flight
+            stats["avg_wait"] = stats["total_wait"] / stats["granted"] if stats["granted"] else 0.0
+            return stats
+
+
+class RateGovernor:
+    """
+    客户端限流器。
+
+    按 (base_url, model) 维护请求数/分钟、令牌数/分钟和最大并发三类限制，
+    调用方超限时按到达顺序排队等待，而不是直接失败。
+    """
+
+    def __init__(self, rate_config: Dict[str, Any] = None):
+        """初始化限流器"""
+        self._lock = threading.Lock()
+        self._limiters: Dict[Tuple[str, str], _UpstreamLimiter] = {}
+        self._tickets = itertools.count()
+        self._default_limits = dict(DEFAULT_RATE_LIMITS)
+        self._overrides: List[Dict[str, Any]] = []
+        if rate_config:
+            self.configure(rate_config)
+
+    def configure(self, rate_config: Dict[str, Any]):
+        """更新限流配置（对应 config.yaml 中的 api.rate_limits）"""
+        with self._lock:
+            self._default_limits = dict(DEFAULT_RATE_LIMITS)
+            self._default_limits.update((rate_config or {}).get("default") or {})
+            self._overrides = list((rate_config or {}).get("overrides") or [])
+            self._limiters.clear()
+
+    def _resolve_limits(self, base_url: str, model: str) -> Dict[str, Any]:
+        """查找适用的限流配置，越具体的覆盖项优先级越高"""
+        limits = dict(self._default_limits)
+        for override in sorted(self._overrides, key=lambda o: ("base_url" in o) + ("model" in o)):
+            if override.get("base_url", base_url) == base_url and override.get("model", model) == model:
+                limits.update({k: v for k, v in override.items() if k not in ("base_url", "model")})
+        return limits
+
+    def _get_limiter(self, base_url: str, model: str) -> _UpstreamLimiter:
+        """获取 (base_url, model) 对应的限流器"""
+        key = (base_url or "", model or "")
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = _UpstreamLimiter(self._resolve_limits(*key))
+                self._limiters[key] = limiter
+            return limiter
+
+    @contextmanager
+    def acquire(self, base_url: str, model: str, estimated_tokens: int = 0, deadline: Optional[Deadline] = None):
+        """获取调用许可（同步），退出时自动释放；排队超过 deadline 时抛出 DeadlineExceeded"""
+        limiter = self._get_limiter(base_url, model)
+        permit = limiter.acquire(next(self._tickets), estimated_tokens, deadline)
+        try:
+            yield permit
+        finally:
+            limiter.release(permit)
+
+    @asynccontextmanager
+    async def acquire_async(self, base_url: str, model: str, estimated_tokens: int = 0, deadline: Optional[Deadline] = None):
+        """获取调用许可（异步），退出时自动释放；排队超过 deadline 时抛出 DeadlineExceeded"""
+        limiter = self._get_limiter(base_url, model)
+        permit = await limiter.acquire_async(next(self._tickets), estimated_tokens, deadline)
+        try:
+            yield permit
+        finally:
+            limiter.release(permit)
+
+    def get_queue_state(self, base_url: str, model: str) -> Dict[str, Any]:
+        """获取指定上游/模型当前的排队深度与等待时间"""
+        return self._get_limiter(base_url, model).get_stats()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有上游/模型的限流统计"""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {f"{base_url or 'default'}|{model}": limiter.get_stats() for (base_url, model), limiter in limiters.items()}
+
+
+# 全局限流器实例
+rate_governor = RateGovernor()
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+
+DEFAULT_CACHE_CONFIG = {
+    "enabled": True,
+    "max_temperature": 0.3,  # 仅缓存低温度（近似确定性）的调用
+    "memory_max_entries": 256,
+    "disk_path": None,  # 为空时只使用内存缓存
+    "disk_ttl": 86400,  # 秒
+    "disk_max_size_mb": 100
+}
+
+# 参与缓存键计算的采样参数
+KEY_PARAMS = ("temperature", "top_p", "max_tokens", "response_format", "seed", "stop",
+              "presence_penalty", "frequency_penalty")
+
+
+class ResponseCache:
+    """
+    LLM响应精确匹配缓存。
+
+    缓存键为 (model, messages, 采样参数, response_format) 规范化JSON的SHA-256，
+    一级为进程内LRU，二级为带TTL和容量上限的SQLite持久化缓存。
+    缓存值统一保存为文本块列表，流式命中时按原分块回放。
+    """
+
+    def __init__(self, cache_config: Dict[str, Any] = None):
+        """初始化响应缓存"""
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._config = dict(DEFAULT_CACHE_CONFIG)
+        if cache_config:
+            self.configure(cache_config)
+
+    def configure(self, cache_config: Dict[str, Any]):
+        """更新缓存配置（对应 config.yaml 中的 api.response_cache）"""
+        with self._lock:
+            merged = dict(DEFAULT_CACHE_CONFIG)
+            merged.update(cache_config or {})
+            if merged.get("disk_path") != self._config.get("disk_path") and self._db is not None:
+                self._db.close()
+                self._db = None
+            self._config = merged
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    def make_key(self, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> Optional[str]:
+        """
+        计算缓存键
+
+        Returns:
+            Optional[str]: 缓存键；缓存未启用或调用不具备确定性时返回None
+        """
+        if not self.enabled:
+            return None
+
+        temperature = params.get("temperature", 1.0)
+        if temperature is None or temperature > self._config.get("max_temperature", 0.3):
+            return None
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "params": {name: params[name] for name in KEY_PARAMS if name in params}
+        }
+        canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _get_db(self) -> Optional[sqlite3.Connection]:
+        """获取SQLite连接（调用方需持有锁）"""
+        disk_path = self._config.get("disk_path")
+        if not disk_path:
+            return None
+        if self._db is None:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, chunks: List[str]):
+        """写入内存LRU（调用方需持有锁）"""
+        self._memory[key] = chunks
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._config.get("memory_max_entries", 256):
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """读取缓存的文本块列表，未命中返回None"""
+        with self._lock:
+            chunks = self._memory.get(key)
+            if chunks is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return list(chunks)
+
+            db = self._get_db()
+            if db is not None:
+                now = time.time()
+                row = db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if now - row[1] <= self._config.get("disk_ttl", 86400):
+                        db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        db.commit()
+                        chunks = json.loads(row[0])
+                        self._remember(key, chunks)
+                        self._stats["disk_hits"] += 1
+                        return list(chunks)
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    db.commit()
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, chunks: List[str]):
+        """写入缓存"""
+        with self._lock:
+            self._remember(key, list(chunks))
+            self._stats["stores"] += 1
+
+            db = self._get_db()
+            if db is None:
+                return
+            value = json.dumps(chunks, ensure_ascii=False)
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now)
+            )
+            self._evict(db, now)
+            db.commit()
+
+    def delete(self, key: str):
+        """删除指定缓存条目（例如响应未通过业务校验时）"""
+        with self._lock:
+            self._memory.pop(key, None)
+            db = self._get_db()
+            if db is not None:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float):
+        """淘汰过期条目，并按最近访问时间淘汰超出容量的条目（调用方需持有锁）"""
+        cursor = db.execute("DELETE FROM responses WHERE created_at < ?", (now - self._config.get("disk_ttl", 86400),))
+        self._stats["evictions"] += cursor.rowcount
+
+        max_bytes = self._config.get("disk_max_size_mb", 100) * 1024 * 1024
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            if total <= max_bytes:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self._stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            return stats
+
+    def clear(self):
+        """清空内存与磁盘缓存"""
+        with self._lock:
+            self._memory.clear()
+            db = self._get_db()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+                db.commit()
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
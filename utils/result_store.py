@@ -0,0 +1,167 @@
+import threading
+from collections.abc import Mapping
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+from utils.rate_limiter import estimate_text_tokens
+
+
+DEFAULT_DEPENDENCY_CONTEXT_CONFIG = {
+    "token_budget": 1000,  # 每个依赖结果注入下游任务时的令牌预算，0 表示不限制
+    "strategy": "truncate"  # truncate: 保留首尾、省略中间；summarize: 调用LLM摘要，失败时退回截断
+}
+
+# 估算令牌数时约2字符/令牌，与 estimate_text_tokens 一致
+CHARS_PER_TOKEN = 2
+
+
+def truncate_text(text: str, token_budget: int) -> str:
+    """按令牌预算截断文本：保留开头约2/3与结尾约1/3，中间以省略标记代替"""
+    if not token_budget or estimate_text_tokens(text) <= token_budget:
+        return text
+    max_chars = token_budget * CHARS_PER_TOKEN
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n……（已省略约 {omitted} 字）……\n{text[-tail:] if tail else ''}"
+
+
+class ResultRef:
+    """依赖任务结果的轻量句柄，转换为字符串时才读取（并压缩）结果内容"""
+
+    __slots__ = ("_store", "task_id")
+
+    def __init__(self, store: "ResultStore", task_id: str):
+        self._store = store
+        self.task_id = task_id
+
+    def read(self) -> str:
+        """读取压缩到令牌预算内的结果"""
+        return self._store.materialize(self.task_id)
+
+    def read_full(self) -> str:
+        """读取完整结果"""
+        return self._store.raw(self.task_id) or ""
+
+    def __str__(self) -> str:
+        return self.read()
+
+    def __repr__(self) -> str:
+        return f"ResultRef({self.task_id!r})"
+
+
+class ResultStore:
+    """
+    MCP 计划执行中的任务结果存储。
+
+    直接引用执行结果字典中的结果，不复制内容；下游任务拿到的是 ResultRef 句柄，
+    只有工具真正读取时才按每个依赖的令牌预算压缩（截断或摘要），压缩结果在同一计划内只计算一次。
+    """
+
+    def __init__(self, results: Dict[str, Any], lock: threading.Lock, context_config: Dict[str, Any] = None,
+                 summarizer: Callable[[str, int], str] = None):
+        """
+        Args:
+            results: 计划执行结果 {"tasks": {task_id: {"result": ...}}}
+            lock: 保护 results 的锁
+            context_config: 依赖上下文配置（token_budget、strategy）
+            summarizer: 摘要函数 (文本, 令牌预算) -> 摘要，strategy 为 summarize 时使用
+        """
+        self._results = results
+        self._results_lock = lock
+        self._config = dict(DEFAULT_DEPENDENCY_CONTEXT_CONFIG)
+        self._config.update(context_config or {})
+        self._summarizer = summarizer
+        self._compacted: Dict[str, str] = {}
+        self._compact_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def raw(self, task_id: str) -> Optional[str]:
+        """任务的完整结果；任务未成功完成时返回None"""
+        with self._results_lock:
+            entry = self._results["tasks"].get(task_id)
+        if not entry or "result" not in entry:
+            return None
+        return str(entry["result"])
+
+    def ref(self, task_id: str) -> Optional[ResultRef]:
+        """任务结果的句柄；任务未成功完成时返回None"""
+        with self._results_lock:
+            entry = self._results["tasks"].get(task_id)
+        return ResultRef(self, task_id) if entry and "result" in entry else None
+
+    def materialize(self, task_id: str) -> str:
+        """读取压缩后的结果，同一任务只压缩一次（并发读取时等待首次压缩完成）"""
+        with self._lock:
+            if task_id in self._compacted:
+                return self._compacted[task_id]
+            compact_lock = self._compact_locks.setdefault(task_id, threading.Lock())
+
+        with compact_lock:
+            with self._lock:
+                if task_id in self._compacted:
+                    return self._compacted[task_id]
+            compacted = self.compact(self.raw(task_id) or "")
+            with self._lock:
+                self._compacted[task_id] = compacted
+            return compacted
+
+    @property
+    def needs_summarizer(self) -> bool:
+        """压缩是否需要调用LLM"""
+        return self._config.get("strategy") == "summarize" and self._summarizer is not None
+
+    def compact(self, text: str) -> str:
+        """按令牌预算压缩结果"""
+        budget = int(self._config.get("token_budget") or 0)
+        if not budget or estimate_text_tokens(text) <= budget:
+            return text
+        if self.needs_summarizer:
+            try:
+                summary = self._summarizer(text, budget)
+                if summary:
+                    return truncate_text(summary, budget)
+            except Exception as e:
+                print(f"⚠️ 依赖结果摘要失败，改为截断: {e}")
+        return truncate_text(text, budget)
+
+
+class TaskContext(Mapping):
+    """
+    任务上下文：共享（不复制）计划的初始上下文，并以句柄形式附加依赖结果。
+
+    读取 "{dep_id}_result" 时才取出压缩后的依赖结果，与原先注入字符串的读取方式兼容；
+    需要传递而不读取时可以用 ref() 取得句柄。
+    """
+
+    def __init__(self, base: Mapping, refs: Dict[str, ResultRef]):
+        self._base = base
+        self._refs = refs
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._refs:
+            return self._refs[key].read()
+        return self._base[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._base
+        for key in self._refs:
+            if key not in self._base:
+                yield key
+
+    def __len__(self) -> int:
+        return len(set(self._base) | set(self._refs))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._refs or key in self._base
+
+    def ref(self, key: str) -> Optional[ResultRef]:
+        """依赖结果的句柄"""
+        return self._refs.get(key)
+
+    def refs(self) -> List[ResultRef]:
+        """全部依赖结果的句柄"""
+        return list(self._refs.values())
+
+    def copy(self) -> "TaskContext":
+        """浅复制（依赖结果仍以句柄形式保存）"""
+        return TaskContext(dict(self._base), dict(self._refs))
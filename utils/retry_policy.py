@@ -0,0 +1,297 @@
+import asyncio
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator, AsyncIterator, Union
+
+import httpx
+import openai
+
+
+DEFAULT_RETRY_CONFIG = {
+    "max_attempts": 3,  # 含首次调用
+    "base_delay": 0.5,  # 秒，指数退避的基数
+    "max_delay": 8,  # 秒，单次退避上限
+    "total_budget": 120,  # 秒，连接、等待首个token与重试阶段的总时间预算，开始输出后不再受其约束；null 表示不限制
+    "connect_timeout": 10,
+    "read_timeout": 60,  # 非流式调用等待响应的超时
+    "first_token_timeout": 30,  # 流式调用等待首个token的超时
+    "inter_token_timeout": 20  # 流式调用两个token之间的最大间隔
+}
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(Exception):
+    """调用超出时间预算"""
+
+
+class StreamTimeoutError(Exception):
+    """流式响应在首个token或token间隔上超时"""
+
+
+class Deadline:
+    """
+    绝对截止时间，None 表示不限制
+
+    setup_expires_at 为连接、排队、等待首个token与重试阶段的截止时间，不晚于 expires_at；
+    由 RetryPolicy.start 按总时间预算设置，开始输出后只受 expires_at 约束。
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.setup_expires_at = self.expires_at
+
+    @staticmethod
+    def _remaining(expires_at: Optional[float]) -> Optional[float]:
+        if expires_at is None:
+            return None
+        return max(0.0, expires_at - time.monotonic())
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数，不限制时返回None"""
+        return self._remaining(self.expires_at)
+
+    def expired(self) -> bool:
+        """是否已过期"""
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def setup_remaining(self) -> Optional[float]:
+        """连接、等待首个token与重试阶段的剩余秒数，不限制时返回None"""
+        return self._remaining(self.setup_expires_at)
+
+    def setup_expired(self) -> bool:
+        """连接、等待首个token与重试阶段是否已超时"""
+        return self.setup_expires_at is not None and time.monotonic() >= self.setup_expires_at
+
+    @staticmethod
+    def earliest(*deadlines: Optional["Deadline"]) -> "Deadline":
+        """取多个截止时间中最早的一个"""
+        result = Deadline()
+        for deadline in deadlines:
+            if deadline is not None and deadline.expires_at is not None:
+                if result.expires_at is None or deadline.expires_at < result.expires_at:
+                    result.expires_at = deadline.expires_at
+        result.setup_expires_at = result.expires_at
+        return result
+
+
+# 当前上下文（线程/协程）的截止时间，用于让一组调用共享同一个时间预算
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("llm_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """获取当前上下文的截止时间"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Union[Deadline, float, None]):
+    """
+    在作用域内为所有LLM调用设置共享的截止时间
+
+    嵌套使用时取更早的截止时间。
+    """
+    if deadline is not None and not isinstance(deadline, Deadline):
+        deadline = Deadline(deadline)
+    token = _current_deadline.set(Deadline.earliest(current_deadline(), deadline))
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+
+class RetryPolicy:
+    """
+    LLM调用的统一重试策略。
+
+    只对可重试的错误（连接失败、超时、429、5xx）进行带抖动的指数退避重试，并受单次调用截止时间约束。
+    总时间预算只约束连接、排队、等待首个token与重试阶段，正在输出的流不会因此被中断，
+    整体时长由调用方的截止时间（例如MCP任务超时）控制。
+    """
+
+    def __init__(self, retry_config: Dict[str, Any] = None):
+        """初始化重试策略"""
+        self._config = dict(DEFAULT_RETRY_CONFIG)
+        if retry_config:
+            self.configure(retry_config)
+
+    def configure(self, retry_config: Dict[str, Any]):
+        """更新重试配置（对应 config.yaml 中的 api.retry）"""
+        merged = dict(DEFAULT_RETRY_CONFIG)
+        merged.update(retry_config or {})
+        self._config = merged
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """当前重试配置"""
+        return dict(self._config)
+
+    def start(self, deadline: Union[Deadline, float, None] = None) -> Deadline:
+        """
+        为一次调用建立截止时间：显式截止时间与上下文截止时间中最早的一个；
+        连接、等待首个token与重试阶段另外受总时间预算约束（setup_expires_at）
+        """
+        if deadline is not None and not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+        call_deadline = Deadline.earliest(deadline, current_deadline())
+        call_deadline.setup_expires_at = Deadline.earliest(call_deadline, Deadline(self._config.get("total_budget"))).expires_at
+        return call_deadline
+
+    @staticmethod
+    def is_retryable(exc: BaseException) -> bool:
+        """判断错误是否可重试"""
+        if isinstance(exc, (openai.APIConnectionError, StreamTimeoutError, httpx.TimeoutException, httpx.TransportError)):
+            return True
+        if isinstance(exc, openai.APIStatusError):
+            return exc.status_code in RETRYABLE_STATUS_CODES
+        return False
+
+    def backoff_delay(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（全抖动指数退避）"""
+        cap = min(self._config.get("max_delay", 8), self._config.get("base_delay", 0.5) * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def next_delay(self, exc: BaseException, attempt: int, deadline: Deadline,
+                   retryable: Callable[[BaseException], bool] = None, failover: bool = False) -> Optional[float]:
+        """
+        计算下一次重试前的等待时间
+
+        Args:
+            retryable: 自定义可重试判断，默认使用 is_retryable
+            failover: 下一次重试将切换到其他健康端点，此时无需退避
+
+        Returns:
+            Optional[float]: 等待秒数；不应重试时返回None
+        """
+        if not (retryable or self.is_retryable)(exc) or attempt + 1 >= self._config.get("max_attempts", 3):
+            return None
+        if deadline.setup_expired():
+            return None
+        delay = 0.0 if failover else self.backoff_delay(attempt)
+        remaining = deadline.setup_remaining()
+        if delay and remaining is not None and remaining <= delay:
+            return None
+        return delay
+
+    def request_timeout(self, deadline: Deadline, stream: bool = False) -> httpx.Timeout:
+        """
+        根据截止时间计算单次请求的超时设置
+
+        连接与非流式响应受总时间预算约束；流式读取的超时按单次读取计算，
+        只受调用截止时间约束，首个token的预算由 watch_stream 检查。
+        """
+        if stream:
+            read = max(self._config.get("first_token_timeout") or 0, self._config.get("inter_token_timeout") or 0) or None
+        else:
+            read = self._config.get("read_timeout")
+        connect = self._config.get("connect_timeout")
+
+        read_remaining = deadline.remaining() if stream else deadline.setup_remaining()
+        if read_remaining is not None:
+            read = min(read, read_remaining) if read else read_remaining
+        setup_remaining = deadline.setup_remaining()
+        if setup_remaining is not None:
+            connect = min(connect, setup_remaining) if connect else setup_remaining
+        return httpx.Timeout(read, connect=connect)
+
+    def _check_gap(self, gap: float, received: bool, deadline: Deadline):
+        """检查首token/token间隔与截止时间；总时间预算只约束首个token之前的等待"""
+        limit = self._config.get("inter_token_timeout") if received else self._config.get("first_token_timeout")
+        if limit and gap > limit:
+            stage = "token间隔" if received else "首个token"
+            raise StreamTimeoutError(f"等待{stage}超时（{gap:.1f}s > {limit}s）")
+        if deadline.expired():
+            raise DeadlineExceeded("流式响应超出调用截止时间")
+        if not received and deadline.setup_expired():
+            raise DeadlineExceeded("等待首个token超出时间预算")
+
+    def watch_stream(self, response, deadline: Deadline) -> Iterator:
+        """
+        包装流式响应，检查首token超时、token间隔超时与截止时间
+
+        阻塞读取本身由请求的read超时兜底，这里在每个数据块到达时做精确检查，
+        超时后关闭上游连接。
+        """
+        started = last = time.monotonic()
+        received = False
+        try:
+            for chunk in response:
+                now = time.monotonic()
+                # 首个token从请求开始计时，之后按相邻token间隔计时
+                self._check_gap(now - (last if received else started), received, deadline)
+                last = now
+                if chunk.choices and chunk.choices[0].delta.content:
+                    received = True
+                yield chunk
+        except (StreamTimeoutError, DeadlineExceeded, GeneratorExit):
+            # 包括调用方提前停止读取（任务取消）的情况，及时释放上游连接
+            response.close()
+            raise
+
+    async def watch_stream_async(self, response, deadline: Deadline) -> AsyncIterator:
+        """watch_stream 的异步版本"""
+        started = last = time.monotonic()
+        received = False
+        try:
+            async for chunk in response:
+                now = time.monotonic()
+                # 首个token从请求开始计时，之后按相邻token间隔计时
+                self._check_gap(now - (last if received else started), received, deadline)
+                last = now
+                if chunk.choices and chunk.choices[0].delta.content:
+                    received = True
+                yield chunk
+        except (StreamTimeoutError, DeadlineExceeded, GeneratorExit):
+            await response.close()
+            raise
+
+    def call(self, func: Callable[[Deadline], Any], deadline: Union[Deadline, float, None] = None,
+             retryable: Callable[[BaseException], bool] = None, failover: Callable[[], bool] = None) -> Any:
+        """
+        按重试策略执行同步调用
+
+        Args:
+            func: 被调用函数，接收本次调用的截止时间
+            deadline: 可选的截止时间
+            retryable: 自定义可重试判断，默认使用 is_retryable
+            failover: 失败后判断能否立即切换到其他端点重试（无需退避）
+        """
+        deadline = self.start(deadline)
+        attempt = 0
+        while True:
+            if deadline.setup_expired():
+                raise DeadlineExceeded("调用超出时间预算")
+            try:
+                return func(deadline)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, deadline, retryable, bool(failover and failover()))
+                if delay is None:
+                    raise
+                print(f"🔁 调用失败，{delay:.2f}秒后重试 (第{attempt + 1}次): {e}")
+                time.sleep(delay)
+                attempt += 1
+
+    async def call_async(self, func: Callable[[Deadline], Any], deadline: Union[Deadline, float, None] = None,
+                         retryable: Callable[[BaseException], bool] = None, failover: Callable[[], bool] = None) -> Any:
+        """按重试策略执行异步调用，func 返回可等待对象"""
+        deadline = self.start(deadline)
+        attempt = 0
+        while True:
+            if deadline.setup_expired():
+                raise DeadlineExceeded("调用超出时间预算")
+            try:
+                return await func(deadline)
+            except Exception as e:
+                delay = self.next_delay(e, attempt, deadline, retryable, bool(failover and failover()))
+                if delay is None:
+                    raise
+                print(f"🔁 调用失败，{delay:.2f}秒后重试 (第{attempt + 1}次): {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+# 全局重试策略实例
+retry_policy = RetryPolicy()
@@ -0,0 +1,346 @@
+import asyncio
+import hashlib
+import json
+import threading
+import weakref
+from typing import Dict, Any, List, Optional, Callable, Iterator, AsyncIterator, Tuple, Awaitable
+
+
+DEFAULT_SINGLE_FLIGHT_CONFIG = {
+    "enabled": True
+}
+
+
+def make_flight_key(kind: str, base_url: Optional[str], model: str,
+                    messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """计算合并键：调用方式、上游、模型、消息与全部采样参数的规范化JSON的SHA-256"""
+    payload = {"kind": kind, "base_url": base_url, "model": model, "messages": messages, "params": params}
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """一次进行中的上游流式调用，保存已收到的文本块供后加入者回放"""
+
+    def __init__(self, source):
+        self.source = source  # 共享的上游文本块迭代器
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.driving = False  # 是否有订阅者正在从上游读取下一块
+        self.subscribers = 0
+
+
+class _Call:
+    """一次进行中的非流式调用"""
+
+    def __init__(self):
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _LeaderCancelled(Exception):
+    """非流式调用的发起者被取消，等待者需要重新发起调用"""
+
+
+class StreamSubscription:
+    """对某个合并流的订阅；leader 为 True 表示本次订阅发起了上游调用"""
+
+    def __init__(self, chunks: Iterator[str], leader: bool):
+        self._chunks = chunks
+        self.leader = leader
+
+    def __iter__(self):
+        return self._chunks
+
+
+class AsyncStreamSubscription:
+    """对某个合并流的异步订阅"""
+
+    def __init__(self, chunks: AsyncIterator[str], leader: bool):
+        self._chunks = chunks
+        self.leader = leader
+
+    def __aiter__(self):
+        return self._chunks
+
+
+class SingleFlight:
+    """
+    相同请求合并器。
+
+    并发的相同请求（合并键一致）只向上游发起一次调用：流式调用的后加入者先回放
+    已收到的文本块，再与其他订阅者一起接收后续内容；非流式调用的后加入者等待同一结果。
+    上游流由需要下一块内容的订阅者轮流读取，发起者中途退出不影响其他订阅者，
+    所有订阅者都退出时关闭上游流。
+    """
+
+    def __init__(self, flight_config: Dict[str, Any] = None):
+        """初始化请求合并器"""
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._flights: Dict[str, _Flight] = {}
+        self._calls: Dict[str, Tuple[_Call, threading.Event]] = {}
+        # 异步状态按事件循环隔离：{loop: {"flights": {}, "calls": {}}}
+        self._loop_states: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._stats = {"leaders": 0, "followers": 0}
+        self._config = dict(DEFAULT_SINGLE_FLIGHT_CONFIG)
+        if flight_config:
+            self.configure(flight_config)
+
+    def configure(self, flight_config: Dict[str, Any]):
+        """更新合并配置（对应 config.yaml 中的 api.single_flight）"""
+        merged = dict(DEFAULT_SINGLE_FLIGHT_CONFIG)
+        merged.update(flight_config or {})
+        self._config = merged
+
+    @property
+    def enabled(self) -> bool:
+        """请求合并是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    def _count(self, leader: bool):
+        """记录发起/合并次数（调用方需持有锁）"""
+        self._stats["leaders" if leader else "followers"] += 1
+
+    # ---------- 同步 ----------
+
+    def stream(self, key: str, factory: Callable[[], Iterator[str]]) -> StreamSubscription:
+        """订阅合并流；没有进行中的相同请求时由 factory 创建上游迭代器"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None or flight.done
+            if leader:
+                flight = _Flight(factory())
+                self._flights[key] = flight
+            flight.subscribers += 1
+            self._count(leader)
+        return StreamSubscription(self._replay(key, flight), leader)
+
+    def _replay(self, key: str, flight: _Flight) -> Iterator[str]:
+        """回放已收到的文本块，并在需要时推进上游流"""
+        index = 0
+        try:
+            while True:
+                with self._cond:
+                    while index >= len(flight.chunks) and not flight.done and flight.driving:
+                        self._cond.wait()
+                    if index < len(flight.chunks):
+                        pending = flight.chunks[index:]
+                    elif flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.driving = True
+                        pending = None
+
+                if pending is None:
+                    self._advance(key, flight)
+                    continue
+                for chunk in pending:
+                    index += 1
+                    yield chunk
+        finally:
+            self._leave(key, flight)
+
+    def _advance(self, key: str, flight: _Flight):
+        """从上游读取下一块（同一时刻只有一个订阅者读取）"""
+        chunk, finished, error = None, False, None
+        try:
+            chunk = next(flight.source)
+        except StopIteration:
+            finished = True
+        except BaseException as e:
+            finished, error = True, e
+        with self._cond:
+            if finished:
+                flight.done, flight.error = True, error
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            else:
+                flight.chunks.append(chunk)
+            flight.driving = False
+            self._cond.notify_all()
+
+    def _leave(self, key: str, flight: _Flight):
+        """订阅者退出；最后一个订阅者在流未结束时关闭上游"""
+        with self._cond:
+            flight.subscribers -= 1
+            abandoned = flight.subscribers == 0 and not flight.done
+            if abandoned:
+                flight.done = True
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+        if abandoned and hasattr(flight.source, "close"):
+            flight.source.close()
+
+    def call(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        合并执行非流式调用
+
+        Returns:
+            Tuple: (调用结果, 是否由本次调用发起)
+        """
+        with self._lock:
+            entry = self._calls.get(key)
+            leader = entry is None
+            if leader:
+                entry = (_Call(), threading.Event())
+                self._calls[key] = entry
+            self._count(leader)
+        call, finished = entry
+
+        if not leader:
+            finished.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = func()
+            return call.result, True
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            finished.set()
+
+    # ---------- 异步 ----------
+
+    def _loop_state(self) -> Dict[str, Any]:
+        """获取当前事件循环的合并状态"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loop_states.get(loop)
+            if state is None:
+                state = {"flights": {}, "calls": {}, "cond": asyncio.Condition()}
+                self._loop_states[loop] = state
+            return state
+
+    def stream_async(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncStreamSubscription:
+        """订阅合并流（异步），需在协程内调用"""
+        state = self._loop_state()
+        flight = state["flights"].get(key)
+        leader = flight is None or flight.done
+        if leader:
+            flight = _Flight(factory())
+            state["flights"][key] = flight
+        flight.subscribers += 1
+        with self._lock:
+            self._count(leader)
+        return AsyncStreamSubscription(self._replay_async(state, key, flight), leader)
+
+    async def _replay_async(self, state: Dict[str, Any], key: str, flight: _Flight) -> AsyncIterator[str]:
+        """_replay 的异步版本"""
+        cond: asyncio.Condition = state["cond"]
+        index = 0
+        try:
+            while True:
+                async with cond:
+                    while index >= len(flight.chunks) and not flight.done and flight.driving:
+                        await cond.wait()
+                    if index < len(flight.chunks):
+                        pending = flight.chunks[index:]
+                    elif flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.driving = True
+                        pending = None
+
+                if pending is None:
+                    await self._advance_async(state, key, flight)
+                    continue
+                for chunk in pending:
+                    index += 1
+                    yield chunk
+        finally:
+            await self._leave_async(state, key, flight)
+
+    async def _advance_async(self, state: Dict[str, Any], key: str, flight: _Flight):
+        """从上游读取下一块（异步）"""
+        chunk, finished, error = None, False, None
+        try:
+            chunk = await flight.source.__anext__()
+        except StopAsyncIteration:
+            finished = True
+        except BaseException as e:
+            finished, error = True, e
+        async with state["cond"]:
+            if finished:
+                flight.done, flight.error = True, error
+                if state["flights"].get(key) is flight:
+                    del state["flights"][key]
+            else:
+                flight.chunks.append(chunk)
+            flight.driving = False
+            state["cond"].notify_all()
+
+    async def _leave_async(self, state: Dict[str, Any], key: str, flight: _Flight):
+        """订阅者退出（异步）"""
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.done:
+            flight.done = True
+            if state["flights"].get(key) is flight:
+                del state["flights"][key]
+            if hasattr(flight.source, "aclose"):
+                await flight.source.aclose()
+
+    async def call_async(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        合并执行非流式调用（异步）
+
+        发起者被取消时不取消共享调用的结果，而是通知等待者重新发起：
+        第一个重新进入的等待者成为新的发起者，其余等待者合并到它的调用上。
+        """
+        state = self._loop_state()
+        counted = False
+        while True:
+            future = state["calls"].get(key)
+            leader = future is None
+            if not counted:
+                with self._lock:
+                    self._count(leader)
+                counted = True
+            if not leader:
+                try:
+                    # shield 避免某个等待者被取消时连带取消共享调用
+                    return await asyncio.shield(future), False
+                except _LeaderCancelled:
+                    continue
+
+            future = asyncio.get_running_loop().create_future()
+            state["calls"][key] = future
+            try:
+                result = await func()
+                future.set_result(result)
+                return result, True
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                future.exception()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # 没有等待者时避免 "exception was never retrieved" 警告
+                future.exception()
+                raise
+            finally:
+                del state["calls"][key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight_streams"] = len(self._flights)
+            stats["in_flight_calls"] = len(self._calls)
+            total = stats["leaders"] + stats["followers"]
+            stats["coalesce_rate"] = stats["followers"] / total if total else 0.0
+            return stats
+
+
+# 全局请求合并实例
+single_flight = SingleFlight()
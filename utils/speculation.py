@@ -0,0 +1,168 @@
+import threading
+from typing import Dict, Any, Optional
+
+from utils.goal_normalizer import normalize_goal
+from utils.intent_router import intent_router
+from utils.rate_limiter import estimate_text_tokens
+from utils.task_run import TaskRun
+
+
+DEFAULT_SPECULATION_CONFIG = {
+    "enabled": False,  # 推测执行默认关闭
+    "min_confidence": 0.6  # 本地预测的置信度低于该值时不推测
+}
+
+
+class SpeculationCancelled(Exception):
+    """推测执行的任务未被计划采用，中止其流式输出"""
+
+
+class Speculation:
+    """
+    一次推测执行：在规划完成前按本地预测提前运行的第一个任务。
+
+    计划中出现匹配的任务时由该任务认领并直接使用结果；计划结束仍未被认领时取消，
+    取消后工具下一次输出文本时会收到 SpeculationCancelled 而中止流式生成。
+    认领后推测执行由认领任务的 TaskRun 接管：输出经 TaskRun 收集与转发，任务超时或计划取消时同样中止。
+    """
+
+    def __init__(self, task: Dict[str, Any], goal: str, confidence: float):
+        self.task = task
+        self.confidence = confidence
+        self.job = None  # 执行推测任务的 Future 或 asyncio.Task
+        self.claimed_id: Optional[str] = None
+        self._goal_slots = normalize_goal(goal)[1]
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._text = ""
+        self._run: Optional[TaskRun] = None
+
+    def matches(self, task: Dict[str, Any]) -> bool:
+        """计划中的任务是否与推测任务等价：同一工具、没有依赖，且描述中的目的地/天数与目标一致"""
+        if task.get("tool") != self.task["tool"] or task.get("dependencies"):
+            return False
+        _, task_slots = normalize_goal(task.get("description", ""))
+        return all(self._goal_slots.get(name) == value for name, value in task_slots.items())
+
+    def claim(self, task: Dict[str, Any]) -> bool:
+        """计划中第一个匹配的任务认领推测结果（推测任务尚未启动时不能认领）"""
+        with self._lock:
+            if self.job is None or self.claimed_id is not None or self._cancelled.is_set() or not self.matches(task):
+                return False
+            self.claimed_id = task["task_id"]
+        print(f"🎯 推测命中: {task['task_id']} 使用提前执行的 {self.task['tool']}")
+        return True
+
+    def owns(self, task: Dict[str, Any]) -> bool:
+        """任务是否已认领推测结果"""
+        return self.claimed_id is not None and task.get("task_id") == self.claimed_id
+
+    def attach(self, run: TaskRun):
+        """
+        由认领任务的 TaskRun 接管推测执行：之前已生成的文本先交给 TaskRun，之后的输出逐段交给它
+
+        TaskRun 已停止（超时或计划已取消）时抛出与 TaskRun.on_token 相同的异常。
+        """
+        # 在锁内交接，保证之前的文本排在后续增量之前
+        with self._lock:
+            self._run = run
+            if self._text:
+                run.on_token(self._text)
+
+    def on_token(self, delta: str):
+        """推测任务的工具输出回调；被接管后认领任务停止时抛出异常，中止工具的流式输出"""
+        if self._cancelled.is_set():
+            raise SpeculationCancelled("推测任务已取消")
+        with self._lock:
+            self._text += delta
+            if self._run is not None:
+                self._run.on_token(delta)
+
+    def cancel(self):
+        """取消推测任务"""
+        self._cancelled.set()
+        if self.job is not None:
+            self.job.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def generated_tokens(self) -> int:
+        """推测任务已生成的令牌数（按输出文本估算）"""
+        with self._lock:
+            return estimate_text_tokens(self._text)
+
+
+class Speculator:
+    """
+    MCP 推测执行控制器。
+
+    规划开始前用本地意图路由预测第一个任务的工具，置信度足够时提前执行；
+    统计推测次数、命中率与未被采用的推测所浪费的令牌数。
+    """
+
+    def __init__(self, speculation_config: Dict[str, Any] = None):
+        """初始化推测执行控制器"""
+        self._lock = threading.Lock()
+        self._config = dict(DEFAULT_SPECULATION_CONFIG)
+        self._stats = {"speculations": 0, "hits": 0, "misses": 0, "wasted_tokens": 0}
+        if speculation_config:
+            self.configure(speculation_config)
+
+    def configure(self, speculation_config: Dict[str, Any]):
+        """更新配置（对应 config.yaml 中 pages.mcp_agent.speculation）"""
+        merged = dict(DEFAULT_SPECULATION_CONFIG)
+        merged.update(speculation_config or {})
+        self._config = merged
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用推测执行"""
+        return bool(self._config.get("enabled", False))
+
+    def predict(self, goal: str, tool_config: Dict[str, Any]) -> Optional[Speculation]:
+        """
+        预测第一个任务；只有需要调用LLM规划时才会启动推测任务（设置 job）
+
+        Returns:
+            Optional[Speculation]: 可以提前执行的推测；未启用或置信度不足时返回None
+        """
+        if not self.enabled:
+            return None
+        tool, confidence = intent_router.predict_first_tool(goal, tool_config)
+        if not tool or confidence < self._config.get("min_confidence", 0.6):
+            return None
+        task = intent_router.build_task("speculative_task", tool, goal, tool_config)
+        print(f"🔮 推测第一个任务: {tool}（置信度 {confidence:.2f}）")
+        return Speculation(task, goal, confidence)
+
+    def settle(self, speculation: Optional[Speculation]):
+        """计划生成完毕后结算推测：未被认领的推测被取消，其已生成的令牌计为浪费；未启动的推测不计入统计"""
+        if speculation is None or speculation.job is None:
+            return
+        if speculation.claimed_id is not None:
+            with self._lock:
+                self._stats["speculations"] += 1
+                self._stats["hits"] += 1
+            return
+        speculation.cancel()
+        wasted = speculation.generated_tokens
+        with self._lock:
+            self._stats["speculations"] += 1
+            self._stats["misses"] += 1
+            self._stats["wasted_tokens"] += wasted
+        print(f"🗑️ 推测未命中，已取消（浪费约 {wasted} tokens）")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取推测执行统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        settled = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / settled if settled else 0.0
+        return stats
+
+
+# 全局推测执行控制器
+speculator = Speculator()
@@ -13,6 +13,7 @@ import plotly.express as px
 from datetime import datetime, timedelta
 import requests
 from io import StringIO
+from utils.retry_policy import retry_policy
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 用来正常显示中文标签
@@ -46,7 +47,7 @@ class StockPredictor:
             self.ticker = ticker
             # 显式设置auto_adjust参数来避免警告，并添加重试机制处理速率限制
             max_retries = 3
-            retry_delay = 2  # 秒
+            deadline = retry_policy.start()
             
             for attempt in range(max_retries):
                 try:
@@ -59,9 +60,13 @@ class StockPredictor:
                         return stock_data
                     
                 except Exception as inner_e:
-                    # 捕获速率限制错误
-                    if 'Too Many Requests' in str(inner_e) and attempt < max_retries - 1:
-                        st.info(f"速率限制，{retry_delay}秒后重试...")
+                    # 捕获速率限制错误，按统一重试策略做带抖动的指数退避
+                    retry_delay = retry_policy.next_delay(
+                        inner_e, attempt, deadline,
+                        retryable=lambda e: 'Too Many Requests' in str(e)
+                    ) if attempt < max_retries - 1 else None
+                    if retry_delay is not None:
+                        st.info(f"速率限制，{retry_delay:.1f}秒后重试...")
                         time.sleep(retry_delay)
                         continue
                     # 捕获其他错误
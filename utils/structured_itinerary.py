@@ -0,0 +1,360 @@
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+
+DEFAULT_STRUCTURED_CONFIG = {
+    "enabled": False,  # 默认仍由模型直接输出Markdown行程
+    "base_max_tokens": 300,  # 标题、概述与提示的令牌预算
+    "max_tokens_per_day": 450,  # 每天的令牌预算
+    "max_tokens": 8192,  # 单次调用的令牌上限
+    "currency": "元"
+}
+
+# 时间段类型对应的图标
+SLOT_ICONS = {"景点": "🏛️", "餐饮": "🍜", "交通": "🚇", "活动": "🎯", "购物": "🛍️", "休息": "☕"}
+# days 数组的开始位置
+DAYS_KEY_PATTERN = re.compile(r'"days"\s*:\s*\[')
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2})[:：](\d{2})")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# 没有下一个时间段时，定时事件的默认时长
+DEFAULT_SLOT_DURATION = timedelta(minutes=90)
+
+
+class StructuredItineraryError(ValueError):
+    """模型返回的结构化行程无法解析"""
+
+
+def parse_cost(value: Any) -> float:
+    """解析花费：数字或 "约100元" 之类的文本，无法解析时为0"""
+    if isinstance(value, bool):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.search(str(value or ""))
+    return float(match.group(0)) if match else 0.0
+
+
+def day_cost(day: Dict[str, Any]) -> float:
+    """一天的预算：各时间段花费加住宿"""
+    total = sum(parse_cost(slot.get("cost")) for slot in day.get("slots") or [] if isinstance(slot, dict))
+    hotel = day.get("hotel")
+    if isinstance(hotel, dict):
+        total += parse_cost(hotel.get("cost"))
+    return total
+
+
+def budget_summary(itinerary: Dict[str, Any]) -> Dict[str, Any]:
+    """按天汇总预算 {"days": [{"day", "theme", "cost"}], "total"}"""
+    days = [{"day": day.get("day"), "theme": day.get("theme", ""), "cost": day_cost(day)}
+            for day in itinerary.get("days") or [] if isinstance(day, dict)]
+    return {"days": days, "total": sum(day["cost"] for day in days)}
+
+
+def _format_cost(cost: float, currency: str) -> str:
+    return f"约{cost:.0f}{currency}"
+
+
+def render_header(meta: Dict[str, Any], destination: str, num_days: int) -> str:
+    """渲染行程标题与概述"""
+    lines = [f"# {meta.get('title') or f'{destination} {num_days}天行程'}"]
+    if meta.get("overview"):
+        lines += ["", str(meta["overview"])]
+    return "\n".join(lines) + "\n\n"
+
+
+def render_day(day: Dict[str, Any], currency: str = "元") -> str:
+    """渲染一天的行程；标题使用 "Day N:" 格式，与日历切分保持一致"""
+    lines = [f"## Day {day.get('day')}: {day.get('theme') or ''}".rstrip()]
+    if day.get("area"):
+        lines.append(f"📍 区域：{day['area']}")
+    lines.append("")
+    for slot in day.get("slots") or []:
+        if not isinstance(slot, dict):
+            continue
+        text = f"- **{slot.get('time', '')}** {SLOT_ICONS.get(slot.get('type'), '📌')} {slot.get('poi', '')}"
+        if slot.get("note"):
+            text += f"：{slot['note']}"
+        if parse_cost(slot.get("cost")):
+            text += f"（{_format_cost(parse_cost(slot['cost']), currency)}）"
+        lines.append(text)
+    hotel = day.get("hotel")
+    if isinstance(hotel, dict) and hotel.get("name"):
+        text = f"\n🏨 住宿：{hotel['name']}"
+        if hotel.get("area"):
+            text += f"（{hotel['area']}）"
+        if parse_cost(hotel.get("cost")):
+            text += f"，{_format_cost(parse_cost(hotel['cost']), currency)}/晚"
+        lines.append(text)
+    if day.get("transport"):
+        lines.append(f"🚇 交通：{day['transport']}")
+    lines.append(f"💰 当日预算：{_format_cost(day_cost(day), currency)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def render_footer(itinerary: Dict[str, Any], currency: str = "元") -> str:
+    """渲染旅行提示与预算汇总（预算由本地计算）"""
+    lines = []
+    tips = [tip for tip in itinerary.get("tips") or [] if tip]
+    if tips:
+        lines += ["## 💡 旅行提示", ""] + [f"- {tip}" for tip in tips] + [""]
+    summary = budget_summary(itinerary)
+    if summary["days"]:
+        lines += ["## 💰 预算汇总", "", "| 天 | 主题 | 预算 |", "| --- | --- | --- |"]
+        lines += [f"| Day {day['day']} | {day['theme']} | {_format_cost(day['cost'], currency)} |" for day in summary["days"]]
+        lines += ["", f"**合计：{_format_cost(summary['total'], currency)}**"]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _json_object(text: str) -> str:
+    """去掉代码块标记等多余内容，只保留最外层的JSON对象"""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise StructuredItineraryError("结构化行程中没有JSON对象")
+    return text[start:end + 1]
+
+
+def parse_structured_itinerary(text: str) -> Dict[str, Any]:
+    """解析完整的结构化行程"""
+    try:
+        itinerary = json.loads(_json_object(text))
+    except json.JSONDecodeError as e:
+        raise StructuredItineraryError(f"结构化行程不是合法的JSON: {e}") from None
+    if not isinstance(itinerary, dict) or not isinstance(itinerary.get("days"), list):
+        raise StructuredItineraryError("结构化行程缺少 days 列表")
+    return itinerary
+
+
+class StructuredItineraryStream:
+    """
+    结构化行程的增量解析与渲染。
+
+    在模型输出JSON的同时扫描 days 数组，每当一天的对象完整闭合就解析并渲染为Markdown，
+    因此第1天可以在后面几天仍在生成时先显示；输出结束后渲染提示与本地计算的预算汇总。
+    """
+
+    def __init__(self, destination: str, num_days: int, currency: str = "元"):
+        self.destination = destination
+        self.num_days = num_days
+        self.currency = currency
+        self._text = ""
+        self._days: List[Dict[str, Any]] = []
+        self._days_start: Optional[int] = None  # days 数组内容的开始位置
+        self._days_closed = False
+        # 扫描状态
+        self._scan_from = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start: Optional[int] = None
+        self.itinerary: Optional[Dict[str, Any]] = None
+
+    @property
+    def days(self) -> List[Dict[str, Any]]:
+        """已完整接收的各天"""
+        return list(self._days)
+
+    @property
+    def text(self) -> str:
+        """已接收的原始JSON文本"""
+        return self._text
+
+    def _header_meta(self) -> Dict[str, Any]:
+        """days 之前的字段（标题、概述）：截取 days 之前的部分补全为对象后解析"""
+        prefix = self._text[:self._days_start]
+        prefix = prefix[:DAYS_KEY_PATTERN.search(prefix).start()].rstrip().rstrip(",")
+        try:
+            meta = json.loads(_json_object(prefix + "}"))
+        except (json.JSONDecodeError, StructuredItineraryError):
+            return {}
+        return meta if isinstance(meta, dict) else {}
+
+    def feed(self, chunk: str) -> List[str]:
+        """接收一块模型输出，返回新渲染出的Markdown片段"""
+        self._text += chunk
+        rendered = []
+        if self._days_start is None:
+            match = DAYS_KEY_PATTERN.search(self._text)
+            if match is None:
+                return rendered
+            self._days_start = self._scan_from = match.end()
+            rendered.append(render_header(self._header_meta(), self.destination, self.num_days))
+        if not self._days_closed:
+            rendered += [render_day(day, self.currency) for day in self._scan()]
+        return rendered
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        """从上次的位置继续扫描 days 数组，返回新闭合的各天"""
+        completed = []
+        text = self._text
+        for index in range(self._scan_from, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # days 数组结束
+                    self._days_closed = True
+                    self._scan_from = index + 1
+                    return completed
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        day = json.loads(text[self._object_start:index + 1])
+                    except json.JSONDecodeError:
+                        day = None
+                    if isinstance(day, dict):
+                        day.setdefault("day", len(self._days) + 1)
+                        self._days.append(day)
+                        completed.append(day)
+                    self._object_start = None
+        self._scan_from = len(text)
+        return completed
+
+    def finish(self) -> List[str]:
+        """
+        输出结束：解析完整JSON，补渲染增量扫描未能识别的天，并渲染提示与预算汇总
+
+        Raises:
+            StructuredItineraryError: 没有得到任何一天的行程
+        """
+        try:
+            itinerary = parse_structured_itinerary(self._text)
+        except StructuredItineraryError:
+            if not self._days:
+                raise
+            # 末尾不完整（例如达到令牌上限）：使用已完整接收的各天
+            itinerary = {"days": list(self._days)}
+
+        rendered = []
+        if self._days_start is None:
+            rendered.append(render_header(itinerary, self.destination, self.num_days))
+        days = [day for day in itinerary["days"] if isinstance(day, dict)]
+        for day in days[len(self._days):]:
+            rendered.append(render_day(day, self.currency))
+        if not days:
+            raise StructuredItineraryError("结构化行程中没有任何一天")
+        itinerary["days"] = self._days + days[len(self._days):]
+        rendered.append(render_footer(itinerary, self.currency))
+        self.itinerary = itinerary
+        return rendered
+
+
+def render_itinerary(text: str, destination: str, num_days: int, currency: str = "元") -> List[str]:
+    """将完整的结构化行程渲染为Markdown片段（行程缓存命中时使用）"""
+    stream = StructuredItineraryStream(destination, num_days, currency)
+    return stream.feed(text) + stream.finish()
+
+
+def _slot_time(date: datetime, slot: Dict[str, Any]) -> Optional[datetime]:
+    """时间段的开始时间，时间无法解析时为None"""
+    match = TIME_PATTERN.match(str(slot.get("time") or ""))
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return datetime.combine(date.date(), datetime.min.time()).replace(hour=hour, minute=minute)
+
+
+def itinerary_to_ics(itinerary: Dict[str, Any], start_date: datetime = None, currency: str = "元") -> bytes:
+    """
+    由结构化行程直接生成ICS日历：每天一个全天事件，带时间的时间段各为一个定时事件
+
+    Args:
+        itinerary: 结构化行程
+        start_date: 可选的开始日期（默认为今天）
+    """
+    # 按需导入，只使用行程生成的进程不需要加载 icalendar
+    from icalendar import Calendar, Event
+
+    start_date = start_date or datetime.today()
+    cal = Calendar()
+    cal.add('prodid', '-//AI Travel Planner//github.com//')
+    cal.add('version', '2.0')
+
+    for index, day in enumerate(itinerary.get("days") or [], 1):
+        if not isinstance(day, dict):
+            continue
+        try:
+            day_num = int(day.get("day", index))
+        except (TypeError, ValueError):
+            day_num = index
+        date = start_date + timedelta(days=day_num - 1)
+
+        event = Event()
+        event.add('summary', f"第{day_num}天行程：{day.get('theme', '')}".rstrip("："))
+        event.add('description', render_day(day, currency).strip())
+        event.add('dtstart', date.date())
+        event.add('dtend', date.date())
+        event.add("dtstamp", datetime.now())
+        cal.add_component(event)
+
+        slots = [slot for slot in day.get("slots") or [] if isinstance(slot, dict)]
+        starts = [_slot_time(date, slot) for slot in slots]
+        for position, (slot, start) in enumerate(zip(slots, starts)):
+            if start is None:
+                continue
+            # 结束时间为下一个时间段的开始时间
+            end = next((later for later in starts[position + 1:] if later and later > start), start + DEFAULT_SLOT_DURATION)
+            event = Event()
+            event.add('summary', slot.get("poi") or slot.get("type") or "行程")
+            description = str(slot.get("note") or "")
+            if parse_cost(slot.get("cost")):
+                description += f"（{_format_cost(parse_cost(slot['cost']), currency)}）"
+            event.add('description', description)
+            if day.get("area"):
+                event.add('location', day["area"])
+            event.add('dtstart', start)
+            event.add('dtend', end)
+            event.add("dtstamp", datetime.now())
+            cal.add_component(event)
+
+    return cal.to_ical()
+
+
+class StructuredItineraryMode:
+    """结构化精简行程模式的配置（对应 config.yaml 中 pages.travel_agent.structured）"""
+
+    def __init__(self, structured_config: Dict[str, Any] = None):
+        self._config = dict(DEFAULT_STRUCTURED_CONFIG)
+        if structured_config:
+            self.configure(structured_config)
+
+    def configure(self, structured_config: Dict[str, Any]):
+        """更新配置"""
+        merged = dict(DEFAULT_STRUCTURED_CONFIG)
+        merged.update(structured_config or {})
+        self._config = merged
+
+    @property
+    def enabled(self) -> bool:
+        """默认是否使用结构化模式（客户端可单独指定）"""
+        return bool(self._config.get("enabled", False))
+
+    @property
+    def currency(self) -> str:
+        """金额单位"""
+        return self._config.get("currency") or "元"
+
+    def params(self, num_days: int) -> Dict[str, Any]:
+        """结构化生成的采样参数，令牌上限按天数估算"""
+        max_tokens = self._config["base_max_tokens"] + self._config["max_tokens_per_day"] * int(num_days)
+        return {"temperature": 0.2, "top_p": 0.9, "max_tokens": min(max_tokens, self._config["max_tokens"]),
+                "response_format": {"type": "json_object"}}
+
+
+# 全局结构化行程模式配置
+structured_itinerary = StructuredItineraryMode()
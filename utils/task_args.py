@@ -0,0 +1,178 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+from utils.trip_slots import parse_chinese_number
+
+
+def _to_str(value: Any) -> Optional[str]:
+    """字符串参数：接受字符串与数字，空字符串视为无效"""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    return str(value).strip() or None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """整数参数：接受整数、数字字符串与中文数字（"三"、"3天"）"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return parse_chinese_number(value.strip().rstrip("天日"))
+    return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """数值参数"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+# 参数类型转换：返回None表示值无效
+ARG_TYPES = {
+    "string": _to_str,
+    "integer": _to_int,
+    "number": _to_float,
+    "boolean": lambda value: value if isinstance(value, bool) else None
+}
+
+
+def coerce_task_args(args: Any, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    按工具的参数定义校验并转换任务参数
+
+    只保留定义过的参数；类型不符、不在 enum 中、超出 minimum/maximum 或为空的参数被丢弃，由工具自行解析。
+
+    Args:
+        args: 规划结果中的 args
+        schema: available_tools 中工具的 args 定义 {参数名: {"type", "enum", "description"}}
+    """
+    if not isinstance(args, dict) or not schema:
+        return {}
+    coerced = {}
+    for name, spec in schema.items():
+        if args.get(name) is None:
+            continue
+        spec = spec or {}
+        convert = ARG_TYPES.get(spec.get("type", "string"), ARG_TYPES["string"])
+        value = convert(args[name])
+        if value is None or (spec.get("enum") and value not in spec["enum"]):
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and (
+                (spec.get("minimum") is not None and value < spec["minimum"])
+                or (spec.get("maximum") is not None and value > spec["maximum"])):
+            continue
+        coerced[name] = value
+    return coerced
+
+
+def describe_task_args(schema: Dict[str, Any]) -> str:
+    """规划提示词中工具参数的说明"""
+    parts = []
+    for name, spec in (schema or {}).items():
+        spec = spec or {}
+        text = f"{name}({spec.get('type', 'string')})"
+        if spec.get("enum"):
+            text += f"，取值 {'/'.join(map(str, spec['enum']))}"
+        if spec.get("minimum") is not None and spec.get("maximum") is not None:
+            text += f"，范围 {spec['minimum']}-{spec['maximum']}"
+        if spec.get("description"):
+            text += f"：{spec['description']}"
+        parts.append(text)
+    return "；".join(parts)
+
+
+def build_travel_parse_messages(task_description: str) -> List[Dict[str, Any]]:
+    """构建从任务描述中提取目的地与天数的对话消息（MCP 与旅行规划工具共用）"""
+    parse_prompt = f"""
+请从以下任务描述中提取旅行规划信息：
+
+任务描述: "{task_description}"
+
+请返回JSON格式的结果：
+{{
+    "destination": "目的地城市名称",
+    "days": 天数（数字）
+}}
+
+如果无法确定某个信息，请返回null。
+"""
+    return [{"role": "user", "content": parse_prompt}]
+
+
+class TaskArgExtractor:
+    """
+    记忆化的任务参数提取器。
+
+    规划结果没有给出参数时，工具才需要调用LLM从任务描述中解析参数；
+    同一描述的解析结果在进程内共享，MCP 与各工具不会为同一段文本重复调用LLM。
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """初始化参数提取器"""
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _lookup(self, task_description: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(task_description)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(task_description)
+            self._stats["hits"] += 1
+            print(f"⚡ 复用已解析的任务参数: {entry}")
+            return dict(entry)
+
+    def _store(self, task_description: str, parsed: Dict[str, Any]) -> Dict[str, Any]:
+        # 只缓存至少解析出一个参数的结果
+        if isinstance(parsed, dict) and any(value is not None for value in parsed.values()):
+            with self._lock:
+                self._entries[task_description] = dict(parsed)
+                self._entries.move_to_end(task_description)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return parsed
+
+    def extract(self, task_description: str, parse: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """返回缓存的解析结果，未命中时调用 parse 解析（parse 抛出的异常不会被缓存）"""
+        cached = self._lookup(task_description)
+        if cached is not None:
+            return cached
+        return self._store(task_description, parse(task_description))
+
+    async def extract_async(self, task_description: str, parse: Callable[[str], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """extract 的异步版本"""
+        cached = self._lookup(task_description)
+        if cached is not None:
+            return cached
+        return self._store(task_description, await parse(task_description))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+def parse_json_args(content: str) -> Dict[str, Any]:
+    """解析LLM返回的参数JSON"""
+    result = json.loads(content)
+    if not isinstance(result, dict):
+        raise ValueError(f"参数解析结果不是对象: {type(result)}")
+    return result
+
+
+# 全局任务参数提取器
+task_arg_extractor = TaskArgExtractor()
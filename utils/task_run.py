@@ -0,0 +1,117 @@
+import threading
+from typing import Callable, Optional
+
+from utils.retry_policy import Deadline, DeadlineExceeded
+
+
+# 停止原因
+TIMED_OUT = "超时"
+CANCELLED = "已取消"
+
+
+class TaskCancelled(Exception):
+    """任务已被取消，中止工具的流式输出"""
+
+
+class TaskRun:
+    """
+    一次 MCP 任务执行的控制状态。
+
+    作为工具的 on_token 回调收集已输出的文本；任务超时或被取消后，工具下一次输出时回调抛出异常，
+    使工具停止读取并关闭上游流。已收集的文本作为部分结果保留。
+    """
+
+    def __init__(self, task_id: str, deadline: Deadline, forward: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            task_id: 任务ID
+            deadline: 任务的截止时间
+            forward: 可选，转发每段输出（例如作为 TOKEN 事件）
+        """
+        self.task_id = task_id
+        self.deadline = deadline
+        self._forward = forward
+        self._lock = threading.Lock()
+        self._parts = []
+        self._stop_reason: Optional[str] = None
+
+    def on_token(self, delta: str):
+        """工具的输出回调"""
+        if self.deadline.expired():
+            self.stop(TIMED_OUT)
+        reason = self._stop_reason
+        if reason == TIMED_OUT:
+            raise DeadlineExceeded(f"任务 {self.task_id} {reason}")
+        if reason is not None:
+            raise TaskCancelled(f"任务 {self.task_id} {reason}")
+        with self._lock:
+            self._parts.append(delta)
+        if self._forward:
+            self._forward(delta)
+
+    def stop(self, reason: str = CANCELLED):
+        """停止任务（超时或取消），只记录第一次的原因"""
+        with self._lock:
+            if self._stop_reason is None:
+                self._stop_reason = reason
+
+    def cancel(self):
+        """取消任务"""
+        self.stop(CANCELLED)
+
+    def check_deadline(self):
+        """工具返回后检查是否已超时（未以流式输出的工具只能在返回后判断）"""
+        if self.deadline.expired():
+            self.stop(TIMED_OUT)
+
+    @property
+    def stop_reason(self) -> Optional[str]:
+        """停止原因；正常执行时为None"""
+        return self._stop_reason
+
+    @property
+    def partial(self) -> str:
+        """已输出的部分结果"""
+        with self._lock:
+            return "".join(self._parts)
+
+
+class PlanRun:
+    """
+    一次计划执行（execute_plan / plan_and_execute 调用）的取消状态。
+
+    同一个 Agent 可能同时执行多个计划（例如 run_batch 并发执行多个目标），
+    每次调用持有自己的取消标记与正在执行的任务，取消一个计划不会影响其他计划。
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._runs = set()
+
+    def begin(self, task_id: str, deadline: Deadline, forward: Optional[Callable[[str], None]] = None) -> TaskRun:
+        """登记一次任务执行；计划已取消时任务立即处于取消状态"""
+        run = TaskRun(task_id, deadline, forward)
+        with self._lock:
+            self._runs.add(run)
+        if self.cancelled:
+            run.cancel()
+        return run
+
+    def end(self, run: TaskRun):
+        """注销任务执行"""
+        with self._lock:
+            self._runs.discard(run)
+
+    def cancel(self):
+        """取消计划：运行中的任务在下一次输出时停止，尚未开始的任务被跳过"""
+        self._cancelled.set()
+        with self._lock:
+            runs = list(self._runs)
+        for run in runs:
+            run.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        """计划是否已被取消"""
+        return self._cancelled.is_set()
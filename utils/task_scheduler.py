@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import threading
+from collections import defaultdict
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Awaitable, Iterable
+
+
+def task_dependencies(task: Dict[str, Any]) -> List[str]:
+    """规范化任务的依赖列表"""
+    deps = task.get("dependencies", [])
+    if isinstance(deps, (int, str)):
+        return [] if deps in (0, "0", "") else [str(deps)]
+    if not isinstance(deps, list):
+        return []
+    return [str(dep) for dep in deps]
+
+
+def find_missing_dependencies(tasks: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """找出依赖了计划中不存在任务的任务：{task_id: [缺失的依赖]}"""
+    tasks = list(tasks)
+    known = {task["task_id"] for task in tasks}
+    missing = {}
+    for task in tasks:
+        absent = [dep for dep in task_dependencies(task) if dep not in known]
+        if absent:
+            missing[task["task_id"]] = absent
+    return missing
+
+
+def find_dependency_cycle(tasks: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    检测依赖环
+
+    Returns:
+        List[str]: 构成环的任务ID（按依赖顺序），无环时返回空列表
+    """
+    graph = {task["task_id"]: task_dependencies(task) for task in tasks}
+    visiting, visited = [], set()
+
+    def visit(task_id: str) -> List[str]:
+        if task_id in visiting:
+            return visiting[visiting.index(task_id):]
+        if task_id in visited or task_id not in graph:
+            return []
+        visiting.append(task_id)
+        for dep in graph[task_id]:
+            cycle = visit(dep)
+            if cycle:
+                return cycle
+        visiting.pop()
+        visited.add(task_id)
+        return []
+
+    for task_id in graph:
+        cycle = visit(task_id)
+        if cycle:
+            return cycle
+    return []
+
+
+class _SchedulerState:
+    """同步与异步调度器共享的依赖与并发状态"""
+
+    def __init__(self, max_concurrency: int = 1, tool_limits: Dict[str, int] = None):
+        self.max_concurrency = max_concurrency
+        self.tool_limits = dict(tool_limits or {})
+        self.pending: List[Dict[str, Any]] = []
+        self.known = set()
+        self.finished = set()
+        self.running = 0
+        self.tool_running: Dict[str, int] = defaultdict(int)
+        self.closed = False
+
+    def add(self, task: Dict[str, Any]):
+        self.pending.append(task)
+        self.known.add(task["task_id"])
+
+    def is_ready(self, task: Dict[str, Any]) -> bool:
+        """依赖是否全部完成；计划结束后，计划中不存在的依赖不再等待"""
+        return all(dep in self.finished or (self.closed and dep not in self.known)
+                   for dep in task_dependencies(task))
+
+    def take_ready(self) -> List[Dict[str, Any]]:
+        """按计划顺序取出可以立即开始的任务，同时遵守总并发与单工具并发上限"""
+        ready = []
+        for task in list(self.pending):
+            if self.max_concurrency and self.running >= self.max_concurrency:
+                break
+            if not self.is_ready(task):
+                continue
+            tool = task.get("tool", "")
+            limit = self.tool_limits.get(tool)
+            if limit and self.tool_running[tool] >= limit:
+                continue
+            self.pending.remove(task)
+            self.running += 1
+            self.tool_running[tool] += 1
+            ready.append(task)
+        return ready
+
+    def mark_finished(self, task: Dict[str, Any]):
+        self.running -= 1
+        self.tool_running[task.get("tool", "")] -= 1
+        self.finished.add(task["task_id"])
+
+    @property
+    def idle(self) -> bool:
+        """计划已结束且没有运行中的任务"""
+        return self.closed and not self.running
+
+
+class TaskScheduler:
+    """
+    按依赖关系并行执行计划任务的调度器。
+
+    依赖全部完成的任务立即提交到执行器，受总并发数与单工具并发上限约束，
+    整体耗时约等于关键路径长度。任务可以在计划生成过程中逐个加入（add），
+    计划结束（close）后，计划中不存在的依赖不再等待。
+    """
+
+    def __init__(self, run_task: Callable[[Dict[str, Any]], None], executor: Executor,
+                 max_concurrency: int = 1, tool_limits: Dict[str, int] = None):
+        """
+        Args:
+            run_task: 执行单个任务的函数，自行记录结果与错误
+            executor: 执行任务的线程池，线程数应不少于 max_concurrency
+            max_concurrency: 同时执行的任务数上限
+            tool_limits: 单个工具同时执行的任务数上限 {tool: n}
+        """
+        self._run_task = run_task
+        self._executor = executor
+        self._cond = threading.Condition(threading.RLock())
+        self._state = _SchedulerState(max_concurrency, tool_limits)
+
+    def add(self, task: Dict[str, Any]):
+        """加入一个已校验的任务"""
+        with self._cond:
+            self._state.add(task)
+            self._dispatch()
+
+    def close(self):
+        """标记计划已完整，之后不会再加入任务"""
+        with self._cond:
+            self._state.closed = True
+            self._dispatch()
+            self._cond.notify_all()
+
+    def _dispatch(self):
+        """提交所有可以开始的任务（调用方需持有锁）"""
+        for task in self._state.take_ready():
+            # 在提交时复制上下文，使任务继承调用方的截止时间等上下文变量
+            self._executor.submit(contextvars.copy_context().run, self._run, task)
+
+    def _run(self, task: Dict[str, Any]):
+        """在执行器中运行任务，完成后派发后续任务"""
+        try:
+            self._run_task(task)
+        finally:
+            with self._cond:
+                self._state.mark_finished(task)
+                self._dispatch()
+                self._cond.notify_all()
+
+    def wait(self) -> List[Dict[str, Any]]:
+        """
+        等待所有可执行的任务完成（需先调用 close）
+
+        Returns:
+            List[Dict]: 依赖始终无法满足（如存在依赖环）而未执行的任务
+        """
+        with self._cond:
+            while not self._state.idle:
+                self._cond.wait()
+            return list(self._state.pending)
+
+
+class AsyncTaskScheduler:
+    """TaskScheduler 的异步版本，任务作为事件循环中的协程执行"""
+
+    def __init__(self, run_task: Callable[[Dict[str, Any]], Awaitable[None]],
+                 max_concurrency: int = 1, tool_limits: Dict[str, int] = None):
+        """
+        Args:
+            run_task: 执行单个任务的协程函数，自行记录结果与错误
+            max_concurrency: 同时执行的任务数上限
+            tool_limits: 单个工具同时执行的任务数上限 {tool: n}
+        """
+        self._run_task = run_task
+        self._state = _SchedulerState(max_concurrency, tool_limits)
+        self._changed = asyncio.Event()
+        self._tasks = set()  # 持有协程任务的引用，避免被垃圾回收
+
+    def add(self, task: Dict[str, Any]):
+        """加入一个已校验的任务"""
+        self._state.add(task)
+        self._dispatch()
+
+    def close(self):
+        """标记计划已完整，之后不会再加入任务"""
+        self._state.closed = True
+        self._dispatch()
+        self._changed.set()
+
+    def _dispatch(self):
+        """为所有可以开始的任务创建协程"""
+        for task in self._state.take_ready():
+            job = asyncio.create_task(self._run(task))
+            self._tasks.add(job)
+            job.add_done_callback(self._tasks.discard)
+
+    async def _run(self, task: Dict[str, Any]):
+        """运行任务，完成后派发后续任务"""
+        try:
+            await self._run_task(task)
+        finally:
+            self._state.mark_finished(task)
+            self._dispatch()
+            self._changed.set()
+
+    async def wait(self) -> List[Dict[str, Any]]:
+        """等待所有可执行的任务完成，返回依赖始终无法满足的任务"""
+        while not self._state.idle:
+            self._changed.clear()
+            await self._changed.wait()
+        return list(self._state.pending)
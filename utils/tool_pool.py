@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Type
+
+
+DEFAULT_TOOL_POOL_CONFIG = {
+    "enabled": True,
+    "max_instances": 64,  # 实例数上限，超出后淘汰最久未使用的实例
+    "warmup": False  # 启动时是否预先创建 available_tools 中的全部工具实例
+}
+
+
+class ToolPool:
+    """
+    MCP 工具实例池。
+
+    按 (工具类, 配置页面, 模型, 端点) 缓存已构造的工具实例，跨任务、跨计划复用，
+    省去每个任务重复的构造开销（如 ReadmeViewerLLM 构造时的页面模块导入）。
+    工具实例只持有连接配置，HTTP 连接由 client_registry 共享，因此可以被多个线程同时使用。
+    同一个键只会构造一次：并发请求同一工具时，后到的线程等待首个线程构造完成。
+    """
+
+    def __init__(self, pool_config: Dict[str, Any] = None):
+        """初始化工具实例池"""
+        self._lock = threading.Lock()
+        self._instances: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._building: Dict[Tuple, threading.Lock] = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._config = dict(DEFAULT_TOOL_POOL_CONFIG)
+        if pool_config:
+            self.configure(pool_config)
+
+    def configure(self, pool_config: Dict[str, Any]):
+        """更新实例池配置（对应 config.yaml 中 pages.mcp_agent.tool_pool）"""
+        with self._lock:
+            merged = dict(DEFAULT_TOOL_POOL_CONFIG)
+            merged.update(pool_config or {})
+            self._config = merged
+            self._trim()
+
+    @property
+    def enabled(self) -> bool:
+        """实例池是否启用"""
+        return bool(self._config.get("enabled", True))
+
+    @property
+    def warmup_enabled(self) -> bool:
+        """是否在启动时预热"""
+        return self.enabled and bool(self._config.get("warmup", False))
+
+    @staticmethod
+    def make_key(tool_class: Type, page: str, model: str, base_url: Optional[str], api_key: str) -> Tuple:
+        """实例池键；密钥不同的页面配置不能共用实例"""
+        return (f"{tool_class.__module__}.{tool_class.__qualname__}", page, model, base_url or "", api_key or "")
+
+    def _trim(self):
+        """淘汰超出上限的实例（调用方需持有锁）"""
+        while len(self._instances) > max(1, self._config.get("max_instances", 64)):
+            self._instances.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    @staticmethod
+    def resolve_settings(page: str, config_manager) -> Dict[str, Any]:
+        """
+        解析工具页面的实例化参数
+
+        每次都从配置管理器读取（只是字典与环境变量查询），配置重新加载后立即生效；
+        实例池按解析出的模型、端点与密钥取实例，配置变化时自然换用新实例。
+
+        Returns:
+            Dict[str, Any]: {"api_key": ..., "base_url": ..., "model": ...}
+        """
+        api_key = config_manager.get_api_key(page)
+        base_url = config_manager.get_base_url(page)
+        try:
+            model = config_manager.get_page_config(page).get("default_model", "qwen-turbo")
+        except Exception:
+            model = "qwen-turbo"
+        return {"api_key": api_key, "base_url": base_url, "model": model}
+
+    def acquire(self, tool_class: Type, page: str, tool_kwargs: Dict[str, Any]) -> Any:
+        """
+        获取工具实例，不存在时创建
+
+        Args:
+            tool_class: 工具类
+            page: 工具对应的配置页面
+            tool_kwargs: resolve_settings 返回的实例化参数
+
+        Returns:
+            Any: tool_class(**tool_kwargs) 的共享实例；实例池未启用时每次新建
+        """
+        if not self.enabled:
+            return tool_class(**tool_kwargs)
+
+        key = self.make_key(tool_class, page, tool_kwargs.get("model"), tool_kwargs.get("base_url"), tool_kwargs.get("api_key"))
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is not None:
+                self._instances.move_to_end(key)
+                self._stats["hits"] += 1
+                return instance
+            building = self._building.setdefault(key, threading.Lock())
+
+        # 构造可能较慢（导入模块等），不持有全局锁，只按键串行
+        with building:
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is not None:
+                    self._stats["hits"] += 1
+                    return instance
+
+            print(f"🏗️ 创建工具实例: {tool_class.__name__} ({page}, {tool_kwargs.get('model')})")
+            try:
+                instance = tool_class(**tool_kwargs)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+            with self._lock:
+                self._instances[key] = instance
+                self._stats["misses"] += 1
+                self._trim()
+            return instance
+
+    def warmup(self, tools: List[Tuple[Type, str]], config_manager) -> Dict[str, bool]:
+        """
+        预先创建工具实例
+
+        Args:
+            tools: (工具类, 配置页面) 列表
+            config_manager: 配置管理器实例
+
+        Returns:
+            Dict[str, bool]: 每个工具是否创建成功
+        """
+        results = {}
+        for tool_class, page in tools:
+            name = f"{tool_class.__name__}@{page}"
+            try:
+                self.acquire(tool_class, page, self.resolve_settings(page, config_manager))
+                results[name] = True
+            except Exception as e:
+                print(f"⚠️ 预热工具 {name} 失败: {e}")
+                results[name] = False
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取实例池统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["instances"] = len(self._instances)
+            return stats
+
+    def clear(self):
+        """清空实例池"""
+        with self._lock:
+            self._instances.clear()
+
+
+# 全局工具实例池
+tool_pool = ToolPool()
@@ -0,0 +1,94 @@
+import importlib
+import threading
+from typing import Dict, Any, Optional
+
+
+# 旧配置中只写类名的内置工具，对应的导入路径（同步类, 异步类）
+BUILTIN_TOOL_CLASSES = {
+    "TravelPlannerLLM": ("utils.travel_planner_llm.TravelPlannerLLM", "utils.travel_planner_llm.AsyncTravelPlannerLLM"),
+    "VisionLLMClient": ("utils.vision_llm_client.VisionLLMClient", "utils.vision_llm_client.AsyncVisionLLMClient"),
+    "ReadmeViewerLLM": ("utils.readme_client.ReadmeViewerLLM", None)
+}
+
+
+class ToolRegistry:
+    """
+    MCP 工具类注册表。
+
+    available_tools 中的 class / async_class 为导入路径（"包.模块.类名" 或 "包.模块:类名"），
+    首次使用时才导入对应模块并缓存，未被计划使用的工具不产生导入开销；
+    新增工具只需在配置中写明导入路径，无需修改 MCP 模块。
+    """
+
+    def __init__(self):
+        """初始化工具类注册表"""
+        self._lock = threading.Lock()
+        self._classes: Dict[str, type] = {}
+
+    @staticmethod
+    def _split_path(path: str):
+        """拆分导入路径为 (模块, 属性)"""
+        if ":" in path:
+            return path.split(":", 1)
+        module_name, _, attr = path.rpartition(".")
+        if not module_name:
+            raise ImportError(f"工具类路径 '{path}' 缺少模块名")
+        return module_name, attr
+
+    def resolve(self, path: str) -> type:
+        """
+        按导入路径加载工具类（结果会被缓存）
+
+        Raises:
+            ImportError: 模块不存在或模块中没有该类
+        """
+        tool_class = self._classes.get(path)
+        if tool_class is not None:
+            return tool_class
+
+        # 导入在锁外进行：模块导入本身由导入锁保护，慢导入不会阻塞其他工具的解析
+        target = BUILTIN_TOOL_CLASSES.get(path, (path, None))[0]
+        module_name, attr = self._split_path(target)
+        module = importlib.import_module(module_name)
+        try:
+            tool_class = getattr(module, attr)
+        except AttributeError:
+            raise ImportError(f"模块 {module_name} 中没有 {attr}") from None
+        print(f"📦 加载工具类: {target}")
+
+        with self._lock:
+            return self._classes.setdefault(path, tool_class)
+
+    def tool_class(self, tool_info: Dict[str, Any]) -> type:
+        """工具配置对应的同步工具类"""
+        return self.resolve(tool_info["class"])
+
+    def async_tool_class(self, tool_info: Dict[str, Any]) -> Optional[type]:
+        """工具配置对应的异步工具类；没有异步版本时返回None（同步工具放到线程中执行）"""
+        path = self._async_path(tool_info)
+        return self.resolve(path) if path else None
+
+    @staticmethod
+    def _async_path(tool_info: Dict[str, Any]) -> Optional[str]:
+        """异步工具类的导入路径，旧配置中的内置工具使用内置的异步版本"""
+        return tool_info.get("async_class") or BUILTIN_TOOL_CLASSES.get(tool_info.get("class"), (None, None))[1]
+
+    def is_loaded(self, tool_info: Dict[str, Any]) -> bool:
+        """工具配置中的同步类与异步类是否都已加载"""
+        paths = [tool_info.get("class"), self._async_path(tool_info)]
+        with self._lock:
+            return all(path in self._classes for path in paths if path)
+
+    def loaded(self) -> Dict[str, str]:
+        """已加载的工具类 {配置中的路径: 类的完整名称}"""
+        with self._lock:
+            return {path: f"{cls.__module__}.{cls.__qualname__}" for path, cls in self._classes.items()}
+
+    def clear(self):
+        """清空缓存（已导入的模块仍保留在 sys.modules 中）"""
+        with self._lock:
+            self._classes.clear()
+
+
+# 全局工具类注册表
+tool_registry = ToolRegistry()
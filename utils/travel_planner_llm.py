@@ -1,4 +1,4 @@
-from typing import Dict, Any, List, Optional, Tuple, Generator
+from typing import Dict, Any, List, Optional, Tuple, Generator, AsyncGenerator, Callable
 from openai import OpenAI
 import re
 import base64
@@ -7,14 +7,52 @@ from PIL import Image
 from datetime import datetime, timedelta
 from icalendar import Calendar, Event
 import json
+import hashlib
 from utils.llm_client import LLMClient
+from utils.async_llm_client import AsyncLLMClient
+from utils.task_args import build_travel_parse_messages, parse_json_args, task_arg_extractor
+from utils.trip_slots import MAX_TRIP_DAYS, trip_slot_extractor
+from utils.itinerary_cache import itinerary_cache
+from utils.itinerary_fanout import itinerary_fanout, parse_skeleton
+from utils.structured_itinerary import StructuredItineraryError, StructuredItineraryStream, structured_itinerary
+from utils.llm_metrics import llm_metrics
 
-class TravelPlannerLLM(LLMClient):
-    """旅行规划专用LLM客户端"""
-    
-    def generate_itinerary_stream(self, destination: str, num_days: int) -> Generator[str, None, None]:
-        """流式生成旅行行程"""
-        system_prompt = """你是一个专业的旅行规划师，具有丰富的全球旅行知识。
+
+class ItineraryRun:
+    """
+    一次行程生成的选项与结果。
+
+    每次调用单独创建并传给 generate_itinerary_stream。客户端实例会被工具池在并发任务间复用，
+    所以是否命中缓存、结构化行程数据与调用指标都记录在这里，不保存在实例上。
+    """
+
+    def __init__(self, structured: Optional[bool] = None):
+        """
+        Args:
+            structured: 是否使用结构化精简模式（模型输出JSON，本地渲染Markdown）；None 表示按配置
+        """
+        self.structured = structured
+        self.from_cache = False  # 是否来自行程缓存
+        self.structured_itinerary: Optional[Dict[str, Any]] = None  # 结构化模式的行程数据（用于精确生成日历与预算）
+        self.call_metrics: List[Dict[str, Any]] = []  # 本次生成中各次LLM调用的指标记录
+
+    def on_metrics(self, record: Dict[str, Any]):
+        """LLM调用结束时的指标回调"""
+        self.call_metrics.append(record)
+
+    @property
+    def last_metrics(self) -> Optional[Dict[str, Any]]:
+        """最后一次LLM调用的指标记录"""
+        return self.call_metrics[-1] if self.call_metrics else None
+
+
+class TravelPlannerMixin:
+    """旅行规划提示词与解析逻辑，由同步和异步客户端共享"""
+
+    # 行程生成的采样参数
+    itinerary_params = {"temperature": 0.2, "top_p": 0.9, "max_tokens": 4096}
+
+    itinerary_system_prompt = """你是一个专业的旅行规划师，具有丰富的全球旅行知识。
 请为用户创建详细的、实用的旅行行程。
 
 要求：
@@ -25,6 +63,8 @@ class TravelPlannerLLM(LLMClient):
 5. 使用清晰的"Day 1:", "Day 2:"等格式标题
 6. 考虑当地文化和实际情况"""
 
+    def build_itinerary_messages(self, destination: str, num_days: int) -> List[Dict[str, Any]]:
+        """构建行程生成的对话消息"""
         user_prompt = f"""请为{destination}创建一个{num_days}天的详细旅行行程。
 
 请包括：
@@ -37,107 +77,423 @@ class TravelPlannerLLM(LLMClient):
 
 请确保每天都有明确的"Day X:"标题，方便转换为日历事件。"""
 
+        return [
+            {"role": "system", "content": self.itinerary_system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def build_skeleton_messages(self, destination: str, num_days: int) -> List[Dict[str, Any]]:
+        """构建行程骨架（每天的主题与游览区域）的对话消息"""
+        user_prompt = f"""请为{destination}的{num_days}天旅行规划每天的主题与游览区域。
+相邻几天尽量安排在相近的区域，各天的景点不要重复，节奏合理。
+
+只返回JSON：
+{{"days": [{{"day": 1, "theme": "当天主题", "area": "游览区域"}}]}}
+days 中恰好包含 {num_days} 项，day 从 1 开始。"""
+
+        return [
+            {"role": "system", "content": self.itinerary_system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def build_day_messages(self, destination: str, num_days: int, skeleton: List[Dict[str, Any]], day: int) -> List[Dict[str, Any]]:
+        """构建按天并行生成时某一天详细行程的对话消息（附上整体骨架，保证各天衔接且不重复）"""
+        outline = "\n".join(f"Day {item['day']}: {item['theme']}（{item['area']}）" for item in skeleton)
+        plan = skeleton[day - 1]
+        user_prompt = f"""你正在为{destination}规划一个{num_days}天的旅行行程，整体安排如下：
+{outline}
+
+现在只需详细写出第{day}天（主题：{plan['theme']}，区域：{plan['area']}）的行程，包括：
+- 具体的景点和活动安排（上午、下午、晚上）
+- 餐厅和美食推荐
+- 住宿建议
+- 交通提示
+- 当天预算估计
+
+请以"Day {day}: {plan['theme']}"作为标题开头，不要输出其他天的内容或整体总结。"""
+
+        return [
+            {"role": "system", "content": self.itinerary_system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def build_structured_messages(self, destination: str, num_days: int) -> List[Dict[str, Any]]:
+        """构建结构化精简行程的对话消息：只要求紧凑的JSON，Markdown由本地渲染"""
+        user_prompt = f"""请为{destination}创建一个{num_days}天的旅行行程。
+
+只返回紧凑的JSON，不要输出Markdown或其他说明：
+{{"title": "行程标题", "overview": "一句话概述",
+"days": [{{"day": 1, "theme": "当天主题", "area": "游览区域",
+"slots": [{{"time": "09:00", "type": "景点|餐饮|交通|活动|购物", "poi": "地点名称", "note": "简短建议", "cost": 100}}],
+"hotel": {{"name": "住宿推荐", "area": "所在区域", "cost": 400}}, "transport": "当天交通提示"}}],
+"tips": ["当地文化或实用提示"]}}
+
+要求：
+- days 中恰好包含 {num_days} 项，day 从 1 开始，每天 4-6 个时间段，按时间排序
+- time 使用24小时制 HH:MM，cost 为人均人民币金额的数字（免费为0）
+- note 不超过30字，tips 不超过5条"""
+
+        return [
+            {"role": "system", "content": self.itinerary_system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    @staticmethod
+    def _itinerary_mode(num_days: int, structured: Optional[bool] = None) -> str:
+        """行程生成方式：structured（结构化精简）、fanout（按天并行）或 markdown（整体生成）"""
+        if structured_itinerary.enabled if structured is None else structured:
+            return "structured"
+        return "fanout" if itinerary_fanout.applies(num_days) else "markdown"
+
+    def itinerary_prompt_version(self, num_days: int, structured: Optional[bool] = None) -> str:
+        """行程提示词版本：提示词模板、采样参数或生成方式变化后，缓存的旧行程不再被命中"""
+        mode = self._itinerary_mode(num_days, structured)
+        if mode == "structured":
+            template = [mode, self.build_structured_messages("{destination}", "{num_days}"), structured_itinerary.params(num_days)]
+            payload = json.dumps(template, ensure_ascii=False, sort_keys=True)
+            return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+        template = [self.build_itinerary_messages("{destination}", "{num_days}"), self.itinerary_params]
+        if mode == "fanout":
+            skeleton = [{"day": 1, "theme": "{theme}", "area": "{area}"}]
+            template += [self.build_skeleton_messages("{destination}", "{num_days}"),
+                         self.build_day_messages("{destination}", "{num_days}", skeleton, 1),
+                         itinerary_fanout.skeleton_params(), itinerary_fanout.day_params(self.itinerary_params)]
+        payload = json.dumps(template, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _day_producers(self, destination: str, num_days: int, skeleton: List[Dict[str, Any]], run: ItineraryRun) -> List[Callable]:
+        """每天详细行程的流式生成（按天并行时由 itinerary_fanout 并发启动）"""
+        params = itinerary_fanout.day_params(self.itinerary_params)
+        return [
+            lambda day=day: self.stream_chat(self.build_day_messages(destination, num_days, skeleton, day),
+                                             on_metrics=run.on_metrics, **params)
+            for day in range(1, num_days + 1)
+        ]
+
+    def _cached_itinerary(self, destination: str, num_days: int, run: ItineraryRun) -> Optional[List[str]]:
+        """查找缓存的行程分块，命中时记录一次缓存调用的指标（结构化行程缓存的是JSON，命中时重新渲染）"""
+        chunks = itinerary_cache.get(destination, num_days, self.model, self.itinerary_prompt_version(num_days, run.structured))
+        if chunks is not None and self._itinerary_mode(num_days, run.structured) == "structured":
+            try:
+                stream = self._structured_renderer(destination, num_days)
+                chunks = stream.feed("".join(chunks)) + stream.finish()
+                run.structured_itinerary = stream.itinerary
+            except StructuredItineraryError as e:
+                print(f"⚠️ 缓存的结构化行程无法解析，重新生成: {e}")
+                chunks = None
+        run.from_cache = chunks is not None
+        if chunks is not None:
+            tracker = llm_metrics.track(self.model, self.base_url, "stream", run.on_metrics)
+            tracker.mark_cached()
+            tracker.mark_first_token()
+            tracker.finish()
+            print(f"⚡ 命中行程缓存: {destination} {num_days}天")
+        return chunks
+
+    def _structured_renderer(self, destination: str, num_days: int) -> StructuredItineraryStream:
+        """结构化行程的增量渲染器"""
+        return StructuredItineraryStream(destination, num_days, structured_itinerary.currency)
+
+    def _store_itinerary(self, destination: str, num_days: int, chunks: List[str], mode: str, run: ItineraryRun):
+        """保存完整生成的行程；实际生成方式与应有方式不同（骨架失败或结构化解析失败后退回整体生成）时不保存"""
+        if mode == self._itinerary_mode(num_days, run.structured):
+            itinerary_cache.set(destination, num_days, self.model, self.itinerary_prompt_version(num_days, run.structured), chunks)
+
+    def build_parse_messages(self, task_description: str) -> List[Dict[str, Any]]:
+        """构建任务解析的对话消息（与MCP共用同一提示词）"""
+        return build_travel_parse_messages(task_description)
+
+    @staticmethod
+    def _has_trip_args(args: Dict[str, Any]) -> bool:
+        """参数中是否已有目的地与天数"""
+        return bool(args.get("destination") and args.get("days"))
+
+    @staticmethod
+    def _valid_days(days: Any) -> Optional[int]:
+        """校验天数：1 到 MAX_TRIP_DAYS 之间的整数，否则返回None"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2,
-                top_p=0.9,
-                max_tokens=4096,
-                stream=True
-            )
-            
-            for chunk in response:
-                if chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
-                    
+            num_days = int(days)
+        except (TypeError, ValueError):
+            return None
+        return num_days if 1 <= num_days <= MAX_TRIP_DAYS else None
+
+    @staticmethod
+    def _merge_trip_args(parsed: Dict[str, Any], given: Dict[str, Any]) -> Dict[str, Any]:
+        """解析结果补全规划给出的部分参数，规划给出的值优先"""
+        return {**(parsed or {}), **{name: value for name, value in given.items() if value}}
+
+    def _parse_task_locally(self, task_description: str) -> dict:
+        """使用本地提取器（目的地名录 + 中文数字与时长解析）解析任务描述中的目的地和天数信息"""
+        return trip_slot_extractor.extract(task_description)
+
+    def _resolve_trip_args(self, task_args: Optional[Dict[str, Any]], task_description: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        合并规划给出的参数与本地解析结果
+
+        Returns:
+            Tuple[Dict, bool]: (参数, 是否仍需调用LLM解析)
+        """
+        parsed_info = dict(task_args or {})
+        if self._has_trip_args(parsed_info):
+            print(f"🧩 使用规划给出的参数: {parsed_info}")
+            return parsed_info, False
+        parsed_info = self._merge_trip_args(self._parse_task_locally(task_description), parsed_info)
+        if self._has_trip_args(parsed_info):
+            print(f"🧩 本地解析结果: {parsed_info}")
+            return parsed_info, False
+        return parsed_info, True
+
+
+class TravelPlannerLLM(TravelPlannerMixin, LLMClient):
+    """旅行规划专用LLM客户端"""
+
+    def generate_itinerary_stream(self, destination: str, num_days: int, run: Optional[ItineraryRun] = None) -> Generator[str, None, None]:
+        """
+        流式生成旅行行程（已生成过的目的地与天数从行程缓存回放，结构化模式本地渲染，长行程按天并行生成）
+
+        run 可选，为本次生成的选项与结果（是否命中缓存、结构化行程数据、调用指标）
+        """
+        run = run if run is not None else ItineraryRun()
+        cached_chunks = self._cached_itinerary(destination, num_days, run)
+        if cached_chunks is not None:
+            yield from itinerary_cache.replay(cached_chunks)
+            return
+
+        mode = self._itinerary_mode(num_days, run.structured)
+        chunks = []
+        try:
+            if mode == "structured":
+                emitted = False
+                try:
+                    for piece in self._generate_structured(destination, num_days, chunks, run):
+                        emitted = True
+                        yield piece
+                except StructuredItineraryError as e:
+                    # 无法解析的JSON不能留在响应缓存中，否则下次结构化生成会直接回放同样的结果
+                    self.invalidate_cached_response(self.build_structured_messages(destination, num_days),
+                                                    **structured_itinerary.params(num_days))
+                    # 已输出部分结构化内容时不能再拼接整体生成的行程
+                    if emitted:
+                        raise
+                    print(f"⚠️ 结构化行程解析失败，改为整体生成: {e}")
+                    mode, chunks = "markdown", []
+            elif mode == "fanout":
+                skeleton = self._generate_skeleton(destination, num_days, run)
+                if skeleton:
+                    for chunk in itinerary_fanout.merge_ordered(self._day_producers(destination, num_days, skeleton, run)):
+                        chunks.append(chunk)
+                        yield chunk
+                else:
+                    mode = "markdown"
+            if mode == "markdown":
+                for chunk in self.stream_chat(self.build_itinerary_messages(destination, num_days),
+                                              on_metrics=run.on_metrics, **self.itinerary_params):
+                    chunks.append(chunk)
+                    yield chunk
         except Exception as e:
             raise Exception(f"生成行程时发生错误: {str(e)}")
-    
-    def generate_itinerary(self, destination: str, num_days: int) -> str:
+        # 只保存完整读取的行程，调用方提前停止读取时不会执行到这里
+        self._store_itinerary(destination, num_days, chunks, mode, run)
+
+    def _generate_structured(self, destination: str, num_days: int, raw_chunks: List[str], run: ItineraryRun) -> Generator[str, None, None]:
+        """结构化生成：模型输出JSON（原始分块追加到 raw_chunks），每完整收到一天就渲染输出"""
+        renderer = self._structured_renderer(destination, num_days)
+        for chunk in self.stream_chat(self.build_structured_messages(destination, num_days),
+                                      on_metrics=run.on_metrics, **structured_itinerary.params(num_days)):
+            raw_chunks.append(chunk)
+            yield from renderer.feed(chunk)
+        yield from renderer.finish()
+        run.structured_itinerary = renderer.itinerary
+
+    def _generate_skeleton(self, destination: str, num_days: int, run: ItineraryRun) -> Optional[List[Dict[str, Any]]]:
+        """生成行程骨架，失败时返回None（退回整体生成）"""
+        try:
+            skeleton = parse_skeleton(self.complete_chat(
+                self.build_skeleton_messages(destination, num_days),
+                on_metrics=run.on_metrics,
+                **itinerary_fanout.skeleton_params()
+            ), num_days)
+            print(f"🧭 已生成{num_days}天行程骨架，按天并行生成详细行程")
+            return skeleton
+        except Exception as e:
+            print(f"⚠️ 行程骨架生成失败，改为整体生成: {e}")
+            return None
+
+    def generate_itinerary(self, destination: str, num_days: int, run: Optional[ItineraryRun] = None) -> str:
         """非流式生成旅行行程"""
         full_text = ""
-        for chunk in self.generate_itinerary_stream(destination, num_days):
+        for chunk in self.generate_itinerary_stream(destination, num_days, run):
             full_text += chunk
         return full_text
 
     # +++ 新增：标准化的任务执行入口，用于被MCP调用 +++
-    def execute_task(self, task_description: str, context: dict) -> str:
+    def execute_task(self, task_description: str, context: dict, on_token: Optional[Callable[[str], None]] = None,
+                     task_args: Optional[Dict[str, Any]] = None) -> str:
         """
         作为工具被MCP调用时执行的具体任务。
         task_description: MCP分配的具体指令, e.g., "为去巴黎的5日游制定一个行程"
         context: 任务上下文，可能包含前置任务的结果
+        on_token: 可选回调，行程生成过程中每收到一块文本就调用一次
+        task_args: 可选，规划给出的结构化参数 {"destination", "days"}，完整时不再解析任务描述
         """
         print(f"✈️ TravelPlannerLLM 正在执行: {task_description}")
-        # 使用LLM来解析任务描述中的目的地和天数信息
-        parsed_info = self._parse_task_with_llm(task_description)
-        
+        parsed_info, needs_llm = self._resolve_trip_args(task_args, task_description)
+        if needs_llm:
+            # 本地提取不到时，才使用LLM来解析任务描述中的目的地和天数信息
+            parsed_info = self._merge_trip_args(self._parse_task_with_llm(task_description), parsed_info)
+
         destination = parsed_info.get("destination")
-        days = parsed_info.get("days")
-        
-        # 如果LLM解析失败，则尝试使用正则表达式解析
-        if not destination or not days:
-            import re
-            print("🔄 LLM解析失败，尝试使用正则表达式解析...")
-            
-            # 尝试提取目的地 - 使用更精确的模式
-            destination_match = re.search(r'安排一下([\u4e00-\u9fa5]{2,5})(?=国庆)', task_description)
-            destination = destination_match.group(1) if destination_match else None
-            
-            # 尝试提取天数 - 匹配中文数字或阿拉伯数字
-            days_match = re.search(r'(?:(\d+)|([一二三四五六七八九十]))天', task_description)
-            days = days_match.group(1) if days_match else None
-            # 如果匹配到中文数字，需要转换为阿拉伯数字
-            days_dict = {'一': '1', '二': '2', '三': '3', '四': '4', '五': '5', '六': '6', '七': '7', '八': '8', '九': '9', '十': '10'}
-            if not days and days_match and days_match.group(2):
-                days = days_dict.get(days_match.group(2))
-            
-            if not destination or not days:
-                return f"错误：无法从任务 '{task_description}' 中解析出目的地和天数。"
-        
-        num_days = int(days)
+        num_days = self._valid_days(parsed_info.get("days"))
+        if not destination or not num_days:
+            return f"错误：无法从任务 '{task_description}' 中解析出目的地和天数。"
 
         # 使用流式方法来完成任务
         try:
             result = ""
             for chunk in self.generate_itinerary_stream(destination, num_days):
                 result += chunk
+                if on_token:
+                    on_token(chunk)
             print(f"✈️ TravelPlannerLLM 完成任务。")
             return result
         except Exception as e:
             return f"旅行规划执行失败: {e}"
 
     def _parse_task_with_llm(self, task_description: str) -> dict:
-        """使用LLM来智能解析任务描述中的目的地和天数信息"""
+        """使用LLM来智能解析任务描述中的目的地和天数信息（同一描述的解析结果在进程内共享）"""
         try:
-            parse_prompt = f"""
-请从以下任务描述中提取旅行规划信息：
-
-任务描述: \"{task_description}\"
-
-请返回JSON格式的结果：
-{{
-    \"destination\": \"目的地城市名称\",
-    \"days\": 天数（数字）
-}}
-
-如果无法确定某个信息，请返回null。
-"""
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": parse_prompt}],
+            result = task_arg_extractor.extract(task_description, lambda text: parse_json_args(self.complete_chat(
+                self.build_parse_messages(text),
                 temperature=0.1,
                 response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            )))
             print(f"🧠 LLM解析结果: {result}")
             return result
-            
+
+        except Exception as e:
+            print(f"⚠️ LLM解析失败: {e}")
+            return {}
+
+
+class AsyncTravelPlannerLLM(TravelPlannerMixin, AsyncLLMClient):
+    """旅行规划专用异步LLM客户端"""
+
+    async def generate_itinerary_stream(self, destination: str, num_days: int, run: Optional[ItineraryRun] = None) -> AsyncGenerator[str, None]:
+        """异步流式生成旅行行程（与同步版本一致，run 为本次生成的选项与结果）"""
+        run = run if run is not None else ItineraryRun()
+        cached_chunks = self._cached_itinerary(destination, num_days, run)
+        if cached_chunks is not None:
+            async for chunk in itinerary_cache.areplay(cached_chunks):
+                yield chunk
+            return
+
+        mode = self._itinerary_mode(num_days, run.structured)
+        chunks = []
+        try:
+            if mode == "structured":
+                emitted = False
+                try:
+                    async for piece in self._generate_structured(destination, num_days, chunks, run):
+                        emitted = True
+                        yield piece
+                except StructuredItineraryError as e:
+                    # 无法解析的JSON不能留在响应缓存中，否则下次结构化生成会直接回放同样的结果
+                    self.invalidate_cached_response(self.build_structured_messages(destination, num_days),
+                                                    **structured_itinerary.params(num_days))
+                    # 已输出部分结构化内容时不能再拼接整体生成的行程
+                    if emitted:
+                        raise
+                    print(f"⚠️ 结构化行程解析失败，改为整体生成: {e}")
+                    mode, chunks = "markdown", []
+            elif mode == "fanout":
+                skeleton = await self._generate_skeleton(destination, num_days, run)
+                if skeleton:
+                    async for chunk in itinerary_fanout.amerge_ordered(self._day_producers(destination, num_days, skeleton, run)):
+                        chunks.append(chunk)
+                        yield chunk
+                else:
+                    mode = "markdown"
+            if mode == "markdown":
+                async for chunk in self.stream_chat(self.build_itinerary_messages(destination, num_days),
+                                                    on_metrics=run.on_metrics, **self.itinerary_params):
+                    chunks.append(chunk)
+                    yield chunk
+        except Exception as e:
+            raise Exception(f"生成行程时发生错误: {str(e)}")
+        self._store_itinerary(destination, num_days, chunks, mode, run)
+
+    async def _generate_structured(self, destination: str, num_days: int, raw_chunks: List[str], run: ItineraryRun) -> AsyncGenerator[str, None]:
+        """结构化生成：模型输出JSON（原始分块追加到 raw_chunks），每完整收到一天就渲染输出"""
+        renderer = self._structured_renderer(destination, num_days)
+        async for chunk in self.stream_chat(self.build_structured_messages(destination, num_days),
+                                            on_metrics=run.on_metrics, **structured_itinerary.params(num_days)):
+            raw_chunks.append(chunk)
+            for piece in renderer.feed(chunk):
+                yield piece
+        for piece in renderer.finish():
+            yield piece
+        run.structured_itinerary = renderer.itinerary
+
+    async def _generate_skeleton(self, destination: str, num_days: int, run: ItineraryRun) -> Optional[List[Dict[str, Any]]]:
+        """生成行程骨架，失败时返回None（退回整体生成）"""
+        try:
+            skeleton = parse_skeleton(await self.complete_chat(
+                self.build_skeleton_messages(destination, num_days),
+                on_metrics=run.on_metrics,
+                **itinerary_fanout.skeleton_params()
+            ), num_days)
+            print(f"🧭 已生成{num_days}天行程骨架，按天并行生成详细行程")
+            return skeleton
+        except Exception as e:
+            print(f"⚠️ 行程骨架生成失败，改为整体生成: {e}")
+            return None
+
+    async def generate_itinerary(self, destination: str, num_days: int, run: Optional[ItineraryRun] = None) -> str:
+        """异步非流式生成旅行行程"""
+        full_text = ""
+        async for chunk in self.generate_itinerary_stream(destination, num_days, run):
+            full_text += chunk
+        return full_text
+
+    async def execute_task(self, task_description: str, context: dict, on_token: Optional[Callable[[str], None]] = None,
+                           task_args: Optional[Dict[str, Any]] = None) -> str:
+        """作为工具被MCP调用时执行的具体任务（异步版本，契约与同步版本一致）"""
+        print(f"✈️ AsyncTravelPlannerLLM 正在执行: {task_description}")
+        parsed_info, needs_llm = self._resolve_trip_args(task_args, task_description)
+        if needs_llm:
+            parsed_info = self._merge_trip_args(await self._parse_task_with_llm(task_description), parsed_info)
+
+        destination = parsed_info.get("destination")
+        num_days = self._valid_days(parsed_info.get("days"))
+        if not destination or not num_days:
+            return f"错误：无法从任务 '{task_description}' 中解析出目的地和天数。"
+
+        try:
+            result = ""
+            async for chunk in self.generate_itinerary_stream(destination, num_days):
+                result += chunk
+                if on_token:
+                    on_token(chunk)
+            print(f"✈️ AsyncTravelPlannerLLM 完成任务。")
+            return result
+        except Exception as e:
+            return f"旅行规划执行失败: {e}"
+
+    async def _parse_task_with_llm(self, task_description: str) -> dict:
+        """使用LLM来智能解析任务描述中的目的地和天数信息（同一描述的解析结果在进程内共享）"""
+        async def parse(text: str) -> dict:
+            return parse_json_args(await self.complete_chat(
+                self.build_parse_messages(text),
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            ))
+
+        try:
+            result = await task_arg_extractor.extract_async(task_description, parse)
+            print(f"🧠 LLM解析结果: {result}")
+            return result
+
         except Exception as e:
             print(f"⚠️ LLM解析失败: {e}")
             return {}
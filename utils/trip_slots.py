@@ -0,0 +1,257 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import yaml
+
+
+# 中文数字
+CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5,
+                  "六": 6, "七": 7, "八": 8, "九": 9, "壹": 1, "贰": 2, "叁": 3, "肆": 4,
+                  "伍": 5, "陆": 6, "柒": 7, "捌": 8, "玖": 9}
+CHINESE_UNITS = {"十": 10, "拾": 10, "百": 100, "佰": 100, "千": 1000, "仟": 1000}
+# 整十的简写：廿 = 二十，卅 = 三十
+CHINESE_TENS = {"廿": 20, "卅": 30}
+NUMERAL_CHARS = "".join(CHINESE_DIGITS) + "".join(CHINESE_UNITS) + "".join(CHINESE_TENS) + "万"
+
+# 随仓库提供的目的地名录
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "gazetteer.yaml")
+
+# 时长：数字 + 天/日/晚/夜/周/星期/礼拜/个月，例如 "3天"、"十一日"、"两晚"、"一周"、"两个星期"、"半个月"
+DURATION_PATTERN = re.compile(rf"([\d{NUMERAL_CHARS}]+|半)\s*(个)?\s*(天|日|晚|夜|周|星期|礼拜|月)")
+# 英文时长，例如 "5 days"、"3-night"、"2 weeks"
+ENGLISH_DURATION_PATTERN = re.compile(r"(\d+)\s*-?\s*(day|night|week)s?\b")
+ENGLISH_UNITS = {"day": "天", "night": "晚", "week": "周"}
+# 各时长单位折合的天数，晚/夜折合时另加一天（"两晚" 为三天）
+DURATION_UNITS = {"天": 1, "日": 1, "晚": 1, "夜": 1, "周": 7, "星期": 7, "礼拜": 7, "月": 30}
+# 没有数字的时长说法
+DURATION_PHRASES = {"周末": 2, "小长假": 3, "黄金周": 7}
+# 各单位的优先级：明确的天数优先于晚数，晚数优先于周、月
+UNIT_PRIORITY = {"天": 0, "日": 0, "晚": 1, "夜": 1, "周": 2, "星期": 2, "礼拜": 2, "月": 3}
+# 可规划的最大天数，超过时视为无法解析
+MAX_TRIP_DAYS = 30
+
+# 出发地标记：城市前的 "从/由/离开"，或城市后的 "出发"
+ORIGIN_BEFORE = ("从", "由", "离开", "自")
+ORIGIN_AFTER = ("出发", "启程")
+# 可能是出发地：城市后紧跟 "到/去"（"北京到上海"）
+LIKELY_ORIGIN_AFTER = ("到", "去", "飞")
+# 目的地标记：城市前的出行动词
+DESTINATION_BEFORE = ("去", "到", "往", "飞", "游", "玩", "逛", "赴", "在")
+
+
+def parse_chinese_number(text: str) -> Optional[int]:
+    """将中文数字或阿拉伯数字转换为整数，例如 三、十二、两、二十五、廿一、一百零八、一万二千、3"""
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+
+    total, section, current = 0, 0, 0
+    for char in text:
+        if char in CHINESE_DIGITS:
+            # 两个数字之间缺少单位（如 "五五"）无法确定数值；"零" 只作占位，其后可以接数字
+            if current:
+                return None
+            current = CHINESE_DIGITS[char]
+        elif char in CHINESE_TENS:
+            section += CHINESE_TENS[char]
+            current = 0
+        elif char in CHINESE_UNITS:
+            # "十二" 中省略的 "一"
+            section += (current or 1) * CHINESE_UNITS[char]
+            current = 0
+        elif char == "万":
+            total += ((section + current) or 1) * 10000
+            section, current = 0, 0
+        else:
+            return None
+    return total + section + current
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机：一次扫描找出文本中出现的所有名称"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+
+    def add(self, word: str, value: Any):
+        """加入一个名称（需在 build 之前调用）"""
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append((len(word), value))
+
+    def build(self):
+        """按广度优先计算失配指针"""
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                # 第一层节点的失配指针为根节点，更深的节点沿父节点的失配链查找
+                if state:
+                    fallback = self._fail[state]
+                    while fallback and char not in self._goto[fallback]:
+                        fallback = self._fail[fallback]
+                    self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """遍历文本中的所有匹配 (开始位置, 结束位置, 值)"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                yield index + 1 - length, index + 1, value
+
+
+class TripSlotExtractor:
+    """
+    本地旅行槽位提取器。
+
+    目的地通过内置名录（config/gazetteer.yaml）的多模式匹配识别，支持中文名、英文名与常用别称；
+    天数支持完整的中文数字（十一、二十、两）以及 "两晚"、"一周"、"半个月"、"周末" 等时长说法。
+    不调用LLM，提取不到时才由调用方交给LLM解析。
+    """
+
+    def __init__(self, gazetteer_path: str = GAZETTEER_PATH):
+        """初始化提取器（名录在首次使用时加载）"""
+        self.gazetteer_path = gazetteer_path
+        self._lock = threading.Lock()
+        self._matcher: Optional[AhoCorasick] = None
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """统一全半角与大小写"""
+        return unicodedata.normalize("NFKC", text or "").lower()
+
+    def _load(self) -> AhoCorasick:
+        """加载名录并构建匹配自动机"""
+        with self._lock:
+            if self._matcher is not None:
+                return self._matcher
+            with open(self.gazetteer_path, "r", encoding="utf-8") as f:
+                gazetteer = yaml.safe_load(f) or {}
+            matcher = AhoCorasick()
+            count = 0
+            for section in gazetteer.values():
+                for name, aliases in (section or {}).items():
+                    for alias in [name] + list(aliases or []):
+                        matcher.add(self._normalize(str(alias)), name)
+                    count += 1
+            matcher.build()
+            print(f"📚 已加载目的地名录: {count} 个")
+            self._matcher = matcher
+            return matcher
+
+    @staticmethod
+    def _is_word_boundary(text: str, start: int, end: int) -> bool:
+        """英文名称需要整词匹配（"paris" 不匹配 "comparison"）"""
+        if not text[start:end].isascii():
+            return True
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        return not (before.isascii() and before.isalnum()) and not (after.isascii() and after.isalnum())
+
+    def find_destinations(self, text: str) -> List[Tuple[int, int, str]]:
+        """找出文本中出现的目的地 (开始位置, 结束位置, 标准名)，重叠时保留最长的匹配"""
+        text = self._normalize(text)
+        matches = [match for match in self._load().iter_matches(text) if self._is_word_boundary(text, match[0], match[1])]
+        matches.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+        selected = []
+        for start, end, name in matches:
+            if selected and start < selected[-1][1]:
+                # 与前一个匹配重叠：更长的匹配替换前一个
+                if end - start > selected[-1][1] - selected[-1][0]:
+                    selected[-1] = (start, end, name)
+                continue
+            selected.append((start, end, name))
+        return selected
+
+    def locate_destination(self, text: str) -> Optional[Tuple[int, int, str]]:
+        """
+        定位目的地 (开始位置, 结束位置, 标准名)，位置对应统一全半角与大小写后的文本
+
+        跳过明确的出发地（"从上海出发"）；出现多个城市时，优先选择出行动词之后的城市（"去成都"），
+        其次是没有标记的城市，后面紧跟 "到/去" 的城市（"北京到上海" 中的北京）最后考虑。
+        """
+        normalized = self._normalize(text)
+        candidates = []
+        for start, end, name in self.find_destinations(text):
+            before, after = normalized[max(start - 2, 0):start], normalized[end:end + 2]
+            if before.endswith(ORIGIN_BEFORE) or after.startswith(ORIGIN_AFTER):
+                continue
+            if before.endswith(DESTINATION_BEFORE):
+                rank = 0
+            elif after.startswith(LIKELY_ORIGIN_AFTER):
+                rank = 2
+            else:
+                rank = 1
+            candidates.append((rank, start, end, name))
+        if not candidates:
+            return None
+        return min(candidates)[1:]
+
+    def extract_destination(self, text: str) -> Optional[str]:
+        """提取目的地标准名"""
+        located = self.locate_destination(text)
+        return located[2] if located else None
+
+    def locate_days(self, text: str) -> Optional[Tuple[int, int, int]]:
+        """
+        定位天数 (开始位置, 结束位置, 天数)，位置对应统一全半角与大小写后的文本
+
+        同时出现多种说法时，明确的天数优先（"三天两晚" 为三天）；超过 MAX_TRIP_DAYS 的时长忽略。
+        """
+        normalized = self._normalize(text)
+        found = []
+        matches = [(match.start(), match.end(), *match.groups()) for match in DURATION_PATTERN.finditer(normalized)]
+        matches += [(match.start(), match.end(), match.group(1), None, ENGLISH_UNITS[match.group(2)])
+                    for match in ENGLISH_DURATION_PATTERN.finditer(normalized)]
+        for start, end, number, counter, unit in matches:
+            preceding = normalized[start - 1] if start else ""
+            if preceding == "第" or (unit == "日" and preceding == "月"):
+                continue  # "第二天" 是序数，"10月1日" 是日期
+            if unit == "月" and not counter:
+                continue  # "3月" 是月份
+            value = 0.5 if number == "半" else parse_chinese_number(number)
+            if not value:
+                continue
+            days = int(value * DURATION_UNITS[unit]) + (1 if unit in ("晚", "夜") else 0)
+            if 0 < days <= MAX_TRIP_DAYS:
+                found.append((UNIT_PRIORITY[unit], start, end, days))
+        if found:
+            return min(found)[1:]
+        for phrase, days in DURATION_PHRASES.items():
+            index = normalized.find(phrase)
+            if index >= 0:
+                return index, index + len(phrase), days
+        return None
+
+    def extract_days(self, text: str) -> Optional[int]:
+        """提取天数"""
+        located = self.locate_days(text)
+        return located[2] if located else None
+
+    def extract(self, text: str) -> Dict[str, Any]:
+        """提取目的地与天数，提取不到的槽位为None"""
+        return {"destination": self.extract_destination(text), "days": self.extract_days(text)}
+
+
+# 全局旅行槽位提取器
+trip_slot_extractor = TripSlotExtractor()
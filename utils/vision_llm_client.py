@@ -1,4 +1,4 @@
-from typing import Dict, Any, List, Optional, Tuple, Generator
+from typing import Dict, Any, List, Optional, Tuple, Generator, AsyncGenerator, Callable
 from openai import OpenAI
 import re
 import base64
@@ -8,12 +8,13 @@ from datetime import datetime, timedelta
 from icalendar import Calendar, Event
 import json
 from utils.llm_client import LLMClient
+from utils.async_llm_client import AsyncLLMClient
 
-class VisionLLMClient(LLMClient):
-    """视觉识别专用LLM客户端"""
+class VisionAnalysisMixin:
+    """图像分析提示词与编码逻辑，由同步和异步客户端共享"""
     
-    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-vl-plus"):
-        super().__init__(api_key, base_url, model)
+    # 图像分析的采样参数
+    analysis_params = {"temperature": 0.3, "top_p": 0.9, "max_tokens": 4096}
     
     def encode_image_to_base64(self, image: Image.Image, format: str = "JPEG") -> str:
         """将PIL图像转换为base64编码"""
@@ -92,9 +93,8 @@ class VisionLLMClient(LLMClient):
         
         return system_prompts.get(analysis_type, system_prompts["comprehensive"])
     
-    def analyze_image_stream(self, image: Image.Image, analysis_type: str = "comprehensive") -> Generator[str, None, None]:
-        """流式分析图片内容"""
-        
+    def build_analysis_messages(self, image: Image.Image, analysis_type: str = "comprehensive") -> List[Dict[str, Any]]:
+        """构建图像分析的对话消息"""
         system_prompt = self.get_system_prompt(analysis_type)
         
         user_prompt = f"""请对这张图片进行{analysis_type}分析。
@@ -110,78 +110,149 @@ class VisionLLMClient(LLMClient):
         # 编码图像
         base64_image = self.encode_image_to_base64(image)
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+        return [
+            {
+                "role": "system", 
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": [
                     {
-                        "role": "system", 
-                        "content": system_prompt
+                        "type": "text",
+                        "text": user_prompt
                     },
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": user_prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": base64_image,
-                                    "detail": "high"
-                                }
-                            }
-                        ]
+                        "type": "image_url",
+                        "image_url": {
+                            "url": base64_image,
+                            "detail": "high"
+                        }
                     }
-                ],
-                temperature=0.3,
-                top_p=0.9,
-                max_tokens=4096,
-                stream=True
-            )
-            
-            for chunk in response:
-                if chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
+                ]
+            }
+        ]
+    
+    def _detect_analysis_type(self, task_description: str) -> str:
+        """从任务描述中解析分析类型，如果没指定，就用默认的"""
+        if "简单" in task_description or "简洁" in task_description:
+            return "simple"
+        elif "详细" in task_description:
+            return "detailed"
+        return "comprehensive"
+
+    def _resolve_task_args(self, task_description: str, context: dict, task_args: Optional[Dict[str, Any]]) -> Tuple[Optional[str], str]:
+        """
+        确定要分析的图片路径与分析类型
+
+        规划给出的参数优先：image 为上下文中图片路径的键名（默认 image_path），
+        未给出 analysis_type 时从任务描述中判断。
+        """
+        task_args = task_args or {}
+        image_path = context.get(task_args.get("image") or "image_path")
+        analysis_type = task_args.get("analysis_type") or self._detect_analysis_type(task_description)
+        return image_path, analysis_type
+
+
+class VisionLLMClient(VisionAnalysisMixin, LLMClient):
+    """视觉识别专用LLM客户端"""
+    
+    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-vl-plus"):
+        super().__init__(api_key, base_url, model)
+    
+    def analyze_image_stream(self, image: Image.Image, analysis_type: str = "comprehensive",
+                             on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None) -> Generator[str, None, None]:
+        """流式分析图片内容（on_metrics 可选，调用结束时收到本次调用的指标记录）"""
+        messages = self.build_analysis_messages(image, analysis_type)
+        
+        try:
+            yield from self.stream_chat(messages, on_metrics=on_metrics, **self.analysis_params)
                     
         except Exception as e:
             raise Exception(f"图像分析时发生错误: {str(e)}")
     
-    def analyze_image(self, image: Image.Image, analysis_type: str = "comprehensive") -> str:
+    def analyze_image(self, image: Image.Image, analysis_type: str = "comprehensive",
+                      on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
         """非流式分析图片内容"""
         full_text = ""
-        for chunk in self.analyze_image_stream(image, analysis_type):
+        for chunk in self.analyze_image_stream(image, analysis_type, on_metrics):
             full_text += chunk
         return full_text
     
     # +++ 新增：标准化的任务执行入口，用于被MCP调用 +++
-    def execute_task(self, task_description: str, context: dict) -> str:
+    def execute_task(self, task_description: str, context: dict, on_token: Optional[Callable[[str], None]] = None,
+                     task_args: Optional[Dict[str, Any]] = None) -> str:
         """
         作为工具被MCP调用时执行的具体任务。
         task_description: MCP分配的具体指令, e.g., "分析这张图片里的主要物体"
         context: 任务上下文，必须包含 image_path 或 image_url
+        on_token: 可选回调，分析过程中每收到一块文本就调用一次
+        task_args: 可选，规划给出的结构化参数 {"analysis_type", "image"}
         """
         print(f"👁️ VisionLLMClient 正在执行: {task_description}")
         
         # 从上下文中获取图片信息
         # 假设MCP会把需要处理的文件路径放入context
-        image_path = context.get("image_path")
+        image_path, analysis_type = self._resolve_task_args(task_description, context, task_args)
         if not image_path:
             return "错误：上下文中未找到需要分析的图片路径(image_path)。"
             
         try:
             image = Image.open(image_path)
-            # 从任务描述中解析分析类型，如果没指定，就用默认的
-            analysis_type = "comprehensive"
-            if "简单" in task_description or "简洁" in task_description:
-                analysis_type = "simple"
-            elif "详细" in task_description:
-                analysis_type = "detailed"
             
-            # 调用已有的非流式方法来完成任务
-            result = self.analyze_image(image, analysis_type)
+            result = ""
+            for chunk in self.analyze_image_stream(image, analysis_type):
+                result += chunk
+                if on_token:
+                    on_token(chunk)
             print(f"👁️ VisionLLMClient 完成任务。")
             return result
         except Exception as e:
-            return f"图像分析执行失败: {e}"
\ No newline at end of file
+            return f"图像分析执行失败: {e}"
+
+
+class AsyncVisionLLMClient(VisionAnalysisMixin, AsyncLLMClient):
+    """视觉识别专用异步LLM客户端"""
+    
+    def __init__(self, api_key: str, base_url: str = None, model: str = "qwen-vl-plus"):
+        super().__init__(api_key, base_url, model)
+    
+    async def analyze_image_stream(self, image: Image.Image, analysis_type: str = "comprehensive",
+                                   on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None) -> AsyncGenerator[str, None]:
+        """异步流式分析图片内容（on_metrics 可选，调用结束时收到本次调用的指标记录）"""
+        messages = self.build_analysis_messages(image, analysis_type)
+        
+        try:
+            async for chunk in self.stream_chat(messages, on_metrics=on_metrics, **self.analysis_params):
+                yield chunk
+        except Exception as e:
+            raise Exception(f"图像分析时发生错误: {str(e)}")
+    
+    async def analyze_image(self, image: Image.Image, analysis_type: str = "comprehensive",
+                            on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """异步非流式分析图片内容"""
+        full_text = ""
+        async for chunk in self.analyze_image_stream(image, analysis_type, on_metrics):
+            full_text += chunk
+        return full_text
+    
+    async def execute_task(self, task_description: str, context: dict, on_token: Optional[Callable[[str], None]] = None,
+                           task_args: Optional[Dict[str, Any]] = None) -> str:
+        """作为工具被MCP调用时执行的具体任务（异步版本，契约与同步版本一致）"""
+        print(f"👁️ AsyncVisionLLMClient 正在执行: {task_description}")
+        
+        image_path, analysis_type = self._resolve_task_args(task_description, context, task_args)
+        if not image_path:
+            return "错误：上下文中未找到需要分析的图片路径(image_path)。"
+            
+        try:
+            image = Image.open(image_path)
+            result = ""
+            async for chunk in self.analyze_image_stream(image, analysis_type):
+                result += chunk
+                if on_token:
+                    on_token(chunk)
+            print(f"👁️ AsyncVisionLLMClient 完成任务。")
+            return result
+        except Exception as e:
+            return f"图像分析执行失败: {e}"